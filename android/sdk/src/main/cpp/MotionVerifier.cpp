@@ -5,21 +5,143 @@
 #include <numeric>
 #include <algorithm>
 #include <iostream>
+#include <cstdint>
+#include <cstring>
+#include <iterator>
+#ifdef VP_HAVE_ZLIB
+#include <zlib.h>
+#endif
+
+namespace {
+
+// Binary gyro log, see backend/app/gyro_format.py for the layout
+const char kGyroMagic[4] = {'V', 'P', 'G', 'Y'};
+const size_t kGyroHeaderSize = 16;
+const uint8_t kGyroVersion = 1;
+const uint8_t kGyroFlagZlib = 1;
+const uint8_t kGyroFlagNanoseconds = 2;
+const uint8_t kGyroFlagDegrees = 4;
+
+// Fields are little-endian, like every platform we build for
+template <typename T>
+T readLittleEndian(const unsigned char* p) {
+    T value;
+    std::memcpy(&value, p, sizeof(T));
+    return value;
+}
+
+#ifdef VP_HAVE_ZLIB
+bool inflateBuffer(const std::vector<char>& in, std::vector<char>& out) {
+    z_stream zs;
+    std::memset(&zs, 0, sizeof(zs));
+    if (inflateInit(&zs) != Z_OK) return false;
+    zs.next_in = reinterpret_cast<Bytef*>(const_cast<char*>(in.data()));
+    zs.avail_in = static_cast<uInt>(in.size());
+
+    char buffer[64 * 1024];
+    int ret;
+    do {
+        zs.next_out = reinterpret_cast<Bytef*>(buffer);
+        zs.avail_out = sizeof(buffer);
+        ret = inflate(&zs, Z_NO_FLUSH);
+        if (ret != Z_OK && ret != Z_STREAM_END) {
+            inflateEnd(&zs);
+            return false;
+        }
+        out.insert(out.end(), buffer, buffer + (sizeof(buffer) - zs.avail_out));
+    } while (ret != Z_STREAM_END);
+    inflateEnd(&zs);
+    return true;
+}
+#endif
+
+} // namespace
 
 MotionVerifier::MotionVerifier() {}
 MotionVerifier::~MotionVerifier() {}
 
+std::vector<GyroSample> MotionVerifier::loadGyroBinary(std::ifstream& file) {
+    std::vector<GyroSample> data;
+    unsigned char header[kGyroHeaderSize];
+    if (!file.read(reinterpret_cast<char*>(header), kGyroHeaderSize)) {
+        std::cerr << "Truncated binary gyro header" << std::endl;
+        return data;
+    }
+    uint8_t version = header[4];
+    uint8_t flags = header[5];
+    uint8_t valueSize = header[6];
+    uint32_t count = readLittleEndian<uint32_t>(header + 12);
+    if (version != kGyroVersion || (valueSize != 4 && valueSize != 8)) {
+        std::cerr << "Unsupported binary gyro log (version " << int(version)
+                  << ", value size " << int(valueSize) << ")" << std::endl;
+        return data;
+    }
+
+    // One read of the whole payload; records are decoded in place
+    std::vector<char> payload((std::istreambuf_iterator<char>(file)), std::istreambuf_iterator<char>());
+    if (flags & kGyroFlagZlib) {
+#ifdef VP_HAVE_ZLIB
+        std::vector<char> inflated;
+        if (!inflateBuffer(payload, inflated)) {
+            std::cerr << "Corrupt compressed gyro payload" << std::endl;
+            return data;
+        }
+        payload.swap(inflated);
+#else
+        std::cerr << "Compressed gyro logs need a build with zlib" << std::endl;
+        return data;
+#endif
+    }
+
+    size_t recordSize = sizeof(double) + 3 * valueSize;
+    size_t available = payload.size() / recordSize;
+    if (count == 0) {
+        count = static_cast<uint32_t>(available);
+    } else if (count > available) {
+        std::cerr << "Binary gyro log declares " << count << " records, payload holds " << available << std::endl;
+        return data;
+    }
+
+    double timeScale = (flags & kGyroFlagNanoseconds) ? 1e-9 : 1.0;
+    double rateScale = (flags & kGyroFlagDegrees) ? M_PI / 180.0 : 1.0;
+    const unsigned char* p = reinterpret_cast<const unsigned char*>(payload.data());
+    double t0 = count > 0 ? readLittleEndian<double>(p) : 0.0;
+    data.reserve(count);
+    for (uint32_t i = 0; i < count; ++i, p += recordSize) {
+        GyroSample sample;
+        sample.timestamp = (readLittleEndian<double>(p) - t0) * timeScale;
+        const unsigned char* values = p + sizeof(double);
+        for (int axis = 0; axis < 3; ++axis) {
+            double v = valueSize == 4
+                ? readLittleEndian<float>(values + axis * 4)
+                : readLittleEndian<double>(values + axis * 8);
+            (axis == 0 ? sample.x : axis == 1 ? sample.y : sample.z) = v * rateScale;
+        }
+        data.push_back(sample);
+    }
+    return data;
+}
+
 std::vector<GyroSample> MotionVerifier::loadGyroData(const std::string& path) {
     std::vector<GyroSample> data;
-    std::ifstream file(path);
+    std::ifstream file(path, std::ios::binary);
     std::string line;
     
     // Check if file opened
     if (!file.is_open()) {
-        std::cerr << "Failed to open gyro CSV: " << path << std::endl;
+        std::cerr << "Failed to open gyro log: " << path << std::endl;
         return data; 
     }
 
+    // Binary VPGY log, otherwise CSV
+    char magic[sizeof(kGyroMagic)] = {0};
+    file.read(magic, sizeof(magic));
+    file.clear();
+    file.seekg(0);
+    if (std::memcmp(magic, kGyroMagic, sizeof(kGyroMagic)) == 0) {
+        return loadGyroBinary(file);
+    }
+
     // Skip header
     std::getline(file, line);
     
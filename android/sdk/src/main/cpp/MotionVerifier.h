@@ -3,6 +3,7 @@
 
 #include <vector>
 #include <string>
+#include <fstream>
 #include <opencv2/opencv.hpp>
 
 struct GyroSample {
@@ -25,12 +26,14 @@ public:
     /**
      * Verify consistency between a video file and a gyroscope CSV.
      * @param videoPath Path to mp4 video
-     * @param gyroCSVPath Path to CSV (timestamp, x, y, z)
+     * @param gyroCSVPath Path to CSV (timestamp, x, y, z) or binary VPGY gyro log
      */
     VerificationResult verify(const std::string& videoPath, const std::string& gyroCSVPath);
 
 private:
+    // Gyro log as `timestamp,x,y,z` CSV or binary VPGY (detected by its magic)
     std::vector<GyroSample> loadGyroData(const std::string& path);
+    std::vector<GyroSample> loadGyroBinary(std::ifstream& file);
     
     // Calculates dense optical flow and returns a signal of average flow (X, Y) per frame
     // Returns pair of vectors: <Time, FlowX> (focusing on X for now)
@@ -6,16 +6,41 @@ import android.hardware.SensorEvent
 import android.hardware.SensorEventListener
 import android.hardware.SensorManager
 import android.os.SystemClock
+import java.io.BufferedOutputStream
 import java.io.File
+import java.io.FileOutputStream
 import java.io.FileWriter
 import java.io.IOException
+import java.io.RandomAccessFile
+import java.nio.ByteBuffer
+import java.nio.ByteOrder
 
 class SensorRecorder(private val context: Context) : SensorEventListener {
 
+    /**
+     * CSV is understood by every server version. BINARY writes the compact
+     * VPGY log (float64 ns timestamps, float32 rad/s axes), about a third of
+     * the CSV size; use it with servers that accept `.vpgy` gyro uploads.
+     */
+    enum class GyroFormat { CSV, BINARY }
+
+    companion object {
+        private val VPGY_MAGIC = byteArrayOf('V'.code.toByte(), 'P'.code.toByte(), 'G'.code.toByte(), 'Y'.code.toByte())
+        private const val VPGY_VERSION: Byte = 1
+        private const val VPGY_FLAG_NANOSECONDS: Byte = 2
+        private const val VPGY_HEADER_SIZE = 16
+        private const val VPGY_RECORD_SIZE = 20
+    }
+
     private var sensorManager: SensorManager? = null
     private var gyroscope: Sensor? = null
     private var isRecording = false
     private var writer: FileWriter? = null
+    private var binaryStream: BufferedOutputStream? = null
+    private val record = ByteBuffer.allocate(VPGY_RECORD_SIZE).order(ByteOrder.LITTLE_ENDIAN)
+    private var sampleCount = 0L
+    private var firstTimestamp = 0L
+    private var lastTimestamp = 0L
     private var outputFile: File? = null
 
     init {
@@ -23,14 +48,22 @@ class SensorRecorder(private val context: Context) : SensorEventListener {
         gyroscope = sensorManager?.getDefaultSensor(Sensor.TYPE_GYROSCOPE)
     }
 
-    fun start(outputFile: File) {
+    fun start(outputFile: File, format: GyroFormat = GyroFormat.CSV) {
         if (isRecording) return
         this.outputFile = outputFile
+        sampleCount = 0
         
         try {
-            writer = FileWriter(outputFile)
-            // Write Header
-            writer?.append("timestamp,x,y,z\n")
+            if (format == GyroFormat.BINARY) {
+                // Count and rate are filled in by stop()
+                binaryStream = BufferedOutputStream(FileOutputStream(outputFile)).also {
+                    it.write(vpgyHeader(0f, 0))
+                }
+            } else {
+                writer = FileWriter(outputFile)
+                // Write Header
+                writer?.append("timestamp,x,y,z\n")
+            }
         } catch (e: IOException) {
             e.printStackTrace()
             return
@@ -50,9 +83,34 @@ class SensorRecorder(private val context: Context) : SensorEventListener {
         try {
             writer?.flush()
             writer?.close()
+            binaryStream?.let {
+                it.close()
+                finishBinaryHeader()
+            }
         } catch (e: IOException) {
             e.printStackTrace()
         }
+        writer = null
+        binaryStream = null
+    }
+
+    private fun vpgyHeader(sampleRate: Float, count: Int): ByteArray {
+        return ByteBuffer.allocate(VPGY_HEADER_SIZE).order(ByteOrder.LITTLE_ENDIAN)
+            .put(VPGY_MAGIC)
+            .put(VPGY_VERSION)
+            .put(VPGY_FLAG_NANOSECONDS)
+            .put(4.toByte()) // float32 axes
+            .put(0.toByte())
+            .putFloat(sampleRate)
+            .putInt(count)
+            .array()
+    }
+
+    private fun finishBinaryHeader() {
+        val file = outputFile ?: return
+        val span = (lastTimestamp - firstTimestamp) / 1e9
+        val rate = if (sampleCount > 1 && span > 0) ((sampleCount - 1) / span).toFloat() else 0f
+        RandomAccessFile(file, "rw").use { it.write(vpgyHeader(rate, sampleCount.toInt())) }
     }
 
     override fun onSensorChanged(event: SensorEvent?) {
@@ -67,7 +125,17 @@ class SensorRecorder(private val context: Context) : SensorEventListener {
             val timestamp = event.timestamp
             
             try {
-                writer?.append("$timestamp,$x,$y,$z\n")
+                val stream = binaryStream
+                if (stream != null) {
+                    if (sampleCount == 0L) firstTimestamp = timestamp
+                    lastTimestamp = timestamp
+                    record.clear()
+                    record.putDouble(timestamp.toDouble()).putFloat(x).putFloat(y).putFloat(z)
+                    stream.write(record.array())
+                    sampleCount++
+                } else {
+                    writer?.append("$timestamp,$x,$y,$z\n")
+                }
             } catch (e: IOException) {
                 // Ignore drop
             }
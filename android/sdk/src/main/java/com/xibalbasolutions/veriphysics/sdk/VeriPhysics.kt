@@ -6,8 +6,11 @@ import okhttp3.MultipartBody
 import okhttp3.OkHttpClient
 import okhttp3.Request
 import okhttp3.RequestBody.Companion.asRequestBody
+import okhttp3.RequestBody.Companion.toRequestBody
 import java.io.File
 import java.io.IOException
+import java.io.RandomAccessFile
+import java.util.concurrent.Executors
 import java.util.concurrent.TimeUnit
 
 class VeriPhysics private constructor(private val context: Context) {
@@ -18,6 +21,7 @@ class VeriPhysics private constructor(private val context: Context) {
         .writeTimeout(60, TimeUnit.SECONDS)
         .readTimeout(60, TimeUnit.SECONDS)
         .build()
+    private val uploadExecutor = Executors.newSingleThreadExecutor()
 
     companion object {
         @Volatile
@@ -29,6 +33,10 @@ class VeriPhysics private constructor(private val context: Context) {
             }
         }
         
+        private const val TUS_VERSION = "1.0.0"
+        private const val PREFS_UPLOADS = "veriphysics_uploads"
+        const val DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
         init {
             System.loadLibrary("veriphysics_sdk")
         }
@@ -36,8 +44,8 @@ class VeriPhysics private constructor(private val context: Context) {
 
     external fun verifyCapture(videoPath: String, gyroPath: String): String
 
-    fun startCapture(gyroFile: File) {
-        sensorRecorder.start(gyroFile)
+    fun startCapture(gyroFile: File, format: SensorRecorder.GyroFormat = SensorRecorder.GyroFormat.CSV) {
+        sensorRecorder.start(gyroFile, format)
     }
 
     fun stopCapture() {
@@ -57,7 +65,6 @@ class VeriPhysics private constructor(private val context: Context) {
         callback: UploadCallback
     ) {
         val mediaTypeVideo = "video/mp4".toMediaTypeOrNull()
-        val mediaTypeCsv = "text/csv".toMediaTypeOrNull()
 
         // 1. Sign Data
         val signature = signBundle(videoFile.absolutePath, gyroFile.absolutePath)
@@ -65,7 +72,7 @@ class VeriPhysics private constructor(private val context: Context) {
         val requestBody = MultipartBody.Builder()
             .setType(MultipartBody.FORM)
             .addFormDataPart("video", videoFile.name, videoFile.asRequestBody(mediaTypeVideo))
-            .addFormDataPart("gyro", gyroFile.name, gyroFile.asRequestBody(mediaTypeCsv))
+            .addFormDataPart("gyro", gyroFile.name, gyroFile.asRequestBody(gyroMediaType(gyroFile)))
             .build()
 
         val request = Request.Builder()
@@ -93,6 +100,150 @@ class VeriPhysics private constructor(private val context: Context) {
         })
     }
     
+    /**
+     * Resumable variant of [uploadBundle] for long clips on flaky networks.
+     * The video is sent in chunks; after a network error, or an app restart
+     * with the same file, the upload continues from the server's offset
+     * instead of starting over. Runs on a background thread.
+     */
+    fun uploadBundleResumable(
+        apiUrl: String,
+        apiKey: String,
+        videoFile: File,
+        gyroFile: File,
+        callback: UploadCallback,
+        chunkSize: Int = DEFAULT_CHUNK_SIZE,
+        maxRetries: Int = 5
+    ) {
+        uploadExecutor.execute {
+            try {
+                callback.onSuccess(runResumableUpload(apiUrl, apiKey, videoFile, gyroFile, chunkSize, maxRetries))
+            } catch (e: Exception) {
+                callback.onError(e.message ?: "Unknown upload error")
+            }
+        }
+    }
+
+    private fun runResumableUpload(
+        apiUrl: String,
+        apiKey: String,
+        videoFile: File,
+        gyroFile: File,
+        chunkSize: Int,
+        maxRetries: Int
+    ): String {
+        // Remember the upload URL per file so a restarted app can resume it
+        val prefs = context.getSharedPreferences(PREFS_UPLOADS, Context.MODE_PRIVATE)
+        val fingerprint = "${videoFile.absolutePath}:${videoFile.length()}:${videoFile.lastModified()}"
+
+        val saved = prefs.getString(fingerprint, null)
+        val savedOffset = saved?.let { queryOffset("$apiUrl$it", apiKey) }
+        val uploadPath: String
+        var offset: Long
+        if (saved != null && savedOffset != null) {
+            uploadPath = saved
+            offset = savedOffset
+        } else {
+            uploadPath = createUpload(apiUrl, apiKey, videoFile)
+            offset = 0L
+            prefs.edit().putString(fingerprint, uploadPath).apply()
+        }
+        val url = "$apiUrl$uploadPath"
+
+        val total = videoFile.length()
+        var failures = 0
+        RandomAccessFile(videoFile, "r").use { raf ->
+            val buffer = ByteArray(chunkSize)
+            while (offset < total) {
+                try {
+                    val length = minOf(chunkSize.toLong(), total - offset).toInt()
+                    raf.seek(offset)
+                    raf.readFully(buffer, 0, length)
+                    offset = patchChunk(url, apiKey, offset, buffer, length)
+                    failures = 0
+                } catch (e: IOException) {
+                    if (++failures > maxRetries) throw e
+                    Thread.sleep(1000L shl minOf(failures, 5))
+                    offset = queryOffset(url, apiKey) ?: throw IOException("Upload session expired")
+                }
+            }
+        }
+
+        val gyroBody = MultipartBody.Builder()
+            .setType(MultipartBody.FORM)
+            .addFormDataPart("gyro", gyroFile.name, gyroFile.asRequestBody(gyroMediaType(gyroFile)))
+            .build()
+        execute(Request.Builder().url("$url/gyro").header("x-api-key", apiKey).put(gyroBody).build()).use { }
+
+        val signature = signBundle(videoFile.absolutePath, gyroFile.absolutePath)
+        val finalize = Request.Builder()
+            .url("$url/finalize")
+            .header("x-api-key", apiKey)
+            .header("x-signature", signature)
+            .post(ByteArray(0).toRequestBody(null))
+            .build()
+        val body = execute(finalize).use { it.body?.string() ?: "{}" }
+        prefs.edit().remove(fingerprint).apply()
+        return body
+    }
+
+    private fun createUpload(apiUrl: String, apiKey: String, videoFile: File): String {
+        fun encode(value: String) = android.util.Base64.encodeToString(value.toByteArray(), android.util.Base64.NO_WRAP)
+        val request = Request.Builder()
+            .url("$apiUrl/uploads")
+            .header("x-api-key", apiKey)
+            .header("Tus-Resumable", TUS_VERSION)
+            .header("Upload-Length", videoFile.length().toString())
+            .header("Upload-Metadata", "filename ${encode(videoFile.name)},filetype ${encode("video/mp4")}")
+            .post(ByteArray(0).toRequestBody(null))
+            .build()
+        return execute(request).use { it.header("Location") ?: throw IOException("Server returned no upload location") }
+    }
+
+    /** Server-side offset, or null if the upload no longer exists. */
+    private fun queryOffset(url: String, apiKey: String): Long? {
+        val request = Request.Builder().url(url).header("x-api-key", apiKey).header("Tus-Resumable", TUS_VERSION).head().build()
+        client.newCall(request).execute().use {
+            if (it.code == 404) return null
+            if (!it.isSuccessful) throw IOException("Server Error: ${it.code} ${it.message}")
+            return it.header("Upload-Offset")?.toLongOrNull()
+        }
+    }
+
+    private fun patchChunk(url: String, apiKey: String, offset: Long, buffer: ByteArray, length: Int): Long {
+        val request = Request.Builder()
+            .url(url)
+            .header("x-api-key", apiKey)
+            .header("Tus-Resumable", TUS_VERSION)
+            .header("Upload-Offset", offset.toString())
+            .patch(buffer.toRequestBody("application/offset+octet-stream".toMediaTypeOrNull(), 0, length))
+            .build()
+        client.newCall(request).execute().use {
+            // 409: our offset is stale, continue from the server's
+            if (it.isSuccessful || it.code == 409) {
+                return it.header("Upload-Offset")?.toLongOrNull() ?: throw IOException("Server returned no offset")
+            }
+            throw IOException("Server Error: ${it.code} ${it.message}")
+        }
+    }
+
+    private fun execute(request: Request): okhttp3.Response {
+        val response = client.newCall(request).execute()
+        if (!response.isSuccessful) {
+            response.close()
+            throw IOException("Server Error: ${response.code} ${response.message}")
+        }
+        return response
+    }
+
+    // Binary logs are announced as such; CSV keeps the type older servers expect
+    private fun gyroMediaType(gyroFile: File) =
+        if (gyroFile.extension.equals("vpgy", ignoreCase = true)) {
+            "application/vnd.veriphysics.gyro".toMediaTypeOrNull()
+        } else {
+            "text/csv".toMediaTypeOrNull()
+        }
+
     private fun signBundle(videoPath: String, gyroPath: String): String {
         try {
             val ks = java.security.KeyStore.getInstance("AndroidKeyStore")
@@ -0,0 +1,304 @@
+"""
+Per-API-key rate limits, concurrency caps and global admission control for the
+endpoints that accept uploads or create verification work.
+
+Runs as ASGI middleware, so a refused request is answered with 429 and
+Retry-After before its body is read and nothing reaches UPLOAD_DIR. Checks,
+in order:
+
+- per API key: a token bucket (`rate_limit_per_minute`, `rate_limit_burst`)
+  charged by requests that start new work (chunks and segments of an
+  upload or live session already started are not), and a cap on its
+  requests in flight (`max_concurrent_uploads`);
+- per user: a cap on unfinished jobs (`max_concurrent_jobs`), for requests
+  that create jobs or start an upload that will;
+- globally: uploads in flight against `max_uploads`, and queued plus running
+  jobs plus uploads in flight against `capacity`.
+
+Limits are columns of the api_keys row; NULL falls back to the server default
+and 0 means unlimited. Buckets and in-flight counts are kept per process.
+"""
+import logging
+import math
+import re
+import threading
+import time
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# Jobs a user still has in the pipeline
+ACTIVE_STATUSES = ("PENDING", "PROCESSING", "SIGNING")
+
+# (method, path, rate limited, counts against the job cap)
+ADMITTED_ROUTES = (
+    ("POST", re.compile(r"^/verify$"), True, True),
+    ("POST", re.compile(r"^/verify/batch$"), True, True),
+    ("POST", re.compile(r"^/uploads$"), True, True),
+    ("PATCH", re.compile(r"^/uploads/[^/]+$"), False, False),
+    ("PUT", re.compile(r"^/uploads/[^/]+/gyro$"), False, False),
+    ("POST", re.compile(r"^/uploads/[^/]+/finalize$"), False, True),
+    ("POST", re.compile(r"^/live$"), True, False),
+    ("POST", re.compile(r"^/live/[^/]+/video$"), False, False),
+)
+
+
+class AdmissionError(Exception):
+    """Request refused; `retry_after` is the suggested wait in seconds."""
+
+    def __init__(self, message: str, retry_after: float, reason: str):
+        super().__init__(message)
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+        self.reason = reason
+        self.status_code = 429
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Takes a token; returns 0, or the seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+class KeyLimits:
+    """Effective limits of one API key (defaults applied); 0 = unlimited."""
+
+    def __init__(self, user_id: int, rate_per_minute: float, burst: int, max_jobs: int, max_uploads: int):
+        self.user_id = user_id
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.max_jobs = max_jobs
+        self.max_uploads = max_uploads
+
+    def to_dict(self) -> dict:
+        return {
+            "rate_limit_per_minute": self.rate_per_minute,
+            "rate_limit_burst": self.burst,
+            "max_concurrent_jobs": self.max_jobs,
+            "max_concurrent_uploads": self.max_uploads,
+        }
+
+
+class AdmissionController:
+    """
+    `queue_depth(db)` and `job_seconds()` (average time of one job) come from
+    the verify queue, which runs `workers` jobs at a time; they drive the
+    global check and the Retry-After estimates.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        queue_depth,
+        job_seconds,
+        workers: int = 1,
+        capacity: int = 1000,
+        max_uploads: int = 64,
+        default_rate_per_minute: float = 60.0,
+        default_burst: int = 10,
+        default_max_jobs: int = 100,
+        default_max_uploads: int = 4,
+        cache_ttl: float = 30.0,
+        depth_ttl: float = 1.0,
+    ):
+        self.session_factory = session_factory
+        self.queue_depth = queue_depth
+        self.job_seconds = job_seconds
+        self.workers = max(1, workers)
+        self.capacity = capacity
+        self.max_uploads = max_uploads
+        self.default_rate_per_minute = default_rate_per_minute
+        self.default_burst = default_burst
+        self.default_max_jobs = default_max_jobs
+        self.default_max_uploads = default_max_uploads
+        self.cache_ttl = cache_ttl
+        self.depth_ttl = depth_ttl
+
+        self._lock = threading.Lock()
+        self._limits = {}  # key -> (KeyLimits or None, expires)
+        self._buckets = {}
+        self._in_flight = {}  # key -> admitted requests still running
+        self._in_flight_total = 0
+        self._depth = (0, 0.0)  # (value, expires)
+        # Moving average of how long an admitted request runs, for Retry-After
+        self._avg_request_seconds = 5.0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight_total
+
+    def effective_limits(self, row: models.ApiKey) -> KeyLimits:
+        def pick(value, default):
+            return default if value is None else value
+
+        return KeyLimits(
+            row.user_id,
+            pick(row.rate_limit_per_minute, self.default_rate_per_minute),
+            pick(row.rate_limit_burst, self.default_burst),
+            pick(row.max_concurrent_jobs, self.default_max_jobs),
+            pick(row.max_concurrent_uploads, self.default_max_uploads),
+        )
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._limits.pop(key, None)
+            self._buckets.pop(key, None)
+
+    def _key_limits(self, db, key: str):
+        with self._lock:
+            cached = self._limits.get(key)
+            if cached and cached[1] > time.monotonic():
+                return cached[0]
+        row = db.query(models.ApiKey).filter(models.ApiKey.key == key, models.ApiKey.is_active == True).first()
+        limits = self.effective_limits(row) if row else None
+        with self._lock:
+            self._limits[key] = (limits, time.monotonic() + self.cache_ttl)
+            if len(self._limits) > 10000:
+                self._limits.clear()
+        return limits
+
+    def _current_depth(self, db) -> int:
+        value, expires = self._depth
+        if expires > time.monotonic():
+            return value
+        value = self.queue_depth(db)
+        self._depth = (value, time.monotonic() + self.depth_ttl)
+        return value
+
+    def _take_token(self, key: str, limits: KeyLimits):
+        if limits.rate_per_minute <= 0:
+            return
+        rate = limits.rate_per_minute / 60.0
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None or bucket.rate != rate or bucket.burst != max(1.0, limits.burst):
+                bucket = self._buckets[key] = TokenBucket(rate, limits.burst)
+            wait = bucket.take()
+        if wait > 0:
+            raise AdmissionError(f"Rate limit of {limits.rate_per_minute:g} requests/minute exceeded", wait, "rate")
+
+    def admit(self, key: str, rated: bool = True, creates_jobs: bool = False) -> bool:
+        """
+        Runs the checks for one request (blocking DB access; call from a
+        thread). Returns True if a slot was taken, to be given back with
+        release(); False if the key is unknown (the endpoint rejects it).
+        Raises AdmissionError.
+        """
+        db = self.session_factory()
+        try:
+            limits = self._key_limits(db, key)
+            if limits is None:
+                return False
+            if rated:
+                self._take_token(key, limits)
+
+            if creates_jobs and limits.max_jobs > 0:
+                active = db.query(models.VerificationJob).filter(
+                    models.VerificationJob.user_id == limits.user_id,
+                    models.VerificationJob.status.in_(ACTIVE_STATUSES),
+                ).count()
+                if active >= limits.max_jobs:
+                    raise AdmissionError(
+                        f"Too many unfinished jobs ({active}, limit {limits.max_jobs})",
+                        self.job_seconds(), "user_jobs",
+                    )
+            depth = self._current_depth(db) if self.capacity > 0 else 0
+
+            # Checked and taken under one lock so concurrent requests cannot overshoot
+            with self._lock:
+                key_in_flight = self._in_flight.get(key, 0)
+                total = self._in_flight_total
+                if limits.max_uploads > 0 and key_in_flight >= limits.max_uploads:
+                    raise AdmissionError(
+                        f"Too many concurrent requests for this API key (limit {limits.max_uploads})",
+                        self._avg_request_seconds, "key_concurrency",
+                    )
+                if self.max_uploads > 0 and total >= self.max_uploads:
+                    raise AdmissionError("Server is busy, retry later", self._avg_request_seconds, "uploads")
+                if self.capacity > 0 and depth + total >= self.capacity:
+                    backlog = depth + total - self.capacity + 1
+                    raise AdmissionError("Server is at capacity, retry later", backlog * self.job_seconds() / self.workers, "capacity")
+                self._in_flight[key] = key_in_flight + 1
+                self._in_flight_total = total + 1
+            return True
+        finally:
+            db.close()
+
+    def release(self, key: str, seconds: float):
+        with self._lock:
+            remaining = self._in_flight.get(key, 0) - 1
+            if remaining > 0:
+                self._in_flight[key] = remaining
+            else:
+                self._in_flight.pop(key, None)
+            self._in_flight_total = max(0, self._in_flight_total - 1)
+            self._avg_request_seconds = 0.8 * self._avg_request_seconds + 0.2 * seconds
+
+
+def admitted_route(method: str, path: str):
+    """(rated, creates_jobs) for an admission-controlled route, else None."""
+    for route_method, pattern, rated, creates_jobs in ADMITTED_ROUTES:
+        if method == route_method and pattern.match(path):
+            return rated, creates_jobs
+    return None
+
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI middleware around AdmissionController. Requests without an
+    API key pass through; the endpoint's own authentication rejects them.
+    """
+
+    def __init__(self, app, controller: AdmissionController, on_reject=None):
+        self.app = app
+        self.controller = controller
+        self.on_reject = on_reject
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        route = admitted_route(scope["method"], scope["path"])
+        key = None
+        if route is not None:
+            for name, value in scope["headers"]:
+                if name == b"x-api-key":
+                    key = value.decode("latin-1")
+                    break
+        if key is None:
+            return await self.app(scope, receive, send)
+
+        try:
+            admitted = await run_in_threadpool(self.controller.admit, key, *route)
+        except AdmissionError as e:
+            logger.info(f"Refused {scope['method']} {scope['path']} ({e.reason}): {e}")
+            if self.on_reject:
+                self.on_reject(e.reason)
+            response = JSONResponse(
+                {"detail": str(e)}, status_code=e.status_code, headers={"Retry-After": str(e.retry_after)}
+            )
+            return await response(scope, receive, send)
+        if not admitted:
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(key, time.perf_counter() - started)
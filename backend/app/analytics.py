@@ -0,0 +1,234 @@
+"""
+Per-tenant analytics (score histograms, pass rate, handheld ratio,
+throughput) served from precomputed hourly and daily rollups.
+
+Every job that gets a verdict, is re-scored or gives up adds its
+contribution to one `analytics_rollups` row per period, keyed by
+(period, bucket, user, API key), in the same transaction as the job itself.
+A dashboard query then reads at most one row per bucket and key instead of
+scanning verification_jobs, however many jobs the range covers.
+rebuild_rollups() recomputes everything from the jobs table, e.g. to seed
+the rollups for jobs finished before they existed.
+"""
+import datetime
+
+from sqlalchemy import func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+
+PERIODS = {"hour": datetime.timedelta(hours=1), "day": datetime.timedelta(days=1)}
+DEFAULT_RANGE = {"hour": datetime.timedelta(days=1), "day": datetime.timedelta(days=30)}
+MAX_BUCKETS = {"hour": 24 * 92, "day": 366 * 5}
+
+SCORE_BINS = 10
+BIN_COLUMNS = [f"score_bin_{i}" for i in range(SCORE_BINS)]
+COUNT_COLUMNS = ["jobs", "verified", "failed", "errors", "handheld", "tremor_checked", "score_sum", "duration_sum"]
+COLUMNS = COUNT_COLUMNS + BIN_COLUMNS
+
+# Verifier metrics copied from a result's details onto the job's typed columns
+METRICS = {"causality_score": float, "is_handheld": bool, "tremor_energy": float, "duration": float}
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+
+def to_utc(value: datetime.datetime) -> datetime.datetime:
+    """Naive UTC, as rollup buckets are stored."""
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def bucket_start(period: str, at: datetime.datetime) -> datetime.datetime:
+    at = to_utc(at)
+    if period == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def store_metrics(job: models.VerificationJob, details: dict):
+    """Copies the verifier metrics of a result onto the job's typed columns."""
+    for name, kind in METRICS.items():
+        value = details.get(name)
+        setattr(job, name, kind(value) if value is not None else None)
+
+
+def score_bin(score: float) -> str:
+    return BIN_COLUMNS[min(SCORE_BINS - 1, max(0, int(score * SCORE_BINS)))]
+
+
+def contribution(job: models.VerificationJob) -> dict:
+    """What a finished job adds to its rollup rows; empty until it has finished."""
+    if job.finished_at is None:
+        return {}
+    if job.is_consistent is None:
+        return {"jobs": 1, "errors": 1}
+    delta = {"jobs": 1, "verified" if job.is_consistent else "failed": 1}
+    if job.is_handheld is not None:
+        delta["tremor_checked"] = 1
+        delta["handheld"] = int(job.is_handheld)
+    if job.score is not None:
+        delta["score_sum"] = float(job.score)
+        delta[score_bin(job.score)] = 1
+    if job.duration is not None:
+        delta["duration_sum"] = float(job.duration)
+    return delta
+
+
+def _bump(db: Session, period: str, bucket: datetime.datetime, user_id: int, api_key_id: int, delta: dict):
+    Rollup = models.AnalyticsRollup
+    match = (
+        Rollup.period == period,
+        Rollup.bucket_start == bucket,
+        Rollup.user_id == user_id,
+        Rollup.api_key_id == api_key_id,
+    )
+    values = {getattr(Rollup, name): getattr(Rollup, name) + value for name, value in delta.items()}
+    if db.query(Rollup).filter(*match).update(values, synchronize_session=False):
+        return
+    try:
+        with db.begin_nested():
+            db.add(Rollup(period=period, bucket_start=bucket, user_id=user_id, api_key_id=api_key_id, **delta))
+    except IntegrityError:
+        # Created concurrently; the row exists now
+        db.query(Rollup).filter(*match).update(values, synchronize_session=False)
+
+
+def record(db: Session, job: models.VerificationJob, sign: int = 1):
+    """
+    Adds the job's contribution to its hourly and daily rollups (sign=-1
+    takes it back out) inside the caller's transaction.
+    """
+    delta = {name: value * sign for name, value in contribution(job).items() if value}
+    if not delta:
+        return
+    for period in PERIODS:
+        _bump(db, period, bucket_start(period, job.finished_at), job.user_id or 0, job.api_key_id or 0, delta)
+
+
+def record_finished(db: Session, job: models.VerificationJob):
+    """Stamps a job that just got its verdict (or gave up) and records it."""
+    job.finished_at = _utcnow()
+    record(db, job)
+
+
+def rebuild_rollups(db: Session, batch_size: int = 1000) -> dict:
+    """
+    Recomputes every rollup from verification_jobs. Jobs finished before
+    the typed columns existed get them from their details, and their
+    creation time as finished_at. Jobs finishing while it runs may be
+    counted twice or not at all; run it when the queues are quiet.
+    """
+    Job = models.VerificationJob
+    backfilled = 0
+    pending = db.query(Job).filter(
+        Job.finished_at.is_(None),
+        or_(Job.is_consistent.isnot(None), Job.status == "ERROR"),
+    )
+    while True:
+        jobs = pending.order_by(Job.id).limit(batch_size).all()
+        if not jobs:
+            break
+        for job in jobs:
+            store_metrics(job, job.details or {})
+            job.finished_at = to_utc(job.created_at or _utcnow())
+        backfilled += len(jobs)
+        db.commit()
+
+    totals = {}
+    jobs = 0
+    for job in db.query(Job).filter(Job.finished_at.isnot(None)).yield_per(batch_size):
+        delta = contribution(job)
+        jobs += 1
+        for period in PERIODS:
+            key = (period, bucket_start(period, job.finished_at), job.user_id or 0, job.api_key_id or 0)
+            row = totals.setdefault(key, dict.fromkeys(COLUMNS, 0))
+            for name, value in delta.items():
+                row[name] += value
+
+    db.query(models.AnalyticsRollup).delete(synchronize_session=False)
+    db.bulk_insert_mappings(models.AnalyticsRollup, [
+        dict(row, period=period, bucket_start=bucket, user_id=user_id, api_key_id=api_key_id)
+        for (period, bucket, user_id, api_key_id), row in totals.items()
+    ])
+    db.commit()
+    return {"jobs": jobs, "backfilled": backfilled, "rollups": len(totals)}
+
+
+def summarize(row: dict) -> dict:
+    """Rates and the histogram derived from summed rollup columns."""
+    verdicts = row["verified"] + row["failed"]
+    return {
+        "jobs": row["jobs"],
+        "verified": row["verified"],
+        "failed": row["failed"],
+        "errors": row["errors"],
+        "pass_rate": row["verified"] / verdicts if verdicts else None,
+        "handheld_ratio": row["handheld"] / row["tremor_checked"] if row["tremor_checked"] else None,
+        "mean_score": row["score_sum"] / verdicts if verdicts else None,
+        "duration_seconds": row["duration_sum"],
+        "score_histogram": [row[name] for name in BIN_COLUMNS],
+    }
+
+
+def query(
+    db: Session,
+    period: str = "day",
+    start: datetime.datetime = None,
+    end: datetime.datetime = None,
+    user_id: int = None,
+    api_key_id: int = None,
+) -> dict:
+    """
+    Per-bucket and total analytics over [start, end), optionally for one user
+    and/or API key (all jobs otherwise). Empty buckets are included. Raises
+    ValueError for an unknown period or a range of more than MAX_BUCKETS.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period {period!r} (choose from {', '.join(PERIODS)})")
+    step = PERIODS[period]
+    if end is None:
+        end = bucket_start(period, _utcnow()) + step  # Up to and including the current bucket
+    elif bucket_start(period, end) != to_utc(end):
+        end = bucket_start(period, end) + step  # Covers the partial bucket
+    else:
+        end = to_utc(end)
+    start = bucket_start(period, start) if start is not None else end - DEFAULT_RANGE[period]
+    if start >= end:
+        raise ValueError("start must be before end")
+    if (end - start) / step > MAX_BUCKETS[period]:
+        raise ValueError(f"At most {MAX_BUCKETS[period]} {period} buckets per query")
+
+    Rollup = models.AnalyticsRollup
+    rows = db.query(
+        Rollup.bucket_start, *[func.sum(getattr(Rollup, name)) for name in COLUMNS]
+    ).filter(Rollup.period == period, Rollup.bucket_start >= start, Rollup.bucket_start < end)
+    if user_id is not None:
+        rows = rows.filter(Rollup.user_id == user_id)
+    if api_key_id is not None:
+        rows = rows.filter(Rollup.api_key_id == api_key_id)
+    by_bucket = {
+        to_utc(bucket): dict(zip(COLUMNS, (value or 0 for value in sums)))
+        for bucket, *sums in rows.group_by(Rollup.bucket_start).all()
+    }
+
+    buckets = []
+    total = dict.fromkeys(COLUMNS, 0)
+    at = start
+    while at < end:
+        row = by_bucket.get(at) or dict.fromkeys(COLUMNS, 0)
+        for name in COLUMNS:
+            total[name] += row[name]
+        buckets.append(dict(summarize(row), start=at.isoformat() + "Z"))
+        at += step
+    return {
+        "period": period,
+        "start": start.isoformat() + "Z",
+        "end": end.isoformat() + "Z",
+        "score_bins": [i / SCORE_BINS for i in range(SCORE_BINS + 1)],
+        "totals": summarize(total),
+        "buckets": buckets,
+    }
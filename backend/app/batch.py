@@ -0,0 +1,371 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import tarfile
+import tempfile
+import threading
+import uuid
+import zipfile
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from . import models, dedup, events, preflight, stats
+from .storage import blob_key
+from .uploads import CHUNK_SIZE, VIDEO_EXTENSIONS, GYRO_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed"}
+
+
+class BatchError(Exception):
+    """Invalid archive or manifest; reported to the client as 400/413."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class StreamPipe:
+    """
+    Blocking file-like reader fed chunk by chunk from the event loop, so the
+    archive can be parsed in a worker thread while the body is still arriving.
+    """
+
+    def __init__(self, max_chunks: int = 8):
+        self._chunks = queue.Queue(maxsize=max_chunks)
+        self._buffer = b""
+        self._eof = False
+        self.aborted = threading.Event()
+
+    def feed(self, chunk: bytes):
+        """Called from the threadpool; gives up if the reader has failed."""
+        while not self.aborted.is_set():
+            try:
+                self._chunks.put(chunk, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def finish(self):
+        self.feed(None)
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            chunk = self._chunks.get()
+            if chunk is None:
+                self._eof = True
+            else:
+                self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _normalize_member_name(name: str):
+    parts = [p for p in name.replace("\\", "/").split("/") if p not in ("", ".")]
+    if not parts or ".." in parts:
+        return None
+    return "/".join(parts)
+
+
+class ArchiveExtractor:
+    """
+    Writes archive members to `dest_dir` as they are read, hashing each file in
+    the same pass and enforcing per-file, per-batch and member-count limits.
+    """
+
+    def __init__(self, dest_dir: str, max_file_bytes: int, max_total_bytes: int, max_members: int):
+        self.dest_dir = dest_dir
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+        self.max_members = max_members
+        self.total_bytes = 0
+        self.files = {}  # member name -> (path, size, sha256)
+
+    def _store(self, name: str, source):
+        if len(self.files) >= self.max_members:
+            raise BatchError(f"Archive has more than {self.max_members} files", 413)
+        path = os.path.join(self.dest_dir, f"{uuid.uuid4()}_{os.path.basename(name)}")
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, "wb") as out:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                self.total_bytes += len(chunk)
+                if size > self.max_file_bytes:
+                    raise BatchError(f"'{name}' exceeds the maximum file size", 413)
+                if self.total_bytes > self.max_total_bytes:
+                    raise BatchError("Archive exceeds the maximum batch size", 413)
+                digest.update(chunk)
+                out.write(chunk)
+        self.files[name] = (path, size, digest.hexdigest())
+
+    def extract_tar(self, fileobj):
+        try:
+            # Stream mode: members are consumed strictly in order, no seeking
+            with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+                for member in archive:
+                    if not member.isfile():
+                        continue
+                    name = _normalize_member_name(member.name)
+                    if name is None:
+                        continue
+                    self._store(name, archive.extractfile(member))
+        except tarfile.TarError as e:
+            raise BatchError(f"Invalid tar archive: {e}")
+
+    def extract_zip(self, fileobj):
+        # Zip keeps its directory at the end, so spool first, then extract
+        with tempfile.TemporaryFile(dir=self.dest_dir) as spool:
+            total = 0
+            while True:
+                chunk = fileobj.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if total > self.max_total_bytes:
+                    raise BatchError("Archive exceeds the maximum batch size", 413)
+                spool.write(chunk)
+            spool.seek(0)
+            try:
+                with zipfile.ZipFile(spool) as archive:
+                    for info in archive.infolist():
+                        if info.is_dir():
+                            continue
+                        name = _normalize_member_name(info.filename)
+                        if name is None:
+                            continue
+                        with archive.open(info) as source:
+                            self._store(name, source)
+            except zipfile.BadZipFile as e:
+                raise BatchError(f"Invalid zip archive: {e}")
+
+    def cleanup(self, keep=()):
+        keep = set(keep)
+        for path, _, _ in self.files.values():
+            if path not in keep and os.path.exists(path):
+                os.remove(path)
+
+
+def pair_items(files: dict) -> list:
+    """
+    Builds the list of bundles from `manifest.json` when present:
+        {"items": [{"id": "clip1", "video": "a/clip1.mp4", "gyro": "a/clip1.csv", "flow": "a/clip1_flow.csv"}]}
+    Otherwise pairs `<stem>.<video ext>` with `<stem>.csv` (or `.vpgy`) in the same folder.
+    Each item: {"name", "video", "gyro", "flow", "error"}.
+    """
+    items = []
+    if MANIFEST_NAME in files:
+        with open(files[MANIFEST_NAME][0], "rb") as f:
+            try:
+                manifest = json.load(f)
+            except ValueError as e:
+                raise BatchError(f"Invalid manifest: {e}")
+        entries = manifest.get("items") if isinstance(manifest, dict) else manifest
+        if not isinstance(entries, list):
+            raise BatchError("Manifest must contain an 'items' list")
+        for i, entry in enumerate(entries):
+            if not isinstance(entry, dict):
+                raise BatchError(f"Manifest item {i} must be an object")
+            item = {
+                "name": str(entry.get("id") or entry.get("video") or i),
+                "video": _normalize_member_name(str(entry.get("video", ""))),
+                "gyro": _normalize_member_name(str(entry.get("gyro", ""))),
+                "flow": _normalize_member_name(str(entry["flow"])) if entry.get("flow") else None,
+                "error": None,
+            }
+            for field in ("video", "gyro", "flow"):
+                if item[field] is not None and item[field] not in files:
+                    item["error"] = f"Missing {field} file '{entry.get(field)}'"
+            if item["video"] is None or item["gyro"] is None:
+                item["error"] = item["error"] or "Item needs both 'video' and 'gyro'"
+            items.append(item)
+        return items
+
+    for name in sorted(files):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in VIDEO_EXTENSIONS:
+            continue
+        gyro = next((stem + g for g in GYRO_EXTENSIONS if stem + g in files), None)
+        items.append({
+            "name": os.path.basename(stem),
+            "video": name,
+            "gyro": gyro,
+            "flow": None,
+            "error": None if gyro else f"No gyro file for '{name}'",
+        })
+    return items
+
+
+def preflight_items(files: dict, items: list, check):
+    """
+    Runs `check(video, gyro, flow)` on the staged files of every valid item
+    before anything is stored. A rejected item gets the preflight message as
+    its error; otherwise the returned report (if any) is kept in
+    item["preflight"] for the job's details.
+    """
+    for item in items:
+        if item["error"] is not None:
+            continue
+        flow_path = files[item["flow"]][0] if item["flow"] else None
+        try:
+            item["preflight"] = check(files[item["video"]][0], files[item["gyro"]][0], flow_path)
+        except preflight.PreflightError as e:
+            item["error"] = f"Preflight failed: {e}"
+
+
+def store_files(storage, files: dict, items: list) -> dict:
+    """
+    Moves the files that valid items use into `storage`.
+    Returns member name -> (storage key, size, sha256).
+    """
+    stored = {}
+    for item in items:
+        if item["error"] is not None:
+            continue
+        for field in ("video", "gyro", "flow"):
+            name = item[field]
+            if name and name not in stored:
+                path, size, sha256 = files[name]
+                key = storage.put_file(path, blob_key("uploads", sha256, os.path.splitext(name)[1]))
+                stored[name] = (key, size, sha256)
+    return stored
+
+
+def create_batch_jobs(
+    db: Session,
+    user_id: int,
+    files: dict,
+    items: list,
+    priority: int = 0,
+    profile: str = None,
+    api_key_id: int = None,
+):
+    """
+    Inserts the batch, its jobs and item rows in a single transaction.
+    Items whose bundle this user already submitted (with the same analysis
+    `profile`) point at the existing job instead of queuing new work. `files`
+    maps member names to stored blobs (see `store_files`); `api_key_id` is
+    the key the batch was submitted with. Returns (batch, events for the new jobs).
+    """
+    batch = models.VerificationBatch(id=str(uuid.uuid4()), user_id=user_id, total_items=len(items))
+    db.add(batch)
+
+    # Content hashes of all valid items, deduplicated against history in one query
+    for item in items:
+        if item["error"] is None:
+            flow_sha = files[item["flow"]][2] if item["flow"] else None
+            item["content_hash"] = dedup.bundle_hash(files[item["video"]][2], files[item["gyro"]][2], flow_sha, profile)
+    hashes = {item["content_hash"] for item in items if item["error"] is None}
+    existing = {}
+    if hashes:
+        for job in db.query(models.VerificationJob).filter(
+            models.VerificationJob.user_id == user_id,
+            models.VerificationJob.content_hash.in_(hashes),
+            models.VerificationJob.status.in_(dedup.REUSABLE_STATUSES),
+        ).order_by(models.VerificationJob.id):
+            existing[job.content_hash] = job
+
+    new_jobs = {}
+    for item in items:
+        if item["error"] is not None:
+            continue
+        content_hash = item["content_hash"]
+        if content_hash in existing or content_hash in new_jobs:
+            continue
+        video_path, _, video_sha = files[item["video"]]
+        gyro_path, _, gyro_sha = files[item["gyro"]]
+        flow_path = files[item["flow"]][0] if item["flow"] else None
+        new_jobs[content_hash] = models.VerificationJob(
+            video_filename=os.path.basename(item["video"]),
+            gyro_filename=os.path.basename(item["gyro"]),
+            video_path=video_path,
+            gyro_path=gyro_path,
+            flow_path=flow_path,
+            priority=priority,
+            analysis_profile=profile,
+            api_key_id=api_key_id,
+            video_sha256=video_sha,
+            gyro_sha256=gyro_sha,
+            content_hash=content_hash,
+            status="PENDING",
+            user_id=user_id,
+            details={"preflight": item["preflight"]} if item.get("preflight") else None,
+        )
+
+    db.add_all(new_jobs.values())
+    stats.record_job_created(db, count=len(new_jobs))
+    db.flush()  # Assigns job ids in one round trip
+    created = [events.job_event(job) for job in new_jobs.values()]
+
+    rows = []
+    for item in items:
+        job = None
+        if item["error"] is None:
+            job = existing.get(item["content_hash"]) or new_jobs[item["content_hash"]]
+        rows.append(models.BatchItem(
+            batch_id=batch.id,
+            name=item["name"],
+            job_id=job.id if job else None,
+            error=item["error"],
+        ))
+    db.add_all(rows)
+    db.commit()
+    logger.info(f"Batch {batch.id}: {len(items)} items, {len(new_jobs)} new jobs")
+    return batch, created
+
+
+def batch_progress(db: Session, batch: models.VerificationBatch, include_items: bool = True) -> dict:
+    Job = models.VerificationJob
+    Item = models.BatchItem
+
+    counts = dict(
+        db.query(Job.status, func.count(Item.id))
+        .join(Item, Item.job_id == Job.id)
+        .filter(Item.batch_id == batch.id)
+        .group_by(Job.status)
+        .all()
+    )
+    invalid = db.query(func.count(Item.id)).filter(Item.batch_id == batch.id, Item.job_id == None).scalar()
+    done = counts.get("COMPLETED", 0) + counts.get("ERROR", 0) + invalid
+    result = {
+        "batch_id": batch.id,
+        "created_at": batch.created_at,
+        "total": batch.total_items,
+        "completed": done,
+        "invalid": invalid,
+        "by_status": counts,
+        "done": done >= batch.total_items,
+    }
+    if include_items:
+        rows = (
+            db.query(Item, Job)
+            .outerjoin(Job, Item.job_id == Job.id)
+            .filter(Item.batch_id == batch.id)
+            .order_by(Item.id)
+            .all()
+        )
+        result["items"] = [
+            {
+                "item": item.name,
+                "job_id": item.job_id,
+                "status": job.status if job else "INVALID",
+                "score": job.score if job else None,
+                "verified": job.is_consistent if job else None,
+                "signed_url": job.signed_url if job else None,
+                "message": item.error or (job.message if job else None),
+            }
+            for item, job in rows
+        ]
+    return result
@@ -1,59 +1,251 @@
+import json
+import logging
+import mimetypes
+import multiprocessing
 import os
-from c2pa import Builder, Signer, C2paSigningAlg, C2paSignerInfo
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from c2pa import Builder, Signer, C2paSigningAlg, C2paSignerInfo, C2paError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TSA_URL = "http://timestamp.digicert.com"
+
+# c2pa reports a failed timestamp request as a generic error; these mark it in the message
+TSA_ERROR_MARKERS = ("timestamp", "time stamp", "tsa", "http", "network", "connection", "timed out")
+
+
+def is_tsa_error(error: Exception) -> bool:
+    """
+    True for failures of the timestamp request (network, TSA), not of the
+    signing itself. A signing call that overran its deadline is not one:
+    sign_video re-probes the TSA to tell a stalled TSA from a slow rewrite.
+    """
+    if isinstance(error, (urllib.error.URLError, ConnectionError)):
+        return True
+    if isinstance(error, C2paError) and not isinstance(error, (C2paError.FileNotFound, C2paError.NotSupported)):
+        message = str(error).lower()
+        return any(marker in message for marker in TSA_ERROR_MARKERS)
+    return False
+
+
+class SigningError(Exception):
+    """Signing failed in the signing process; `tsa` tells whether the timestamp request was to blame."""
+
+    def __init__(self, message: str, tsa: bool = False):
+        super().__init__(message)
+        self.tsa = tsa
+
+
+class SigningTimeout(SigningError):
+    """The signing process overran its deadline and was killed."""
+
+
+def load_signer(cert_path: str, key_path: str, ta_url: str = None) -> Signer:
+    with open(cert_path, "rb") as f:
+        cert_data = f.read()
+    with open(key_path, "rb") as f:
+        key_data = f.read()
+    info = C2paSignerInfo(alg=C2paSigningAlg.ES256, sign_cert=cert_data, private_key=key_data, ta_url=ta_url)
+    return Signer.from_info(info)
+
+
+UPLOAD_INGREDIENT = "veriphysics.upload"
+
+
+def build_manifest(verification_data: dict) -> dict:
+    # We use a custom label for our physics assertion
+    return {
+        "claim_generator": "VeriPhysics SDK/1.0",
+        "assertions": [
+            {
+                # c2pa requires a created/opened first action. We only ever see the
+                # uploaded file, so we claim to have opened it (added as the parentOf
+                # ingredient in sign_file) rather than vouching for how it was captured.
+                "label": "c2pa.actions",
+                "data": {
+                    "actions": [
+                        {
+                            "action": "c2pa.opened",
+                            "parameters": {"ingredientIds": [UPLOAD_INGREDIENT]}
+                        }
+                    ]
+                }
+            },
+            {
+                "label": "stds.veriphysics.assertion",
+                "data": verification_data
+            }
+        ]
+    }
+
+
+def sign_file(cert_path: str, key_path: str, ta_url: str, input_path: str, output_path: str, verification_data: dict):
+    """Embeds the manifest in a signed copy of `input_path`; runs inside the signing process."""
+    builder = Builder(build_manifest(verification_data))
+    mime_type = mimetypes.guess_type(input_path)[0] or "video/mp4"
+    ingredient = {"title": os.path.basename(input_path), "relationship": "parentOf", "label": UPLOAD_INGREDIENT}
+    with open(input_path, "rb") as source:
+        builder.add_ingredient(json.dumps(ingredient), mime_type, source)
+    builder.sign_file(source_path=input_path, dest_path=output_path, signer=load_signer(cert_path, key_path, ta_url))
+
+
+def _signing_process(conn, sign, args):
+    """Child process entry point: reports (error message or None, TSA to blame) back over `conn`."""
+    try:
+        sign(*args)
+        conn.send((None, False))
+    except Exception as e:
+        conn.send((f"{type(e).__name__}: {e}", is_tsa_error(e)))
+    finally:
+        conn.close()
+
+
+class TSAProbe:
+    """
+    Remembers whether the timestamp authority answered recently, so a TSA that
+    is down or slow costs one short probe per `interval` instead of a stalled
+    signature for every job. c2pa gives no control over its own TSA timeout.
+    """
+
+    def __init__(self, url: str, timeout: float = 5.0, interval: float = 30.0):
+        self.url = url
+        self.timeout = timeout
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._available = True
+        self._checked_at = 0.0
+
+    def _probe(self) -> bool:
+        try:
+            urllib.request.urlopen(urllib.request.Request(self.url, method="HEAD"), timeout=self.timeout).close()
+        except urllib.error.HTTPError:
+            pass  # Any HTTP answer means the server is up; TSAs only accept POSTed queries
+        except Exception as e:
+            logger.warning(f"Timestamp authority {self.url} unreachable: {e}")
+            return False
+        return True
+
+    def available(self) -> bool:
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.interval:
+                return self._available
+            self._checked_at = time.monotonic()
+        available = self._probe()
+        with self._lock:
+            self._available = available
+        return available
+
+    def recheck(self) -> bool:
+        """Probes now, regardless of the interval; False (and remembered) if the TSA does not answer."""
+        available = self._probe()
+        with self._lock:
+            self._available = available
+            self._checked_at = time.monotonic()
+        return available
+
+    def mark_down(self):
+        with self._lock:
+            self._available = False
+            self._checked_at = time.monotonic()
+
 
 class C2PASignerService:
-    def __init__(self, cert_path: str, key_path: str):
+    # Signing runs in a child process so an overrunning call (a stalled TSA,
+    # a huge file) can be killed; "spawn" because the API process has threads
+    process_context = multiprocessing.get_context("spawn")
+    sign = staticmethod(sign_file)
+
+    def __init__(
+        self,
+        cert_path: str,
+        key_path: str,
+        ta_url: str = DEFAULT_TSA_URL,
+        fallback_ta_url: str = None,
+        ta_timeout: float = 5.0,
+        sign_timeout: float = 120.0,
+        max_concurrent: int = 2,
+    ):
+        """
+        `ta_url` is the timestamp authority used normally; when it is unreachable
+        (or the timestamp request fails, or a call stalls and the TSA no longer
+        answers its probe) the manifest is timestamped by `fallback_ta_url`
+        instead, e.g. a local TSA, or left untimestamped if no fallback is
+        configured. Each signing call runs in its own process, killed after
+        `sign_timeout` seconds; at most `max_concurrent` run at once.
+        """
         self.cert_path = cert_path
         self.key_path = key_path
-        
+        self.ta_url = ta_url or None
+        self.fallback_ta_url = fallback_ta_url or None
+        self.tsa_probe = TSAProbe(self.ta_url, timeout=ta_timeout) if self.ta_url else None
+        self.sign_timeout = sign_timeout
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrent))
+
         if not os.path.exists(cert_path) or not os.path.exists(key_path):
             raise FileNotFoundError(f"Certificate or Key file not found at {cert_path} or {key_path}")
-
-        # Load signer
-        try:
-             # Read files as bytes
-             with open(cert_path, "rb") as f:
-                 cert_data = f.read()
-             with open(key_path, "rb") as f:
-                 key_data = f.read()
-
-             info = C2paSignerInfo(
-                alg=C2paSigningAlg.ES256,
-                sign_cert=cert_data,
-                private_key=key_data,
-                ta_url="http://timestamp.digicert.com"
-            )
-             self.signer = Signer.from_info(info)
-        except Exception as e:
-            print(f"Error loading signer: {e}")
-            raise e
+        # Fails at startup, not per job, on unreadable credentials
+        load_signer(cert_path, key_path, self.ta_url)
 
     def sign_video(self, input_path: str, output_path: str, verification_data: dict) -> str:
         """
         Signs the video with C2PA manifest including physics verification assertion.
         Returns the path to the signed video.
         """
-        
-        # Define the manifest
-        # We use a custom label for our physics assertion
-        manifest = {
-            "claim_generator": "VeriPhysics SDK/1.0",
-            "assertions": [
-                {
-                    "label": "stds.veriphysics.assertion",
-                    "data": verification_data
-                }
-            ]
-        }
-        
-        try:
-            builder = Builder(manifest)
-            builder.sign_file(
-                source_path=input_path,
-                dest_path=output_path,
-                signer=self.signer
+        if self.tsa_probe is None or self.tsa_probe.available():
+            try:
+                return self._sign_within(input_path, output_path, verification_data, self.ta_url)
+            except SigningTimeout as e:
+                # A stalled TSA stops answering its probe too; otherwise the file is just slow to rewrite
+                if self.tsa_probe is None or self.tsa_probe.recheck():
+                    raise
+                logger.warning(f"Signing stalled and TSA {self.ta_url} does not answer ({e}), using fallback TSA")
+            except SigningError as e:
+                if self.tsa_probe is None or not e.tsa:
+                    raise
+                logger.warning(f"Timestamping with TSA {self.ta_url} failed ({e}), using fallback TSA")
+                self.tsa_probe.mark_down()
+        return self._sign_within(input_path, output_path, verification_data, self.fallback_ta_url)
+
+    def _sign_within(self, input_path: str, output_path: str, verification_data: dict, ta_url: str) -> str:
+        """
+        Signs in a child process and kills it once `sign_timeout` has passed,
+        so nothing outlives the call. The child writes a partial file that is
+        renamed into place only on success.
+        """
+        root, ext = os.path.splitext(output_path)
+        partial_path = f"{root}.{uuid.uuid4().hex}.partial{ext}"
+        args = (self.cert_path, self.key_path, ta_url, input_path, partial_path, verification_data)
+        with self._slots:
+            receiver, sender = self.process_context.Pipe(duplex=False)
+            process = self.process_context.Process(
+                target=_signing_process, args=(sender, self.sign, args), name="c2pa-sign", daemon=True
             )
-            return output_path
-        except Exception as e:
-            print(f"Error signing video: {e}")
-            raise e
+            process.start()
+            sender.close()
+            outcome, died = None, False
+            try:
+                if receiver.poll(self.sign_timeout):
+                    outcome = receiver.recv()
+            except EOFError:
+                died = True  # Exited without reporting back
+            finally:
+                if outcome is not None or died:
+                    process.join(5)
+                if process.is_alive():
+                    process.kill()
+                process.join()
+                receiver.close()
+            if died:
+                outcome = (f"Signing process exited with code {process.exitcode}", False)
+        if outcome is None or outcome[0] is not None:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            if outcome is None:
+                raise SigningTimeout(f"Signing did not finish within {self.sign_timeout:g}s")
+            raise SigningError(*outcome)
+        os.replace(partial_path, output_path)
+        return output_path
@@ -1,19 +1,119 @@
-from sqlalchemy import create_engine
+import logging
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-SQL_ALCHEMY_DATABASE_URL = "sqlite:///./veriphysics.db"
+logger = logging.getLogger(__name__)
+
+SQL_ALCHEMY_DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./veriphysics.db")
+
+# Pool tuning (ignored for in-memory SQLite)
+DB_POOL_SIZE = int(os.environ.get("VERIPHYSICS_DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.environ.get("VERIPHYSICS_DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.environ.get("VERIPHYSICS_DB_POOL_RECYCLE", "1800"))
+DB_POOL_TIMEOUT = float(os.environ.get("VERIPHYSICS_DB_POOL_TIMEOUT", "30"))
+DB_ECHO = os.environ.get("VERIPHYSICS_DB_ECHO", "0") == "1"
+
+# SQLite: wait this long on a locked database instead of failing immediately
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("VERIPHYSICS_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Async engine for async routes; set to 0 to disable
+ASYNC_DB_ENABLED = os.environ.get("VERIPHYSICS_ASYNC_DB", "1") == "1"
+
+# Sync driver -> async driver
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+}
+
+
+def is_sqlite(url) -> bool:
+    return make_url(str(url)).get_backend_name() == "sqlite"
+
+
+def _is_memory_sqlite(url) -> bool:
+    parsed = make_url(str(url))
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+
+def engine_options(url) -> dict:
+    options = {"echo": DB_ECHO, "pool_pre_ping": True}
+    if is_sqlite(url):
+        options["connect_args"] = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000.0}
+    if not _is_memory_sqlite(url):
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    return options
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets the queue workers write while API requests keep reading;
+    # busy_timeout makes writers wait for the lock instead of raising
+    # "database is locked".
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def async_url(url) -> str:
+    parsed = make_url(str(url))
+    driver = ASYNC_DRIVERS.get(parsed.drivername)
+    if driver is None:
+        return None
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+engine = create_engine(SQL_ALCHEMY_DATABASE_URL, **engine_options(SQL_ALCHEMY_DATABASE_URL))
+if is_sqlite(SQL_ALCHEMY_DATABASE_URL) and not _is_memory_sqlite(SQL_ALCHEMY_DATABASE_URL):
+    event.listen(engine, "connect", _set_sqlite_pragmas)
 
-engine = create_engine(
-    SQL_ALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+
+def _create_async_engine():
+    if not ASYNC_DB_ENABLED:
+        return None, None
+    url = async_url(SQL_ALCHEMY_DATABASE_URL)
+    if url is None:
+        logger.warning(f"No async driver known for {make_url(SQL_ALCHEMY_DATABASE_URL).drivername}, async sessions disabled")
+        return None, None
+    try:
+        from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+        async_engine = create_async_engine(url, **engine_options(url))
+    except ImportError as e:
+        logger.warning(f"Async database driver unavailable ({e}), async sessions disabled")
+        return None, None
+    if is_sqlite(url) and not _is_memory_sqlite(url):
+        event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return async_engine, sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async_engine, AsyncSessionLocal = _create_async_engine()
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,42 @@
+import hashlib
+
+from sqlalchemy.orm import Session
+
+from . import models, profiles
+
+# Jobs in these states can be reused by an identical submission.
+# ERROR jobs are skipped so a resubmission gets a fresh attempt.
+REUSABLE_STATUSES = ("PENDING", "PROCESSING", "SIGNING", "COMPLETED")
+
+
+def bundle_hash(video_sha256: str, gyro_sha256: str, flow_sha256: str = None, profile: str = None) -> str:
+    """
+    Content address of a video+gyro (+ optional precomputed flow) bundle.
+    A video analysed with a non-baseline `profile` is a different result;
+    the profile is irrelevant (and ignored) when the flow is precomputed.
+    """
+    key = f"{video_sha256}:{gyro_sha256}"
+    if flow_sha256:
+        key += f":{flow_sha256}"
+    elif profile and profile != profiles.BASELINE:
+        key += f":profile={profile}"
+    return hashlib.sha256(key.encode("ascii")).hexdigest()
+
+
+def find_by_idempotency_key(db: Session, user_id: int, key: str):
+    return db.query(models.VerificationJob).filter(
+        models.VerificationJob.user_id == user_id,
+        models.VerificationJob.idempotency_key == key,
+    ).first()
+
+
+def find_duplicate(db: Session, user_id: int, content_hash: str):
+    """
+    Most recent reusable job of this user for the same bundle, if any.
+    Scoped per user so results (and signed files) never leak across accounts.
+    """
+    return db.query(models.VerificationJob).filter(
+        models.VerificationJob.user_id == user_id,
+        models.VerificationJob.content_hash == content_hash,
+        models.VerificationJob.status.in_(REUSABLE_STATUSES),
+    ).order_by(models.VerificationJob.id.desc()).first()
@@ -0,0 +1,245 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+
+def job_event(job: models.VerificationJob) -> dict:
+    """Payload pushed to subscribers for a job state change."""
+    return {
+        "id": job.id,
+        "user_id": job.user_id,
+        "status": job.status,
+        "score": job.score,
+        "verified": job.is_consistent,
+        "message": job.message,
+        "signed_url": job.signed_url,
+    }
+
+
+class Subscription:
+    """
+    One connected stream. Events are handed over from publisher threads with
+    `call_soon_threadsafe`; a client that falls too far behind is flagged
+    `overflowed` and told to resync instead of buffering without limit.
+    """
+
+    def __init__(self, loop, user_id=None, job_id=None, event_type=None, max_pending: int = 256):
+        self.loop = loop
+        self.user_id = user_id
+        self.job_id = job_id
+        self.event_type = event_type
+        self.max_pending = max_pending
+        self.queue = asyncio.Queue()
+        self.overflowed = False
+
+    def matches(self, event: dict) -> bool:
+        if self.event_type is not None and event["type"] != self.event_type:
+            return False
+        data = event["data"]
+        if self.job_id is not None and data.get("id") != self.job_id:
+            return False
+        if self.user_id is not None and data.get("user_id") != self.user_id:
+            return False
+        return True
+
+    def _put(self, event: dict):
+        if self.queue.qsize() >= self.max_pending:
+            self.overflowed = True
+            return
+        self.queue.put_nowait(event)
+
+    def push(self, event: dict):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            pass  # Event loop closed, the stream is gone
+
+    async def get(self, timeout: float):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class EventBroker:
+    """
+    In-process pub/sub for job state changes.
+
+    `publish` may be called from any thread (queue workers, request handlers).
+    The last `history` events are kept so a reconnecting client can resume
+    from its Last-Event-ID. Event ids start from the wall clock in ms, so they
+    keep increasing across restarts and a stale id is detected as a gap.
+    """
+
+    def __init__(self, history: int = 1000):
+        self._lock = threading.Lock()
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._last_id = int(time.time() * 1000)
+        # Replay covers every event after this id
+        self._floor = self._last_id
+
+    def _next_id(self) -> int:
+        with self._lock:
+            self._last_id = max(self._last_id + 1, int(time.time() * 1000))
+            return self._last_id
+
+    def publish(self, data: dict, event_type: str = "job"):
+        self._deliver({"id": self._next_id(), "type": event_type, "data": data})
+
+    def publish_job(self, job: models.VerificationJob):
+        self.publish(job_event(job))
+
+    def _deliver(self, event: dict):
+        with self._lock:
+            if len(self._history) == self._history.maxlen:
+                self._floor = self._history[0]["id"]
+            self._history.append(event)
+            subscribers = [s for s in self._subscribers if s.matches(event)]
+        for sub in subscribers:
+            sub.push(event)
+
+    def subscribe(self, user_id=None, job_id=None, event_type=None) -> Subscription:
+        sub = Subscription(asyncio.get_running_loop(), user_id=user_id, job_id=job_id, event_type=event_type)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def replay(self, sub: Subscription, last_event_id: int):
+        """
+        Events after `last_event_id` matching the subscription.
+        Returns (events, complete); complete is False when the history no longer
+        reaches back that far, in which case the client has to resync.
+        """
+        with self._lock:
+            history = list(self._history)
+            complete = self._floor <= last_event_id <= self._last_id
+        return [e for e in history if e["id"] > last_event_id and sub.matches(e)], complete
+
+    def close(self):
+        pass
+
+
+class RedisBroker(EventBroker):
+    """
+    Shares events between API processes through a Redis channel; each process
+    fans them out to its own subscribers and keeps its own replay history.
+    Requires the optional `redis` package.
+    """
+
+    def __init__(self, url: str, channel: str = "vp:job-events", history: int = 1000):
+        import redis  # Optional dependency
+
+        super().__init__(history)
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+        self._floor = self._last_id = int(self.client.get(f"{channel}:seq") or 0)
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(channel)
+        self._thread = threading.Thread(target=self._listen, name="event-broker", daemon=True)
+        self._thread.start()
+
+    def publish(self, data: dict, event_type: str = "job"):
+        # Ids come from Redis so every process agrees on the order
+        event_id = self.client.incr(f"{self.channel}:seq")
+        self.client.publish(self.channel, json.dumps({"id": event_id, "type": event_type, "data": data}))
+
+    def _listen(self):
+        while True:
+            try:
+                for message in self._pubsub.listen():
+                    event = json.loads(message["data"])
+                    with self._lock:
+                        self._last_id = max(self._last_id, event["id"])
+                    self._deliver(event)
+                return
+            except Exception as e:
+                logger.warning(f"Event broker connection lost ({e}), reconnecting")
+                time.sleep(1)
+
+    def close(self):
+        self._pubsub.close()
+
+
+def create_broker(url: str = None, history: int = 1000) -> EventBroker:
+    if url:
+        try:
+            return RedisBroker(url, history=history)
+        except ImportError:
+            logger.warning("redis package not installed, falling back to in-process event broker")
+    return EventBroker(history)
+
+
+def _payload(data: dict) -> str:
+    # user_id is only used for routing
+    return json.dumps({k: v for k, v in data.items() if k != "user_id"}, default=str)
+
+
+def format_sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {_payload(event['data'])}\n\n"
+
+
+async def stream_events(
+    broker: EventBroker,
+    sub: Subscription,
+    request,
+    initial=(),
+    last_event_id=None,
+    heartbeat: float = 15.0,
+    final_statuses=(),
+    event_type: str = "job",
+):
+    """
+    Server-Sent Events body: missed events (when resuming from `last_event_id`)
+    or the `initial` snapshot first, then live ones. Snapshot events carry no
+    id so they do not move the client's resume point; without a snapshot, a
+    resume the history cannot cover gets a `resync` event instead.
+    A comment line is sent every `heartbeat` seconds to keep proxies from
+    closing an idle connection. The stream ends after an event whose status is
+    in `final_statuses`. `event_type` names the snapshot events.
+    """
+    try:
+        yield f"retry: {int(heartbeat * 1000)}\n\n"
+        if last_event_id is not None:
+            missed, complete = broker.replay(sub, last_event_id)
+            if complete:
+                # The client is up to date; only a snapshot that already ended
+                # the stream is still worth sending, or it would wait forever
+                initial = [data for data in initial if data.get("status") in final_statuses]
+            elif not initial:
+                yield "event: resync\ndata: {}\n\n"
+            for event in missed:
+                yield format_sse(event)
+                last_event_id = event["id"]
+                if event["data"].get("status") in final_statuses:
+                    return
+        for data in initial:
+            yield f"event: {event_type}\ndata: {_payload(data)}\n\n"
+            if data.get("status") in final_statuses:
+                return
+        while True:
+            if sub.overflowed:
+                yield "event: resync\ndata: {}\n\n"
+                return
+            try:
+                event = await sub.get(heartbeat)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+                continue
+            if last_event_id is not None and event["id"] <= last_event_id:
+                continue  # Already replayed
+            yield format_sse(event)
+            if event["data"].get("status") in final_statuses:
+                return
+    finally:
+        broker.unsubscribe(sub)
@@ -0,0 +1,182 @@
+"""
+Size-bounded on-disk cache of the inputs a verdict is computed from, so a job
+can be re-scored (new threshold, axis mapping or a corrected gyro log)
+without decoding its video again:
+
+- the per-frame optical-flow series of a video, keyed by the video's sha256
+  (or, for bundles that came with an on-device flow CSV, by that file's
+  sha256), stored as an (N, 2) or (N, 3) float64 `.npy` array of
+  timestamp, flow_x[, flow_y];
+- the gyro log of a bundle, keyed by its sha256, as uncompressed VPGY with
+  float64 axes and timestamps already in seconds (exactly what was scored).
+
+Upload blobs are deleted once their job finishes, so this is the only copy
+left for old jobs. Entries are evicted least recently used first (reads
+touch the file) once the total size exceeds `max_bytes`.
+"""
+import logging
+import os
+import threading
+import uuid
+
+import numpy as np
+
+from . import gyro_analysis, gyro_format
+
+logger = logging.getLogger(__name__)
+
+# Server-computed flow (by video sha256), on-device flow (by flow CSV sha256), gyro logs
+KINDS = {"video": ".npy", "client": ".npy", "gyro": gyro_format.EXTENSION}
+EVICT_TO = 0.9  # Fraction of max_bytes kept after an eviction pass
+
+
+class FlowSeries:
+    """Per-frame flow signal; `flow_y` is None when the source only had X."""
+
+    def __init__(self, timestamps, flow_x, flow_y=None):
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)
+        self.flow_x = np.asarray(flow_x, dtype=np.float64)
+        self.flow_y = None if flow_y is None else np.asarray(flow_y, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def signal(self, axis: str):
+        """The flow component for `axis` ("x" or "y"), or None if it was not recorded."""
+        return self.flow_x if axis == "x" else self.flow_y
+
+    def to_array(self) -> np.ndarray:
+        columns = [self.timestamps, self.flow_x] + ([self.flow_y] if self.flow_y is not None else [])
+        return np.column_stack(columns)
+
+    @classmethod
+    def from_array(cls, data: np.ndarray) -> "FlowSeries":
+        return cls(data[:, 0], data[:, 1], data[:, 2] if data.shape[1] > 2 else None)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "FlowSeries":
+        """A `timestamp,flow_x[,flow_y]` CSV."""
+        return cls(*gyro_analysis.load_flow_xy_csv(path))
+
+
+class FlowCache:
+    def __init__(self, directory: str, max_bytes: int = 1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None  # Scanned on first write
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, kind: str, key: str) -> str:
+        return os.path.join(self.directory, kind, key[:2], key + KINDS[kind])
+
+    def _open(self, kind: str, key: str):
+        path = self.path(kind, key)
+        try:
+            os.utime(path)  # Recently used: evicted last
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get_flow(self, kind: str, key: str):
+        """Cached FlowSeries, or None."""
+        path = self._open(kind, key) if key else None
+        if path is None:
+            return None
+        try:
+            return FlowSeries.from_array(np.load(path, allow_pickle=False))
+        except (OSError, ValueError, IndexError) as e:
+            logger.warning(f"Dropping unreadable flow cache entry {path}: {e}")
+            self._remove(path)
+            return None
+
+    def put_flow(self, kind: str, key: str, series: FlowSeries):
+        if not key or len(series) == 0 or os.path.exists(self.path(kind, key)):
+            return
+
+        def write(f):
+            np.save(f, series.to_array(), allow_pickle=False)
+
+        self._write(self.path(kind, key), write)
+
+    def gyro_path(self, key: str):
+        """Path of the cached gyro log (readable with gyro_analysis.load_gyro), or None."""
+        return self._open("gyro", key) if key else None
+
+    def put_gyro(self, key: str, gyro: np.ndarray):
+        """`gyro` as returned by gyro_analysis.load_gyro (seconds from the first sample)."""
+        if not key or len(gyro) == 0 or os.path.exists(self.path("gyro", key)):
+            return
+        self._write(self.path("gyro", key), lambda f: f.write(gyro_format.encode_gyro(gyro, float32=False)))
+
+    def _write(self, path: str, write):
+        if self.max_bytes <= 0:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            with open(tmp, "wb") as f:
+                write(f)
+            size = os.path.getsize(tmp)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not write flow cache entry {path}: {e}")
+            self._remove(tmp)
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += size
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def _entries(self):
+        """Yields (path, size, mtime) of every cached file."""
+        for kind in KINDS:
+            base = os.path.join(self.directory, kind)
+            if not os.path.isdir(base):
+                continue
+            for shard in os.scandir(base):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    if entry.is_file() and not entry.name.endswith(".part"):
+                        yield entry.path, st.st_size, st.st_mtime
+
+    def evict(self) -> dict:
+        """Deletes least recently used entries until the cache is under EVICT_TO of max_bytes."""
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            target = self.max_bytes * EVICT_TO
+            removed = freed = 0
+            for path, size, _ in entries:
+                if total <= target:
+                    break
+                self._remove(path)
+                total -= size
+                removed += 1
+                freed += size
+            self._size = total
+        if removed:
+            logger.info(f"Flow cache: evicted {removed} entries ({freed} bytes)")
+        return {"removed": removed, "bytes": freed}
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            return self._size
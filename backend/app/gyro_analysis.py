@@ -0,0 +1,358 @@
+"""
+Vectorised, in-process port of the signal analysis in cpp_core/MotionVerifier.cpp.
+
+Everything after optical flow (gyro parsing, resampling, correlation and the
+8-12 Hz tremor analysis) runs here without spawning vp_cli, so bundles that
+arrive with a precomputed flow signal never touch the video decoder.
+Results match the CLI to within float32/float64 rounding.
+"""
+import io
+import logging
+
+import numpy as np
+
+from . import gyro_format
+
+logger = logging.getLogger(__name__)
+
+# Same threshold as cpp_core/main.cpp
+CONSISTENCY_THRESHOLD = 0.7
+
+TREMOR_SAMPLE_RATE = 50  # Hz
+TREMOR_BAND = (8.0, 12.0)  # Hz
+TREMOR_MIN_SAMPLES = 32
+TREMOR_MIN_DURATION = 0.5  # seconds
+
+# Timestamps above this are treated as nanoseconds (matches loadGyroData)
+NANOSECOND_THRESHOLD = 1e8
+
+AXES = {"x": 1, "y": 2, "z": 3}
+
+
+def _load_csv(source, columns: int) -> np.ndarray:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(bytes(source))
+    try:
+        data = np.loadtxt(source, delimiter=",", skiprows=1, usecols=range(columns), ndmin=2, dtype=np.float64)
+    except (ValueError, IndexError) as e:
+        logger.warning(f"Could not parse CSV: {e}")
+        return np.empty((0, columns))
+    return data
+
+
+def gyro_seconds(raw: np.ndarray, t0: float, nanoseconds) -> np.ndarray:
+    """Raw gyro timestamps as seconds from `t0` (a raw timestamp, normally the first sample)."""
+    return np.where(nanoseconds, (raw - t0) / 1e9, raw - t0)
+
+
+def load_gyro_csv(source) -> np.ndarray:
+    """
+    Parses a `timestamp,x,y,z` CSV (path, file object or bytes) into an (N, 4)
+    array with timestamps normalised to seconds from the first sample.
+    """
+    data = _load_csv(source, 4)
+    if len(data) == 0:
+        return data
+    raw = data[:, 0]
+    data[:, 0] = gyro_seconds(raw, raw[0], raw > NANOSECOND_THRESHOLD)
+    return data
+
+
+def read_gyro(source):
+    """
+    Reads a gyro log in either format, told apart by the VPGY magic: the
+    binary form (see gyro_format) or the `timestamp,x,y,z` CSV. Accepts a
+    path, a binary file object or bytes.
+    Returns (raw_timestamps, rates, nanoseconds) where `rates` is (N, 3) in
+    rad/s and `nanoseconds` is a flag or per-sample mask for gyro_seconds.
+    An unparseable log gives empty arrays.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        buffer = source
+    elif isinstance(source, str):
+        with open(source, "rb") as f:
+            binary = gyro_format.is_binary_gyro(f.read(len(gyro_format.MAGIC)))
+            f.seek(0)
+            buffer = f.read() if binary else source
+    else:
+        buffer = source.read()
+
+    if isinstance(buffer, str) or not gyro_format.is_binary_gyro(buffer):
+        data = _load_csv(buffer, 4)
+        raw = data[:, 0]
+        return raw, data[:, 1:4], raw > NANOSECOND_THRESHOLD
+    try:
+        return gyro_format.decode_gyro_binary(buffer)
+    except gyro_format.GyroFormatError as e:
+        logger.warning(f"Could not parse binary gyro log: {e}")
+        return np.empty(0), np.empty((0, 3)), False
+
+
+def load_gyro(source) -> np.ndarray:
+    """
+    Loads a gyro log in either format (see read_gyro) into the same (N, 4)
+    array as load_gyro_csv, or an empty one if the log cannot be parsed.
+    """
+    raw, rates, nanoseconds = read_gyro(source)
+    data = np.empty((len(raw), 4))
+    if len(raw) == 0:
+        return data
+    data[:, 0] = gyro_seconds(raw, raw[0], nanoseconds)
+    data[:, 1:4] = rates
+    return data
+
+
+def load_flow_csv(source):
+    """
+    Parses a `timestamp,flow_x[,flow_y]` CSV into (timestamps, flow_x) arrays.
+    """
+    data = _load_csv(source, 2)
+    return data[:, 0].copy(), data[:, 1].copy()
+
+
+def load_flow_xy_csv(path: str):
+    """
+    Like load_flow_csv, also returning the flow_y column when the CSV's
+    header has one: (timestamps, flow_x, flow_y or None).
+    """
+    with open(path, "rb") as f:
+        columns = len(f.readline().split(b","))
+    if columns < 3:
+        timestamps, flow_x = load_flow_csv(path)
+        return timestamps, flow_x, None
+    data = _load_csv(path, 3)
+    return data[:, 0].copy(), data[:, 1].copy(), data[:, 2].copy()
+
+
+def interpolate(t: np.ndarray, xp: np.ndarray, fp: np.ndarray) -> np.ndarray:
+    """
+    Linear interpolation with the same edge behaviour as resampleGyro:
+    clamp past the last sample, extrapolate from the first segment before it.
+    """
+    out = np.interp(t, xp, fp)
+    if len(xp) > 1:
+        before = t < xp[0]
+        if np.any(before):
+            dt = xp[1] - xp[0]
+            alpha = (t[before] - xp[0]) / dt if dt > 1e-9 else 0.0
+            out[before] = fp[0] * (1.0 - alpha) + fp[1] * alpha
+    return out
+
+
+def resample_gyro(target_timestamps: np.ndarray, gyro: np.ndarray, axis: int = 1) -> np.ndarray:
+    """Resamples one gyro axis (0=x, 1=y, 2=z) at the given timestamps."""
+    if len(gyro) == 0 or len(target_timestamps) == 0:
+        return np.empty(0)
+    return interpolate(np.asarray(target_timestamps, dtype=np.float64), gyro[:, 0], gyro[:, axis + 1])
+
+
+def normalize(v: np.ndarray) -> np.ndarray:
+    if len(v) == 0:
+        return v
+    std = np.sqrt(max(0.0, np.mean(v * v) - np.mean(v) ** 2))
+    if std < 1e-6:
+        return v
+    return (v - np.mean(v)) / std
+
+
+def pearson(x: np.ndarray, y: np.ndarray) -> float:
+    if len(x) != len(y) or len(x) == 0:
+        return 0.0
+    n = len(x)
+    sum_x, sum_y = x.sum(), y.sum()
+    numerator = n * np.dot(x, y) - sum_x * sum_y
+    denominator = np.sqrt((n * np.dot(x, x) - sum_x * sum_x) * (n * np.dot(y, y) - sum_y * sum_y))
+    if not np.isfinite(denominator) or abs(denominator) < 1e-9:
+        return 0.0
+    return float(numerator / denominator)
+
+
+class RunningCorrelation:
+    """
+    pearson(normalize(x), normalize(y)) over a growing pair of series, kept as
+    running means and co-moments that are merged chunk by chunk (Chan et al.),
+    so adding samples costs O(new samples) and stays numerically stable.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean_x = self.mean_y = 0.0
+        self.m2_x = self.m2_y = self.c_xy = 0.0
+
+    def add(self, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        n_b = len(x)
+        if n_b == 0:
+            return
+        mean_x, mean_y = x.mean(), y.mean()
+        dx, dy = x - mean_x, y - mean_y
+        n = self.n + n_b
+        delta_x, delta_y = mean_x - self.mean_x, mean_y - self.mean_y
+        weight = self.n * n_b / n
+        self.m2_x += np.dot(dx, dx) + delta_x * delta_x * weight
+        self.m2_y += np.dot(dy, dy) + delta_y * delta_y * weight
+        self.c_xy += np.dot(dx, dy) + delta_x * delta_y * weight
+        self.mean_x += delta_x * n_b / n
+        self.mean_y += delta_y * n_b / n
+        self.n = n
+
+    def value(self) -> float:
+        if self.n == 0:
+            return 0.0
+        std_x, std_y = np.sqrt(self.m2_x / self.n), np.sqrt(self.m2_y / self.n)
+        # normalize() leaves near-constant signals unscaled, and pearson()'s
+        # zero guard applies to the denominator it would then see
+        scale = (std_x if std_x >= 1e-6 else 1.0) * (std_y if std_y >= 1e-6 else 1.0)
+        denominator = self.n * np.sqrt(self.m2_x * self.m2_y)
+        if not np.isfinite(denominator) or abs(denominator / scale) < 1e-9:
+            return 0.0
+        return float(self.n * self.c_xy / denominator)
+
+
+def optimal_dft_size(n: int) -> int:
+    """Smallest 2^a * 3^b * 5^c >= n, like cv::getOptimalDFTSize."""
+    best = None
+    p2 = 1
+    while True:
+        p3 = p2
+        while True:
+            p5 = p3
+            while p5 < n:
+                p5 *= 5
+            if best is None or p5 < best:
+                best = p5
+            if p3 >= n:
+                break
+            p3 *= 3
+        if p2 >= n:
+            break
+        p2 *= 2
+    return best
+
+
+def tremor_band_energy(magnitude: np.ndarray, sample_rate: int = TREMOR_SAMPLE_RATE):
+    """
+    Returns (total_energy, tremor_energy) of a uniformly sampled magnitude
+    signal, using the same zero-padding and bin range as analyzeTremor.
+    """
+    signal = magnitude - magnitude.mean()
+    size = optimal_dft_size(len(signal))
+    power = np.abs(np.fft.rfft(signal, n=size)) ** 2
+    bins = np.arange(1, size // 2)
+    freqs = bins * (sample_rate / size)
+    band = (freqs >= TREMOR_BAND[0]) & (freqs <= TREMOR_BAND[1])
+    total = float(power[bins].sum())
+    tremor = float(power[bins][band].sum())
+    return total, tremor
+
+
+def tremor_verdict(total: float, tremor: float):
+    if total < 1e-6:
+        return False, 0.0
+    ratio = tremor / total
+    # > 10% energy in the tremor band, and not completely still
+    return bool(ratio > 0.10 and total > 0.1), ratio
+
+
+def gyro_magnitude_series(gyro: np.ndarray, sample_rate: int = TREMOR_SAMPLE_RATE) -> np.ndarray:
+    """Gyro magnitude resampled at `sample_rate` over the recording."""
+    t_start, t_end = gyro[0, 0], gyro[-1, 0]
+    num_samples = int((t_end - t_start) * sample_rate)
+    if num_samples <= 0:
+        return np.empty(0)
+    t = t_start + np.arange(num_samples) / sample_rate
+    magnitude = np.sqrt(np.sum(gyro[:, 1:4] ** 2, axis=1))
+    return interpolate(t, gyro[:, 0], magnitude)
+
+
+def analyze_tremor(gyro: np.ndarray):
+    """
+    Detects 8-12 Hz physiological tremor in the gyro magnitude.
+    Returns (is_handheld, tremor_energy_ratio).
+    """
+    if len(gyro) == 0:
+        return False, 0.0
+    duration = gyro[-1, 0] - gyro[0, 0]
+    if duration < TREMOR_MIN_DURATION:
+        return False, 0.0
+    series = gyro_magnitude_series(gyro)
+    if len(series) < TREMOR_MIN_SAMPLES:
+        return False, 0.0
+    return tremor_verdict(*tremor_band_energy(series))
+
+
+class ScoringParams:
+    """
+    How a flow signal and a gyro log become a verdict: the flow component
+    ("x" or "y") correlated against a gyro axis ("x", "y" or "z"), and the
+    score above which the bundle counts as consistent. The defaults are what
+    vp_cli hardcodes (flow X against gyro Y, 0.7).
+    """
+
+    def __init__(self, threshold: float = CONSISTENCY_THRESHOLD, flow_axis: str = "x", gyro_axis: str = "y"):
+        if flow_axis not in ("x", "y"):
+            raise ValueError(f"Flow axis must be x or y, not {flow_axis!r}")
+        if gyro_axis not in AXES:
+            raise ValueError(f"Gyro axis must be x, y or z, not {gyro_axis!r}")
+        if not 0.0 <= threshold <= 1.0:
+            raise ValueError(f"Threshold must be between 0 and 1, not {threshold}")
+        self.threshold = float(threshold)
+        self.flow_axis = flow_axis
+        self.gyro_axis = gyro_axis
+
+    @property
+    def is_default(self) -> bool:
+        return self.to_dict() == ScoringParams().to_dict()
+
+    @property
+    def matches_cli(self) -> bool:
+        """True if vp_cli correlates the same axes, so only the threshold differs."""
+        return (self.flow_axis, self.gyro_axis) == ("x", "y")
+
+    def replace(self, threshold: float = None, flow_axis: str = None, gyro_axis: str = None) -> "ScoringParams":
+        return ScoringParams(
+            self.threshold if threshold is None else threshold,
+            flow_axis or self.flow_axis,
+            gyro_axis or self.gyro_axis,
+        )
+
+    def to_dict(self) -> dict:
+        return {"threshold": self.threshold, "flow_axis": self.flow_axis, "gyro_axis": self.gyro_axis}
+
+
+def score_flow(timestamps, flow_x, gyro: np.ndarray, axis: int = 1, threshold: float = CONSISTENCY_THRESHOLD) -> dict:
+    """
+    Correlates a per-frame flow signal against gyro data.
+    Returns the same dict shape as MotionVerifierWrapper.verify.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    flow_x = np.asarray(flow_x, dtype=np.float64)
+
+    if len(timestamps) == 0:
+        return {"verified": False, "score": 0.0, "message": "Could not extract optical flow from video.", "details": {}}
+    if len(gyro) == 0:
+        return {"verified": False, "score": 0.0, "message": "Could not load gyro data.", "details": {}}
+
+    # Sync Gyro Y (Yaw) to Visual Flow X (Pan), trimming the first 2 frames
+    gyro_resampled = resample_gyro(timestamps, gyro, axis)
+    if len(flow_x) > 2:
+        flow_x = flow_x[2:]
+        gyro_resampled = gyro_resampled[2:]
+
+    corr = pearson(normalize(flow_x), normalize(gyro_resampled))
+    score = abs(corr)
+    is_handheld, tremor_energy = analyze_tremor(gyro)
+
+    verified = score > threshold
+    return {
+        "verified": verified,
+        "score": score,
+        "message": "REAL/CONSISTENT" if verified else "FAKE/INCONSISTENT",
+        "details": {
+            "causality_score": max(0.0, min(100.0, score * 100.0)),
+            "is_handheld": is_handheld,
+            "tremor_energy": tremor_energy,
+            "duration": float(timestamps[-1] - timestamps[0]),
+        },
+    }
@@ -0,0 +1,133 @@
+"""
+Compact binary gyro log ("VPGY"), an alternative to the `timestamp,x,y,z` CSV.
+
+Layout, all little-endian:
+
+    offset  size  field
+    0       4     magic b"VPGY"
+    4       1     version (1)
+    5       1     flags: 1 = zlib-compressed payload, 2 = timestamps in
+                  nanoseconds (else seconds), 4 = rates in deg/s (else rad/s)
+    6       1     axis value size: 4 (float32) or 8 (float64)
+    7       1     reserved (0)
+    8       4     sample rate in Hz, float32 (0 = unknown; informational)
+    12      4     record count, uint32 (0 = as many as the payload holds)
+    16      ...   records: float64 timestamp, then x, y, z of the axis size
+
+Timestamps stay float64 so nanosecond clocks keep full precision with
+float32 axes. A compressed payload may inflate to at most the declared
+records (MAX_INFLATED_BYTES when the count is 0), so a small zlib bomb
+cannot exhaust memory. Uncompressed payloads are decoded straight out of the buffer
+with np.frombuffer; gyro_analysis.load_gyro turns them into the same (N, 4)
+array as a CSV.
+"""
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b"VPGY"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBxfI")
+
+FLAG_ZLIB = 1
+FLAG_NANOSECONDS = 2
+FLAG_DEGREES = 4
+
+CONTENT_TYPE = "application/vnd.veriphysics.gyro"
+EXTENSION = ".vpgy"
+
+# Largest compressed payload we inflate: ~2M records, hours of 200 Hz gyro
+MAX_INFLATED_BYTES = 64 * 1024 * 1024
+
+
+class GyroFormatError(ValueError):
+    pass
+
+
+def is_binary_gyro(head) -> bool:
+    return bytes(head[:len(MAGIC)]) == MAGIC
+
+
+def record_dtype(value_size: int) -> np.dtype:
+    axis = "<f4" if value_size == 4 else "<f8"
+    return np.dtype([("t", "<f8"), ("x", axis), ("y", axis), ("z", axis)])
+
+
+def decode_gyro_binary(buffer):
+    """
+    Decodes a VPGY buffer (bytes, bytearray, mmap or memoryview).
+    Returns (timestamps, rates, nanoseconds): the raw timestamps as stored (a
+    view into the buffer when uncompressed), an (N, 3) float64 array of x, y, z
+    in rad/s, and whether the timestamps are in nanoseconds.
+    Raises GyroFormatError on a malformed buffer.
+    """
+    view = memoryview(buffer)
+    if len(view) < HEADER.size:
+        raise GyroFormatError("Truncated header")
+    magic, version, flags, value_size, sample_rate, count = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise GyroFormatError("Not a VPGY gyro log")
+    if version != VERSION:
+        raise GyroFormatError(f"Unsupported VPGY version {version}")
+    if value_size not in (4, 8):
+        raise GyroFormatError(f"Unsupported axis value size {value_size}")
+
+    dtype = record_dtype(value_size)
+    offset = HEADER.size
+    if flags & FLAG_ZLIB:
+        view = memoryview(inflate(view[HEADER.size:], count * dtype.itemsize if count else MAX_INFLATED_BYTES))
+        offset = 0
+
+    available = (len(view) - offset) // dtype.itemsize
+    if count == 0:
+        count = available
+    elif count > available:
+        raise GyroFormatError(f"Header declares {count} records, payload holds {available}")
+
+    records = np.frombuffer(view, dtype=dtype, count=count, offset=offset)
+    rates = np.empty((count, 3), dtype=np.float64)
+    for column, axis in enumerate("xyz"):
+        rates[:, column] = records[axis]
+    if flags & FLAG_DEGREES:
+        rates *= np.pi / 180.0
+    return records["t"], rates, bool(flags & FLAG_NANOSECONDS)
+
+
+def inflate(payload, limit: int) -> bytes:
+    """Decompresses a zlib payload, rejecting one that inflates past `limit` bytes."""
+    if limit > MAX_INFLATED_BYTES:
+        raise GyroFormatError(f"Compressed payload declares {limit} bytes, more than {MAX_INFLATED_BYTES}")
+    decompressor = zlib.decompressobj()
+    try:
+        data = decompressor.decompress(payload, limit)
+        # Output stopped at the limit: anything still to come is over it
+        if decompressor.unconsumed_tail and decompressor.decompress(decompressor.unconsumed_tail, 1):
+            raise GyroFormatError(f"Compressed payload inflates past {limit} bytes")
+    except zlib.error as e:
+        raise GyroFormatError(f"Corrupt compressed payload: {e}")
+    if not decompressor.eof:
+        raise GyroFormatError("Corrupt compressed payload: truncated stream")
+    return data
+
+
+def encode_gyro(
+    data,
+    float32: bool = True,
+    compress: bool = False,
+    nanoseconds: bool = False,
+    sample_rate: float = 0.0,
+) -> bytes:
+    """Encodes an (N, 4) `timestamp,x,y,z` array as a VPGY buffer."""
+    data = np.asarray(data, dtype=np.float64).reshape(-1, 4)
+    value_size = 4 if float32 else 8
+    records = np.empty(len(data), dtype=record_dtype(value_size))
+    records["t"] = data[:, 0]
+    for column, axis in enumerate("xyz", start=1):
+        records[axis] = data[:, column]
+
+    flags = (FLAG_ZLIB if compress else 0) | (FLAG_NANOSECONDS if nanoseconds else 0)
+    payload = records.tobytes()
+    if compress:
+        payload = zlib.compress(payload)
+    return HEADER.pack(MAGIC, VERSION, flags, value_size, sample_rate, len(records)) + payload
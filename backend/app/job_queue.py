@@ -0,0 +1,345 @@
+import datetime
+import logging
+import random
+import threading
+import time
+import uuid
+
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import Session
+
+from . import models, metrics, stats
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLost(Exception):
+    """The job's lease expired and another worker claimed it; this run's result is discarded."""
+
+
+class Deferred(Exception):
+    """
+    Raised by a handler that cannot run yet for a reason outside the job (a
+    required subsystem is down): the job is put back without using up an attempt.
+    """
+
+    def __init__(self, message: str, retry_after: float = 30.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Unrecoverable(Exception):
+    """Raised by a handler for a job that can never succeed: it fails without further attempts."""
+
+
+def release_lease(db: Session, job: models.VerificationJob):
+    """
+    Ends the handler's lease inside its final transaction; call it right before
+    the commit. The UPDATE only matches while the job still carries this run's
+    lease token, so a run that outlived its lease (the job was re-leased in the
+    meantime) rolls back and raises LeaseLost instead of committing a second result.
+    """
+    Job = models.VerificationJob
+    released = db.query(Job).filter(Job.id == job.id, Job.lease_token == job.lease_token).update(
+        {Job.lease_token: None, Job.lease_expires_at: None}, synchronize_session=False
+    )
+    if not released:
+        db.rollback()
+        raise LeaseLost(f"Lease on Job {job.id} expired and was taken over by another worker")
+
+
+class JobQueue:
+    """
+    Durable work queue backed by the `verification_jobs` table.
+
+    Jobs in `ready_status` (or leased jobs whose visibility timeout has expired)
+    are claimed with a conditional UPDATE, so several workers and several API
+    processes can share one table without handing out the same job twice.
+    A handler that raises is retried with exponential backoff until
+    `max_attempts` is reached, after which the job is marked `failed_status`;
+    one that raises Deferred is put back without counting the attempt, and
+    one that raises Unrecoverable is failed at once.
+    A lease that expires (the worker crashed or hung) counts as a failed
+    attempt. Every lease carries a token; handlers commit their result
+    through `release_lease`, so a run that outlives its lease cannot
+    overwrite the run that took the job over.
+    Retry and give-up errors go to `job.message`, or to
+    `record_error(job, message)` when given.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        handler,
+        workers: int = 2,
+        ready_status: str = "PENDING",
+        running_status: str = "PROCESSING",
+        visibility_timeout: float = 600.0,
+        max_attempts: int = 3,
+        backoff_base: float = 5.0,
+        backoff_max: float = 300.0,
+        max_depth: int = 1000,
+        poll_interval: float = 1.0,
+        on_give_up=None,
+        on_transition=None,
+        failed_status: str = "ERROR",
+        name: str = "verify",
+        record_error=None,
+    ):
+        self.session_factory = session_factory
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.ready_status = ready_status
+        self.running_status = running_status
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_depth = max_depth
+        self.poll_interval = poll_interval
+        self.on_give_up = on_give_up
+        self.on_transition = on_transition
+        self.failed_status = failed_status
+        self.name = name
+        self.record_error = record_error
+
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._busy = 0
+        self._lock = threading.Lock()
+        # Moving average of handler duration, used for Retry-After estimates
+        self._avg_job_seconds = 10.0
+
+    # --- Producer side ---
+
+    def depth(self, db: Session) -> int:
+        return db.query(models.VerificationJob).filter(
+            models.VerificationJob.status.in_([self.ready_status, self.running_status])
+        ).count()
+
+    def is_full(self, db: Session) -> bool:
+        return self.depth(db) >= self.max_depth
+
+    def retry_after(self, db: Session) -> int:
+        """Rough number of seconds until the queue has drained below its limit."""
+        backlog = max(1, self.depth(db) - self.max_depth + 1)
+        return max(1, int(backlog * self._avg_job_seconds / self.workers))
+
+    @property
+    def avg_job_seconds(self) -> float:
+        return self._avg_job_seconds
+
+    def notify(self):
+        self._wakeup.set()
+
+    @property
+    def busy_workers(self) -> int:
+        return self._busy
+
+    @property
+    def running(self) -> bool:
+        """Worker threads are started and none has died."""
+        return bool(self._threads) and all(t.is_alive() for t in self._threads)
+
+    # --- Consumer side ---
+
+    def start(self):
+        self._stopping.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker_loop, name=f"{self.name}-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        logger.info(f"Started {self.workers} '{self.name}' queue workers")
+
+    def stop(self, timeout: float = 10.0):
+        self._stopping.set()
+        self._wakeup.set()
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
+
+    def _leasable(self, now: datetime.datetime):
+        Job = models.VerificationJob
+        return and_(
+            Job.status.in_([self.ready_status, self.running_status]),
+            # Expired leases are retried only while attempts remain (see _give_up_expired)
+            or_(Job.lease_expires_at == None, and_(Job.lease_expires_at < now, Job.attempts < self.max_attempts)),
+            or_(Job.next_attempt_at == None, Job.next_attempt_at <= now),
+        )
+
+    def _exhausted(self, now: datetime.datetime):
+        Job = models.VerificationJob
+        return and_(
+            Job.status == self.running_status,
+            Job.lease_expires_at < now,
+            Job.attempts >= self.max_attempts,
+        )
+
+    def _give_up_expired(self, db: Session, now: datetime.datetime):
+        """
+        Fails jobs whose last allowed attempt lost its worker (a bundle that
+        crashes or hangs vp_cli), instead of leasing them again forever.
+        """
+        Job = models.VerificationJob
+        expired = db.query(Job.id, Job.is_consistent).filter(self._exhausted(now)).limit(100).all()
+        for job_id, is_consistent in expired:
+            failed = (
+                db.query(Job)
+                .filter(Job.id == job_id, self._exhausted(now))
+                .update(
+                    {
+                        Job.status: self.failed_status,
+                        Job.lease_expires_at: None,
+                        Job.lease_token: None,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if failed:
+                stats.record_transition(db, self.running_status, is_consistent, self.failed_status, is_consistent)
+                job = db.get(Job, job_id, populate_existing=True)
+                self._record_error(job, f"Gave up after {self.max_attempts} attempts: worker lost (lease expired)")
+            db.commit()
+            if failed:
+                self._notify_transition(job)
+                logger.error(f"Job {job_id} failed after {job.attempts} attempts: lease expired")
+                if self.on_give_up:
+                    self.on_give_up(job, db)
+
+    def _lease(self, db: Session):
+        Job = models.VerificationJob
+        now = datetime.datetime.utcnow()
+        self._give_up_expired(db, now)
+        candidates = (
+            db.query(Job.id, Job.status, Job.is_consistent)
+            .filter(self._leasable(now))
+            .order_by(Job.priority.desc(), Job.created_at, Job.id)
+            .limit(self.workers)
+            .all()
+        )
+        for job_id, old_status, is_consistent in candidates:
+            claimed = (
+                db.query(Job)
+                .filter(Job.id == job_id, Job.status == old_status, self._leasable(now))
+                .update(
+                    {
+                        Job.status: self.running_status,
+                        Job.lease_expires_at: now + datetime.timedelta(seconds=self.visibility_timeout),
+                        Job.lease_token: uuid.uuid4().hex,
+                        Job.attempts: Job.attempts + 1,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if claimed:
+                stats.record_transition(db, old_status, is_consistent, self.running_status, is_consistent)
+            db.commit()
+            if claimed:
+                job = db.get(Job, job_id)
+                self._notify_transition(job)
+                return job
+        return None
+
+    def _notify_transition(self, job):
+        """Reports a committed status change; a failing callback never fails the job."""
+        if self.on_transition is None:
+            return
+        try:
+            self.on_transition(job)
+        except Exception:
+            logger.exception(f"'{self.name}' queue transition callback failed for Job {job.id}")
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    def _record_error(self, job, message: str):
+        if self.record_error is not None:
+            self.record_error(job, message)
+        else:
+            job.message = message
+
+    def _handle_failure(self, db: Session, job_id: int, lease_token: str, error: Exception):
+        db.rollback()
+        Job = models.VerificationJob
+        # Only the run that still holds the lease decides about retries
+        released = db.query(Job).filter(Job.id == job_id, Job.lease_token == lease_token).update(
+            {Job.lease_token: None, Job.lease_expires_at: None}, synchronize_session=False
+        )
+        if not released:
+            db.rollback()
+            logger.warning(f"Job {job_id}: discarding the result of a run whose lease was taken over: {error}")
+            return
+        job = db.get(Job, job_id)
+        if isinstance(error, Deferred):
+            stats.record_transition(db, job.status, job.is_consistent, self.ready_status, job.is_consistent)
+            job.status = self.ready_status
+            job.attempts -= 1  # Handed back unattempted
+            job.next_attempt_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=error.retry_after)
+            self._record_error(job, f"Waiting, retrying in {int(error.retry_after)}s: {error}")
+            db.commit()
+            self._notify_transition(job)
+            logger.info(f"Job {job_id} deferred for {error.retry_after:.0f}s: {error}")
+        elif job.attempts < self.max_attempts and not isinstance(error, Unrecoverable):
+            delay = self._backoff(job.attempts)
+            stats.record_transition(db, job.status, job.is_consistent, self.ready_status, job.is_consistent)
+            job.status = self.ready_status
+            job.next_attempt_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=delay)
+            self._record_error(job, f"Attempt {job.attempts} failed, retrying in {int(delay)}s: {error}")
+            db.commit()
+            self._notify_transition(job)
+            logger.warning(f"Job {job_id} attempt {job.attempts} failed, retrying in {delay:.1f}s: {error}")
+        else:
+            stats.record_transition(db, job.status, job.is_consistent, self.failed_status, job.is_consistent)
+            job.status = self.failed_status
+            self._record_error(job, str(error))
+            db.commit()
+            self._notify_transition(job)
+            logger.error(f"Job {job_id} failed after {job.attempts} attempts: {error}")
+            if self.on_give_up:
+                self.on_give_up(job, db)
+
+    def _run_one(self) -> bool:
+        db = self.session_factory()
+        try:
+            job = self._lease(db)
+            if job is None:
+                return False
+
+            runnable_since = job.next_attempt_at or job.created_at
+            if runnable_since is not None:
+                if runnable_since.tzinfo is not None:
+                    runnable_since = runnable_since.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+                wait = (datetime.datetime.utcnow() - runnable_since).total_seconds()
+                metrics.QUEUE_WAIT_SECONDS.labels(queue=self.name).observe(max(0.0, wait))
+
+            with self._lock:
+                self._busy += 1
+            started = time.monotonic()
+            job_id, lease_token = job.id, job.lease_token
+            outcome = "success"
+            try:
+                self.handler(job, db)
+            except Exception as e:
+                outcome = "failure"
+                self._handle_failure(db, job_id, lease_token, e)
+            finally:
+                elapsed = time.monotonic() - started
+                metrics.JOB_SECONDS.labels(queue=self.name, outcome=outcome).observe(elapsed)
+                with self._lock:
+                    self._busy -= 1
+                    self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * elapsed
+            return True
+        finally:
+            db.close()
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            try:
+                if self._run_one():
+                    continue
+            except Exception:
+                logger.exception(f"'{self.name}' queue worker error")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
@@ -0,0 +1,222 @@
+"""
+Process startup that is safe to run from many uvicorn workers and replicas at
+once, and components that come up lazily.
+
+- init_schema() creates missing tables and adds model columns an existing
+  table lacks (create_all never alters tables). It holds a cross-process
+  lock while doing so: a PostgreSQL advisory lock, or a lock file next to a
+  SQLite database. Every process can run it; all but the first find nothing
+  to do. `python -m app.lifecycle` runs it on its own, e.g. as a deploy step.
+- Subsystem wraps a dependency that may be missing when the process starts
+  (vp_cli not yet installed, certificates not yet mounted). It is built in
+  the background and, while it fails, retried instead of staying disabled
+  for the life of the process; /readyz reports it.
+"""
+import contextlib
+import datetime
+import logging
+import threading
+import time
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_LOCK_ID = 0x56505359  # PostgreSQL advisory lock key ("VPSY")
+
+
+@contextlib.contextmanager
+def schema_lock(engine):
+    """
+    Serializes schema changes across processes. Other databases get no lock;
+    init_schema retries when a concurrent process created an object first.
+    """
+    backend = engine.url.get_backend_name()
+    if backend == "postgresql":
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": SCHEMA_LOCK_ID})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": SCHEMA_LOCK_ID})
+                conn.commit()
+        return
+
+    path = engine.url.database if backend == "sqlite" else None
+    try:
+        import fcntl
+    except ImportError:  # Windows
+        fcntl = None
+    if not path or path == ":memory:" or fcntl is None:
+        yield
+        return
+    with open(f"{path}.schema-lock", "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def add_missing_columns(engine, metadata) -> list:
+    """
+    ALTER TABLE ... ADD COLUMN for every model column an existing table lacks,
+    plus its indexes. Existing rows get the column's scalar default (e.g.
+    attempts=0), so code reading them never sees NULL where new rows have a
+    value. Only nullable columns can be added this way; others are logged and
+    left for a manual migration. Returns the "table.column" names added.
+    """
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    quote = engine.dialect.identifier_preparer.quote
+    added = []
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            present = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                if not column.nullable:
+                    logger.error(f"Column {table.name}.{column.name} is missing and NOT NULL; add it by hand")
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}"))
+                if column.default is not None and column.default.is_scalar:
+                    conn.execute(table.update().where(column.is_(None)).values({column.name: column.default.arg}))
+                for index in table.indexes:
+                    if column.name in index.columns:
+                        index.create(conn, checkfirst=True)
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def init_schema(engine, metadata, attempts: int = 3) -> dict:
+    """
+    Brings the database up to the models: creates missing tables and adds
+    missing nullable columns. Returns {"created": tables, "added": columns}.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            with schema_lock(engine):
+                before = set(inspect(engine).get_table_names())
+                metadata.create_all(bind=engine)
+                created = sorted(set(metadata.tables) - before)
+                added = add_missing_columns(engine, metadata)
+            break
+        except DatabaseError as e:
+            # Without a shared lock, another process may have created the same object first
+            if attempt == attempts:
+                raise
+            logger.warning(f"Schema setup failed (attempt {attempt}), retrying: {e}")
+            time.sleep(0.5 * attempt)
+    if created or added:
+        logger.info(f"Schema updated: created tables {created}, added columns {added}")
+    return {"created": created, "added": added}
+
+
+class Subsystem:
+    """
+    A component built by `factory()` on first use or by the background
+    start(). A failed build is remembered and retried once `retry_interval`
+    seconds have passed; meanwhile get() returns None. `close(instance)`
+    releases it at shutdown. `required` subsystems gate readiness.
+    """
+
+    def __init__(self, name: str, factory, required: bool = True, retry_interval: float = 30.0, close=None):
+        self.name = name
+        self.factory = factory
+        self.required = required
+        self.retry_interval = retry_interval
+        self._close = close
+        self._instance = None
+        self._error = None
+        self._attempts = 0
+        self._last_attempt = 0.0
+        self._ready_at = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @property
+    def instance(self):
+        """The component if it is up, without trying to start it."""
+        return self._instance
+
+    @property
+    def ready(self) -> bool:
+        return self._instance is not None
+
+    def get(self):
+        """The component, starting it first if a retry is due; None while unavailable."""
+        if self._instance is not None:
+            return self._instance
+        if self._attempts and time.monotonic() - self._last_attempt < self.retry_interval:
+            return None
+        return self._try_start()
+
+    def _try_start(self):
+        # One build at a time; concurrent callers do not wait for it
+        if not self._lock.acquire(blocking=False):
+            return self._instance
+        try:
+            if self._instance is not None:
+                return self._instance
+            self._attempts += 1
+            self._last_attempt = time.monotonic()
+            try:
+                instance = self.factory()
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                # Logged once per distinct failure, not on every retry
+                level = logging.DEBUG if error == self._error else logging.WARNING
+                logger.log(level, f"{self.name} unavailable (attempt {self._attempts}), retrying in {self.retry_interval:g}s: {error}")
+                self._error = error
+                return None
+            self._instance, self._error = instance, None
+            self._ready_at = datetime.datetime.now(datetime.timezone.utc)
+            logger.info(f"{self.name} ready after {self._attempts} attempt(s)")
+            return instance
+        finally:
+            self._lock.release()
+
+    def start(self):
+        """Builds the component in a background thread, retrying until it is up or closed."""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+
+        def run():
+            while self._try_start() is None and not self._stopping.wait(self.retry_interval):
+                pass
+
+        self._thread = threading.Thread(target=run, name=f"{self.name}-startup", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        with self._lock:
+            instance, self._instance = self._instance, None
+        if instance is not None and self._close:
+            self._close(instance)
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "required": self.required,
+            "attempts": self._attempts,
+            "error": self._error,
+            "ready_since": self._ready_at.isoformat() if self._ready_at else None,
+        }
+
+
+if __name__ == "__main__":
+    from . import database, models
+
+    logging.basicConfig(level=logging.INFO)
+    print(init_schema(database.engine, models.Base.metadata))
@@ -0,0 +1,356 @@
+"""
+Live verification sessions (bodycams, live broadcast): the client pushes gyro
+windows and video segments (or on-device flow windows) while recording and
+gets a rolling verdict after each push.
+
+LiveAnalysis keeps only what later samples still need: running co-moments for
+the correlation, the gyro samples around the oldest frame not yet matched, the
+last `window` seconds for the rolling verdict, and the 50 Hz gyro magnitude
+series for the tremor check. Each push costs work proportional to the new data
+plus the window, not the recording so far, and finish() returns what
+gyro_analysis.score_flow would for the whole recording.
+"""
+import datetime
+import logging
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from . import gyro_analysis, models
+
+logger = logging.getLogger(__name__)
+
+
+class LiveError(Exception):
+    """Invalid push or unknown session; reported to the client as 4xx."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _Series:
+    """Append-only float array with amortised O(1) growth."""
+
+    def __init__(self):
+        self._data = np.empty(1024)
+        self.size = 0
+
+    def extend(self, values: np.ndarray):
+        end = self.size + len(values)
+        if end > len(self._data):
+            grown = np.empty(max(end, 2 * len(self._data)))
+            grown[:self.size] = self._data[:self.size]
+            self._data = grown
+        self._data[self.size:end] = values
+        self.size = end
+
+    def tail(self, n: int) -> np.ndarray:
+        return self._data[max(0, self.size - n):self.size]
+
+    def head(self, n: int) -> np.ndarray:
+        return self._data[:min(n, self.size)]
+
+
+class LiveAnalysis:
+    """
+    Incremental form of gyro_analysis.score_flow. Gyro and flow may arrive in
+    any interleaving; a frame is matched to the gyro once gyro data reaches its
+    timestamp. Both streams must be pushed in time order.
+    """
+
+    def __init__(self, window: float = 10.0, axis: int = 1, threshold: float = gyro_analysis.CONSISTENCY_THRESHOLD):
+        self.window = window
+        self.axis = axis
+        self.threshold = threshold
+
+        # Gyro: raw timestamp of the first sample, the first two samples (to
+        # extrapolate before the recording like resample_gyro does) and the
+        # recent samples still needed for interpolation
+        self._t0 = None
+        self._head_t = np.empty(0)
+        self._head_v = np.empty(0)
+        self._gyro_t = np.empty(0)
+        self._gyro_rates = np.empty((0, 3))
+        self._gyro_end = None
+        self.gyro_samples = 0
+        self._magnitude = _Series()
+
+        # Flow: frames waiting for gyro coverage, and the matched pairs
+        self._pending_t = np.empty(0)
+        self._pending_x = np.empty(0)
+        self.frames = 0
+        self._first_flow_t = None
+        self._last_flow_t = None
+        self._first_pairs = ([], [])  # First two frames, trimmed like score_flow
+        self._correlation = gyro_analysis.RunningCorrelation()
+        self._recent = (np.empty(0), np.empty(0), np.empty(0))
+
+    def add_gyro(self, raw, rates, nanoseconds):
+        """Appends a gyro window as returned by gyro_analysis.read_gyro."""
+        if len(raw) == 0:
+            raise LiveError("Gyro window is empty or could not be parsed")
+        if self._t0 is None:
+            self._t0 = raw[0]
+        t = gyro_analysis.gyro_seconds(np.asarray(raw, dtype=np.float64), self._t0, nanoseconds)
+        if self._gyro_end is not None and t[0] <= self._gyro_end:
+            raise LiveError("Gyro window does not start after the previous one", 409)
+
+        if len(self._head_t) < 2:
+            take = 2 - len(self._head_t)
+            self._head_t = np.concatenate([self._head_t, t[:take]])
+            self._head_v = np.concatenate([self._head_v, rates[:take, self.axis]])
+        self._gyro_t = np.concatenate([self._gyro_t, t])
+        self._gyro_rates = np.concatenate([self._gyro_rates, rates])
+        self._gyro_end = t[-1]
+        self.gyro_samples += len(t)
+
+        self._extend_magnitude()
+        self._match()
+        self._trim_gyro()
+
+    def add_flow(self, timestamps, flow_x):
+        """Appends per-frame flow samples (seconds since the start of the recording)."""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        flow_x = np.asarray(flow_x, dtype=np.float64)
+        if len(timestamps) == 0:
+            return
+        if self._last_flow_t is not None and timestamps[0] <= self._last_flow_t:
+            raise LiveError("Flow window does not start after the previous one", 409)
+        if self._first_flow_t is None:
+            self._first_flow_t = timestamps[0]
+        self._last_flow_t = timestamps[-1]
+
+        # Frames are numbered in arrival order; the first two are set aside
+        first = max(0, 2 - self.frames)
+        self._first_pairs[0].extend(timestamps[:first])
+        self._first_pairs[1].extend(flow_x[:first])
+        self.frames += len(timestamps)
+        self._pending_t = np.concatenate([self._pending_t, timestamps[first:]])
+        self._pending_x = np.concatenate([self._pending_x, flow_x[first:]])
+
+        self._match()
+        self._trim_gyro()
+
+    def _resample(self, t: np.ndarray) -> np.ndarray:
+        out = np.empty(len(t))
+        before = t < self._head_t[0]
+        out[before] = gyro_analysis.interpolate(t[before], self._head_t, self._head_v)
+        out[~before] = gyro_analysis.interpolate(t[~before], self._gyro_t, self._gyro_rates[:, self.axis])
+        return out
+
+    def _matchable(self, t: np.ndarray, final: bool) -> np.ndarray:
+        if final:
+            return np.ones(len(t), dtype=bool)
+        # Before the first sample needs both head samples; after it, gyro past the frame
+        return np.where(t < self._head_t[0], len(self._head_t) == 2, t <= self._gyro_end)
+
+    def _match(self, final: bool = False):
+        if len(self._pending_t) == 0 or self.gyro_samples == 0:
+            return
+        ready = self._matchable(self._pending_t, final)
+        if not ready.any():
+            return
+        t, x = self._pending_t[ready], self._pending_x[ready]
+        self._pending_t, self._pending_x = self._pending_t[~ready], self._pending_x[~ready]
+
+        g = self._resample(t)
+        self._correlation.add(x, g)
+        recent_t, recent_x, recent_g = (np.concatenate(p) for p in zip(self._recent, (t, x, g)))
+        keep = recent_t > recent_t.max() - self.window
+        self._recent = (recent_t[keep], recent_x[keep], recent_g[keep])
+
+    def _extend_magnitude(self):
+        """Gyro magnitude at the 50 Hz points the new samples cover."""
+        rate = gyro_analysis.TREMOR_SAMPLE_RATE
+        start = self._magnitude.size
+        end = int(self._gyro_end * rate) + 1
+        if end <= start:
+            return
+        points = np.arange(start, end) / rate
+        points = points[points <= self._gyro_end]
+        magnitude = np.sqrt(np.sum(self._gyro_rates ** 2, axis=1))
+        self._magnitude.extend(gyro_analysis.interpolate(points, self._gyro_t, magnitude))
+
+    def _trim_gyro(self):
+        """Drops gyro samples no pending frame or future magnitude point can need."""
+        needed = self._magnitude.size / gyro_analysis.TREMOR_SAMPLE_RATE
+        # Frames still to come start after the last one (finish() may need the first two)
+        if self.frames > 2:
+            needed = min(needed, self._last_flow_t)
+        else:
+            needed = min(needed, self._first_flow_t if self.frames else 0.0)
+        if len(self._pending_t):
+            needed = min(needed, self._pending_t.min())
+        keep_from = max(0, min(np.searchsorted(self._gyro_t, needed, side="right") - 1, len(self._gyro_t) - 1))
+        if keep_from > 0:
+            self._gyro_t = self._gyro_t[keep_from:]
+            self._gyro_rates = self._gyro_rates[keep_from:]
+
+    def _tremor(self, series: np.ndarray):
+        if len(series) < gyro_analysis.TREMOR_MIN_SAMPLES:
+            return False, 0.0
+        return gyro_analysis.tremor_verdict(*gyro_analysis.tremor_band_energy(series))
+
+    def snapshot(self) -> dict:
+        """Rolling verdict: cumulative score plus score and tremor over the last `window` seconds."""
+        score = abs(self._correlation.value())
+        _, recent_x, recent_g = self._recent
+        window_score = 0.0
+        if len(recent_x) > 1:
+            window_score = abs(gyro_analysis.pearson(gyro_analysis.normalize(recent_x), gyro_analysis.normalize(recent_g)))
+        is_handheld, tremor_energy = self._tremor(
+            self._magnitude.tail(int(self.window * gyro_analysis.TREMOR_SAMPLE_RATE))
+        )
+        return {
+            "frames": self.frames,
+            "matched_frames": self._correlation.n,
+            "gyro_samples": self.gyro_samples,
+            "duration": float(self._last_flow_t - self._first_flow_t) if self.frames else 0.0,
+            "score": score,
+            "verified": score > self.threshold,
+            "window_score": window_score,
+            "window_verified": window_score > self.threshold,
+            "is_handheld": is_handheld,
+            "tremor_energy": tremor_energy,
+        }
+
+    def finish(self) -> dict:
+        """Final result over the whole recording, in score_flow's shape."""
+        if self.frames == 0:
+            return {"verified": False, "score": 0.0, "message": "Could not extract optical flow from video.", "details": {}}
+        if self.gyro_samples == 0:
+            return {"verified": False, "score": 0.0, "message": "Could not load gyro data.", "details": {}}
+
+        self._match(final=True)
+        correlation = self._correlation
+        if self.frames <= 2:
+            # score_flow only trims the first two frames of longer signals
+            correlation = gyro_analysis.RunningCorrelation()
+            first_t = np.asarray(self._first_pairs[0])
+            correlation.add(self._first_pairs[1], self._resample(first_t))
+        score = abs(correlation.value())
+
+        is_handheld, tremor_energy = False, 0.0
+        if self._gyro_end >= gyro_analysis.TREMOR_MIN_DURATION:
+            num_samples = int(self._gyro_end * gyro_analysis.TREMOR_SAMPLE_RATE)
+            is_handheld, tremor_energy = self._tremor(self._magnitude.head(num_samples))
+
+        verified = score > self.threshold
+        return {
+            "verified": verified,
+            "score": score,
+            "message": "REAL/CONSISTENT" if verified else "FAKE/INCONSISTENT",
+            "details": {
+                "causality_score": max(0.0, min(100.0, score * 100.0)),
+                "is_handheld": is_handheld,
+                "tremor_energy": tremor_energy,
+                "duration": float(self._last_flow_t - self._first_flow_t),
+            },
+        }
+
+
+class LiveSession:
+    def __init__(self, session_id: str, user_id: int, window: float):
+        self.id = session_id
+        self.user_id = user_id
+        self.analysis = LiveAnalysis(window=window)
+        self.lock = threading.Lock()
+        self.last_seen = time.monotonic()
+        self.video_clock = 0.0  # Seconds of video consumed by earlier segments
+
+    def push_gyro(self, gyro_source) -> dict:
+        raw, rates, nanoseconds = gyro_analysis.read_gyro(gyro_source)
+        with self.lock:
+            self.last_seen = time.monotonic()
+            self.analysis.add_gyro(raw, rates, nanoseconds)
+            return self.snapshot()
+
+    def push_flow(self, flow_source) -> dict:
+        timestamps, flow_x = gyro_analysis.load_flow_csv(flow_source)
+        if len(timestamps) == 0:
+            raise LiveError("Flow window is empty or could not be parsed")
+        with self.lock:
+            self.last_seen = time.monotonic()
+            self.analysis.add_flow(timestamps, flow_x)
+            return self.snapshot()
+
+    def push_segment(self, timestamps, flow_x, fps: float, frames: int) -> dict:
+        """
+        Flow of one video segment from Verifier.extract_flow. Segments are
+        placed back to back on the video clock; the frame pair spanning two
+        segments has no flow sample.
+        """
+        with self.lock:
+            self.last_seen = time.monotonic()
+            self.analysis.add_flow(self.video_clock + np.asarray(timestamps, dtype=np.float64), flow_x)
+            self.video_clock += frames / fps
+            return self.snapshot()
+
+    def snapshot(self) -> dict:
+        return {"id": self.id, "status": "LIVE", **self.analysis.snapshot()}
+
+
+class LiveSessions:
+    """
+    Open sessions of this API process. Their state is in memory, so a
+    multi-process deployment needs sticky routing on the session id. Sessions
+    idle for `ttl` seconds are dropped by expire().
+    """
+
+    def __init__(self, ttl: float = 600.0, max_sessions: int = 1000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def create(self, db, user_id: int, window: float) -> LiveSession:
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                raise LiveError("Too many live sessions, try again later", 503)
+            session = LiveSession(str(uuid.uuid4()), user_id, window)
+            self._sessions[session.id] = session
+        db.add(models.LiveSession(id=session.id, user_id=user_id, status="LIVE"))
+        db.commit()
+        return session
+
+    def get(self, session_id: str, user_id: int) -> LiveSession:
+        session = self._sessions.get(session_id)
+        if session is None or session.user_id != user_id:
+            raise LiveError("Live session not found or already finished", 404)
+        return session
+
+    def finish(self, db, session: LiveSession) -> dict:
+        with self._lock:
+            if self._sessions.pop(session.id, None) is None:
+                raise LiveError("Live session not found or already finished", 404)
+        with session.lock:
+            result = session.analysis.finish()
+        row = db.get(models.LiveSession, session.id)
+        if row is not None:
+            row.status = "FINISHED"
+            row.finished_at = datetime.datetime.now(datetime.timezone.utc)
+            row.score = result["score"]
+            row.is_consistent = result["verified"]
+            row.message = result["message"]
+            row.details = {**result["details"], "frames": session.analysis.frames}
+            db.commit()
+        return result
+
+    def expire(self, db) -> dict:
+        cutoff = time.monotonic() - self.ttl
+        with self._lock:
+            expired = [s.id for s in self._sessions.values() if s.last_seen < cutoff]
+            for session_id in expired:
+                del self._sessions[session_id]
+        if expired:
+            db.query(models.LiveSession).filter(models.LiveSession.id.in_(expired)).update(
+                {models.LiveSession.status: "EXPIRED"}, synchronize_session=False
+            )
+            db.commit()
+        return {"removed": len(expired)}
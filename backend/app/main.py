@@ -1,65 +1,211 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Depends, status, Header
+from fastapi import FastAPI, HTTPException, Depends, status, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-import shutil
+from typing import Optional
 import os
+import re
 import uuid
 import logging
 import secrets
+import datetime
+import time
+import asyncio
+import contextlib
 
-from fastapi.staticfiles import StaticFiles
-from .verifier import MotionVerifierWrapper
+from starlette.concurrency import run_in_threadpool
+from .verifier import MotionVerifierWrapper, VerifierError, score_series
+from .flow_cache import FlowCache
 from .c2pa_signer import C2PASignerService
-from . import models, database, auth
+from .job_queue import Deferred, JobQueue, Unrecoverable, release_lease
+from .pagination import paginate_jobs
+from .principal_cache import Principal, create_cache, install_invalidation_hooks
+from .uploads import safe_filename
+from .storage import StorageGC, blob_key, blob_sha256, create_storage, file_sha256, file_url
+from . import models, database, auth, uploads, dedup, metrics, stats, batch, events, resumable, live, admission, preflight, gyro_analysis, profiles, lifecycle, analytics
 
 # Setup Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize DB Tables
-models.Base.metadata.create_all(bind=database.engine)
+metrics.instrument_engine(database.engine)
 
-app = FastAPI(title="VeriPhysics Cloud")
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing touches the database, the verifier or the disk at import time
+    await run_in_threadpool(start_services)
+    try:
+        yield
+    finally:
+        await run_in_threadpool(stop_services)
+
+app = FastAPI(title="VeriPhysics Cloud", lifespan=lifespan)
 
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+# Auth lookups (API key -> user, JWT subject -> user) cached in-process,
+# or in Redis when VERIPHYSICS_CACHE_URL is set so all workers share invalidations
+principal_cache = create_cache(
+    url=os.environ.get("VERIPHYSICS_CACHE_URL"),
+    ttl=float(os.environ.get("VERIPHYSICS_PRINCIPAL_CACHE_TTL", "60")),
+    max_entries=int(os.environ.get("VERIPHYSICS_PRINCIPAL_CACHE_SIZE", "10000")),
+)
+install_invalidation_hooks(principal_cache)
+
+# Job state changes pushed to /jobs/events streams (shared through Redis when configured)
+event_broker = events.create_broker(
+    url=os.environ.get("VERIPHYSICS_EVENTS_URL", os.environ.get("VERIPHYSICS_CACHE_URL")),
+    history=int(os.environ.get("VERIPHYSICS_EVENTS_HISTORY", "1000")),
+)
+EVENTS_HEARTBEAT = float(os.environ.get("VERIPHYSICS_EVENTS_HEARTBEAT", "15"))
+
+# Configuration
+CLI_PATH = os.environ.get("VERIPHYSICS_CLI_PATH", "/usr/local/bin/vp_cli")
+VERIFIER_POOL_SIZE = int(os.environ.get("VERIPHYSICS_VERIFIER_WORKERS", os.cpu_count() or 2))
+VERIFIER_JOB_TIMEOUT = float(os.environ.get("VERIPHYSICS_VERIFIER_TIMEOUT", "300"))
+QUEUE_WORKERS = int(os.environ.get("VERIPHYSICS_QUEUE_WORKERS", VERIFIER_POOL_SIZE))
+QUEUE_MAX_DEPTH = int(os.environ.get("VERIPHYSICS_QUEUE_MAX_DEPTH", "1000"))
+QUEUE_MAX_ATTEMPTS = int(os.environ.get("VERIPHYSICS_QUEUE_MAX_ATTEMPTS", "3"))
+STATS_CACHE_TTL = float(os.environ.get("VERIPHYSICS_STATS_CACHE_TTL", "2"))
+SIGNING_WORKERS = int(os.environ.get("VERIPHYSICS_SIGNING_WORKERS", "2"))
+SIGNING_TIMEOUT = float(os.environ.get("VERIPHYSICS_SIGNING_TIMEOUT", "600"))
+TSA_URL = os.environ.get("VERIPHYSICS_TSA_URL", "http://timestamp.digicert.com")
+TSA_FALLBACK_URL = os.environ.get("VERIPHYSICS_TSA_FALLBACK_URL")  # e.g. a local TSA; unset = no timestamp
+TSA_TIMEOUT = float(os.environ.get("VERIPHYSICS_TSA_TIMEOUT", "5"))
+# Deadline per signing call, after which its process is killed; with a fallback re-sign, two fit in SIGNING_TIMEOUT
+SIGN_CALL_TIMEOUT = float(os.environ.get("VERIPHYSICS_SIGN_CALL_TIMEOUT", min(120.0, SIGNING_TIMEOUT / 3)))
+QUEUE_VISIBILITY_TIMEOUT = float(os.environ.get("VERIPHYSICS_QUEUE_VISIBILITY_TIMEOUT", VERIFIER_JOB_TIMEOUT * 2))
+UPLOAD_DIR = "/tmp/veriphysics_uploads"  # Staging for in-flight uploads
+STORAGE_DIR = os.environ.get("VERIPHYSICS_STORAGE_DIR", "/tmp/veriphysics_storage")
+S3_BUCKET = os.environ.get("VERIPHYSICS_S3_BUCKET")  # Set to store blobs in S3 instead
+S3_PREFIX = os.environ.get("VERIPHYSICS_S3_PREFIX", "")
+S3_ENDPOINT_URL = os.environ.get("VERIPHYSICS_S3_ENDPOINT_URL")  # MinIO or another S3-compatible stand-in
+GC_INTERVAL = float(os.environ.get("VERIPHYSICS_GC_INTERVAL", "300"))
+GC_GRACE = float(os.environ.get("VERIPHYSICS_GC_GRACE", "3600"))
+SIGNED_MAX_AGE_DAYS = float(os.environ.get("VERIPHYSICS_SIGNED_MAX_AGE_DAYS", "30"))
+SIGNED_MAX_BYTES = int(os.environ.get("VERIPHYSICS_SIGNED_MAX_BYTES", "0"))  # 0 = no size cap
+MAX_VIDEO_BYTES = int(os.environ.get("VERIPHYSICS_MAX_VIDEO_BYTES", 1024 * 1024 * 1024))
+MAX_GYRO_BYTES = int(os.environ.get("VERIPHYSICS_MAX_GYRO_BYTES", 64 * 1024 * 1024))
+MAX_REQUEST_BYTES = int(os.environ.get("VERIPHYSICS_MAX_REQUEST_BYTES", MAX_VIDEO_BYTES + MAX_GYRO_BYTES))
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # Part headers and boundaries around a single-file body
+MAX_BATCH_BYTES = int(os.environ.get("VERIPHYSICS_MAX_BATCH_BYTES", 16 * 1024 * 1024 * 1024))
+MAX_BATCH_FILES = int(os.environ.get("VERIPHYSICS_MAX_BATCH_FILES", "10000"))
+UPLOAD_SESSION_DIR = os.environ.get("VERIPHYSICS_UPLOAD_SESSION_DIR", "/tmp/veriphysics_sessions")
+UPLOAD_SESSION_TTL = float(os.environ.get("VERIPHYSICS_UPLOAD_SESSION_TTL", 24 * 3600))
+LIVE_WINDOW = float(os.environ.get("VERIPHYSICS_LIVE_WINDOW", "10"))  # Seconds behind the rolling verdict
+LIVE_SESSION_TTL = float(os.environ.get("VERIPHYSICS_LIVE_SESSION_TTL", "600"))  # Idle seconds before expiry
+LIVE_MAX_SESSIONS = int(os.environ.get("VERIPHYSICS_LIVE_MAX_SESSIONS", "1000"))
+LIVE_MAX_PUSH_BYTES = int(os.environ.get("VERIPHYSICS_LIVE_MAX_PUSH_BYTES", 8 * 1024 * 1024))
+LIVE_MAX_SEGMENT_BYTES = int(os.environ.get("VERIPHYSICS_LIVE_MAX_SEGMENT_BYTES", 256 * 1024 * 1024))
+# Flow series and gyro logs kept for re-scoring without decoding video (see flow_cache.py); 0 bytes disables
+FLOW_CACHE_DIR = os.environ.get("VERIPHYSICS_FLOW_CACHE_DIR", "/tmp/veriphysics_flow_cache")
+FLOW_CACHE_MAX_BYTES = int(os.environ.get("VERIPHYSICS_FLOW_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+# Verdict rule: |corr(flow axis, gyro axis)| > threshold; vp_cli's own is flow X vs gyro Y, 0.7
+SCORING = gyro_analysis.ScoringParams(
+    threshold=float(os.environ.get("VERIPHYSICS_SCORE_THRESHOLD", gyro_analysis.CONSISTENCY_THRESHOLD)),
+    flow_axis=os.environ.get("VERIPHYSICS_FLOW_AXIS", "x"),
+    gyro_axis=os.environ.get("VERIPHYSICS_GYRO_AXIS", "y"),
+)
+# Optical-flow profile (see profiles.py) of submissions that name none and whose API key has none
+ANALYSIS_PROFILE = profiles.get_profile(os.environ.get("VERIPHYSICS_ANALYSIS_PROFILE", profiles.BASELINE)).name
+# Schema setup at startup (see lifecycle.py); turn off when a deploy step runs `python -m app.lifecycle`
+AUTO_MIGRATE = os.environ.get("VERIPHYSICS_AUTO_MIGRATE", "1") == "1"
+# Seconds between attempts to start the verifier or signer while they are unavailable
+SUBSYSTEM_RETRY_INTERVAL = float(os.environ.get("VERIPHYSICS_SUBSYSTEM_RETRY_INTERVAL", "30"))
+# Required: verified jobs wait in SIGNING while the signer is unavailable (without using
+# up attempts) and /readyz fails without it; a job whose signing itself keeps failing
+# still completes unsigned. Otherwise jobs complete unsigned while it is unavailable.
+SIGNER_REQUIRED = os.environ.get("VERIPHYSICS_SIGNER_REQUIRED", "0") == "1"
+CERT_PATH = os.environ.get("VERIPHYSICS_CERT_PATH", "certs/ps256.crt")
+KEY_PATH = os.environ.get("VERIPHYSICS_KEY_PATH", "certs/ps256.pem")
+# Header/gyro checks at submission (see preflight.py): "reject" refuses bundles
+# that cannot verify, "flag" only records the findings on the job, "off" skips them
+PREFLIGHT_MODE = os.environ.get("VERIPHYSICS_PREFLIGHT", "reject").lower()
+# Admission control (see admission.py); per-key columns on api_keys override the KEY_* defaults
+ADMISSION_CAPACITY = int(os.environ.get("VERIPHYSICS_ADMISSION_CAPACITY", QUEUE_MAX_DEPTH))  # Queued + running jobs + uploads in flight
+ADMISSION_MAX_UPLOADS = int(os.environ.get("VERIPHYSICS_ADMISSION_MAX_UPLOADS", "64"))  # Concurrent upload requests, all keys
+KEY_RATE_LIMIT = float(os.environ.get("VERIPHYSICS_KEY_RATE_LIMIT", "60"))  # Requests/minute per key; 0 = unlimited
+KEY_RATE_BURST = int(os.environ.get("VERIPHYSICS_KEY_RATE_BURST", "10"))
+KEY_MAX_JOBS = int(os.environ.get("VERIPHYSICS_KEY_MAX_JOBS", "100"))  # Unfinished jobs per user
+KEY_MAX_UPLOADS = int(os.environ.get("VERIPHYSICS_KEY_MAX_UPLOADS", "4"))  # Concurrent upload requests per key
+admission_controller = admission.AdmissionController(
+    database.SessionLocal,
+    queue_depth=lambda db: job_queue.depth(db),
+    job_seconds=lambda: job_queue.avg_job_seconds,
+    workers=QUEUE_WORKERS,
+    capacity=ADMISSION_CAPACITY,
+    max_uploads=ADMISSION_MAX_UPLOADS,
+    default_rate_per_minute=KEY_RATE_LIMIT,
+    default_burst=KEY_RATE_BURST,
+    default_max_jobs=KEY_MAX_JOBS,
+    default_max_uploads=KEY_MAX_UPLOADS,
+)
+# Refuses work before the body is read; inside CORS so 429s stay readable by browsers
+app.add_middleware(
+    admission.AdmissionMiddleware,
+    controller=admission_controller,
+    on_reject=lambda reason: metrics.ADMISSION_REJECTIONS.labels(reason=reason).inc(),
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-Next-Cursor", "Link", "Retry-After", "Location",
+        "Tus-Resumable", "Upload-Offset", "Upload-Length", "Upload-Expires",
+    ],
 )
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+storage = create_storage(STORAGE_DIR, s3_bucket=S3_BUCKET, s3_prefix=S3_PREFIX, s3_endpoint_url=S3_ENDPOINT_URL)
+storage_gc = StorageGC(
+    storage,
+    database.SessionLocal,
+    staging_dir=UPLOAD_DIR,
+    interval=GC_INTERVAL,
+    grace=GC_GRACE,
+    signed_max_age=SIGNED_MAX_AGE_DAYS * 86400,
+    signed_max_bytes=SIGNED_MAX_BYTES,
+)
+storage_gc.add_collector("upload_sessions", resumable.expire_sessions)
 
-# Configuration
-CLI_PATH = os.environ.get("VERIPHYSICS_CLI_PATH", "/usr/local/bin/vp_cli")
-UPLOAD_DIR = "/tmp/veriphysics_uploads"
-SIGNED_DIR = "/tmp/veriphysics_signed"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(SIGNED_DIR, exist_ok=True)
+live_sessions = live.LiveSessions(ttl=LIVE_SESSION_TTL, max_sessions=LIVE_MAX_SESSIONS)
+storage_gc.add_collector("live_sessions", live_sessions.expire)
 
-app.mount("/files", StaticFiles(directory=SIGNED_DIR), name="files")
+flow_cache = FlowCache(FLOW_CACHE_DIR, FLOW_CACHE_MAX_BYTES) if FLOW_CACHE_MAX_BYTES > 0 else None
+if flow_cache:
+    storage_gc.add_collector("flow_cache", lambda db: flow_cache.evict())
 
-try:
-    verifier = MotionVerifierWrapper(CLI_PATH)
-except FileNotFoundError as e:
-    logger.warning(f"Verifier CLI not found: {e}")
-    verifier = None
+def start_verifier() -> MotionVerifierWrapper:
+    verifier = MotionVerifierWrapper(
+        CLI_PATH, pool_size=VERIFIER_POOL_SIZE, job_timeout=VERIFIER_JOB_TIMEOUT,
+        flow_cache=flow_cache, scoring=SCORING,
+    )
+    if not verifier.pool.ping():
+        verifier.close()
+        raise VerifierError(f"{CLI_PATH} does not answer PING")
+    return verifier
 
 # C2PA Setup
-CERT_PATH = "certs/ps256.crt"
-KEY_PATH = "certs/ps256.pem"
-signer_service = None
-if os.path.exists(CERT_PATH) and os.path.exists(KEY_PATH):
-    try:
-        signer_service = C2PASignerService(CERT_PATH, KEY_PATH)
-        logger.info("C2PA Signer initialized")
-    except Exception as e:
-        logger.error(f"Failed to init C2PA Signer: {e}")
-else:
-    logger.warning("C2PA Certs not found, signing disabled")
+def start_signer() -> C2PASignerService:
+    if not (os.path.exists(CERT_PATH) and os.path.exists(KEY_PATH)):
+        raise FileNotFoundError(f"C2PA certificate or key not found ({CERT_PATH}, {KEY_PATH})")
+    return C2PASignerService(
+        CERT_PATH, KEY_PATH, ta_url=TSA_URL, fallback_ta_url=TSA_FALLBACK_URL, ta_timeout=TSA_TIMEOUT,
+        sign_timeout=SIGN_CALL_TIMEOUT, max_concurrent=SIGNING_WORKERS,
+    )
+
+# Started in the background at startup and retried while unavailable (see lifecycle.py)
+verifier_service = lifecycle.Subsystem(
+    "verifier", start_verifier, retry_interval=SUBSYSTEM_RETRY_INTERVAL, close=lambda v: v.close()
+)
+signer_service = lifecycle.Subsystem(
+    "signer", start_signer, required=SIGNER_REQUIRED, retry_interval=SUBSYSTEM_RETRY_INTERVAL
+)
 
 def get_db():
     yield from database.get_db()
@@ -77,21 +223,46 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except auth.JWTError:
         raise credentials_exception
+    principal = principal_cache.get_user(email)
+    if principal is not None:
+        return principal
     user = db.query(models.User).filter(models.User.email == email).first()
     if user is None:
         raise credentials_exception
-    return user
+    principal = Principal.from_user(user)
+    principal_cache.set_user(principal)
+    return principal
 
 
-# Actually, let's redefine get_api_key_user cleanly
-from fastapi import Header
-async def get_current_user_from_key(x_api_key: str = Header(...), db: Session = Depends(get_db)):
+def get_current_user_from_key(x_api_key: str = Header(...), db: Session = Depends(get_db)):
+    user_id = principal_cache.get_api_key(x_api_key)
+    if user_id is not None:
+        return user_id
     key_record = db.query(models.ApiKey).filter(models.ApiKey.key == x_api_key, models.ApiKey.is_active == True).first()
     if not key_record:
         raise HTTPException(status_code=403, detail="Invalid API Key")
+    principal_cache.set_api_key(x_api_key, key_record.user_id)
     return key_record.user_id
 
-def get_current_admin(current_user: models.User = Depends(get_current_user)):
+def get_stream_user_id(
+    request: Request,
+    access_token: Optional[str] = None,
+    x_api_key: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Event streams accept an API key (SDK), a bearer token, or `?access_token=`
+    since browser EventSource cannot set headers.
+    """
+    if x_api_key:
+        return get_current_user_from_key(x_api_key, db)
+    authorization = request.headers.get("authorization", "")
+    token = authorization[7:] if authorization.lower().startswith("bearer ") else access_token
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    return get_current_user(token, db).id
+
+def get_current_admin(current_user: Principal = Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin privileges required")
     return current_user
@@ -116,11 +287,12 @@ def register(user: dict, db: Session = Depends(get_db)):
     is_admin = db.query(models.User).count() == 0
     new_user = models.User(email=email, hashed_password=hashed_pwd, is_admin=is_admin)
     db.add(new_user)
+    stats.record_user_created(db)
     db.commit()
     return {"status": "User created", "is_admin": is_admin}
 
 @app.get("/users/me")
-def read_users_me(current_user: models.User = Depends(get_current_user)):
+def read_users_me(current_user: Principal = Depends(get_current_user)):
     return {
         "email": current_user.email,
         "is_admin": current_user.is_admin,
@@ -128,29 +300,162 @@ def read_users_me(current_user: models.User = Depends(get_current_user)):
     }
 
 @app.get("/admin/stats")
-def get_admin_stats(current_user: models.User = Depends(get_current_admin), db: Session = Depends(get_db)):
-    total_jobs = db.query(models.VerificationJob).count()
-    verified_jobs = db.query(models.VerificationJob).filter(models.VerificationJob.is_consistent == True).count()
-    failed_jobs = db.query(models.VerificationJob).filter(models.VerificationJob.is_consistent == False).count()
-    processing_jobs = db.query(models.VerificationJob).filter(models.VerificationJob.status == "PROCESSING").count()
-    users_count = db.query(models.User).count()
-    
+def get_admin_stats(current_user: Principal = Depends(get_current_admin), db: Session = Depends(get_db)):
+    return stats.get_admin_stats(db, ttl=STATS_CACHE_TTL)
+
+@app.post("/admin/stats/rebuild")
+def rebuild_admin_stats(current_user: Principal = Depends(get_current_admin), db: Session = Depends(get_db)):
+    """Recompute the counters from the job table (one GROUP BY query)."""
+    stats.rebuild_counters(db)
+    return stats.get_admin_stats(db)
+
+def analytics_response(db: Session, period: str, start, end, user_id: Optional[int], api_key_id: Optional[int]):
+    try:
+        return analytics.query(db, period, start, end, user_id=user_id, api_key_id=api_key_id)
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+
+@app.get("/analytics")
+def get_analytics(
+    period: str = "day",
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    api_key: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Score histogram, pass rate, handheld ratio and throughput of your jobs per
+    `period` ("hour" or "day", UTC) over [start, end), read from the rollup
+    tables; defaults to the last day or 30 days. `api_key` narrows it to one key.
+    """
+    api_key_id = None
+    if api_key:
+        api_key_id = db.query(models.ApiKey.id).filter(
+            models.ApiKey.key == api_key, models.ApiKey.user_id == current_user.id
+        ).scalar()
+        if api_key_id is None:
+            raise HTTPException(404, "API key not found")
+    return analytics_response(db, period, start, end, current_user.id, api_key_id)
+
+@app.get("/admin/analytics")
+def get_admin_analytics(
+    period: str = "day",
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    user_id: Optional[int] = None,
+    api_key: Optional[str] = None,
+    current_user: Principal = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """As /analytics, for any user or API key, or for all jobs when neither is given."""
+    api_key_id = None
+    if api_key:
+        api_key_id = db.query(models.ApiKey.id).filter(models.ApiKey.key == api_key).scalar()
+        if api_key_id is None:
+            raise HTTPException(404, "API key not found")
+    return analytics_response(db, period, start, end, user_id, api_key_id)
+
+@app.post("/admin/analytics/rebuild")
+def rebuild_analytics(current_user: Principal = Depends(get_current_admin), db: Session = Depends(get_db)):
+    """Recompute the analytics rollups from the job table, backfilling metrics of older jobs."""
+    result = analytics.rebuild_rollups(db)
+    logger.info(f"Rebuilt analytics rollups: {result}")
+    return result
+
+@app.get("/metrics")
+def get_metrics(db: Session = Depends(get_db)):
+    """Prometheus exposition of per-stage timings, queue depth and worker usage."""
+    metrics.QUEUE_DEPTH.labels(queue=job_queue.name).set(job_queue.depth(db))
+    metrics.QUEUE_DEPTH.labels(queue=sign_queue.name).set(sign_queue.depth(db))
+    metrics.IN_FLIGHT.labels(pool="queue").set(job_queue.busy_workers)
+    metrics.IN_FLIGHT.labels(pool="signer").set(sign_queue.busy_workers)
+    verifier = verifier_service.instance
+    if verifier:
+        metrics.IN_FLIGHT.labels(pool="verifier").set(verifier.pool.in_flight)
+    for subsystem in (verifier_service, signer_service):
+        metrics.SUBSYSTEM_READY.labels(subsystem=subsystem.name).set(int(subsystem.ready))
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+@app.post("/admin/storage/gc")
+def collect_storage(current_user: Principal = Depends(get_current_admin)):
+    """Run the storage garbage collector now instead of waiting for its next pass."""
+    return storage_gc.collect()
+
+@app.post("/admin/jobs/rescore")
+def rescore_all_jobs(
+    threshold: Optional[float] = None,
+    flow_axis: Optional[str] = None,
+    gyro_axis: Optional[str] = None,
+    after_id: int = 0,
+    limit: int = 1000,
+    user_id: Optional[int] = None,
+    dry_run: bool = False,
+    current_user: Principal = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Re-score completed jobs from the flow cache, in id order, `limit` per call:
+    repeat with `after_id=next_after_id` until it is null. `dry_run` reports
+    how many verdicts would change without saving anything.
+    """
+    scoring = scoring_params(threshold, flow_axis, gyro_axis)
+    limit = max(1, min(limit, 10000))
+    query = db.query(models.VerificationJob).filter(
+        models.VerificationJob.status == "COMPLETED",
+        models.VerificationJob.id > after_id,
+    )
+    if user_id is not None:
+        query = query.filter(models.VerificationJob.user_id == user_id)
+    jobs = query.order_by(models.VerificationJob.id).limit(limit).all()
+
+    rescored = changed = missing = 0
+    updated = []
+    for job in jobs:
+        try:
+            result = rescore(job, scoring)
+        except LookupError:
+            missing += 1
+            continue
+        rescored += 1
+        if result["verified"] != job.is_consistent:
+            changed += 1
+        if not dry_run:
+            apply_rescore(db, job, result)
+            updated.append(job)
+    if updated:
+        new_events = [events.job_event(job) for job in updated]
+        db.commit()
+        for event in new_events:
+            event_broker.publish(event)
+    logger.info(f"Rescored {rescored} jobs ({changed} verdicts changed, {missing} not cached){' [dry run]' if dry_run else ''}")
     return {
-        "total_jobs": total_jobs,
-        "verified_jobs": verified_jobs,
-        "failed_jobs": failed_jobs,
-        "processing_jobs": processing_jobs,
-        "users_count": users_count
+        "rescored": rescored,
+        "changed": changed,
+        "missing": missing,
+        "dry_run": dry_run,
+        "scoring": scoring.to_dict(),
+        "next_after_id": jobs[-1].id if len(jobs) == limit else None,
     }
 
 @app.get("/admin/jobs")
 def get_all_jobs(
-    skip: int = 0, 
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
     limit: int = 100, 
-    current_user: models.User = Depends(get_current_admin), 
+    status: Optional[str] = None,
+    created_after: Optional[datetime.datetime] = None,
+    created_before: Optional[datetime.datetime] = None,
+    current_user: Principal = Depends(get_current_admin), 
     db: Session = Depends(get_db)
 ):
-    jobs = db.query(models.VerificationJob).order_by(models.VerificationJob.created_at.desc()).offset(skip).limit(limit).all()
+    jobs = paginate_jobs(
+        db.query(models.VerificationJob), request, response,
+        cursor=cursor, limit=limit, status=status,
+        created_after=created_after, created_before=created_before,
+    )
     return [
         {
             "id": j.id,
@@ -160,7 +465,12 @@ def get_all_jobs(
             "created_at": j.created_at,
             "filename": j.video_filename,
             "user_id": j.user_id,
-            "message": j.message
+            "message": j.message,
+            "analysis_profile": j.analysis_profile,
+            "causality_score": j.causality_score,
+            "is_handheld": j.is_handheld,
+            "tremor_energy": j.tremor_energy,
+            "duration": j.duration,
         }
         for j in jobs
     ]
@@ -175,7 +485,7 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/api-keys")
-def create_api_key(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+def create_api_key(current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
     new_key_str = "vp_" + secrets.token_urlsafe(32)
     new_key = models.ApiKey(key=new_key_str, user_id=current_user.id)
     db.add(new_key)
@@ -183,127 +493,1075 @@ def create_api_key(current_user: models.User = Depends(get_current_user), db: Se
     return {"api_key": new_key_str}
 
 @app.get("/api-keys")
-def list_api_keys(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+def list_api_keys(current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
     keys = db.query(models.ApiKey).filter(models.ApiKey.user_id == current_user.id).all()
-    return [{"key": k.key, "active": k.is_active, "created": k.created_at} for k in keys]
+    return [
+        {"key": k.key, "active": k.is_active, "created": k.created_at,
+         "limits": admission_controller.effective_limits(k).to_dict(),
+         "analysis_profile": k.analysis_profile or ANALYSIS_PROFILE,
+         "priority": k.priority or 0}
+        for k in keys
+    ]
+
+@app.get("/profiles")
+def list_profiles():
+    """Analysis profiles a submission or API key can select, and the server default."""
+    return {
+        "default": ANALYSIS_PROFILE,
+        "profiles": {name: profile.params() for name, profile in profiles.PROFILES.items()},
+    }
+
+@app.put("/api-keys/{key}/profile")
+def set_api_key_profile(
+    key: str,
+    body: models.ApiKeyProfile,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Analysis profile used when a submission with this key names none; null restores the server default."""
+    key_record = db.query(models.ApiKey).filter(models.ApiKey.key == key, models.ApiKey.user_id == current_user.id).first()
+    if not key_record:
+        raise HTTPException(404, "API key not found")
+    if body.analysis_profile is not None:
+        check_profile(body.analysis_profile)
+    key_record.analysis_profile = body.analysis_profile
+    db.commit()
+    return {"key": key, "analysis_profile": key_record.analysis_profile or ANALYSIS_PROFILE}
+
+@app.delete("/api-keys/{key}")
+def deactivate_api_key(key: str, current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    key_record = db.query(models.ApiKey).filter(models.ApiKey.key == key, models.ApiKey.user_id == current_user.id).first()
+    if not key_record:
+        raise HTTPException(404, "API key not found")
+    key_record.is_active = False
+    db.commit()  # Cached lookups for this key are dropped on commit
+    return {"key": key, "active": False}
+
+@app.put("/admin/api-keys/{key}/limits")
+def set_api_key_limits(
+    key: str,
+    limits: models.ApiKeyLimits,
+    current_user: Principal = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Set an API key's rate limit, burst and concurrency caps (see admission.py).
+    Only the fields sent are changed; null restores the server default, 0 lifts the limit.
+    """
+    key_record = db.query(models.ApiKey).filter(models.ApiKey.key == key).first()
+    if not key_record:
+        raise HTTPException(404, "API key not found")
+    changes = limits.model_dump(exclude_unset=True)
+    for field, value in changes.items():
+        if value is not None and value < 0:
+            raise HTTPException(422, f"{field} must be >= 0")
+        setattr(key_record, field, value)
+    db.commit()
+    admission_controller.invalidate(key)  # Other processes pick the change up within the cache TTL
+    return {
+        "key": key,
+        "limits": {field: getattr(key_record, field) for field in models.ApiKeyLimits.model_fields},
+        "effective": admission_controller.effective_limits(key_record).to_dict(),
+    }
+
+@app.put("/admin/api-keys/{key}/priority")
+def set_api_key_priority(
+    key: str,
+    body: models.ApiKeyPriority,
+    current_user: Principal = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Queue priority (0-9, higher is leased first) of the jobs submitted with an API key; null restores 0."""
+    if body.priority is not None and not 0 <= body.priority <= 9:
+        raise HTTPException(422, "priority must be between 0 and 9")
+    key_record = db.query(models.ApiKey).filter(models.ApiKey.key == key).first()
+    if not key_record:
+        raise HTTPException(404, "API key not found")
+    key_record.priority = body.priority
+    db.commit()
+    return {"key": key, "priority": key_record.priority or 0}
+
+def cleanup_job_files(job: models.VerificationJob, db: Session):
+    """Releases the job's upload blobs (kept while another active job shares them)."""
+    created_at = job.created_at
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=datetime.timezone.utc)
+    storage_gc.release(db, [job.video_path, job.gyro_path, job.flow_path], created_at.timestamp())
+
+def process_verification(job: models.VerificationJob, db: Session):
+    """
+    Queue handler: runs verification for a leased job and publishes the verdict.
+    Verified jobs then wait in SIGNING for the signing stage, so a slow signer
+    never holds a verification slot.
+    Exceptions propagate to the JobQueue, which retries with backoff.
+    """
+    job_id = job.id
+    logger.info(f"Starting verification for Job {job_id} (attempt {job.attempts})")
+
+    if not job.video_path or not job.gyro_path:
+        # Queued before uploads were stored with the job: its files are gone
+        raise Unrecoverable("Uploaded files were not kept for this job; please resubmit the bundle")
 
-def process_verification(job_id: int, video_path: str, gyro_path: str, db: Session):
+    verifier = verifier_service.get()
+    if not verifier:
+        raise Exception(f"Verifier engine unavailable: {verifier_service.status()['error']}")
+
+    video_path = storage.fetch(job.video_path)
+    gyro_path = storage.fetch(job.gyro_path)
+    flow_path = storage.fetch(job.flow_path) if job.flow_path else None
+    mode = "flow" if flow_path else "cli"
+    profile = profiles.PROFILES.get(job.analysis_profile or profiles.BASELINE)
+    if profile is None:
+        logger.warning(f"Job {job_id}: analysis profile {job.analysis_profile!r} no longer exists, using {profiles.BASELINE}")
+    with metrics.timed(metrics.VERIFIER_SECONDS, mode=mode):
+        result = verifier.verify(
+            video_path, gyro_path, flow_path=flow_path,
+            video_sha256=job.video_sha256, gyro_sha256=job.gyro_sha256,
+            flow_sha256=blob_sha256(job.flow_path) if job.flow_path else None,
+            profile=profile,
+        )
+    if "flow_cache" in result.get("details", {}):
+        metrics.FLOW_CACHE.labels(result=result["details"]["flow_cache"]).inc()
+    metrics.observe_verifier_timings(result.get("details", {}).get("timings", {}))
+
+    # Update Job
+    signing = SIGNER_REQUIRED or signer_service.get() is not None
+    next_status = "SIGNING" if result.get("verified") and signing else "COMPLETED"
+    stats.record_transition(db, job.status, job.is_consistent, next_status, result.get("verified"))
+    job.status = next_status
+    job.score = result.get("score")
+    job.is_consistent = result.get("verified")
+    job.message = result.get("message")
+    # Kept in details too: signing errors are recorded beside it (record_signing_error)
+    preflight_report = (job.details or {}).get("preflight")
+    job.details = dict(result.get("details") or {}, verdict=result.get("message"))
+    if preflight_report:
+        job.details["preflight"] = preflight_report
+    analytics.store_metrics(job, job.details)
+    analytics.record_finished(db, job)
+    job.next_attempt_at = None
+    job.attempts = 0  # The signing stage counts its own attempts
+    event = events.job_event(job)
+    release_lease(db, job)  # Rolls back if the lease was lost to another worker
+    with metrics.timed(metrics.DB_SECONDS, operation="COMMIT"):
+        db.commit()
+    event_broker.publish(event)
+
+    if next_status == "SIGNING":
+        sign_queue.notify()
+    else:
+        cleanup_job_files(job, db)
+
+def process_signing(job: models.VerificationJob, db: Session):
+    """
+    Signing-stage handler: embeds the stored verdict in a C2PA manifest.
+    A retry only re-signs; the verification result is never recomputed.
+    """
+    signer = signer_service.get()
+    if not signer:
+        error = f"Signer unavailable: {signer_service.status()['error']}"
+        if SIGNER_REQUIRED:
+            raise Deferred(error, retry_after=SUBSYSTEM_RETRY_INTERVAL)
+        raise Exception(error)
+
+    logger.info(f"Signing Job {job.id} (attempt {job.attempts})")
+    video_path = storage.fetch(job.video_path)
+    output_path = os.path.join(UPLOAD_DIR, f"signed_{uuid.uuid4()}{os.path.splitext(video_path)[1]}")
+
+    # Prepare assertion data; earlier signing errors are not part of the verdict
+    details = {k: v for k, v in (job.details or {}).items() if k != "signing_error"}
+    verification_data = {
+        "score": job.score,
+        "details": details,
+        "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+        "verifier": "VeriPhysics Cloud v1"
+    }
+
+    sign_started = time.perf_counter()
     try:
-        logger.info(f"Starting verification for Job {job_id}")
-        
-        # update status to PROCESSING
-        job = db.query(models.VerificationJob).filter(models.VerificationJob.id == job_id).first()
-        if job:
-            job.status = "PROCESSING"
-            db.commit()
+        signer.sign_video(video_path, output_path, verification_data)
+    except Exception:
+        metrics.SIGNING_SECONDS.labels(outcome="failure").observe(time.perf_counter() - sign_started)
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    metrics.SIGNING_SECONDS.labels(outcome="success").observe(time.perf_counter() - sign_started)
+    # Content-addressed, so the name doubles as a strong ETag
+    signed_key = blob_key("signed", file_sha256(output_path), os.path.splitext(output_path)[1])
+    storage.put_file(output_path, signed_key)
+    signed_url = file_url(signed_key)
+    logger.info(f"Video signed: {signed_url}")
 
-        if not verifier:
-             raise Exception("Verifier engine unavailable")
+    stats.record_transition(db, job.status, job.is_consistent, "COMPLETED", job.is_consistent)
+    job.status = "COMPLETED"
+    job.signed_url = signed_url
+    job.message = details.get("verdict", job.message)
+    job.details = details
+    event = events.job_event(job)
+    release_lease(db, job)
+    with metrics.timed(metrics.DB_SECONDS, operation="COMMIT"):
+        db.commit()
+    event_broker.publish(event)
 
-        result = verifier.verify(video_path, gyro_path)
-        
-        signed_url = None
-        if result.get("verified") and signer_service:
-            try:
-                output_filename = f"signed_{os.path.basename(video_path)}"
-                output_path = os.path.join(SIGNED_DIR, output_filename)
-                
-                # Prepare assertion data
-                verification_data = {
-                    "score": result.get("score"),
-                    "details": result.get("details"),
-                    "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
-                    "verifier": "VeriPhysics Cloud v1"
-                }
-                
-                signer_service.sign_video(video_path, output_path, verification_data)
-                signed_url = f"/files/{output_filename}"
-                logger.info(f"Video signed: {signed_url}")
-            except Exception as e:
-                logger.error(f"Signing failed: {e}")
-
-        # Update Job
-        # Re-fetch to avoid detach issues if needed, but session is scoped
-        job = db.query(models.VerificationJob).filter(models.VerificationJob.id == job_id).first()
-        if job:
-            job.status = "COMPLETED"
-            job.score = result.get("score")
-            job.is_consistent = result.get("verified")
-            job.message = result.get("message")
-            job.signed_url = signed_url
-            db.commit()
-            
+    cleanup_job_files(job, db)
+
+def record_signing_error(job: models.VerificationJob, message: str):
+    """Signing retries and give-ups leave the verdict in `message`; the error goes to details."""
+    job.details = dict(job.details or {}, signing_error=message)
+    job.message = job.details.get("verdict", job.message)
+
+def verification_given_up(job: models.VerificationJob, db: Session):
+    """Counts a job that failed every verification attempt in its rollups, then releases its files."""
+    analytics.record_finished(db, job)
+    db.commit()
+    cleanup_job_files(job, db)
+
+job_queue = JobQueue(
+    database.SessionLocal,
+    process_verification,
+    workers=QUEUE_WORKERS,
+    visibility_timeout=QUEUE_VISIBILITY_TIMEOUT,
+    max_attempts=QUEUE_MAX_ATTEMPTS,
+    max_depth=QUEUE_MAX_DEPTH,
+    on_give_up=verification_given_up,
+    on_transition=event_broker.publish_job,
+)
+
+# Signing stage: its own workers and lease, claimed from jobs left in SIGNING.
+# A job that keeps failing to sign keeps its verdict and completes unsigned;
+# with SIGNER_REQUIRED it waits for an unavailable signer instead.
+sign_queue = JobQueue(
+    database.SessionLocal,
+    process_signing,
+    workers=SIGNING_WORKERS,
+    ready_status="SIGNING",
+    running_status="SIGNING",
+    failed_status="COMPLETED",
+    visibility_timeout=SIGNING_TIMEOUT,
+    max_attempts=QUEUE_MAX_ATTEMPTS,
+    on_give_up=cleanup_job_files,
+    on_transition=event_broker.publish_job,
+    name="sign",
+    record_error=record_signing_error,
+)
+
+def start_services():
+    """
+    Startup, run once per process before it serves: directories, schema,
+    counters, then the workers. The verifier and signer start in the
+    background, so the process answers /healthz (and /readyz, negatively)
+    while vp_cli workers spawn.
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    os.makedirs(UPLOAD_SESSION_DIR, exist_ok=True)
+    if AUTO_MIGRATE:
+        lifecycle.init_schema(database.engine, models.Base.metadata)
+    db = database.SessionLocal()
+    try:
+        stats.ensure_counters(db)
+    finally:
+        db.close()
+    verifier_service.start()
+    signer_service.start()
+    job_queue.start()
+    sign_queue.start()
+    storage_gc.start()
+
+def stop_services():
+    # Drain the queue workers before their verifier pool goes away
+    storage_gc.stop()
+    job_queue.stop()
+    sign_queue.stop()
+    verifier_service.close()
+    signer_service.close()
+    event_broker.close()
+
+def check_database() -> dict:
+    started = time.perf_counter()
+    db = database.SessionLocal()
+    try:
+        db.execute(text("SELECT 1"))
     except Exception as e:
-        logger.error(f"Job {job_id} failed: {e}")
-        job = db.query(models.VerificationJob).filter(models.VerificationJob.id == job_id).first()
-        if job:
-            job.status = "ERROR"
-            job.message = str(e)
-            db.commit()
-            
+        return {"ready": False, "required": True, "error": str(e)}
     finally:
-        # Cleanup files
-        if os.path.exists(video_path):
-            os.remove(video_path)
-        if os.path.exists(gyro_path):
-            os.remove(gyro_path)
+        db.close()
+    return {"ready": True, "required": True, "latency_ms": (time.perf_counter() - started) * 1000.0}
+
+def subsystem_report(database_check: bool = True) -> dict:
+    verifier = dict(verifier_service.status())
+    if verifier_service.instance:
+        pool = verifier_service.instance.pool
+        verifier.update(workers=pool.size, alive_workers=pool.alive_workers, in_flight=pool.in_flight)
+    report = {
+        "verifier": verifier,
+        "signer": signer_service.status(),
+        "queues": {
+            "ready": job_queue.running and sign_queue.running,
+            "required": True,
+            "verify_workers": job_queue.workers,
+            "sign_workers": sign_queue.workers,
+        },
+    }
+    if database_check:
+        report["database"] = check_database()
+    return report
 
-@app.post("/verify", response_model=models.VerificationResponse)
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving. Subsystem states are informational; the database is not queried."""
+    return {"status": "ok", "subsystems": subsystem_report(database_check=False)}
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: 503 until every required subsystem (database, verifier, queues, signer if required) is up."""
+    report = subsystem_report()
+    ready = all(sub["ready"] for sub in report.values() if sub["required"])
+    return JSONResponse(
+        {"status": "ready" if ready else "unavailable", "subsystems": report},
+        status_code=200 if ready else 503,
+    )
+
+def job_response(job: models.VerificationJob) -> dict:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "score": job.score,
+        "verified": job.is_consistent,
+        "message": job.message,
+        "signed_url": job.signed_url
+    }
+
+def admit_bundle(db: Session, user_id: int, idempotency_key: Optional[str]):
+    """Returns an existing job's response for a retried request, raises 429 if the queue is full."""
+    if idempotency_key:
+        existing = dedup.find_by_idempotency_key(db, user_id, idempotency_key)
+        if existing:
+            return job_response(existing)
+
+    # Backpressure: refuse new work once the queue is too deep
+    if job_queue.is_full(db):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Verification queue is full, retry later",
+            headers={"Retry-After": str(job_queue.retry_after(db))},
+        )
+    return None
+
+def run_preflight(video_path: str, gyro_path: str, flow_path: Optional[str] = None):
+    """
+    Preflight checks on staged files, per PREFLIGHT_MODE. Returns the report to
+    keep in the job's details (None when disabled); raises PreflightError when
+    the bundle is rejected.
+    """
+    if PREFLIGHT_MODE == "off":
+        return None
+    try:
+        report = preflight.check_bundle(video_path, gyro_path, flow_path, strict=PREFLIGHT_MODE == "reject")
+    except preflight.PreflightError:
+        metrics.PREFLIGHT_RESULTS.labels(outcome="rejected").inc()
+        raise
+    outcome = "flagged" if report["errors"] or report["warnings"] else "passed"
+    metrics.PREFLIGHT_RESULTS.labels(outcome=outcome).inc()
+    return report
+
+def preflight_details(report) -> Optional[dict]:
+    return {"preflight": report} if report else None
+
+def preflight_rejection(e: preflight.PreflightError) -> HTTPException:
+    return HTTPException(e.status_code, {"message": str(e), "errors": e.report["errors"]})
+
+def check_profile(name: str) -> str:
+    try:
+        return profiles.get_profile(name).name
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+
+def resolve_submission(db: Session, api_key: Optional[str], requested: Optional[str]):
+    """
+    (analysis profile, API key id, queue priority) of a submission. The profile
+    is the one the request names, else the API key's, else ANALYSIS_PROFILE;
+    unknown names are a 422. The priority is the key's, which only admins set.
+    """
+    key_id = key_profile = key_priority = None
+    if api_key:
+        row = db.query(
+            models.ApiKey.id, models.ApiKey.analysis_profile, models.ApiKey.priority
+        ).filter(models.ApiKey.key == api_key).first()
+        if row:
+            key_id, key_profile, key_priority = row
+    priority = key_priority or 0
+    if requested:
+        return check_profile(requested), key_id, priority
+    if key_profile in profiles.PROFILES:
+        return key_profile, key_id, priority
+    return ANALYSIS_PROFILE, key_id, priority
+
+def record_bundle(db: Session, job_fields: dict, flow_sha256: Optional[str] = None):
+    """
+    Creates the PENDING job for a stored bundle, or returns the job an identical
+    bundle (or the same Idempotency-Key) already produced.
+    Returns (response, created).
+    """
+    user_id = job_fields["user_id"]
+
+    # Identical bundle already submitted: reuse its job instead of re-running optical flow
+    content_hash = dedup.bundle_hash(
+        job_fields["video_sha256"], job_fields["gyro_sha256"], flow_sha256, job_fields.get("analysis_profile")
+    )
+    existing = dedup.find_duplicate(db, user_id, content_hash)
+    if existing:
+        logger.info(f"Bundle {content_hash[:12]} is a duplicate of Job {existing.id}")
+        return job_response(existing), False
+
+    job = models.VerificationJob(content_hash=content_hash, status="PENDING", **job_fields)
+    db.add(job)
+    stats.record_job_created(db)
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request with the same Idempotency-Key won the race
+        db.rollback()
+        return job_response(dedup.find_by_idempotency_key(db, user_id, job_fields["idempotency_key"])), False
+    db.refresh(job)
+    event_broker.publish_job(job)
+
+    return {
+        "id": job.id,
+        "status": "PENDING",
+        "message": "Job submitted successfully"
+    }, True
+
+BUNDLE_PARTS = {
+    "video": uploads.FilePart(uploads.VIDEO_CONTENT_TYPES, uploads.VIDEO_EXTENSIONS, MAX_VIDEO_BYTES, "video.mp4"),
+    "gyro": uploads.FilePart(uploads.GYRO_CONTENT_TYPES, uploads.GYRO_EXTENSIONS, MAX_GYRO_BYTES, "gyro.csv"),
+    "flow": uploads.FilePart(uploads.GYRO_CONTENT_TYPES, uploads.GYRO_EXTENSIONS, MAX_GYRO_BYTES, "flow.csv", required=False),
+}
+GYRO_PART = {"gyro": BUNDLE_PARTS["gyro"]}
+OPTIONAL_GYRO_PART = {
+    "gyro": uploads.FilePart(uploads.GYRO_CONTENT_TYPES, uploads.GYRO_EXTENSIONS, MAX_GYRO_BYTES, "gyro.csv", required=False)
+}
+
+@app.post(
+    "/verify",
+    response_model=models.VerificationResponse,
+    openapi_extra=uploads.multipart_openapi(BUNDLE_PARTS, ("profile",)),
+)
 async def verify_bundle(
-    background_tasks: BackgroundTasks,
-    video: UploadFile = File(...),
-    gyro: UploadFile = File(...),
+    request: Request,
     x_signature: str = Header(None),
+    x_api_key: str = Header(None),
+    idempotency_key: str = Header(None),
     user_id: int = Depends(get_current_user_from_key),
     db: Session = Depends(get_db)
 ):
     """
-    Submit a video + gyro bundle for verification.
+    Submit a video + gyro bundle for verification (multipart `video`, `gyro`,
+    optional `flow` and `profile` fields). Jobs are queued with the API key's
+    priority (see PUT /admin/api-keys/{key}/priority).
+    The gyro log is either the `timestamp,x,y,z` CSV or the compact binary
+    VPGY format (`application/vnd.veriphysics.gyro`, `.vpgy`); the format is
+    detected from the file itself, so clients that send CSV need no changes.
+    An optional `flow` CSV (timestamp,flow_x[,flow_y]) computed on-device
+    lets the server skip video decoding; the video is still used for signing.
+    `profile` selects the optical-flow analysis profile (see GET /profiles);
+    the API key's profile, then the server's, apply when it is omitted.
     Requires API Key.
     """
+    # 0. Retried request / queue full: answered before reading any upload
+    early_response = await run_in_threadpool(admit_bundle, db, user_id, idempotency_key)
+    if early_response:
+        return early_response
+
     # 1. verify signature (Mock for MVP: just check presence if we enforced it)
     if x_signature:
         logger.info(f"Received Signature: {x_signature[:10]}...")
         # In PROD: Fetch User's Public Key from DB (uploaded previously via SDK) and verify.
         # For now, we just log it to prove "Active Provenance" capability.
-    
-    # 2. Save Files
+
+    def check_field(name: str, value: str):
+        # Rejected as soon as the field arrives, not after the files behind it
+        if name == "profile" and value:
+            check_profile(value)
+
+    # 2. Stream the body straight to staging files: type, size and request limits
+    # are checked while it arrives, and each file is hashed as it is written
     task_uuid = str(uuid.uuid4())
-    video_path = os.path.join(UPLOAD_DIR, f"{task_uuid}_{video.filename}")
-    gyro_path = os.path.join(UPLOAD_DIR, f"{task_uuid}_{gyro.filename}")
-    
-    with open(video_path, "wb") as buffer:
-        shutil.copyfileobj(video.file, buffer)
-    with open(gyro_path, "wb") as buffer:
-        shutil.copyfileobj(gyro.file, buffer)
-        
-    # 2. Create Job Record
-    job = models.VerificationJob(
+    receiver = uploads.MultipartReceiver(
+        BUNDLE_PARTS,
+        lambda field, filename: os.path.join(UPLOAD_DIR, f"{task_uuid}_{field}_{filename}"),
+        MAX_REQUEST_BYTES,
+        on_field=check_field,
+    )
+    received, fields = await receiver.receive(request)
+    video, gyro, flow = received["video"], received["gyro"], received.get("flow")
+    for part in (video, gyro, flow):
+        if part:
+            metrics.observe_upload(part.field, part.size, part.seconds)
+    try:
+        analysis_profile, api_key_id, priority = await run_in_threadpool(
+            resolve_submission, db, x_api_key, fields.get("profile")
+        )
+        # Rejected here, before anything is stored or queued
+        preflight_report = await run_in_threadpool(run_preflight, video.path, gyro.path, flow and flow.path)
+        # Content-addressed: a re-uploaded file reuses the existing blob
+        video_key = blob_key("uploads", video.sha256, os.path.splitext(video.filename)[1])
+        gyro_key = blob_key("uploads", gyro.sha256, os.path.splitext(gyro.filename)[1])
+        flow_key = blob_key("uploads", flow.sha256, ".csv") if flow else None
+        await run_in_threadpool(storage.put_file, video.path, video_key)
+        await run_in_threadpool(storage.put_file, gyro.path, gyro_key)
+        if flow:
+            await run_in_threadpool(storage.put_file, flow.path, flow_key)
+    except preflight.PreflightError as e:
+        receiver.cleanup()
+        raise preflight_rejection(e)
+    except BaseException:
+        receiver.cleanup()
+        raise
+    logger.info(f"Stored upload {task_uuid}: video {video.size} bytes (sha256 {video.sha256[:12]}), gyro {gyro.size} bytes")
+
+    # 3. Dedup and insert the job (blocking DB work, kept off the event loop)
+    job_fields = dict(
         video_filename=video.filename,
         gyro_filename=gyro.filename,
-        status="PENDING",
-        user_id=user_id
+        video_path=video_key,
+        gyro_path=gyro_key,
+        flow_path=flow_key,
+        priority=priority,
+        analysis_profile=analysis_profile,
+        api_key_id=api_key_id,
+        video_sha256=video.sha256,
+        gyro_sha256=gyro.sha256,
+        idempotency_key=idempotency_key,
+        user_id=user_id,
+        details=preflight_details(preflight_report),
     )
-    db.add(job)
+    response, created = await run_in_threadpool(record_bundle, db, job_fields, flow and flow.sha256)
+    if not created:
+        return response  # Blobs are shared with the existing job, or collected later
+
+    # 4. Hand off to the queue workers
+    job_queue.notify()
+    return response
+
+@app.post("/verify/batch")
+async def verify_batch(
+    request: Request,
+    profile: Optional[str] = None,
+    x_api_key: str = Header(None),
+    user_id: int = Depends(get_current_user_from_key),
+    db: Session = Depends(get_db)
+):
+    """
+    Submit many bundles in one request. The body is a tar (optionally gzip/bz2/xz
+    compressed) or zip archive of video + gyro files, paired by `manifest.json`
+    or by file stem (`clip1.mp4` + `clip1.csv`). Tar members are extracted while
+    the body is still streaming in; all jobs are inserted in one transaction.
+    Every bundle is analysed with `profile` (defaults as for /verify).
+    Requires API Key.
+    """
+    await run_in_threadpool(admit_bundle, db, user_id, None)
+    analysis_profile, api_key_id, priority = await run_in_threadpool(resolve_submission, db, x_api_key, profile)
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_BATCH_BYTES:
+        raise HTTPException(413, "Batch exceeds the maximum upload size")
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    # The archive is parsed in a worker thread, fed chunk by chunk from the request body
+    extractor = batch.ArchiveExtractor(UPLOAD_DIR, MAX_VIDEO_BYTES, MAX_BATCH_BYTES, MAX_BATCH_FILES)
+    extract = extractor.extract_zip if content_type in batch.ZIP_CONTENT_TYPES else extractor.extract_tar
+    pipe = batch.StreamPipe()
+
+    def consume():
+        try:
+            extract(pipe)
+        finally:
+            pipe.aborted.set()
+
+    started = time.perf_counter()
+    consumer = asyncio.ensure_future(run_in_threadpool(consume))
+    try:
+        try:
+            async for chunk in request.stream():
+                if chunk and not await run_in_threadpool(pipe.feed, chunk):
+                    break  # Reader finished or failed, the rest of the body is not needed
+        finally:
+            await run_in_threadpool(pipe.finish)
+        await consumer
+        metrics.observe_upload("batch", extractor.total_bytes, time.perf_counter() - started)
+
+        items = batch.pair_items(extractor.files)
+        if not items:
+            raise batch.BatchError("Archive contains no video + gyro bundles")
+        if PREFLIGHT_MODE != "off":
+            await run_in_threadpool(batch.preflight_items, extractor.files, items, run_preflight)
+        stored = await run_in_threadpool(batch.store_files, storage, extractor.files, items)
+        new_batch, new_jobs = await run_in_threadpool(
+            batch.create_batch_jobs, db, user_id, stored, items, priority,
+            analysis_profile, api_key_id,
+        )
+    except batch.BatchError as e:
+        extractor.cleanup()
+        raise HTTPException(e.status_code, str(e))
+    except BaseException:
+        if not consumer.done():
+            await asyncio.wait([consumer])
+        extractor.cleanup()
+        raise
+    # Staged files no item used (manifest, unpaired entries)
+    extractor.cleanup()
+
+    for event in new_jobs:
+        event_broker.publish(event)
+    job_queue.notify()
+    return await run_in_threadpool(batch.batch_progress, db, new_batch)
+
+@app.get("/verify/batch/{batch_id}")
+def get_batch_status(
+    batch_id: str,
+    items: bool = True,
+    user_id: int = Depends(get_current_user_from_key),
+    db: Session = Depends(get_db)
+):
+    """Aggregate progress of a batch, plus per-item results unless `items=false`."""
+    found = db.query(models.VerificationBatch).filter(
+        models.VerificationBatch.id == batch_id,
+        models.VerificationBatch.user_id == user_id,
+    ).first()
+    if not found:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch.batch_progress(db, found, include_items=items)
+
+# --- RESUMABLE UPLOADS (tus-style) ---
+
+def load_upload_session(db: Session, upload_id: str, user_id: int) -> models.UploadSession:
+    session = db.get(models.UploadSession, upload_id)
+    if session is None or session.user_id != user_id:
+        raise HTTPException(404, "Upload not found", headers=resumable.tus_headers())
+    return session
+
+def _session_expiry() -> datetime.datetime:
+    return datetime.datetime.utcnow() + datetime.timedelta(seconds=UPLOAD_SESSION_TTL)
+
+@app.options("/uploads")
+def upload_options():
+    return Response(status_code=204, headers={
+        "Tus-Resumable": resumable.TUS_VERSION,
+        "Tus-Version": resumable.TUS_VERSION,
+        "Tus-Extension": resumable.TUS_EXTENSIONS,
+        "Tus-Max-Size": str(MAX_VIDEO_BYTES),
+    })
+
+@app.post("/uploads", status_code=201)
+def create_upload(
+    upload_length: int = Header(...),
+    upload_metadata: Optional[str] = Header(None),
+    idempotency_key: str = Header(None),
+    x_api_key: str = Header(None),
+    profile: Optional[str] = None,
+    user_id: int = Depends(get_current_user_from_key),
+    db: Session = Depends(get_db)
+):
+    """
+    Start a resumable video upload of `Upload-Length` bytes. `Upload-Metadata`
+    may carry `filename`, `filetype` and `profile` (or pass `profile` as a
+    query parameter; defaults as for /verify). Send the bytes with PATCH, attach the
+    gyro log (CSV or VPGY) with PUT /uploads/{id}/gyro, then POST /uploads/{id}/finalize.
+    Requires API Key.
+    """
+    if upload_length < 0:
+        raise HTTPException(400, "Invalid Upload-Length")
+    if upload_length > MAX_VIDEO_BYTES:
+        raise HTTPException(413, "Upload exceeds the maximum video size", headers=resumable.tus_headers())
+    metadata = resumable.parse_upload_metadata(upload_metadata)
+    filename = safe_filename(metadata.get("filename"), "video.mp4")
+    filetype = (metadata.get("filetype") or "application/octet-stream").split(";")[0].strip().lower()
+    extension = os.path.splitext(filename)[1].lower()
+    if filetype not in uploads.VIDEO_CONTENT_TYPES or (filetype == "application/octet-stream" and extension not in uploads.VIDEO_EXTENSIONS):
+        raise HTTPException(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, f"Unsupported video type: {filetype} ({extension or 'no extension'})")
+    analysis_profile, api_key_id, priority = resolve_submission(db, x_api_key, profile or metadata.get("profile"))
+
+    upload_id = str(uuid.uuid4())
+    data_path = os.path.join(UPLOAD_SESSION_DIR, f"{upload_id}{extension}")
+    with open(data_path, "wb"):
+        pass  # Chunks are written into this file at their offsets
+    session = models.UploadSession(
+        id=upload_id,
+        user_id=user_id,
+        length=upload_length,
+        offset=0,
+        filename=filename,
+        data_path=data_path,
+        priority=priority,
+        analysis_profile=analysis_profile,
+        api_key_id=api_key_id,
+        idempotency_key=idempotency_key,
+        expires_at=_session_expiry(),
+    )
+    db.add(session)
     db.commit()
-    db.refresh(job)
-    
-    # 3. Offload task
-    background_tasks.add_task(process_verification, job.id, video_path, gyro_path, database.SessionLocal())
-    
+    headers = resumable.tus_headers(session)
+    headers["Location"] = f"/uploads/{upload_id}"
+    return JSONResponse({"id": upload_id, "offset": 0, "length": upload_length}, status_code=201, headers=headers)
+
+@app.head("/uploads/{upload_id}")
+def get_upload_offset(upload_id: str, user_id: int = Depends(get_current_user_from_key), db: Session = Depends(get_db)):
+    """Current offset, so an interrupted client knows where to resume."""
+    session = load_upload_session(db, upload_id, user_id)
+    return Response(status_code=200, headers=resumable.tus_headers(session))
+
+@app.patch("/uploads/{upload_id}")
+async def append_upload(
+    request: Request,
+    upload_id: str,
+    upload_offset: int = Header(...),
+    user_id: int = Depends(get_current_user_from_key),
+    db: Session = Depends(get_db)
+):
+    """Append the body at `Upload-Offset`, which must match the server's offset."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type != resumable.OFFSET_CONTENT_TYPE:
+        raise HTTPException(415, f"PATCH body must be {resumable.OFFSET_CONTENT_TYPE}", headers=resumable.tus_headers())
+    session = await run_in_threadpool(load_upload_session, db, upload_id, user_id)
+    if session.job_id is not None:
+        raise HTTPException(409, "Upload already finalized", headers=resumable.tus_headers(session))
+    if upload_offset != session.offset:
+        raise HTTPException(409, "Upload-Offset does not match", headers=resumable.tus_headers(session))
+
+    token = await run_in_threadpool(resumable.claim_writer, db, upload_id, upload_offset)
+    if token is None:
+        raise HTTPException(409, "Upload is being written by another request", headers=resumable.tus_headers())
+
+    committed = False
+    try:
+        started = time.perf_counter()
+        new_offset, hasher = await resumable.append_chunk(request, session, db, token)
+        metrics.observe_upload("video", new_offset - upload_offset, time.perf_counter() - started)
+        committed = await run_in_threadpool(
+            resumable.release_writer, db, upload_id, token, new_offset, _session_expiry()
+        )
+    finally:
+        if not committed:
+            await run_in_threadpool(resumable.release_writer, db, upload_id, token)
+    if not committed:
+        raise HTTPException(409, "Upload was modified concurrently", headers=resumable.tus_headers())
+    resumable.hashers.put(upload_id, new_offset, hasher)
+    db.expire(session)
+    session = await run_in_threadpool(load_upload_session, db, upload_id, user_id)
+    return Response(status_code=204, headers=resumable.tus_headers(session))
+
+@app.put("/uploads/{upload_id}/gyro", openapi_extra=uploads.multipart_openapi(GYRO_PART))
+async def attach_upload_gyro(
+    upload_id: str,
+    request: Request,
+    user_id: int = Depends(get_current_user_from_key),
+    db: Session = Depends(get_db)
+):
+    """Attach (or replace) the gyro log (CSV or VPGY, multipart `gyro` field) of an upload session."""
+    session = await run_in_threadpool(load_upload_session, db, upload_id, user_id)
+    if session.job_id is not None:
+        raise HTTPException(409, "Upload already finalized")
+    receiver = uploads.MultipartReceiver(
+        GYRO_PART,
+        lambda field, filename: os.path.join(UPLOAD_SESSION_DIR, f"{upload_id}_gyro{os.path.splitext(filename)[1]}"),
+        MAX_GYRO_BYTES + MULTIPART_OVERHEAD_BYTES,
+    )
+    gyro = (await receiver.receive(request))[0]["gyro"]
+    metrics.observe_upload("gyro", gyro.size, gyro.seconds)
+
+    session.gyro_filename = gyro.filename
+    session.gyro_path = gyro.path
+    session.gyro_sha256 = gyro.sha256
+    await run_in_threadpool(db.commit)
+    return {"id": upload_id, "gyro_bytes": gyro.size}
+
+def session_blobs(db: Session, session: models.UploadSession):
+    """
+    [(session file, storage key)] for the video and gyro log. The video hash is
+    committed on the session first, so the keys stay known after the files move.
+    """
+    video_sha256 = resumable.session_sha256(session)
+    db.commit()
+    return [
+        (session.data_path, blob_key("uploads", video_sha256, os.path.splitext(session.filename)[1])),
+        (session.gyro_path, blob_key("uploads", session.gyro_sha256, os.path.splitext(session.gyro_filename)[1])),
+    ]
+
+def session_file(path: str, key: str) -> str:
+    """The session's file, or its stored blob when an earlier finalize already moved it."""
+    return path if os.path.exists(path) else storage.fetch(key)
+
+def finalize_session(db: Session, session: models.UploadSession, details: Optional[dict] = None):
+    """
+    Moves the session's files into storage and creates (or reuses) the job.
+    Safe to repeat after a failure: files already moved are found by their key.
+    """
+    (video_path, video_key), (gyro_path, gyro_key) = session_blobs(db, session)
+    # Local storage renames the session file into place rather than copying it
+    for path, key in ((video_path, video_key), (gyro_path, gyro_key)):
+        if os.path.exists(path):
+            storage.put_file(path, key)
+        elif not storage.exists(key):
+            raise HTTPException(409, "Upload data is no longer available; start a new upload")
+
+    job_fields = dict(
+        video_filename=session.filename,
+        gyro_filename=session.gyro_filename,
+        video_path=video_key,
+        gyro_path=gyro_key,
+        flow_path=None,
+        priority=session.priority,
+        analysis_profile=session.analysis_profile,
+        api_key_id=session.api_key_id,
+        video_sha256=session.video_sha256,
+        gyro_sha256=session.gyro_sha256,
+        idempotency_key=session.idempotency_key,
+        user_id=session.user_id,
+        details=details,
+    )
+    response, created = record_bundle(db, job_fields)
+    session.job_id = response["id"]
+    session.expires_at = _session_expiry()
+    db.commit()
+    return response, created
+
+@app.post("/uploads/{upload_id}/finalize", response_model=models.VerificationResponse)
+async def finalize_upload(
+    upload_id: str,
+    x_signature: str = Header(None),
+    user_id: int = Depends(get_current_user_from_key),
+    db: Session = Depends(get_db)
+):
+    """
+    Turn a complete upload into a verification job. Safe to retry: a finalized
+    session returns its job.
+    """
+    if x_signature:
+        logger.info(f"Received Signature: {x_signature[:10]}...")
+    session = await run_in_threadpool(load_upload_session, db, upload_id, user_id)
+    if session.job_id is not None:
+        job = await run_in_threadpool(db.get, models.VerificationJob, session.job_id)
+        return job_response(job)
+    if session.offset != session.length:
+        raise HTTPException(409, f"Upload incomplete: {session.offset} of {session.length} bytes", headers=resumable.tus_headers(session))
+    if not session.gyro_path:
+        raise HTTPException(409, "No gyro data attached to this upload")
+
+    # Queue full: the session is kept, so the client only retries this call
+    early_response = await run_in_threadpool(admit_bundle, db, user_id, session.idempotency_key)
+    if early_response:
+        return early_response
+
+    # A rejected bundle keeps its session, so the client can PUT a corrected gyro log
+    (video_path, video_key), (gyro_path, gyro_key) = await run_in_threadpool(session_blobs, db, session)
+    try:
+        preflight_report = await run_in_threadpool(
+            run_preflight, session_file(video_path, video_key), session_file(gyro_path, gyro_key)
+        )
+    except preflight.PreflightError as e:
+        raise preflight_rejection(e)
+    response, created = await run_in_threadpool(finalize_session, db, session, preflight_details(preflight_report))
+    if created:
+        job_queue.notify()
+    return response
+
+@app.delete("/uploads/{upload_id}", status_code=204)
+def terminate_upload(upload_id: str, user_id: int = Depends(get_current_user_from_key), db: Session = Depends(get_db)):
+    """Abandon an unfinished upload and free its space."""
+    session = load_upload_session(db, upload_id, user_id)
+    if session.job_id is None:
+        resumable.delete_session_files(session)
+    db.delete(session)
+    db.commit()
+    return Response(status_code=204, headers=resumable.tus_headers())
+
+# --- LIVE SESSIONS ---
+
+def load_live_session(session_id: str, user_id: int) -> live.LiveSession:
+    try:
+        return live_sessions.get(session_id, user_id)
+    except live.LiveError as e:
+        raise HTTPException(e.status_code, str(e))
+
+def live_push(session: live.LiveSession, push, *args) -> dict:
+    """Applies one push and publishes the rolling verdict to /live/{id}/events."""
+    try:
+        snapshot = push(*args)
+    except live.LiveError as e:
+        raise HTTPException(e.status_code, str(e))
+    event_broker.publish({**snapshot, "user_id": session.user_id}, event_type="live")
+    return snapshot
+
+async def read_live_body(request: Request, max_bytes: int) -> bytes:
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > max_bytes:
+            raise HTTPException(413, f"Push exceeds the maximum size of {max_bytes} bytes")
+    return bytes(body)
+
+def live_result(row: models.LiveSession) -> dict:
     return {
-        "id": job.id,
-        "status": "PENDING",
-        "message": "Job submitted successfully"
+        "id": row.id,
+        "status": row.status,
+        "score": row.score,
+        "verified": row.is_consistent,
+        "message": row.message,
+        "details": row.details or {},
     }
 
+@app.post("/live", status_code=201)
+def create_live_session(
+    window: float = LIVE_WINDOW,
+    user_id: int = Depends(get_current_user_from_key),
+    db: Session = Depends(get_db)
+):
+    """
+    Open a live verification session. While recording, push gyro windows to
+    /live/{id}/gyro and video segments to /live/{id}/video (or flow windows
+    computed on-device to /live/{id}/flow), each stream in time order. Every
+    push returns the rolling verdict, also streamed on /live/{id}/events.
+    POST /live/{id}/finish returns the result for the whole recording.
+    `window` is the span (seconds) of the rolling window score and tremor check.
+    Requires API Key.
+    """
+    window = max(1.0, min(window, 300.0))
+    try:
+        session = live_sessions.create(db, user_id, window)
+    except live.LiveError as e:
+        raise HTTPException(e.status_code, str(e))
+    logger.info(f"Live session {session.id} opened")
+    return {"id": session.id, "window": window, "events_url": f"/live/{session.id}/events"}
+
+@app.post("/live/{session_id}/gyro")
+async def push_live_gyro(session_id: str, request: Request, user_id: int = Depends(get_current_user_from_key)):
+    """Append a gyro window: `timestamp,x,y,z` CSV (with header) or a VPGY log as the request body."""
+    session = load_live_session(session_id, user_id)
+    body = await read_live_body(request, LIVE_MAX_PUSH_BYTES)
+    return await run_in_threadpool(live_push, session, session.push_gyro, body)
+
+@app.post("/live/{session_id}/flow")
+async def push_live_flow(session_id: str, request: Request, user_id: int = Depends(get_current_user_from_key)):
+    """
+    Append on-device optical flow as a `timestamp,flow_x[,flow_y]` CSV body,
+    timestamps in seconds since the first frame of the recording.
+    """
+    session = load_live_session(session_id, user_id)
+    body = await read_live_body(request, LIVE_MAX_PUSH_BYTES)
+    return await run_in_threadpool(live_push, session, session.push_flow, body)
+
+@app.post("/live/{session_id}/video")
+async def push_live_video(session_id: str, request: Request, user_id: int = Depends(get_current_user_from_key)):
+    """
+    Append the next self-contained video segment (request body). Its optical
+    flow is computed by the verifier pool and placed after the previous
+    segments; push segments one at a time, in order.
+    """
+    verifier = verifier_service.get()
+    if verifier is None:
+        raise HTTPException(503, "Verifier not available", headers={"Retry-After": str(int(SUBSYSTEM_RETRY_INTERVAL))})
+    session = load_live_session(session_id, user_id)
+    body = await read_live_body(request, LIVE_MAX_SEGMENT_BYTES)
+
+    def extract():
+        path = os.path.join(UPLOAD_DIR, f"live_{session.id}_{uuid.uuid4().hex}.mp4")
+        with open(path, "wb") as f:
+            f.write(body)
+        try:
+            return verifier.extract_flow(path)
+        finally:
+            os.remove(path)
+
+    try:
+        flow = await run_in_threadpool(extract)
+    except VerifierError as e:
+        raise HTTPException(422, f"Could not process video segment: {e}")
+    return await run_in_threadpool(live_push, session, session.push_segment, *flow)
+
+@app.get("/live/{session_id}")
+def get_live_session(session_id: str, user_id: int = Depends(get_current_user_from_key), db: Session = Depends(get_db)):
+    """Current rolling verdict of an open session, or the result of a finished one."""
+    try:
+        return live_sessions.get(session_id, user_id).snapshot()
+    except live.LiveError:
+        pass
+    row = db.get(models.LiveSession, session_id)
+    if row is None or row.user_id != user_id:
+        raise HTTPException(404, "Live session not found")
+    return live_result(row)
+
+@app.post("/live/{session_id}/finish")
+def finish_live_session(session_id: str, user_id: int = Depends(get_current_user_from_key), db: Session = Depends(get_db)):
+    """
+    Close the session and score the whole recording; the result is the same
+    as verifying the complete flow and gyro logs in one go.
+    """
+    session = load_live_session(session_id, user_id)
+    try:
+        live_sessions.finish(db, session)
+    except live.LiveError as e:
+        raise HTTPException(e.status_code, str(e))
+    result = live_result(db.get(models.LiveSession, session_id))
+    event_broker.publish({**result, "user_id": user_id}, event_type="live")
+    logger.info(f"Live session {session_id} finished: {result['message']} ({result['score']:.3f})")
+    return result
+
+@app.get("/live/{session_id}/events")
+async def stream_live_events(
+    request: Request,
+    session_id: str,
+    last_event_id: Optional[int] = None,
+    user_id: int = Depends(get_stream_user_id)
+):
+    """Server-Sent `live` events: the rolling verdict after every push, ending with the final result."""
+    sub = event_broker.subscribe(user_id=user_id, job_id=session_id, event_type="live")
+    # Snapshot taken after subscribing, so no push falls in between
+    try:
+        initial = live_sessions.get(session_id, user_id).snapshot()
+    except live.LiveError:
+        row = await run_in_threadpool(load_live_row, session_id)
+        if row is None or row.user_id != user_id:
+            event_broker.unsubscribe(sub)
+            raise HTTPException(404, "Live session not found")
+        initial = live_result(row)
+    return event_stream_response(events.stream_events(
+        event_broker, sub, request,
+        initial=[initial],
+        last_event_id=_last_event_id(request, last_event_id),
+        heartbeat=EVENTS_HEARTBEAT,
+        final_statuses=("FINISHED", "EXPIRED"),
+        event_type="live",
+    ))
+
+def load_live_row(session_id: str):
+    db = database.SessionLocal()
+    try:
+        row = db.get(models.LiveSession, session_id)
+        if row:
+            db.expunge(row)
+        return row
+    finally:
+        db.close()
+
 @app.get("/jobs")
-def list_jobs(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    # Find all API keys for this user? No, jobs are linked to user_id directly now (via verify endpoint).
-    # Wait, verify endpoint uses `user_id` from `get_current_user_from_key`.
-    # `get_current_user_from_key` returns `user_id` (int).
-    # So we are good.
-    jobs = db.query(models.VerificationJob).filter(models.VerificationJob.user_id == current_user.id).all()
+def list_jobs(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    status: Optional[str] = None,
+    created_after: Optional[datetime.datetime] = None,
+    created_before: Optional[datetime.datetime] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Jobs are linked to user_id directly (via the verify endpoint's API key)
+    jobs = paginate_jobs(
+        db.query(models.VerificationJob).filter(models.VerificationJob.user_id == current_user.id),
+        request, response,
+        cursor=cursor, limit=limit, status=status,
+        created_after=created_after, created_before=created_before,
+    )
     # Return simple list
     return [
         {
@@ -318,17 +1576,223 @@ def list_jobs(current_user: models.User = Depends(get_current_user), db: Session
         for j in jobs
     ]
 
+SIGNED_FILE_NAME = re.compile(r"^[0-9a-f]{64}(\.[A-Za-z0-9]{1,8})?$")
+
+@app.get("/files/{name}")
+def get_signed_file(name: str, request: Request):
+    """
+    Signed outputs. Names are content hashes, so responses are immutable:
+    strong ETag with If-None-Match, long-lived caching, and Range requests.
+    FileResponse uses zero-copy `pathsend` where the ASGI server supports it;
+    with S3 storage the client is redirected to a presigned URL instead.
+    """
+    if not SIGNED_FILE_NAME.match(name):
+        raise HTTPException(404, "File not found")
+    key = f"signed/{name}"
+    remote_url = storage.url(key)
+    if remote_url:
+        return RedirectResponse(remote_url)
+    path = storage.fetch(key)
+    if not os.path.exists(path):
+        raise HTTPException(404, "File not found")
+
+    etag = f'"{name.split(".")[0]}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        if "*" in tags or etag in tags:
+            return Response(status_code=304, headers=headers)
+    return FileResponse(path, headers=headers)
+
+def _last_event_id(request: Request, last_event_id: Optional[int]):
+    # EventSource sends Last-Event-ID on reconnect; the query param covers manual resumes
+    header = request.headers.get("last-event-id")
+    if header and header.isdigit():
+        return int(header)
+    return last_event_id
+
+def event_stream_response(body) -> StreamingResponse:
+    return StreamingResponse(
+        body,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/jobs/events")
+async def stream_user_events(
+    request: Request,
+    last_event_id: Optional[int] = None,
+    user_id: int = Depends(get_stream_user_id)
+):
+    """
+    Server-Sent Events stream of every state change of the caller's jobs.
+    On reconnect, missed events are replayed from Last-Event-ID; if they are
+    no longer available a `resync` event tells the client to reload /jobs.
+    """
+    sub = event_broker.subscribe(user_id=user_id, event_type="job")
+    return event_stream_response(events.stream_events(
+        event_broker, sub, request,
+        last_event_id=_last_event_id(request, last_event_id),
+        heartbeat=EVENTS_HEARTBEAT,
+    ))
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(request: Request, job_id: int, last_event_id: Optional[int] = None):
+    """
+    Server-Sent Events stream for one job, replacing polling of /jobs/{job_id}:
+    the current state first, then each transition until COMPLETED or ERROR.
+    """
+    sub = event_broker.subscribe(job_id=job_id, event_type="job")
+    # Snapshot taken after subscribing, so no transition falls in between
+    job = await load_job(job_id)
+    if not job:
+        event_broker.unsubscribe(sub)
+        raise HTTPException(404, "Job not found")
+    return event_stream_response(events.stream_events(
+        event_broker, sub, request,
+        initial=[events.job_event(job)],
+        last_event_id=_last_event_id(request, last_event_id),
+        heartbeat=EVENTS_HEARTBEAT,
+        final_statuses=("COMPLETED", "ERROR"),
+    ))
+
 @app.get("/jobs/{job_id}", response_model=models.VerificationResponse)
-async def get_job_status(job_id: int, db: Session = Depends(get_db)):
-    job = db.query(models.VerificationJob).filter(models.VerificationJob.id == job_id).first()
+async def get_job_status(job_id: int):
+    job = await load_job(job_id)
     if not job:
         raise HTTPException(404, "Job not found")
         
-    return {
-        "id": job.id,
-        "status": job.status,
-        "score": job.score,
-        "verified": job.is_consistent,
-        "message": job.message,
-        "signed_url": job.signed_url
+    return job_response(job)
+
+def scoring_params(threshold: Optional[float], flow_axis: Optional[str], gyro_axis: Optional[str]):
+    try:
+        return SCORING.replace(threshold, flow_axis, gyro_axis)
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+
+def job_profile(job: models.VerificationJob) -> profiles.AnalysisProfile:
+    """The profile a job's flow was computed with, as recorded at the time."""
+    recorded = (job.details or {}).get("profile")
+    if recorded:
+        return profiles.AnalysisProfile.from_dict(recorded)
+    return profiles.get_profile(profiles.BASELINE)
+
+def rescore(job: models.VerificationJob, scoring, gyro_path: Optional[str] = None, gyro_sha256: Optional[str] = None) -> dict:
+    """
+    Recomputes a finished job's verdict from the flow cache: its cached flow
+    series against its cached gyro log, or against `gyro_path` (a corrected
+    log, cached under `gyro_sha256`). No video is decoded.
+    Raises LookupError if an input is not cached.
+    """
+    if flow_cache is None:
+        raise LookupError("Flow cache is disabled")
+    if job.flow_path:
+        series = flow_cache.get_flow("client", blob_sha256(job.flow_path))
+    else:
+        series = flow_cache.get_flow("video", job_profile(job).flow_key(job.video_sha256))
+    if series is None:
+        raise LookupError("Flow signal of this job is no longer cached")
+    if gyro_path:
+        gyro = gyro_analysis.load_gyro(gyro_path)
+        flow_cache.put_gyro(gyro_sha256, gyro)
+    else:
+        cached = flow_cache.gyro_path(job.gyro_sha256)
+        if cached is None:
+            raise LookupError("Gyro log of this job is no longer cached; send it with the request")
+        gyro = gyro_analysis.load_gyro(cached)
+    return score_series(series, gyro, scoring)
+
+def apply_rescore(db: Session, job: models.VerificationJob, result: dict):
+    """
+    Stores a rescore result on the job (committed by the caller). Signed
+    outputs keep the verdict they were signed with.
+    """
+    stats.record_transition(db, job.status, job.is_consistent, job.status, result["verified"])
+    analytics.record(db, job, sign=-1)  # Re-added below with the new verdict, in the same bucket
+    details = dict(job.details or {}, **result["details"])
+    details["verdict"] = result["message"]
+    details["rescored"] = {
+        "at": datetime.datetime.utcnow().isoformat() + "Z",
+        "previous_score": job.score,
+        "previous_verified": job.is_consistent,
     }
+    job.details = details
+    job.score = result["score"]
+    job.is_consistent = result["verified"]
+    job.message = result["message"]
+    analytics.store_metrics(job, result["details"])
+    analytics.record(db, job)
+
+@app.post("/jobs/{job_id}/rescore", openapi_extra=uploads.multipart_openapi(OPTIONAL_GYRO_PART))
+async def rescore_job(
+    job_id: int,
+    request: Request,
+    threshold: Optional[float] = None,
+    flow_axis: Optional[str] = None,
+    gyro_axis: Optional[str] = None,
+    user_id: int = Depends(get_current_user_from_key),
+    db: Session = Depends(get_db)
+):
+    """
+    Re-verify a finished job from its cached flow signal, without decoding
+    the video. With the server's scoring the result replaces the job's
+    verdict (e.g. after SCORING changed). Another `threshold` or axis mapping,
+    or a corrected `gyro` log uploaded with the request, only return a
+    `what_if` result; the stored verdict is left alone (resubmit the bundle
+    to verify a corrected gyro log; its flow comes from the cache).
+    Requires API Key.
+    """
+    scoring = scoring_params(threshold, flow_axis, gyro_axis)
+    job = await run_in_threadpool(db.get, models.VerificationJob, job_id)
+    if not job or job.user_id != user_id:
+        raise HTTPException(404, "Job not found")
+    if job.status != "COMPLETED":
+        raise HTTPException(409, f"Job is {job.status}; only completed jobs can be re-scored")
+
+    gyro = receiver = None
+    if request.headers.get("content-type", "").lower().startswith("multipart/"):
+        receiver = uploads.MultipartReceiver(
+            OPTIONAL_GYRO_PART,
+            lambda field, filename: os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}_{filename}"),
+            MAX_GYRO_BYTES + MULTIPART_OVERHEAD_BYTES,
+        )
+        gyro = (await receiver.receive(request))[0].get("gyro")
+    # A tenant's own threshold or gyro log must never become the verdict of record
+    store = gyro is None and scoring.to_dict() == SCORING.to_dict()
+    try:
+        try:
+            result = await run_in_threadpool(rescore, job, scoring, gyro and gyro.path, gyro and gyro.sha256)
+        except LookupError as e:
+            raise HTTPException(409, str(e))
+    finally:
+        if receiver:
+            receiver.cleanup()
+
+    if not store:
+        what_if = {name: result[name] for name in ("score", "verified", "message")}
+        return dict(job_response(job), what_if=what_if, stored=False, scoring=scoring.to_dict())
+
+    previous = {"score": job.score, "verified": job.is_consistent}
+    await run_in_threadpool(apply_rescore, db, job, result)  # Rollup and counter queries
+    event = events.job_event(job)
+    await run_in_threadpool(db.commit)
+    event_broker.publish(event)
+    return dict(job_response(job), previous=previous, stored=True, scoring=scoring.to_dict())
+
+def load_job_sync(job_id: int):
+    db = database.SessionLocal()
+    try:
+        job = db.get(models.VerificationJob, job_id)
+        if job:
+            db.expunge(job)
+        return job
+    finally:
+        db.close()
+
+async def load_job(job_id: int):
+    """Fetches a job without blocking the event loop (async session if configured)."""
+    if database.AsyncSessionLocal is None:
+        return await run_in_threadpool(load_job_sync, job_id)
+    async with database.AsyncSessionLocal() as db:
+        return await db.get(models.VerificationJob, job_id)
@@ -0,0 +1,107 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from sqlalchemy import event
+
+# Buckets covering sub-millisecond DB calls up to multi-minute optical flow runs
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+THROUGHPUT_BUCKETS = (64e3, 256e3, 1e6, 4e6, 16e6, 64e6, 256e6, 1e9)
+
+UPLOAD_BYTES = Counter(
+    "veriphysics_upload_bytes_total", "Bytes received in uploads", ["kind"]
+)
+UPLOAD_THROUGHPUT = Histogram(
+    "veriphysics_upload_bytes_per_second", "Upload ingest rate per file", ["kind"], buckets=THROUGHPUT_BUCKETS
+)
+QUEUE_DEPTH = Gauge(
+    "veriphysics_queue_depth", "Jobs waiting or running in the queue", ["queue"]
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "veriphysics_queue_wait_seconds", "Time from becoming runnable to being leased", ["queue"], buckets=DURATION_BUCKETS
+)
+IN_FLIGHT = Gauge(
+    "veriphysics_in_flight_workers", "Workers currently busy", ["pool"]
+)
+SUBSYSTEM_READY = Gauge(
+    "veriphysics_subsystem_ready", "Lazily started subsystem is up (1) or unavailable (0)", ["subsystem"]
+)
+JOB_SECONDS = Histogram(
+    "veriphysics_job_seconds", "Queue handler duration per job", ["queue", "outcome"], buckets=DURATION_BUCKETS
+)
+ADMISSION_REJECTIONS = Counter(
+    "veriphysics_admission_rejections_total", "Requests refused by admission control", ["reason"]
+)
+PREFLIGHT_RESULTS = Counter(
+    "veriphysics_preflight_total", "Bundles checked at submission, by outcome", ["outcome"]
+)
+FLOW_CACHE = Counter(
+    "veriphysics_flow_cache_total", "Video verifications served from the flow cache (hit) or decoded (miss)", ["result"]
+)
+VERIFIER_SECONDS = Histogram(
+    "veriphysics_verifier_seconds", "Wall time of one verification", ["mode"], buckets=DURATION_BUCKETS
+)
+VERIFIER_STAGE_SECONDS = Histogram(
+    "veriphysics_verifier_stage_seconds", "Per-stage time reported by the verifier", ["stage"], buckets=DURATION_BUCKETS
+)
+SIGNING_SECONDS = Histogram(
+    "veriphysics_signing_seconds", "C2PA signing time", ["outcome"], buckets=DURATION_BUCKETS
+)
+DB_SECONDS = Histogram(
+    "veriphysics_db_seconds", "Database statement time", ["operation"], buckets=DURATION_BUCKETS
+)
+
+
+@contextmanager
+def timed(histogram, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        target = histogram.labels(**labels) if labels else histogram
+        target.observe(time.perf_counter() - started)
+
+
+def observe_upload(kind: str, size: int, seconds: float):
+    UPLOAD_BYTES.labels(kind=kind).inc(size)
+    if seconds > 0:
+        UPLOAD_THROUGHPUT.labels(kind=kind).observe(size / seconds)
+
+
+def observe_verifier_timings(timings: dict):
+    """
+    `timings` maps stage name to milliseconds, as parsed from vp_cli output.
+    The overall "wall" time is already covered by VERIFIER_SECONDS.
+    """
+    for stage, ms in timings.items():
+        if stage == "wall":
+            continue
+        VERIFIER_STAGE_SECONDS.labels(stage=stage).observe(ms / 1000.0)
+
+
+def instrument_engine(engine):
+    """
+    Records the duration of every statement executed on `engine`.
+    Commits are not statements; time those with `timed(DB_SECONDS, operation="COMMIT")`.
+    The start time lives on the statement's execution context, so a statement
+    that raises leaves nothing behind on the pooled connection.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._veriphysics_query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_veriphysics_query_start", None)
+        if started is None:
+            return
+        operation = statement.lstrip().split(" ", 1)[0].upper() or "OTHER"
+        DB_SECONDS.labels(operation=operation).observe(time.perf_counter() - started)
+
+    return engine
+
+
+def render():
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,17 +1,29 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, UniqueConstraint, Index, JSON
 from sqlalchemy.sql import func
 from .database import Base
 from pydantic import BaseModel
 from typing import Optional
 import datetime
 
+def _utcnow():
+    return datetime.datetime.now(datetime.timezone.utc)
+
 # --- DATABASE MODELS ---
 class VerificationJob(Base):
     __tablename__ = "verification_jobs"
+    __table_args__ = (
+        UniqueConstraint("user_id", "idempotency_key", name="uq_jobs_user_idempotency_key"),
+        # Keyset pagination on (created_at, id), optionally scoped by user and/or status
+        Index("ix_jobs_created_id", "created_at", "id"),
+        Index("ix_jobs_user_created_id", "user_id", "created_at", "id"),
+        Index("ix_jobs_status_created_id", "status", "created_at", "id"),
+        Index("ix_jobs_user_status_created_id", "user_id", "status", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    status = Column(String, default="PENDING") # PENDING, PROCESSING, COMPLETED, FAILED
+    # Set client-side too so stored values carry the same precision as cursor parameters
+    created_at = Column(DateTime(timezone=True), default=_utcnow, server_default=func.now())
+    status = Column(String, default="PENDING") # PENDING, PROCESSING, SIGNING, COMPLETED, ERROR
     user_id = Column(Integer, nullable=True) # Link to User
     
     video_filename = Column(String)
@@ -21,6 +33,32 @@ class VerificationJob(Base):
     is_consistent = Column(Boolean, nullable=True)
     message = Column(String, nullable=True)
     signed_url = Column(String, nullable=True) # URL to C2PA signed file
+    details = Column(JSON, nullable=True) # Verifier metrics and per-stage timings
+
+    # Verifier metrics as typed columns (see analytics.py); NULL until verified
+    causality_score = Column(Float, nullable=True) # 0-100
+    is_handheld = Column(Boolean, nullable=True)
+    tremor_energy = Column(Float, nullable=True) # Share of gyro energy in the 8-12 Hz band
+    duration = Column(Float, nullable=True) # Seconds of flow signal analysed
+    finished_at = Column(DateTime, nullable=True) # When the verdict or final failure was stored (UTC)
+    api_key_id = Column(Integer, nullable=True) # Key the job was submitted with
+
+    # Queue bookkeeping (see job_queue.py)
+    video_path = Column(String, nullable=True)
+    gyro_path = Column(String, nullable=True)
+    flow_path = Column(String, nullable=True) # Optional precomputed flow CSV
+    priority = Column(Integer, default=0)
+    analysis_profile = Column(String, nullable=True) # See profiles.py; NULL = accurate
+    attempts = Column(Integer, default=0)
+    lease_expires_at = Column(DateTime, nullable=True)
+    lease_token = Column(String(32), nullable=True) # Fences the result of the run holding the lease
+    next_attempt_at = Column(DateTime, nullable=True)
+
+    # Content addressing (see dedup.py)
+    video_sha256 = Column(String(64), nullable=True)
+    gyro_sha256 = Column(String(64), nullable=True)
+    content_hash = Column(String(64), nullable=True, index=True)
+    idempotency_key = Column(String, nullable=True)
 
 class User(Base):
     __tablename__ = "users"
@@ -38,6 +76,109 @@ class ApiKey(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Admission limits (see admission.py): NULL = server default, 0 = unlimited
+    rate_limit_per_minute = Column(Float, nullable=True)
+    rate_limit_burst = Column(Integer, nullable=True)
+    max_concurrent_jobs = Column(Integer, nullable=True) # Unfinished jobs of the key's user
+    max_concurrent_uploads = Column(Integer, nullable=True)
+    analysis_profile = Column(String, nullable=True) # Default profile of the key's submissions; NULL = server default
+    priority = Column(Integer, nullable=True) # Queue priority (0-9) of the key's jobs, set by admins; NULL = 0
+
+class StatCounter(Base):
+    """Running totals for /admin/stats, updated in the same transaction as the rows they count."""
+    __tablename__ = "stat_counters"
+    name = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+class AnalyticsRollup(Base):
+    """
+    Totals of the jobs that got a verdict in one hour or day, per user and API
+    key. Updated in the same transaction as the job (see analytics.py).
+    """
+    __tablename__ = "analytics_rollups"
+    __table_args__ = (
+        UniqueConstraint("period", "bucket_start", "user_id", "api_key_id", name="uq_rollups_bucket"),
+        Index("ix_rollups_user_bucket", "user_id", "period", "bucket_start"),
+        Index("ix_rollups_key_bucket", "api_key_id", "period", "bucket_start"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    period = Column(String(8), nullable=False) # hour, day
+    bucket_start = Column(DateTime, nullable=False) # UTC
+    user_id = Column(Integer, nullable=False) # 0 = none
+    api_key_id = Column(Integer, nullable=False) # 0 = submitted without an API key
+    jobs = Column(Integer, nullable=False, default=0) # Verdicts and failures
+    verified = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0) # Inconsistent verdicts
+    errors = Column(Integer, nullable=False, default=0) # Gave up without a verdict
+    handheld = Column(Integer, nullable=False, default=0)
+    tremor_checked = Column(Integer, nullable=False, default=0) # Verdicts with a handheld result
+    score_sum = Column(Float, nullable=False, default=0.0)
+    duration_sum = Column(Float, nullable=False, default=0.0)
+    # Verdict scores in tenths: score_bin_0 = [0, 0.1), ..., score_bin_9 = [0.9, 1.0]
+    score_bin_0 = Column(Integer, nullable=False, default=0)
+    score_bin_1 = Column(Integer, nullable=False, default=0)
+    score_bin_2 = Column(Integer, nullable=False, default=0)
+    score_bin_3 = Column(Integer, nullable=False, default=0)
+    score_bin_4 = Column(Integer, nullable=False, default=0)
+    score_bin_5 = Column(Integer, nullable=False, default=0)
+    score_bin_6 = Column(Integer, nullable=False, default=0)
+    score_bin_7 = Column(Integer, nullable=False, default=0)
+    score_bin_8 = Column(Integer, nullable=False, default=0)
+    score_bin_9 = Column(Integer, nullable=False, default=0)
+
+class VerificationBatch(Base):
+    """A group of jobs submitted together through /verify/batch."""
+    __tablename__ = "verification_batches"
+    id = Column(String, primary_key=True) # UUID
+    user_id = Column(Integer, index=True)
+    created_at = Column(DateTime(timezone=True), default=_utcnow, server_default=func.now())
+    total_items = Column(Integer, default=0)
+
+class BatchItem(Base):
+    __tablename__ = "batch_items"
+    id = Column(Integer, primary_key=True)
+    batch_id = Column(String, index=True) # ForeignKey in real app
+    name = Column(String)
+    job_id = Column(Integer, nullable=True, index=True) # None when the item was rejected
+    error = Column(String, nullable=True)
+
+class UploadSession(Base):
+    """Resumable (tus-style) video upload that is finalized into a VerificationJob."""
+    __tablename__ = "upload_sessions"
+    id = Column(String, primary_key=True) # UUID
+    user_id = Column(Integer, index=True)
+    created_at = Column(DateTime(timezone=True), default=_utcnow, server_default=func.now())
+    expires_at = Column(DateTime, nullable=True, index=True)
+    length = Column(Integer, nullable=False) # Declared video size in bytes
+    offset = Column(Integer, nullable=False, default=0) # Bytes received so far
+    filename = Column(String)
+    data_path = Column(String) # Video bytes are written here at their offset
+    video_sha256 = Column(String(64), nullable=True) # Set at finalize, before the file moves to storage
+    writer_token = Column(String(32), nullable=True) # Lease of the PATCH currently appending
+    writer_expires_at = Column(DateTime, nullable=True)
+    gyro_filename = Column(String, nullable=True)
+    gyro_path = Column(String, nullable=True)
+    gyro_sha256 = Column(String(64), nullable=True)
+    priority = Column(Integer, default=0)
+    analysis_profile = Column(String, nullable=True)
+    api_key_id = Column(Integer, nullable=True)
+    idempotency_key = Column(String, nullable=True)
+    job_id = Column(Integer, nullable=True) # Set once finalized
+
+class LiveSession(Base):
+    """Live verification session; the rolling state lives in the API process (see live.py)."""
+    __tablename__ = "live_sessions"
+    id = Column(String, primary_key=True) # UUID
+    user_id = Column(Integer, index=True)
+    created_at = Column(DateTime(timezone=True), default=_utcnow, server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    status = Column(String, default="LIVE") # LIVE, FINISHED, EXPIRED
+    score = Column(Float, nullable=True)
+    is_consistent = Column(Boolean, nullable=True)
+    message = Column(String, nullable=True)
+    details = Column(JSON, nullable=True)
+
 # --- API SCHEMAS ---
 class VerificationResponse(BaseModel):
     id: int
@@ -50,3 +191,18 @@ class VerificationResponse(BaseModel):
 class JobStatus(BaseModel):
     id: int
     status: str
+
+class ApiKeyLimits(BaseModel):
+    """Admission limits of an API key; null = server default, 0 = unlimited. Omitted fields are unchanged."""
+    rate_limit_per_minute: Optional[float] = None
+    rate_limit_burst: Optional[int] = None
+    max_concurrent_jobs: Optional[int] = None
+    max_concurrent_uploads: Optional[int] = None
+
+class ApiKeyPriority(BaseModel):
+    """Queue priority (0-9, higher first) of an API key's jobs; null = 0."""
+    priority: Optional[int] = None
+
+class ApiKeyProfile(BaseModel):
+    """Analysis profile of an API key's submissions; null = server default."""
+    analysis_profile: Optional[str] = None
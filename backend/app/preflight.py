@@ -0,0 +1,268 @@
+"""
+Cheap consistency checks run on a bundle at submission, before it is queued.
+
+Only the MP4/MOV container header is read (duration, frame count, frame
+rate and resolution come from the moov box; nothing is decoded) and the gyro
+log's timestamps are scanned, so a bundle that cannot verify is refused in
+milliseconds instead of after vp_cli has run optical flow on every frame.
+Problems that make the verdict meaningless are errors; marginal ones are
+warnings recorded in the job's details under "preflight".
+"""
+import logging
+import os
+import struct
+
+import numpy as np
+
+from . import gyro_analysis
+
+logger = logging.getLogger(__name__)
+
+# Optical flow drops the first 2 frames; at least two flow values must remain
+MIN_FRAMES = 5
+MIN_GYRO_SAMPLES = gyro_analysis.TREMOR_MIN_SAMPLES
+# Gyro time span / video duration
+MIN_COVERAGE = 0.5  # Error below this
+WARN_COVERAGE = 0.9  # Warning below this
+# Below twice the top of the tremor band the 8-12 Hz analysis sees only aliases
+MIN_TREMOR_RATE = 2 * gyro_analysis.TREMOR_BAND[1]
+MAX_FPS = 1000.0
+
+# ISO BMFF boxes that may open an MP4/MOV file
+LEADING_BOXES = {b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pnot", b"uuid"}
+MAX_STTS_BYTES = 64 * 1024 * 1024
+
+
+class PreflightError(Exception):
+    """The bundle fails a preflight check; `report` has every issue found."""
+
+    def __init__(self, message: str, report: dict, status_code: int = 422):
+        super().__init__(message)
+        self.report = report
+        self.status_code = status_code
+
+
+def _boxes(f, start: int, end: int):
+    """Yields (type, payload_offset, payload_size) for the boxes in [start, end)."""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:
+            large = f.read(8)
+            if len(large) < 8:
+                return
+            size = struct.unpack(">Q", large)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset  # Runs to the end of the enclosing box
+        if size < header_size or offset + size > end:
+            return  # Truncated or corrupt; keep what was read so far
+        yield box_type, offset + header_size, size - header_size
+        offset += size
+
+
+def _read_full_box(f, offset: int, size: int, limit: int = 4096) -> bytes:
+    f.seek(offset)
+    return f.read(min(size, limit))
+
+
+def _mvhd_or_mdhd(payload: bytes):
+    """(timescale, duration) of an mvhd or mdhd box."""
+    if len(payload) < 4:
+        return 0, 0
+    if payload[0] == 1 and len(payload) >= 32:
+        return struct.unpack_from(">IQ", payload, 20)
+    if len(payload) >= 20:
+        return struct.unpack_from(">II", payload, 12)
+    return 0, 0
+
+
+def _tkhd_size(payload: bytes):
+    """(width, height) in pixels from a tkhd box (16.16 fixed point)."""
+    offset = 88 if payload[:1] == b"\x01" else 76
+    if len(payload) < offset + 8:
+        return 0, 0
+    width, height = struct.unpack_from(">II", payload, offset)
+    return width >> 16, height >> 16
+
+
+def _stts_frames(f, offset: int, size: int) -> int:
+    if size < 8 or size > MAX_STTS_BYTES:
+        return 0
+    f.seek(offset)
+    payload = f.read(size)
+    entries = struct.unpack_from(">I", payload, 4)[0]
+    entries = min(entries, (len(payload) - 8) // 8)
+    table = np.frombuffer(payload, dtype=">u4", count=entries * 2, offset=8)
+    return int(table[0::2].sum(dtype=np.int64))
+
+
+def _video_track(f, offset: int, size: int):
+    """Reads one trak; returns its info dict if it is a video track, else None."""
+    info = {"width": 0, "height": 0, "timescale": 0, "duration": 0, "frames": 0}
+    handler = None
+
+    def walk(start, length):
+        nonlocal handler
+        for box_type, payload_offset, payload_size in _boxes(f, start, start + length):
+            if box_type in (b"mdia", b"minf", b"stbl"):
+                walk(payload_offset, payload_size)
+            elif box_type == b"tkhd":
+                info["width"], info["height"] = _tkhd_size(_read_full_box(f, payload_offset, payload_size))
+            elif box_type == b"mdhd":
+                info["timescale"], info["duration"] = _mvhd_or_mdhd(_read_full_box(f, payload_offset, payload_size))
+            elif box_type == b"hdlr":
+                payload = _read_full_box(f, payload_offset, payload_size)
+                handler = payload[8:12] if len(payload) >= 12 else None
+            elif box_type == b"stts":
+                info["frames"] = _stts_frames(f, payload_offset, payload_size)
+
+    walk(offset, size)
+    return info if handler == b"vide" else None
+
+
+def read_video_info(path: str):
+    """
+    Container-level facts about an MP4/MOV file without decoding it:
+    {"duration", "frames", "fps", "width", "height", "fragmented"}, with None
+    for what the header does not say. Returns None for other containers.
+    """
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(8)
+        if len(head) < 8 or head[4:8] not in LEADING_BOXES:
+            return None
+        movie = None
+        fragmented = False
+        track = None
+        for box_type, payload_offset, payload_size in _boxes(f, 0, file_size):
+            if box_type == b"moof":
+                fragmented = True
+            if box_type != b"moov":
+                continue
+            for inner_type, inner_offset, inner_size in _boxes(f, payload_offset, payload_offset + payload_size):
+                if inner_type == b"mvhd":
+                    movie = _mvhd_or_mdhd(_read_full_box(f, inner_offset, inner_size))
+                elif inner_type == b"mvex":
+                    fragmented = True
+                elif inner_type == b"trak" and track is None:
+                    track = _video_track(f, inner_offset, inner_size)
+        if movie is None and track is None:
+            return None
+
+    duration = None
+    if track and track["timescale"] and track["duration"]:
+        duration = track["duration"] / track["timescale"]
+    elif movie and movie[0] and movie[1]:
+        duration = movie[1] / movie[0]
+    # Fragmented files keep their samples in moof boxes, not in the moov tables
+    frames = track["frames"] if track and track["frames"] else None
+    return {
+        "duration": duration,
+        "frames": frames,
+        "fps": frames / duration if frames and duration else None,
+        "width": track["width"] if track and track["width"] else None,
+        "height": track["height"] if track and track["height"] else None,
+        "fragmented": fragmented,
+    }
+
+
+def scan_gyro(path: str) -> dict:
+    """Sample count, time span, median rate and ordering of a gyro log (CSV or VPGY)."""
+    raw, rates, nanoseconds = gyro_analysis.read_gyro(path)
+    samples = len(raw)
+    if samples == 0:
+        return {"samples": 0}
+    t = gyro_analysis.gyro_seconds(np.asarray(raw, dtype=np.float64), raw[0], nanoseconds)
+    dt = np.diff(t)
+    increasing = dt[dt > 0]
+    return {
+        "samples": samples,
+        "duration": float(t[-1] - t[0]),
+        "rate": float(1.0 / np.median(increasing)) if len(increasing) else None,
+        "non_increasing": int(np.count_nonzero(dt <= 0)),
+        "finite": bool(np.isfinite(t).all() and np.isfinite(rates).all()),
+    }
+
+
+def scan_flow(path: str) -> dict:
+    timestamps, flow_x = gyro_analysis.load_flow_csv(path)
+    if len(timestamps) == 0:
+        return {"samples": 0}
+    return {"samples": len(timestamps), "duration": float(timestamps[-1] - timestamps[0])}
+
+
+def check_bundle(video_path: str, gyro_path: str, flow_path: str = None, strict: bool = True) -> dict:
+    """
+    Runs every check on local files. Returns the report
+    {"video", "gyro", ["flow",] "errors", "warnings"}, each issue being
+    {"code", "message"}. Raises PreflightError when there are errors and
+    `strict` is set; otherwise errors are only reported.
+    """
+    errors, warnings = [], []
+
+    def error(code, message):
+        errors.append({"code": code, "message": message})
+
+    def warn(code, message):
+        warnings.append({"code": code, "message": message})
+
+    try:
+        video = read_video_info(video_path)
+    except (OSError, struct.error, ValueError) as e:
+        logger.warning(f"Could not read container header of {video_path}: {e}")
+        video = None
+    gyro = scan_gyro(gyro_path)
+    flow = scan_flow(flow_path) if flow_path else None
+    report = {"video": video, "gyro": gyro, "errors": errors, "warnings": warnings}
+    if flow is not None:
+        report["flow"] = flow
+
+    if video is None:
+        warn("video_unparsed", "Container header not inspected (only MP4/MOV headers are read)")
+    else:
+        if video["frames"] is not None and video["frames"] < MIN_FRAMES:
+            error("video_too_few_frames", f"Video has {video['frames']} frames, at least {MIN_FRAMES} are needed")
+        if video["fps"] is not None and video["fps"] > MAX_FPS:
+            warn("video_fps", f"Implausible frame rate of {video['fps']:.0f} fps")
+        if video["duration"] is None or video["frames"] is None:
+            warn("video_header_incomplete", "Duration or frame count missing from the container header")
+
+    if flow is not None and flow["samples"] < MIN_FRAMES - 1:
+        error("flow_too_few_samples", f"Flow CSV has {flow['samples']} samples, at least {MIN_FRAMES - 1} are needed")
+
+    if gyro["samples"] == 0:
+        error("gyro_empty", "Gyro log has no readable samples")
+    else:
+        if not gyro["finite"]:
+            error("gyro_non_finite", "Gyro log contains NaN or infinite values")
+        if gyro["samples"] < MIN_GYRO_SAMPLES:
+            error("gyro_too_few_samples", f"Gyro log has {gyro['samples']} samples, at least {MIN_GYRO_SAMPLES} are needed")
+        if gyro["rate"] is None:
+            error("gyro_not_increasing", "Gyro timestamps never increase")
+        elif gyro["duration"] <= 0:
+            error("gyro_not_increasing", "Gyro timestamps run backwards")
+        elif gyro["non_increasing"]:
+            warn("gyro_out_of_order", f"{gyro['non_increasing']} gyro timestamps do not increase")
+        if gyro["rate"] is not None and gyro["rate"] < MIN_TREMOR_RATE:
+            warn("gyro_low_rate", f"Gyro rate of {gyro['rate']:.1f} Hz is too low for tremor analysis")
+
+        # What the gyro log has to cover: the clip, or the precomputed flow signal
+        span = flow["duration"] if flow and flow["samples"] else (video or {}).get("duration")
+        if span and gyro["duration"] > 0:
+            coverage = gyro["duration"] / span
+            report["coverage"] = coverage
+            message = f"Gyro log covers {gyro['duration']:.2f}s of a {span:.2f}s recording"
+            if coverage < MIN_COVERAGE:
+                error("gyro_coverage", message)
+            elif coverage < WARN_COVERAGE:
+                warn("gyro_coverage", message)
+
+    if errors and strict:
+        raise PreflightError("; ".join(e["message"] for e in errors), report)
+    return report
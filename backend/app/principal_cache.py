@@ -0,0 +1,191 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+
+class Principal:
+    """Detached, read-only snapshot of a User, safe to share across requests and threads."""
+
+    def __init__(self, id: int, email: str, is_admin: bool = False, is_active: bool = True):
+        self.id = id
+        self.email = email
+        self.is_admin = is_admin
+        self.is_active = is_active
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(user.id, user.email, bool(user.is_admin), bool(user.is_active))
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "email": self.email, "is_admin": self.is_admin, "is_active": self.is_active}
+
+
+class LocalBackend:
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if time.monotonic() >= expires:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: float):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisBackend:
+    """
+    Shared backend so every uvicorn worker sees the same entries and the same
+    invalidations. Requires the optional `redis` package.
+    A Redis error is logged and treated as a miss, so lookups fall through to
+    the database instead of failing the request.
+    """
+
+    def __init__(self, url: str, prefix: str = "vp:principal:"):
+        import redis  # Optional dependency
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._error = redis.RedisError
+
+    def get(self, key: str):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except self._error as e:
+            logger.warning(f"Principal cache unavailable, reading from the database: {e}")
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value, ttl: float):
+        try:
+            self.client.set(self.prefix + key, json.dumps(value), ex=max(1, int(ttl)))
+        except self._error as e:
+            logger.warning(f"Principal cache unavailable, entry not stored: {e}")
+
+    def delete(self, key: str):
+        try:
+            self.client.delete(self.prefix + key)
+        except self._error as e:
+            logger.error(f"Principal cache unavailable, stale entry kept until it expires: {e}")
+
+    def clear(self):
+        try:
+            for key in self.client.scan_iter(self.prefix + "*"):
+                self.client.delete(key)
+        except self._error as e:
+            logger.error(f"Principal cache unavailable, could not clear it: {e}")
+
+
+class PrincipalCache:
+    """
+    Caches API-key -> user id and JWT subject -> Principal lookups.
+    Entries expire after `ttl` seconds and are dropped explicitly when the
+    underlying ApiKey or User row changes (see `install_invalidation_hooks`).
+    """
+
+    def __init__(self, backend, ttl: float = 60.0):
+        self.backend = backend
+        self.ttl = ttl
+
+    # API keys, stored under their hash so the cache never holds a credential
+    @staticmethod
+    def _api_key_entry(key: str) -> str:
+        return "key:" + hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get_api_key(self, key: str):
+        return self.backend.get(self._api_key_entry(key))
+
+    def set_api_key(self, key: str, user_id: int):
+        self.backend.set(self._api_key_entry(key), user_id, self.ttl)
+
+    def invalidate_api_key(self, key: str):
+        self.backend.delete(self._api_key_entry(key))
+
+    # Users (by JWT subject, i.e. email)
+    def get_user(self, email: str):
+        value = self.backend.get(f"user:{email}")
+        return Principal(**value) if value is not None else None
+
+    def set_user(self, principal: Principal):
+        self.backend.set(f"user:{principal.email}", principal.to_dict(), self.ttl)
+
+    def invalidate_user(self, email: str):
+        self.backend.delete(f"user:{email}")
+
+    def clear(self):
+        self.backend.clear()
+
+
+def create_cache(url: str = None, ttl: float = 60.0, max_entries: int = 10000) -> PrincipalCache:
+    if url:
+        try:
+            return PrincipalCache(RedisBackend(url), ttl)
+        except ImportError:
+            logger.warning("redis package not installed, falling back to in-process principal cache")
+    return PrincipalCache(LocalBackend(max_entries), ttl)
+
+
+def install_invalidation_hooks(cache: PrincipalCache):
+    """
+    Drops cache entries for every User/ApiKey row changed through the ORM,
+    once the transaction commits (so a concurrent reader cannot re-cache the
+    old row in between). Bulk `query.update()` bypasses this; call the
+    invalidate_* methods directly in that case.
+    """
+
+    @event.listens_for(Session, "after_flush")
+    def _collect(session, flush_context):
+        pending = session.info.setdefault("principal_invalidations", set())
+        for obj in list(session.dirty) + list(session.deleted):
+            if isinstance(obj, models.ApiKey):
+                pending.add(("key", obj.key))
+            elif isinstance(obj, models.User):
+                pending.add(("user", obj.email))
+                # The email (cache key) itself may have changed
+                for old_email in inspect(obj).attrs.email.history.deleted or ():
+                    pending.add(("user", old_email))
+
+    @event.listens_for(Session, "after_commit")
+    def _apply(session):
+        for kind, value in session.info.pop("principal_invalidations", set()):
+            if kind == "key":
+                cache.invalidate_api_key(value)
+            else:
+                cache.invalidate_user(value)
+
+    @event.listens_for(Session, "after_rollback")
+    def _discard(session):
+        session.info.pop("principal_invalidations", None)
@@ -0,0 +1,97 @@
+"""
+Named optical-flow analysis profiles: how much of a clip vp_cli looks at.
+
+Optical flow dominates the cost of a verification and grows with resolution
+and frame count, while the verdict only needs the mean pan of each frame.
+A profile caps the working width (frames are downscaled before Farneback),
+computes flow between every `stride`-th frame, and sets the Farneback pyramid
+and the margin cropped from each side. vp_cli reports flow in full-resolution
+pixels per frame whatever the profile, so scores stay comparable.
+
+Profiles are resolved here and sent to vp_cli as explicit parameters, so a
+job's details record exactly what was computed even if a profile is retuned
+later. "accurate" is what vp_cli does without a profile.
+"""
+import hashlib
+
+# Parameter order of the spec string sent to vp_cli
+PARAMS = ("max_width", "stride", "pyr_scale", "levels", "winsize", "iterations", "poly_n", "poly_sigma", "roi_margin")
+
+
+class AnalysisProfile:
+    def __init__(
+        self,
+        name: str,
+        max_width: int = 0,
+        stride: int = 1,
+        pyr_scale: float = 0.5,
+        levels: int = 3,
+        winsize: int = 15,
+        iterations: int = 3,
+        poly_n: int = 5,
+        poly_sigma: float = 1.2,
+        roi_margin: float = 0.1,
+    ):
+        if max_width < 0 or stride < 1 or levels < 1 or winsize < 3 or iterations < 1:
+            raise ValueError(f"Invalid analysis profile {name!r}")
+        if not 0.0 < pyr_scale < 1.0 or poly_n not in (5, 7) or poly_sigma <= 0 or not 0.0 <= roi_margin < 0.5:
+            raise ValueError(f"Invalid analysis profile {name!r}")
+        self.name = name
+        self.max_width = int(max_width)
+        self.stride = int(stride)
+        self.pyr_scale = float(pyr_scale)
+        self.levels = int(levels)
+        self.winsize = int(winsize)
+        self.iterations = int(iterations)
+        self.poly_n = int(poly_n)
+        self.poly_sigma = float(poly_sigma)
+        self.roi_margin = float(roi_margin)
+
+    def params(self) -> dict:
+        return {param: getattr(self, param) for param in PARAMS}
+
+    def to_dict(self) -> dict:
+        return dict(self.params(), name=self.name)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "AnalysisProfile":
+        """Inverse of to_dict (e.g. the "profile" recorded in a job's details)."""
+        return cls(data.get("name", "custom"), **{param: data[param] for param in PARAMS if param in data})
+
+    def spec(self) -> str:
+        """The `key=value,...` field vp_cli's VERIFY and FLOW requests take."""
+        return ",".join(f"{param}={value:g}" for param, value in self.params().items())
+
+    @property
+    def is_baseline(self) -> bool:
+        """Computes exactly what vp_cli does without a profile."""
+        return self.params() == AnalysisProfile("baseline").params()
+
+    def flow_key(self, video_sha256: str):
+        """
+        Flow cache key of a video analysed with this profile. Baseline flow
+        keeps the bare content hash; other profiles are keyed by their
+        parameters, so retuning a profile never serves stale flow.
+        """
+        if not video_sha256 or self.is_baseline:
+            return video_sha256
+        return f"{video_sha256}-{hashlib.sha256(self.spec().encode()).hexdigest()[:12]}"
+
+
+PROFILES = {
+    # Half-scale pyramid on quarter-width frames, every other frame
+    "fast": AnalysisProfile("fast", max_width=480, stride=2, levels=2, winsize=11, iterations=2),
+    # Every frame, downscaled to 960 pixels wide
+    "balanced": AnalysisProfile("balanced", max_width=960),
+    # Full resolution, every frame
+    "accurate": AnalysisProfile("accurate"),
+}
+BASELINE = "accurate"
+
+
+def get_profile(name: str) -> AnalysisProfile:
+    """Raises ValueError for unknown names."""
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown analysis profile {name!r} (choose from {', '.join(PROFILES)})") from None
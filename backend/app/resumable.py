@@ -0,0 +1,210 @@
+import base64
+import datetime
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+
+from fastapi import HTTPException, Request
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+
+from . import models
+from .storage import file_sha256
+
+logger = logging.getLogger(__name__)
+
+TUS_VERSION = "1.0.0"
+TUS_EXTENSIONS = "creation,termination,expiration"
+OFFSET_CONTENT_TYPE = "application/offset+octet-stream"
+WRITER_LEASE_SECONDS = 120.0  # Renewed while the body keeps arriving
+
+
+def parse_upload_metadata(header: str) -> dict:
+    """tus `Upload-Metadata`: comma-separated `key base64(value)` pairs."""
+    metadata = {}
+    for pair in (header or "").split(","):
+        parts = pair.strip().split(" ", 1)
+        if not parts[0]:
+            continue
+        try:
+            metadata[parts[0]] = base64.b64decode(parts[1]).decode() if len(parts) > 1 else ""
+        except (ValueError, UnicodeDecodeError):
+            raise HTTPException(400, f"Invalid Upload-Metadata value for '{parts[0]}'")
+    return metadata
+
+
+def tus_headers(session: models.UploadSession = None) -> dict:
+    headers = {"Tus-Resumable": TUS_VERSION, "Cache-Control": "no-store"}
+    if session is not None:
+        headers["Upload-Offset"] = str(session.offset)
+        headers["Upload-Length"] = str(session.length)
+        if session.expires_at:
+            headers["Upload-Expires"] = session.expires_at.strftime("%a, %d %b %Y %H:%M:%S GMT")
+    return headers
+
+
+class _Hashers:
+    """
+    Running sha256 per session, so finalizing does not re-read the video.
+    Only valid while every PATCH lands in this process; otherwise the file is
+    hashed once at finalize.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._hashers = {}  # session id -> (offset, hasher)
+
+    def get(self, session_id: str, offset: int):
+        with self._lock:
+            entry = self._hashers.pop(session_id, None)
+        if offset == 0:
+            return hashlib.sha256()
+        if entry is not None and entry[0] == offset:
+            return entry[1]
+        return None
+
+    def put(self, session_id: str, offset: int, hasher):
+        if hasher is None:
+            return
+        with self._lock:
+            if len(self._hashers) >= self.max_entries:
+                self._hashers.pop(next(iter(self._hashers)))
+            self._hashers[session_id] = (offset, hasher)
+
+    def digest(self, session_id: str, offset: int):
+        with self._lock:
+            entry = self._hashers.pop(session_id, None)
+        if entry is not None and entry[0] == offset:
+            return entry[1].hexdigest()
+        return None
+
+    def discard(self, session_id: str):
+        with self._lock:
+            self._hashers.pop(session_id, None)
+
+
+hashers = _Hashers()
+
+
+def _write_at(path: str, offset: int, chunk: bytes, hasher):
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        f.write(chunk)
+    if hasher is not None:
+        hasher.update(chunk)
+
+
+def claim_writer(db: Session, session_id: str, offset: int) -> str:
+    """
+    Leases the session to one PATCH at `offset`, across API processes: a
+    second PATCH is refused until the first has committed its offset (or its
+    lease ran out), so two requests never write the same bytes. Returns the
+    lease token, or None if the session is busy or not at `offset`.
+    """
+    Upload = models.UploadSession
+    now = datetime.datetime.utcnow()
+    token = uuid.uuid4().hex
+    claimed = db.query(Upload).filter(
+        Upload.id == session_id,
+        Upload.offset == offset,
+        Upload.job_id == None,
+        or_(Upload.writer_token == None, Upload.writer_expires_at < now),
+    ).update({
+        Upload.writer_token: token,
+        Upload.writer_expires_at: now + datetime.timedelta(seconds=WRITER_LEASE_SECONDS),
+    }, synchronize_session=False)
+    db.commit()
+    return token if claimed else None
+
+
+def _renew_writer(db: Session, session_id: str, token: str) -> bool:
+    Upload = models.UploadSession
+    renewed = db.query(Upload).filter(Upload.id == session_id, Upload.writer_token == token).update({
+        Upload.writer_expires_at: datetime.datetime.utcnow() + datetime.timedelta(seconds=WRITER_LEASE_SECONDS),
+    }, synchronize_session=False)
+    db.commit()
+    return bool(renewed)
+
+
+def release_writer(db: Session, session_id: str, token: str, offset: int = None, expires_at: datetime.datetime = None) -> bool:
+    """Ends the PATCH's lease, storing its new offset if given; False if the lease was lost."""
+    Upload = models.UploadSession
+    values = {Upload.writer_token: None, Upload.writer_expires_at: None}
+    if offset is not None:
+        values[Upload.offset] = offset
+        values[Upload.expires_at] = expires_at
+    released = db.query(Upload).filter(Upload.id == session_id, Upload.writer_token == token).update(
+        values, synchronize_session=False
+    )
+    db.commit()
+    return bool(released)
+
+
+async def append_chunk(request: Request, session: models.UploadSession, db: Session, token: str):
+    """
+    Writes the PATCH body at `session.offset`, directly into the session's
+    data file (no per-chunk files to reassemble later), under the writer lease
+    `token` from claim_writer. Bytes received before a client disconnect are
+    kept, so the client resumes from where it got to. Returns the new offset
+    and the running hash; the caller stores both once the offset is committed.
+    """
+    offset = session.offset
+    hasher = hashers.get(session.id, offset)
+    renewed = time.monotonic()
+    try:
+        async for chunk in request.stream():
+            if not chunk:
+                continue
+            if offset + len(chunk) > session.length:
+                raise HTTPException(413, "Chunk goes past the declared Upload-Length")
+            # Renewed well before expiry, so no other PATCH can hold the lease while this one writes
+            if time.monotonic() - renewed > WRITER_LEASE_SECONDS / 2:
+                if not await run_in_threadpool(_renew_writer, db, session.id, token):
+                    raise HTTPException(409, "Upload was taken over by another request")
+                renewed = time.monotonic()
+            await run_in_threadpool(_write_at, session.data_path, offset, chunk, hasher)
+            offset += len(chunk)
+    except ClientDisconnect:
+        logger.info(f"Upload {session.id} interrupted at offset {offset}")
+    return offset, hasher
+
+
+def session_sha256(session: models.UploadSession) -> str:
+    """Hash of the complete video; stored on the session, which keeps it once the file has moved."""
+    if session.video_sha256 is None:
+        session.video_sha256 = hashers.digest(session.id, session.offset) or file_sha256(session.data_path)
+    return session.video_sha256
+
+
+def delete_session_files(session: models.UploadSession):
+    hashers.discard(session.id)
+    for path in (session.data_path, session.gyro_path):
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+def expire_sessions(db: Session) -> dict:
+    """Drops unfinished sessions past their expiry, with their partial files."""
+    now = datetime.datetime.utcnow()
+    expired = db.query(models.UploadSession).filter(
+        models.UploadSession.job_id == None,
+        models.UploadSession.expires_at < now,
+    ).all()
+    freed = 0
+    for session in expired:
+        freed += session.offset
+        delete_session_files(session)
+        db.delete(session)
+    # Finished sessions only keep their job link for idempotent finalize retries
+    db.query(models.UploadSession).filter(
+        models.UploadSession.job_id != None,
+        models.UploadSession.expires_at < now,
+    ).delete(synchronize_session=False)
+    db.commit()
+    return {"removed": len(expired), "bytes": freed}
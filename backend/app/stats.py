@@ -0,0 +1,135 @@
+import threading
+import time
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Counter names kept in the `stat_counters` table
+JOBS_TOTAL = "jobs_total"
+USERS_TOTAL = "users_total"
+
+
+def status_counter(status: str) -> str:
+    return f"jobs_status:{status}"
+
+
+def consistent_counter(is_consistent) -> str:
+    return f"jobs_consistent:{'null' if is_consistent is None else str(bool(is_consistent)).lower()}"
+
+
+def bump(db: Session, name: str, delta: int = 1):
+    """
+    Adjusts a counter inside the caller's transaction, so the counter and the
+    row change it reflects commit (or roll back) together.
+    """
+    if delta == 0:
+        return
+    Counter = models.StatCounter
+    updated = db.query(Counter).filter(Counter.name == name).update(
+        {Counter.value: Counter.value + delta}, synchronize_session=False
+    )
+    if updated:
+        return
+    try:
+        with db.begin_nested():
+            db.add(Counter(name=name, value=delta))
+    except IntegrityError:
+        # Created concurrently; the row exists now
+        db.query(Counter).filter(Counter.name == name).update(
+            {Counter.value: Counter.value + delta}, synchronize_session=False
+        )
+
+
+def record_job_created(db: Session, status: str = "PENDING", count: int = 1):
+    bump(db, JOBS_TOTAL, count)
+    bump(db, status_counter(status), count)
+    bump(db, consistent_counter(None), count)
+
+
+def record_transition(db: Session, old_status: str, old_consistent, new_status: str, new_consistent):
+    if old_status != new_status:
+        bump(db, status_counter(old_status), -1)
+        bump(db, status_counter(new_status), 1)
+    if old_consistent != new_consistent:
+        bump(db, consistent_counter(old_consistent), -1)
+        bump(db, consistent_counter(new_consistent), 1)
+
+
+def record_user_created(db: Session):
+    bump(db, USERS_TOTAL)
+
+
+def rebuild_counters(db: Session):
+    """
+    Recomputes every counter from the base tables with one aggregate query
+    over verification_jobs. Used to seed the table and to repair drift.
+    """
+    Job = models.VerificationJob
+    counts = {}
+    total = 0
+    rows = db.query(Job.status, Job.is_consistent, func.count(Job.id)).group_by(Job.status, Job.is_consistent).all()
+    for job_status, is_consistent, n in rows:
+        total += n
+        counts[status_counter(job_status)] = counts.get(status_counter(job_status), 0) + n
+        counts[consistent_counter(is_consistent)] = counts.get(consistent_counter(is_consistent), 0) + n
+    counts[JOBS_TOTAL] = total
+    counts[USERS_TOTAL] = db.query(func.count(models.User.id)).scalar()
+
+    db.query(models.StatCounter).delete(synchronize_session=False)
+    db.add_all([models.StatCounter(name=name, value=value) for name, value in counts.items()])
+    db.commit()
+    _cache.clear()
+
+
+def ensure_counters(db: Session):
+    if db.query(models.StatCounter).first() is None:
+        rebuild_counters(db)
+
+
+class _TTLCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = None
+        self._expires = 0.0
+
+    def get(self):
+        with self._lock:
+            if self._value is not None and time.monotonic() < self._expires:
+                return self._value
+            return None
+
+    def set(self, value, ttl: float):
+        with self._lock:
+            self._value = value
+            self._expires = time.monotonic() + ttl
+
+    def clear(self):
+        with self._lock:
+            self._value = None
+
+
+_cache = _TTLCache()
+
+
+def get_admin_stats(db: Session, ttl: float = 0.0) -> dict:
+    """Reads the dashboard numbers from the counters table (optionally cached for `ttl` seconds)."""
+    if ttl > 0:
+        cached = _cache.get()
+        if cached is not None:
+            return cached
+
+    counters = dict(db.query(models.StatCounter.name, models.StatCounter.value).all())
+    stats = {
+        "total_jobs": counters.get(JOBS_TOTAL, 0),
+        "verified_jobs": counters.get(consistent_counter(True), 0),
+        "failed_jobs": counters.get(consistent_counter(False), 0),
+        "processing_jobs": counters.get(status_counter("PROCESSING"), 0),
+        "signing_jobs": counters.get(status_counter("SIGNING"), 0),
+        "users_count": counters.get(USERS_TOTAL, 0),
+    }
+    if ttl > 0:
+        _cache.set(stats, ttl)
+    return stats
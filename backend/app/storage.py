@@ -0,0 +1,344 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+
+from sqlalchemy import or_
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# Jobs in these states still need their uploaded files
+ACTIVE_STATUSES = ("PENDING", "PROCESSING", "SIGNING")
+
+
+def blob_key(kind: str, sha256: str, ext: str = "") -> str:
+    """Content-addressed key, e.g. `uploads/<sha256>.mp4`; identical files share one blob."""
+    return f"{kind}/{sha256}{(ext or '').lower()}"
+
+
+def blob_sha256(key: str) -> str:
+    """The content hash a blob_key was built from."""
+    return os.path.splitext(key.rpartition("/")[2])[0]
+
+
+class LocalStorage:
+    """
+    Content-addressed blobs on the local filesystem, sharded by hash prefix:
+    `uploads/<sha>.mp4` lives at `<root>/uploads/<sha[:2]>/<sha>.mp4`.
+    Keys that are absolute paths (rows written before this layer existed)
+    resolve to themselves.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        if os.path.isabs(key):
+            return key
+        kind, _, name = key.partition("/")
+        return os.path.join(self.root, kind, name[:2], name)
+
+    def put_file(self, src_path: str, key: str) -> str:
+        """Moves a finished local file into the store; an existing blob is kept and touched."""
+        dest = self.path(key)
+        if os.path.exists(dest):
+            os.remove(src_path)
+            os.utime(dest)  # Restarts the GC grace period for the shared blob
+            return key
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(src_path, dest)
+        return key
+
+    def fetch(self, key: str) -> str:
+        """Local path for reading the blob (verifier and signer need real files)."""
+        return self.path(key)
+
+    def evict_local(self, key: str):
+        pass  # Blobs are the local copies
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def stat(self, key: str):
+        """(size, mtime) or None."""
+        try:
+            st = os.stat(self.path(key))
+        except FileNotFoundError:
+            return None
+        return st.st_size, st.st_mtime
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def list(self, kind: str):
+        """Yields (key, size, mtime) for every blob of `kind`."""
+        base = os.path.join(self.root, kind)
+        if not os.path.isdir(base):
+            return
+        for shard in os.scandir(base):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.is_file():
+                    st = entry.stat()
+                    yield f"{kind}/{entry.name}", st.st_size, st.st_mtime
+
+    def url(self, key: str, expires: int = 3600):
+        return None  # Served by the API itself
+
+
+class S3Storage:
+    """
+    Blobs in an S3-compatible bucket (AWS, MinIO, or any local stand-in via
+    `endpoint_url`). Workers download blobs into `cache_dir` to process them.
+    Requires the optional `boto3` package.
+    """
+
+    def __init__(self, bucket: str, cache_dir: str, prefix: str = "", endpoint_url: str = None):
+        import boto3  # Optional dependency
+
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefix = prefix
+        self.cache = LocalStorage(cache_dir)
+
+    def _object(self, key: str) -> str:
+        return self.prefix + key
+
+    def put_file(self, src_path: str, key: str) -> str:
+        if self.stat(key) is None:
+            self.client.upload_file(src_path, self.bucket, self._object(key))
+        else:
+            # Re-copy in place to refresh LastModified, restarting the GC grace period
+            self.client.copy_object(
+                Bucket=self.bucket, Key=self._object(key),
+                CopySource={"Bucket": self.bucket, "Key": self._object(key)},
+                MetadataDirective="REPLACE",
+            )
+        os.remove(src_path)
+        return key
+
+    def fetch(self, key: str) -> str:
+        path = self.cache.path(key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.part"
+            self.client.download_file(self.bucket, self._object(key), tmp)
+            os.replace(tmp, path)
+        return path
+
+    def evict_local(self, key: str):
+        self.cache.delete(key)
+
+    def exists(self, key: str) -> bool:
+        return self.stat(key) is not None
+
+    def stat(self, key: str):
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._object(key))
+        except ClientError:
+            return None
+        return head["ContentLength"], head["LastModified"].timestamp()
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object(key))
+        self.cache.delete(key)
+
+    def list(self, kind: str):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._object(f"{kind}/")):
+            for obj in page.get("Contents", []):
+                yield obj["Key"][len(self.prefix):], obj["Size"], obj["LastModified"].timestamp()
+
+    def url(self, key: str, expires: int = 3600):
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": self._object(key)}, ExpiresIn=expires
+        )
+
+
+def create_storage(root: str, s3_bucket: str = None, s3_prefix: str = "", s3_endpoint_url: str = None):
+    if s3_bucket:
+        try:
+            return S3Storage(s3_bucket, os.path.join(root, "cache"), prefix=s3_prefix, endpoint_url=s3_endpoint_url)
+        except ImportError:
+            logger.warning("boto3 not installed, falling back to local storage")
+    return LocalStorage(root)
+
+
+class StorageGC:
+    """
+    Reclaims space from three places:
+    - upload blobs no active job references (finished, failed or orphaned by a
+      crash), once they are older than `grace` seconds;
+    - signed outputs beyond `signed_max_age` seconds or, oldest first, beyond
+      `signed_max_bytes` in total (their jobs' signed_url is cleared);
+    - abandoned files in the local staging directory;
+    - anything registered with `add_collector` (called with a session).
+    Runs every `interval` seconds in a background thread, or on demand.
+    """
+
+    def __init__(
+        self,
+        storage,
+        session_factory,
+        staging_dir: str = None,
+        interval: float = 300.0,
+        grace: float = 3600.0,
+        signed_max_age: float = 30 * 86400.0,
+        signed_max_bytes: int = 0,
+    ):
+        self.storage = storage
+        self.session_factory = session_factory
+        self.staging_dir = staging_dir
+        self.interval = interval
+        self.grace = grace
+        self.signed_max_age = signed_max_age
+        self.signed_max_bytes = signed_max_bytes
+        self._collectors = {}
+        self._stopping = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def add_collector(self, name: str, collector):
+        self._collectors[name] = collector
+
+    def _referenced(self, db, keys=None) -> set:
+        """Keys still needed by an active job (optionally only among `keys`)."""
+        Job = models.VerificationJob
+        query = db.query(Job.video_path, Job.gyro_path, Job.flow_path).filter(Job.status.in_(ACTIVE_STATUSES))
+        if keys is not None:
+            query = query.filter(or_(Job.video_path.in_(keys), Job.gyro_path.in_(keys), Job.flow_path.in_(keys)))
+        return {key for row in query for key in row if key}
+
+    def release(self, db, keys, stored_before: float):
+        """
+        Called when a job is done with its files: deletes the blobs no other
+        active job uses. A blob touched after `stored_before` (the job's
+        creation time) was re-uploaded by a request whose job may not be
+        committed yet, so it is left to `collect`.
+        """
+        keys = [k for k in keys if k]
+        if not keys:
+            return
+        referenced = self._referenced(db, keys)
+        for key in keys:
+            self.storage.evict_local(key)
+            if key in referenced:
+                continue
+            info = self.storage.stat(key)
+            if info is not None and info[1] <= stored_before:
+                self.storage.delete(key)
+
+    def collect(self) -> dict:
+        with self._lock:
+            db = self.session_factory()
+            try:
+                result = {
+                    "uploads": self._collect_uploads(db),
+                    "signed": self._collect_signed(db),
+                    "staging": self._collect_staging(),
+                }
+                for name, collector in self._collectors.items():
+                    result[name] = collector(db)
+                return result
+            finally:
+                db.close()
+
+    def _collect_uploads(self, db) -> dict:
+        referenced = self._referenced(db)
+        now = time.time()
+        removed = freed = 0
+        for key, size, mtime in list(self.storage.list("uploads")):
+            if key not in referenced and now - mtime >= self.grace:
+                self.storage.delete(key)
+                removed += 1
+                freed += size
+        return {"removed": removed, "bytes": freed}
+
+    def _collect_signed(self, db) -> dict:
+        now = time.time()
+        blobs = sorted(self.storage.list("signed"), key=lambda b: b[2])  # Oldest first
+        total = sum(size for _, size, _ in blobs)
+        expired = []
+        for key, size, mtime in blobs:
+            too_old = self.signed_max_age > 0 and now - mtime >= self.signed_max_age
+            too_big = self.signed_max_bytes > 0 and total > self.signed_max_bytes
+            if not (too_old or too_big):
+                continue
+            expired.append((key, size))
+            total -= size
+
+        for key, _ in expired:
+            self.storage.delete(key)
+        # Jobs should not advertise files that are gone
+        urls = [file_url(key) for key, _ in expired]
+        for i in range(0, len(urls), 500):
+            db.query(models.VerificationJob).filter(
+                models.VerificationJob.signed_url.in_(urls[i:i + 500])
+            ).update({models.VerificationJob.signed_url: None}, synchronize_session=False)
+        db.commit()
+        return {"removed": len(expired), "bytes": sum(size for _, size in expired)}
+
+    def _collect_staging(self) -> dict:
+        removed = freed = 0
+        if not self.staging_dir or not os.path.isdir(self.staging_dir):
+            return {"removed": 0, "bytes": 0}
+        cutoff = time.time() - self.grace
+        for entry in os.scandir(self.staging_dir):
+            try:
+                st = entry.stat()
+                if st.st_mtime >= cutoff:
+                    continue
+                if entry.is_dir():
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    os.remove(entry.path)
+                removed += 1
+                freed += st.st_size
+            except FileNotFoundError:
+                continue
+        return {"removed": removed, "bytes": freed}
+
+    def start(self):
+        if self.interval <= 0:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._loop, name="storage-gc", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                result = self.collect()
+                logger.info(f"Storage GC: {result}")
+            except Exception:
+                logger.exception("Storage GC failed")
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_url(key: str) -> str:
+    """Public URL of a signed output (see the /files route)."""
+    return f"/files/{key.partition('/')[2]}"
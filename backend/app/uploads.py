@@ -0,0 +1,249 @@
+import hashlib
+import os
+import time
+
+from fastapi import HTTPException, Request, status
+from python_multipart import MultipartParser
+from python_multipart.multipart import parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+MAX_FIELD_BYTES = 64 * 1024  # Non-file form fields
+
+VIDEO_CONTENT_TYPES = {
+    "video/mp4",
+    "video/quicktime",
+    "video/x-m4v",
+    "video/webm",
+    "video/x-matroska",
+    "application/octet-stream",
+}
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".m4v", ".webm", ".mkv"}
+
+GYRO_CONTENT_TYPES = {
+    "text/csv",
+    "text/plain",
+    "application/csv",
+    "application/vnd.ms-excel",
+    "application/vnd.veriphysics.gyro",  # Binary VPGY log, see gyro_format
+    "application/octet-stream",
+}
+GYRO_EXTENSIONS = {".csv", ".txt", ".vpgy"}
+
+
+def safe_filename(filename: str, default: str) -> str:
+    name = os.path.basename(filename or "").strip()
+    return name or default
+
+
+def check_upload_type(filename: str, content_type: str, content_types: set, extensions: set, field: str):
+    """
+    Reject obviously wrong files before any bytes reach disk.
+    `application/octet-stream` (what most HTTP clients send when they don't
+    know better) is only accepted when the file extension is plausible.
+    """
+    content_type = (content_type or "application/octet-stream").split(";")[0].strip().lower()
+    extension = os.path.splitext(filename or "")[1].lower()
+
+    if content_type not in content_types:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported content type for '{field}': {content_type}",
+        )
+    if content_type == "application/octet-stream" and extension not in extensions:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported file extension for '{field}': {extension or '(none)'}",
+        )
+
+
+class FilePart:
+    """A file field MultipartReceiver accepts, with its type and size limits."""
+
+    def __init__(self, content_types: set, extensions: set, max_bytes: int, default_name: str, required: bool = True):
+        self.content_types = content_types
+        self.extensions = extensions
+        self.max_bytes = max_bytes
+        self.default_name = default_name
+        self.required = required
+
+
+class ReceivedFile:
+    """A file part written to its staging path; `seconds` is how long it took to arrive."""
+
+    def __init__(self, field: str, filename: str, content_type: str, path: str):
+        self.field = field
+        self.filename = filename
+        self.content_type = content_type
+        self.path = path
+        self.size = 0
+        self.sha256 = None
+        self.seconds = 0.0
+
+
+class MultipartReceiver:
+    """
+    Parses a multipart/form-data request body as it streams in, instead of
+    letting FastAPI spool the whole body to temporary files first. Each file
+    part named in `files` is type-checked as soon as its headers arrive and
+    written straight to `staging_path(field, filename)`, hashed in the same
+    pass, so every byte is written once; the per-file and per-request limits
+    apply while the body is still arriving. Other small fields are returned
+    as strings (`on_field(name, value)` may reject them early); unknown
+    files are discarded. Parsing and disk writes run in the threadpool.
+    """
+
+    def __init__(self, files: dict, staging_path, max_request_bytes: int, on_field=None):
+        self.files = files
+        self.staging_path = staging_path
+        self.max_request_bytes = max_request_bytes
+        self.on_field = on_field
+        self.received = {}
+        self.fields = {}
+        self._done = False
+        self._part = None
+
+    async def receive(self, request: Request):
+        """Reads the whole body. Returns (received files by field, form fields)."""
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_request_bytes:
+            raise HTTPException(413, "Request exceeds the maximum upload size")
+        content_type, options = parse_options_header(request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data":
+            raise HTTPException(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, "Expected a multipart/form-data body")
+        if not options.get(b"boundary"):
+            raise HTTPException(400, "Multipart boundary missing")
+        parser = MultipartParser(options[b"boundary"], {
+            "on_part_begin": self._part_begin,
+            "on_header_field": self._header_field,
+            "on_header_value": self._header_value,
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+            "on_end": self._end,
+        })
+
+        total = 0
+        pending = bytearray()
+        try:
+            async for chunk in request.stream():
+                total += len(chunk)
+                if total > self.max_request_bytes:
+                    raise HTTPException(413, "Request exceeds the maximum upload size")
+                pending += chunk
+                # File data is written in CHUNK_SIZE batches; part headers are parsed as they arrive
+                in_file = self._part is not None and self._part["kind"] == "file"
+                if len(pending) >= CHUNK_SIZE or not in_file:
+                    await run_in_threadpool(parser.write, bytes(pending))
+                    pending.clear()
+            if pending:
+                await run_in_threadpool(parser.write, bytes(pending))
+            await run_in_threadpool(parser.finalize)
+        except BaseException:
+            await run_in_threadpool(self._close_part)
+            self.cleanup()
+            raise
+        if not self._done:
+            self.cleanup()
+            raise HTTPException(400, "Incomplete multipart body")
+        missing = [field for field, part in self.files.items() if part.required and field not in self.received]
+        if missing:
+            self.cleanup()
+            raise HTTPException(422, f"Missing file field(s): {', '.join(missing)}")
+        return self.received, self.fields
+
+    def cleanup(self):
+        """Removes every staged file."""
+        for received in self.received.values():
+            if os.path.exists(received.path):
+                os.remove(received.path)
+
+    # Parser callbacks
+
+    def _part_begin(self):
+        self._headers = {}
+        self._header_name = b""
+        self._header_value = b""
+
+    def _header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def _header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _header_end(self):
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def _headers_finished(self):
+        _, disposition = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = disposition.get(b"name", b"").decode("utf-8", "replace")
+        filename = disposition.get(b"filename")
+        part = self.files.get(name)
+        if part is None:
+            # A plain field, or a file nobody asked for (dropped)
+            self._part = {"kind": "skip" if filename is not None else "field", "name": name, "value": bytearray()}
+            return
+        if name in self.received:
+            raise HTTPException(422, f"File field '{name}' sent more than once")
+        filename = safe_filename(filename.decode("utf-8", "replace") if filename else "", part.default_name)
+        content_type = self._headers.get(b"content-type", b"").decode("latin-1")
+        check_upload_type(filename, content_type, part.content_types, part.extensions, name)
+        received = ReceivedFile(name, filename, content_type, self.staging_path(name, filename))
+        self.received[name] = received
+        self._part = {
+            "kind": "file", "name": name, "limit": part.max_bytes, "received": received,
+            "file": open(received.path, "wb"), "digest": hashlib.sha256(), "started": time.perf_counter(),
+        }
+
+    def _part_data(self, data: bytes, start: int, end: int):
+        part = self._part
+        if part["kind"] == "file":
+            received = part["received"]
+            received.size += end - start
+            if received.size > part["limit"]:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"File '{received.filename}' exceeds the maximum size of {part['limit']} bytes",
+                )
+            chunk = data[start:end]
+            part["digest"].update(chunk)
+            part["file"].write(chunk)
+        elif part["kind"] == "field":
+            part["value"] += data[start:end]
+            if len(part["value"]) > MAX_FIELD_BYTES:
+                raise HTTPException(413, f"Form field '{part['name']}' is too large")
+
+    def _part_end(self):
+        part = self._part
+        if part["kind"] == "file":
+            part["received"].sha256 = part["digest"].hexdigest()
+            part["received"].seconds = time.perf_counter() - part["started"]
+            self._close_part()
+        elif part["kind"] == "field":
+            value = part["value"].decode("utf-8", "replace")
+            if self.on_field:
+                self.on_field(part["name"], value)
+            self.fields[part["name"]] = value
+        self._part = None
+
+    def _close_part(self):
+        if self._part and self._part["kind"] == "file" and not self._part["file"].closed:
+            self._part["file"].close()
+
+    def _end(self):
+        self._done = True
+
+
+def multipart_openapi(files: dict, fields: tuple = ()) -> dict:
+    """`openapi_extra` documenting a body that MultipartReceiver parses."""
+    properties = {field: {"type": "string", "format": "binary"} for field in files}
+    properties.update({field: {"type": "string"} for field in fields})
+    required = [field for field, part in files.items() if part.required]
+    return {"requestBody": {"required": bool(required), "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "properties": properties,
+        "required": required,
+    }}}}}
@@ -1,96 +1,531 @@
-
 import subprocess
 import os
 import json
 import logging
+import queue
+import select
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from . import gyro_analysis, profiles
+from .flow_cache import FlowSeries
+from .profiles import AnalysisProfile
 
 logger = logging.getLogger(__name__)
 
-class MotionVerifierWrapper:
+VERDICTS = {True: "REAL/CONSISTENT", False: "FAKE/INCONSISTENT"}
+
+
+class VerifierError(Exception):
+    """Raised when a verifier worker times out, crashes or cannot be acquired."""
+
+
+class VerifierWorker:
+    """
+    A single long-lived `vp_cli --serve` process.
+    Requests are written as one tab-separated line on stdin; responses are read
+    from stdout up to an `END` (or `PONG`) terminator.
+    """
+
     def __init__(self, cli_path: str):
+        self.cli_path = cli_path
+        self.process = None
+        self._buffer = b""
+        self.jobs_served = 0
+
+    def start(self):
+        self._buffer = b""
+        self.process = subprocess.Popen(
+            [self.cli_path, "--serve"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=None,  # Inherit: diagnostics go to the server log
+            bufsize=0,
+        )
+        logger.info(f"Started verifier worker (pid {self.process.pid})")
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            if self.process.poll() is None:
+                try:
+                    self.process.stdin.write(b"QUIT\n")
+                    self.process.stdin.flush()
+                    self.process.wait(timeout=2)
+                except (OSError, subprocess.TimeoutExpired):
+                    self.process.kill()
+                    self.process.wait()
+        finally:
+            for stream in (self.process.stdin, self.process.stdout):
+                try:
+                    stream.close()
+                except OSError:
+                    pass
+            self.process = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def _read_line(self, deadline: float) -> str:
+        while b"\n" not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise VerifierError("Verifier worker timed out")
+            fd = self.process.stdout.fileno()
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                try:
+                    code = self.process.wait(timeout=1)
+                except subprocess.TimeoutExpired:
+                    code = None
+                raise VerifierError(f"Verifier worker exited (code {code})")
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return line.decode("utf-8", errors="replace").rstrip("\r")
+
+    def request(self, fields: list, terminator: str, timeout: float) -> list:
+        if not self.is_alive():
+            raise VerifierError("Verifier worker is not running")
+        for field in fields:
+            if "\t" in field or "\n" in field:
+                raise ValueError(f"Invalid character in request field: {field!r}")
+
+        deadline = time.monotonic() + timeout
+        try:
+            self.process.stdin.write(("\t".join(fields) + "\n").encode("utf-8"))
+            self.process.stdin.flush()
+        except OSError as e:
+            raise VerifierError(f"Verifier worker pipe closed: {e}")
+
+        lines = []
+        while True:
+            line = self._read_line(deadline)
+            if line == terminator:
+                return lines
+            lines.append(line)
+
+    def ping(self, timeout: float) -> bool:
+        try:
+            self.request(["PING"], "PONG", timeout)
+            return True
+        except VerifierError:
+            return False
+
+
+class VerifierPool:
+    """
+    Fixed-size pool of persistent verifier workers.
+    Caps concurrent verifications at `size`, applies a per-job timeout and
+    replaces workers that crash, hang or fail their health check.
+    """
+
+    def __init__(
+        self,
+        cli_path: str,
+        size: int = 2,
+        job_timeout: float = 300.0,
+        acquire_timeout: float = 600.0,
+        health_interval: float = 30.0,
+    ):
+        self.cli_path = cli_path
+        self.size = max(1, size)
+        self.job_timeout = job_timeout
+        self.acquire_timeout = acquire_timeout
+        self.health_interval = health_interval
+
+        self._idle = queue.Queue()
+        self._workers = []
+        self._closed = threading.Event()
+
+        for _ in range(self.size):
+            worker = VerifierWorker(cli_path)
+            worker.start()
+            self._workers.append(worker)
+            self._idle.put(worker)
+
+        self._health_thread = threading.Thread(
+            target=self._health_loop, name="verifier-health", daemon=True
+        )
+        self._health_thread.start()
+
+    @property
+    def in_flight(self) -> int:
+        return self.size - self._idle.qsize()
+
+    def _acquire(self) -> VerifierWorker:
+        try:
+            return self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise VerifierError("No verifier worker available")
+
+    def _release(self, worker: VerifierWorker):
+        if self._closed.is_set():
+            worker.stop()
+            return
+        self._idle.put(worker)
+
+    def _replace(self, worker: VerifierWorker):
+        try:
+            worker.restart()
+        except OSError as e:
+            logger.error(f"Failed to restart verifier worker: {e}")
+
+    def run(self, fields: list, timeout: float = None) -> list:
+        if self._closed.is_set():
+            raise VerifierError("Verifier pool is closed")
+
+        worker = self._acquire()
+        try:
+            if not worker.is_alive():
+                logger.warning("Verifier worker found dead, restarting")
+                self._replace(worker)
+            lines = worker.request(fields, "END", timeout or self.job_timeout)
+            worker.jobs_served += 1
+            return lines
+        except VerifierError:
+            # Timed out or crashed mid-job: the process state is unknown
+            self._replace(worker)
+            raise
+        finally:
+            self._release(worker)
+
+    def _health_loop(self):
+        while not self._closed.wait(self.health_interval):
+            # Only check workers that are idle right now
+            for _ in range(self._idle.qsize()):
+                try:
+                    worker = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    if not worker.ping(timeout=5.0):
+                        logger.warning("Verifier worker failed health check, restarting")
+                        self._replace(worker)
+                finally:
+                    self._release(worker)
+
+    def ping(self, timeout: float = 5.0) -> bool:
+        """Round trip through an idle worker; False if none is idle or it does not answer."""
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            return False
+        try:
+            if worker.ping(timeout=timeout):
+                return True
+            self._replace(worker)
+            return False
+        finally:
+            self._release(worker)
+
+    @property
+    def alive_workers(self) -> int:
+        return sum(1 for worker in self._workers if worker.is_alive())
+
+    def close(self):
+        self._closed.set()
+        for worker in self._workers:
+            worker.stop()
+
+
+def score_series(series: FlowSeries, gyro, scoring: gyro_analysis.ScoringParams = None) -> dict:
+    """
+    Scores a flow series against a loaded gyro log (see gyro_analysis.load_gyro)
+    with the given threshold and axis mapping, in score_flow's result shape.
+    """
+    scoring = scoring or gyro_analysis.ScoringParams()
+    signal = series.signal(scoring.flow_axis)
+    if signal is None:
+        return {"verified": False, "score": 0.0, "message": "Flow signal has no Y component.", "details": {}}
+    result = gyro_analysis.score_flow(
+        series.timestamps, signal, gyro,
+        axis=gyro_analysis.AXES[scoring.gyro_axis] - 1, threshold=scoring.threshold,
+    )
+    result["details"]["scoring"] = scoring.to_dict()
+    return result
+
+
+class MotionVerifierWrapper:
+    def __init__(
+        self,
+        cli_path: str,
+        pool_size: int = 2,
+        job_timeout: float = 300.0,
+        flow_cache=None,
+        scoring: gyro_analysis.ScoringParams = None,
+    ):
+        """
+        With a `flow_cache` (see flow_cache.FlowCache), a video's flow series
+        comes from the cache or from a FLOW request and is cached; vp_cli still
+        gives the verdict, unless `scoring` maps axes it cannot, in which case
+        the series is scored in-process. Without a cache, only the threshold of
+        `scoring` can be applied.
+        """
         self.cli_path = cli_path
         if not os.path.exists(cli_path):
             raise FileNotFoundError(f"Verifier CLI not found at: {cli_path}")
+        self.flow_cache = flow_cache
+        self.scoring = scoring or gyro_analysis.ScoringParams()
+        if flow_cache is None and not self.scoring.matches_cli:
+            logger.warning("vp_cli always correlates flow X with gyro Y; the axis mapping needs the flow cache")
+        self.pool = VerifierPool(cli_path, size=pool_size, job_timeout=job_timeout)
+
+    def close(self):
+        self.pool.close()
 
-    def verify(self, video_path: str, gyro_path: str) -> dict:
+    def verify_flow(self, timestamps, flow_x, gyro_path: str) -> dict:
         """
-        Runs the C++ verifier CLI on the given files.
+        Scores a precomputed optical-flow signal (e.g. computed on-device)
+        against the gyro log in-process, skipping video decoding entirely.
+        """
+        return self._score_files(FlowSeries(timestamps, flow_x), gyro_path)
+
+    def _score_files(self, series: FlowSeries, gyro_path: str, gyro_sha256: str = None, cache_as=None, timings=None) -> dict:
+        """
+        Scores `series` against the gyro log at `gyro_path`. With a flow cache,
+        the gyro log is cached under `gyro_sha256` and the series under
+        `cache_as` ((kind, key)), so the job can be re-scored later.
+        """
+        if not os.path.exists(gyro_path):
+            return {"verified": False, "score": 0.0, "message": f"Gyro log not found: {gyro_path}"}
+        started = time.perf_counter()
+        gyro = gyro_analysis.load_gyro(gyro_path)
+        loaded = time.perf_counter()
+        result = score_series(series, gyro, self.scoring)
+        result["details"]["timings"] = dict(
+            timings or {},
+            gyro_load=(loaded - started) * 1000.0,
+            analysis=(time.perf_counter() - loaded) * 1000.0,
+        )
+        if self.flow_cache is not None:
+            self.flow_cache.put_gyro(gyro_sha256, gyro)
+            if cache_as:
+                self.flow_cache.put_flow(*cache_as, series)
+        return result
+
+    def verify(
+        self,
+        video_path: str,
+        gyro_path: str,
+        flow_path: str = None,
+        video_sha256: str = None,
+        gyro_sha256: str = None,
+        flow_sha256: str = None,
+        profile: AnalysisProfile = None,
+    ) -> dict:
+        """
+        Runs the C++ verifier on the given files using a pooled worker.
+        If `flow_path` (a timestamp,flow_x[,flow_y] CSV) is given, the flow
+        signal is scored in-process instead and the video is not decoded.
+        With a flow cache, a video whose `video_sha256` was seen before with
+        the same `profile` is not decoded either; the content hashes key the
+        cache entries. `profile` (see profiles.py) defaults to "accurate" and
+        is recorded in the details of results computed from the video.
         Returns a dict with keys: verified (bool), score (float), message (str), details (dict)
+        Raises VerifierError if the worker times out or crashes.
         """
+        if flow_path:
+            if not os.path.exists(flow_path):
+                return {"verified": False, "score": 0.0, "message": f"Flow CSV not found: {flow_path}"}
+            return self._score_files(FlowSeries.from_csv(flow_path), gyro_path, gyro_sha256, ("client", flow_sha256))
+
         if not os.path.exists(video_path):
             return {"verified": False, "score": 0.0, "message": f"Video not found: {video_path}"}
         if not os.path.exists(gyro_path):
-            return {"verified": False, "score": 0.0, "message": f"Gyro CSV not found: {gyro_path}"}
+            return {"verified": False, "score": 0.0, "message": f"Gyro log not found: {gyro_path}"}
+
+        profile = profile or profiles.get_profile(profiles.BASELINE)
+        if self.flow_cache is not None and video_sha256:
+            flow_key = profile.flow_key(video_sha256)
+            started = time.perf_counter()
+            series = self.flow_cache.get_flow("video", flow_key)
+            cached = series is not None
+            if not cached:
+                series = self.clip_flow(video_path, profile)
+            timings = {"flow": (time.perf_counter() - started) * 1000.0}
+            if self.scoring.matches_cli:
+                result = self._verify_series(series, gyro_path, gyro_sha256, None if cached else ("video", flow_key))
+                result["details"].setdefault("timings", {}).update(timings)
+            else:
+                result = self._score_files(
+                    series, gyro_path, gyro_sha256, None if cached else ("video", flow_key), timings
+                )
+            result["details"]["flow_cache"] = "hit" if cached else "miss"
+            result["details"]["profile"] = profile.to_dict()
+            return result
+
+        response = self._run_verify([video_path, gyro_path] + self._profile_field(profile))
+        response["details"]["profile"] = profile.to_dict()
+        return response
 
+    def _run_verify(self, fields: list) -> dict:
+        """VERIFY request, parsed, with our threshold applied to vp_cli's score."""
+        started = time.perf_counter()
+        lines = self.pool.run(["VERIFY"] + fields)
+        wall_ms = (time.perf_counter() - started) * 1000.0
+
+        return_code = 0
+        output_lines = []
+        for line in lines:
+            if line.startswith("EXIT_CODE:"):
+                try:
+                    return_code = int(line.split(":")[1].strip())
+                except ValueError:
+                    return_code = 1
+            else:
+                output_lines.append(line)
+
+        stdout = "\n".join(output_lines)
+        stderr = "\n".join(l for l in output_lines if l.startswith("FAILURE:"))
+        response = self._parse_output(stdout, stderr, return_code)
+        response["details"].setdefault("timings", {})["wall"] = wall_ms
+        if response["message"] in VERDICTS.values():
+            # vp_cli hardcodes its own threshold
+            response["verified"] = response["score"] > self.scoring.threshold
+            response["message"] = VERDICTS[response["verified"]]
+        return response
+
+    def _verify_series(self, series: FlowSeries, gyro_path: str, gyro_sha256: str = None, cache_as=None) -> dict:
+        """
+        vp_cli's verdict on a flow series: VERIFY reads it as a flow CSV instead
+        of decoding the video, so cached flow is scored by the same C++
+        analysis as a fresh upload. Caches like _score_files.
+        """
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            np.savetxt(f, series.to_array()[:, :2], fmt="%.17g", delimiter=",", header="timestamp,flow_x", comments="")
         try:
-            # Run the CLI
-            result = subprocess.run(
-                [self.cli_path, video_path, gyro_path],
-                capture_output=True,
-                text=True,
-                check=False # We handle return codes manually
-            )
-
-            stdout = result.stdout
-            stderr = result.stderr
-            return_code = result.returncode
-
-            # Parse Output (Parsing the stdout format from main.cpp)
-            # SUCCESS: Analysis complete. ...
-            # SCORE: 0.98...
-            # VERDICT: REAL...
-            
-            score = 0.0
-            is_consistent = False
-            message = "Verification failed"
-            response_details = {} # Store new metrics here
-
-            for line in stdout.splitlines():
-                if line.startswith("SCORE:"):
-                    try:
-                        score = float(line.split(":")[1].strip())
-                    except ValueError:
-                        pass
-                if line.startswith("VERDICT:"):
-                    verdict = line.split(":")[1].strip()
-                    if "REAL" in verdict or "CONSISTENT" in verdict:
-                        is_consistent = True
-                    message = verdict
-                if line.startswith("SUCCESS:") and not message:
-                     message = line.split(":")[1].strip()
-                
-                # New metrics
-                if line.startswith("CAUSALITY_SCORE:"):
-                    try:
-                        response_details["causality_score"] = float(line.split(":")[1].strip())
-                    except ValueError: pass
-                if line.startswith("IS_HANDHELD:"):
-                    val = line.split(":")[1].strip().lower()
-                    response_details["is_handheld"] = (val == "true")
-                if line.startswith("TREMOR_ENERGY:"):
-                    try:
-                        response_details["tremor_energy"] = float(line.split(":")[1].strip())
-                    except ValueError: pass
-
-            response = {
-                "verified": is_consistent,
-                "score": score,
-                "message": message,
-                "details": response_details, # Pass these up
-                "raw_output": stdout,
-                "error_output": stderr
-            }
-            
-            if return_code != 0:
-                 response["verified"] = False
-                 response["message"] = f"CLI Error (Code {return_code})"
-
-            return response
-
-        except Exception as e:
-            logger.exception("Error running verification CLI")
-            return {
-                "verified": False,
-                "score": 0.0,
-                "message": str(e)
-            }
+            result = self._run_verify([f.name, gyro_path])
+        finally:
+            os.remove(f.name)
+        if self.flow_cache.gyro_path(gyro_sha256) is None:
+            self.flow_cache.put_gyro(gyro_sha256, gyro_analysis.load_gyro(gyro_path))
+        if cache_as:
+            self.flow_cache.put_flow(*cache_as, series)
+        return result
+
+    @staticmethod
+    def _profile_field(profile: AnalysisProfile) -> list:
+        # Baseline requests stay in the form older vp_cli builds understand
+        return [] if profile is None or profile.is_baseline else [profile.spec()]
+
+    def _run_flow(self, video_path: str, profile: AnalysisProfile = None):
+        """FLOW request: (timestamps, flow_x, flow_y or None, fps, frames, failure message)."""
+        lines = self.pool.run(["FLOW", video_path] + self._profile_field(profile))
+        fps, frames = 0.0, 0
+        timestamps, flow_x, flow_y = [], [], []
+        failure = "Could not decode video segment"
+        for line in lines:
+            key, _, value = line.partition(":")
+            try:
+                if key == "FLOW":
+                    # t,flow_x[,flow_y]; older vp_cli builds only print X
+                    values = [float(v) for v in value.split(",")]
+                    timestamps.append(values[0])
+                    flow_x.append(values[1])
+                    if len(values) > 2:
+                        flow_y.append(values[2])
+                elif key == "FPS":
+                    fps = float(value)
+                elif key == "FRAMES":
+                    frames = int(value)
+            except (ValueError, IndexError):
+                continue
+            if key == "FAILURE":
+                failure = value.strip()
+        flow_y = flow_y if len(flow_y) == len(flow_x) else None
+        return timestamps, flow_x, flow_y, fps, frames, failure
+
+    def clip_flow(self, video_path: str, profile: AnalysisProfile = None) -> FlowSeries:
+        """
+        Optical flow of a whole clip, as VERIFY computes it with `profile`;
+        empty if the video cannot be decoded. Raises VerifierError if the
+        worker times out or crashes.
+        """
+        timestamps, flow_x, flow_y, _, _, _ = self._run_flow(video_path, profile)
+        return FlowSeries(timestamps, flow_x, flow_y)
+
+    def extract_flow(self, video_path: str):
+        """
+        Optical flow of one video segment (live sessions), computed by a pooled
+        worker exactly as in verify(). Returns (timestamps, flow_x, fps, frames)
+        with timestamps in seconds from the segment's first frame.
+        Raises VerifierError if the segment cannot be decoded.
+        """
+        timestamps, flow_x, _, fps, frames, failure = self._run_flow(video_path)
+        if frames == 0:
+            raise VerifierError(failure)
+        return timestamps, flow_x, fps, frames
+
+    def _parse_output(self, stdout: str, stderr: str, return_code: int) -> dict:
+        # Parse Output (Parsing the stdout format from main.cpp)
+        # SUCCESS: Analysis complete. ...
+        # SCORE: 0.98...
+        # VERDICT: REAL...
+
+        score = 0.0
+        is_consistent = False
+        message = "Verification failed"
+        response_details = {} # Store new metrics here
+
+        for line in stdout.splitlines():
+            if line.startswith("SCORE:"):
+                try:
+                    score = float(line.split(":")[1].strip())
+                except ValueError:
+                    pass
+            if line.startswith("VERDICT:"):
+                verdict = line.split(":")[1].strip()
+                if "REAL" in verdict or "CONSISTENT" in verdict:
+                    is_consistent = True
+                message = verdict
+            if line.startswith("SUCCESS:") and not message:
+                 message = line.split(":")[1].strip()
+
+            # New metrics
+            if line.startswith("CAUSALITY_SCORE:"):
+                try:
+                    response_details["causality_score"] = float(line.split(":")[1].strip())
+                except ValueError: pass
+            if line.startswith("IS_HANDHELD:"):
+                val = line.split(":")[1].strip().lower()
+                response_details["is_handheld"] = (val == "true")
+            if line.startswith("TREMOR_ENERGY:"):
+                try:
+                    response_details["tremor_energy"] = float(line.split(":")[1].strip())
+                except ValueError: pass
+            if line.startswith("DURATION:"):
+                try:
+                    response_details["duration"] = float(line.split(":")[1].strip().rstrip("s"))
+                except ValueError: pass
+            # Stage timings: TIMING_<STAGE>_MS: <ms>
+            if line.startswith("TIMING_") and "_MS:" in line:
+                stage = line[len("TIMING_"):line.index("_MS:")].lower()
+                try:
+                    response_details.setdefault("timings", {})[stage] = float(line.split(":")[1].strip())
+                except ValueError: pass
+
+        response = {
+            "verified": is_consistent,
+            "score": score,
+            "message": message,
+            "details": response_details, # Pass these up
+            "raw_output": stdout,
+            "error_output": stderr
+        }
+
+        if return_code != 0:
+             response["verified"] = False
+             response["message"] = f"CLI Error (Code {return_code})"
+
+        return response
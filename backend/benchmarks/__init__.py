@@ -0,0 +1,13 @@
+"""
+Benchmarks and load tests for the verification pipeline.
+
+Run from `backend/`:
+
+    python -m benchmarks generate --out /tmp/vp_bench
+    python -m benchmarks run --cli /usr/local/bin/vp_cli --output results.json
+    python -m benchmarks run --url http://localhost:8000 --suites e2e --concurrency 8
+    python -m benchmarks compare baseline.json results.json
+
+Synthetic clips need OpenCV (`pip install opencv-python-headless`); without it
+only the gyro/flow data is generated and the video suites are skipped.
+"""
@@ -0,0 +1,148 @@
+import argparse
+import logging
+import os
+import sys
+
+from app import profiles
+
+from . import report, suites, synthetic
+
+logger = logging.getLogger("benchmarks")
+
+DEFAULT_WORK_DIR = "/tmp/veriphysics_bench"
+DEFAULT_CLI = os.environ.get("VERIPHYSICS_CLI_PATH", "/usr/local/bin/vp_cli")
+SUITES = ("verify", "flow", "sign", "e2e")
+
+
+def csv_list(value: str):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def add_data_args(parser):
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR, help="Where generated bundles are cached")
+    parser.add_argument("--resolutions", type=csv_list, default=["360p", "720p"],
+                        help=f"Comma-separated, from {', '.join(synthetic.RESOLUTIONS)}")
+    parser.add_argument("--durations", type=lambda v: [float(d) for d in csv_list(v)], default=[5.0, 15.0],
+                        help="Comma-separated clip lengths in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--gyro-format", choices=("csv", "vpgy"), default="csv")
+
+
+def generate_bundles(args, gyro_ext: str = None):
+    ext = gyro_ext or (".vpgy" if args.gyro_format == "vpgy" else ".csv")
+    return synthetic.generate_set(args.work_dir, args.resolutions, args.durations, args.seed, ext)
+
+
+def cmd_generate(args) -> int:
+    for bundle in generate_bundles(args):
+        logger.info(f"{bundle.name}: video={bundle.video_path} gyro={bundle.gyro_path} flow={bundle.flow_path}")
+    return 0
+
+
+def cmd_run(args) -> int:
+    selected = args.suites or [s for s in SUITES if s != "e2e" or args.url]
+    unknown = set(selected) - set(SUITES)
+    if unknown:
+        logger.error(f"Unknown suites: {', '.join(sorted(unknown))}")
+        return 2
+    unknown = set(args.profiles) - set(profiles.PROFILES)
+    if unknown or not args.profiles:
+        logger.error(f"Unknown analysis profiles: {', '.join(sorted(unknown)) or '(none given)'}")
+        return 2
+
+    bundles = generate_bundles(args)
+    results = {}
+    if "verify" in selected:
+        if os.path.exists(args.cli):
+            results.update(suites.bench_verify(bundles, args.cli, args.repeat, args.concurrency, args.profiles))
+        else:
+            logger.warning(f"Verifier CLI not found at {args.cli}, skipping the verify suite")
+    if "flow" in selected:
+        results.update(suites.bench_flow(bundles, args.repeat * 10, args.concurrency))
+    if "sign" in selected:
+        cert = (args.cert, args.key) if args.cert and args.key else None
+        results.update(suites.bench_sign(bundles, args.work_dir, args.repeat, args.concurrency, cert))
+    if "e2e" in selected:
+        if args.url:
+            # The server dedups by content; only CSV logs are re-tagged per request
+            e2e_bundles = bundles if args.gyro_format == "csv" else generate_bundles(args, ".csv")
+            results.update(suites.bench_e2e(
+                e2e_bundles, args.url, args.api_key, args.requests, args.concurrency, args.timeout,
+            ))
+        else:
+            logger.warning("No --url given, skipping the e2e suite")
+
+    params = {
+        "suites": selected,
+        "resolutions": args.resolutions,
+        "durations": args.durations,
+        "seed": args.seed,
+        "gyro_format": args.gyro_format,
+        "repeat": args.repeat,
+        "concurrency": args.concurrency,
+        "profiles": args.profiles,
+        "requests": args.requests,
+    }
+    result = report.build_report(results, params)
+    print(report.format_results(results))
+    if args.output:
+        report.write_report(result, args.output)
+        logger.info(f"Wrote {args.output}")
+    if args.baseline:
+        return print_comparison(report.load_report(args.baseline), result, args.tolerance)
+    return 0
+
+
+def print_comparison(baseline: dict, current: dict, tolerance: float) -> int:
+    rows, regressions = report.compare(baseline, current, tolerance)
+    print(report.format_comparison(rows))
+    if regressions:
+        print(f"{regressions} regression(s) beyond {tolerance:.0%}")
+        return 1
+    return 0
+
+
+def cmd_compare(args) -> int:
+    return print_comparison(report.load_report(args.baseline), report.load_report(args.current), args.tolerance)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="VeriPhysics benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="Generate synthetic bundles only")
+    add_data_args(generate)
+    generate.set_defaults(func=cmd_generate)
+
+    run = commands.add_parser("run", help="Run benchmark suites and report throughput and latency")
+    add_data_args(run)
+    run.add_argument("--suites", type=csv_list, help=f"Comma-separated, from {', '.join(SUITES)} (default: all that can run)")
+    run.add_argument("--cli", default=DEFAULT_CLI, help="vp_cli binary for the verify suite")
+    run.add_argument("--repeat", type=int, default=3, help="Calls per bundle (x10 for the flow suite)")
+    run.add_argument("--concurrency", type=int, default=2)
+    run.add_argument("--profiles", type=csv_list, default=list(profiles.PROFILES),
+                     help="Comma-separated analysis profiles for the verify suite (default: all)")
+    run.add_argument("--cert", help="Signing certificate chain (default: a generated test certificate)")
+    run.add_argument("--key", help="Signing key for --cert")
+    run.add_argument("--url", help="Server for the e2e suite, e.g. http://localhost:8000")
+    run.add_argument("--api-key", help="API key for the e2e suite (default: registers a throwaway user)")
+    run.add_argument("--requests", type=int, default=20, help="e2e submissions per resolution/duration")
+    run.add_argument("--timeout", type=float, default=600.0, help="Seconds to wait for each e2e job")
+    run.add_argument("--output", help="Write the JSON report here")
+    run.add_argument("--baseline", help="Compare against this stored report (exit 1 on regression)")
+    run.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative slowdown, e.g. 0.10")
+    run.set_defaults(func=cmd_run)
+
+    compare = commands.add_parser("compare", help="Compare two JSON reports")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--tolerance", type=float, default=0.10)
+    compare.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Throwaway signing certificate for benchmarking C2PASignerService.
+
+c2pa refuses a bare self-signed end-entity certificate, so this creates a
+self-signed test CA and an ES256 leaf it issues (digitalSignature, email
+protection EKU), written as a leaf + CA chain next to a PKCS#8 key, the same
+files certs/generate_certs.sh produces for development.
+"""
+import datetime
+import os
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+
+
+def _name(common_name: str) -> x509.Name:
+    return x509.Name([
+        x509.NameAttribute(NameOID.ORGANIZATION_NAME, "VeriPhysics"),
+        x509.NameAttribute(NameOID.COMMON_NAME, common_name),
+    ])
+
+
+def _key_usage(signing: bool) -> x509.KeyUsage:
+    return x509.KeyUsage(
+        digital_signature=signing, content_commitment=False, key_encipherment=False,
+        data_encipherment=False, key_agreement=False, key_cert_sign=not signing,
+        crl_sign=not signing, encipher_only=False, decipher_only=False,
+    )
+
+
+def _builder(subject: x509.Name, issuer: x509.Name, public_key, days: int) -> x509.CertificateBuilder:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return (
+        x509.CertificateBuilder()
+        .subject_name(subject)
+        .issuer_name(issuer)
+        .public_key(public_key)
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=days))
+        .add_extension(x509.SubjectKeyIdentifier.from_public_key(public_key), critical=False)
+    )
+
+
+def make_test_certificate(out_dir: str, days: int = 30):
+    """Writes `bench.crt` (chain) and `bench.pem` (key) to `out_dir`; returns their paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    cert_path = os.path.join(out_dir, "bench.crt")
+    key_path = os.path.join(out_dir, "bench.pem")
+
+    ca_key = ec.generate_private_key(ec.SECP256R1())
+    ca_name = _name("VeriPhysics Benchmark CA")
+    ca = (
+        _builder(ca_name, ca_name, ca_key.public_key(), days)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=0), critical=True)
+        .add_extension(_key_usage(signing=False), critical=True)
+        .sign(ca_key, hashes.SHA256())
+    )
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    leaf = (
+        _builder(_name("VeriPhysics Benchmark Signer"), ca_name, key.public_key(), days)
+        .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+        .add_extension(_key_usage(signing=True), critical=True)
+        .add_extension(x509.ExtendedKeyUsage([ExtendedKeyUsageOID.EMAIL_PROTECTION]), critical=False)
+        .add_extension(x509.AuthorityKeyIdentifier.from_issuer_public_key(ca_key.public_key()), critical=False)
+        .sign(ca_key, hashes.SHA256())
+    )
+
+    with open(cert_path, "wb") as f:
+        f.write(leaf.public_bytes(serialization.Encoding.PEM))
+        f.write(ca.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ))
+    return cert_path, key_path
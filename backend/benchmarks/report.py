@@ -0,0 +1,149 @@
+"""
+Result aggregation, JSON reports and comparison against a stored baseline.
+
+A report is `{"meta": {...}, "results": {name: summary}}` where every
+summary has the same keys (see summarize). compare() flags a result as a
+regression when its latency or throughput is worse than the baseline by more
+than the tolerance, or when its verdict accuracy (or, for analysis profiles,
+its verdict agreement with the reference profile) dropped.
+"""
+import datetime
+import json
+import os
+import platform
+import subprocess
+
+import numpy as np
+
+# Compared exactly: any drop is a regression
+VERDICT_METRICS = ("accuracy", "verdict_agreement")
+# (metric, higher is better)
+COMPARED_METRICS = (
+    ("p50_ms", False),
+    ("p95_ms", False),
+    ("throughput_per_s", True),
+)
+
+
+def summarize(latencies, wall: float, errors: int = 0, correct: int = None) -> dict:
+    """Latency percentiles (ms) and throughput of one benchmark run."""
+    latencies = np.asarray(latencies, dtype=np.float64) * 1000.0
+    count = len(latencies)
+    summary = {
+        "count": count,
+        "errors": errors,
+        "mean_ms": float(latencies.mean()) if count else None,
+        "p50_ms": float(np.percentile(latencies, 50)) if count else None,
+        "p95_ms": float(np.percentile(latencies, 95)) if count else None,
+        "max_ms": float(latencies.max()) if count else None,
+        "throughput_per_s": count / wall if wall > 0 else None,
+        "wall_s": wall,
+    }
+    if correct is not None:
+        summary["accuracy"] = correct / count if count else None
+    return summary
+
+
+def agreement(outcomes: dict, reference: dict) -> dict:
+    """
+    How closely per-bundle `{name: (score, verified)}` outcomes follow those of
+    a reference run on the same bundles: mean absolute score difference and
+    the share of bundles with the same verdict.
+    """
+    shared = [name for name in outcomes if name in reference]
+    if not shared:
+        return {}
+    return {
+        "score_delta": float(np.mean([abs(outcomes[n][0] - reference[n][0]) for n in shared])),
+        "verdict_agreement": sum(outcomes[n][1] == reference[n][1] for n in shared) / len(shared),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+
+def build_report(results: dict, params: dict) -> dict:
+    return {
+        "meta": {
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "host": platform.node(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "params": params,
+        },
+        "results": results,
+    }
+
+
+def write_report(report: dict, path: str):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_report(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline: dict, current: dict, tolerance: float = 0.10):
+    """
+    Compares the results both reports share.
+    Returns (rows, regressions): one row per (result, metric) as
+    (name, metric, baseline, current, relative_change, regressed).
+    """
+    rows = []
+    regressions = 0
+    base_results, cur_results = baseline["results"], current["results"]
+    for name in sorted(set(base_results) & set(cur_results)):
+        base, cur = base_results[name], cur_results[name]
+        for metric, higher_is_better in COMPARED_METRICS:
+            if not base.get(metric) or cur.get(metric) is None:
+                continue
+            change = (cur[metric] - base[metric]) / base[metric]
+            worse = -change if higher_is_better else change
+            regressed = worse > tolerance
+            rows.append((name, metric, base[metric], cur[metric], change, regressed))
+            regressions += regressed
+        for metric in VERDICT_METRICS:
+            if base.get(metric) is None or cur.get(metric) is None:
+                continue
+            regressed = cur[metric] < base[metric]
+            rows.append((name, metric, base[metric], cur[metric], cur[metric] - base[metric], regressed))
+            regressions += regressed
+    return rows, regressions
+
+
+def format_comparison(rows) -> str:
+    lines = [f"{'result':<36} {'metric':<17} {'baseline':>12} {'current':>12} {'change':>9}"]
+    for name, metric, base, cur, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        lines.append(f"{name:<36} {metric:<17} {base:>12.3f} {cur:>12.3f} {change:>+8.1%}{flag}")
+    return "\n".join(lines)
+
+
+def format_results(results: dict) -> str:
+    # agree / dscore / speedup: against the reference analysis profile (verify suite)
+    lines = [
+        f"{'result':<36} {'n':>5} {'err':>4} {'p50 ms':>10} {'p95 ms':>10} {'ops/s':>9} {'acc':>6}"
+        f" {'agree':>6} {'dscore':>7} {'speedup':>8}"
+    ]
+    for name in sorted(results):
+        r = results[name]
+        fmt = lambda v, spec: format(v, spec) if v is not None else "-"
+        lines.append(
+            f"{name:<36} {r['count']:>5} {r['errors']:>4} {fmt(r['p50_ms'], '>10.1f')} "
+            f"{fmt(r['p95_ms'], '>10.1f')} {fmt(r['throughput_per_s'], '>9.2f')} {fmt(r.get('accuracy'), '>6.2f')} "
+            f"{fmt(r.get('verdict_agreement'), '>6.2f')} {fmt(r.get('score_delta'), '>7.3f')} {fmt(r.get('speedup'), '>8.2f')}"
+        )
+    return "\n".join(lines)
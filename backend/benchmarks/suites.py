@@ -0,0 +1,248 @@
+"""
+The benchmark suites. Each returns `{result_name: summary}` (see report.summarize):
+
+- verify: MotionVerifierWrapper.verify on the clips through a pool of vp_cli workers,
+          once per analysis profile, with score and verdict agreement against
+          the "accurate" profile (or the first one run)
+- flow:   the in-process path for bundles with a precomputed flow CSV
+- sign:   C2PASignerService.sign_video with a throwaway test certificate
+- e2e:    POST /verify against a running server, until the job is COMPLETED
+
+Calls are issued from `concurrency` threads; accuracy is the share of calls
+whose verdict matches how the bundle was generated (matched or not).
+"""
+import json
+import logging
+import os
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app import gyro_analysis, profiles
+from app.c2pa_signer import C2PASignerService
+from app.verifier import MotionVerifierWrapper
+
+from . import certs
+from .report import agreement, summarize
+
+logger = logging.getLogger(__name__)
+
+
+def by_group(bundles):
+    groups = {}
+    for bundle in bundles:
+        groups.setdefault(bundle.group, []).append(bundle)
+    return groups
+
+
+def run_concurrent(fn, items, concurrency: int, check=None):
+    """
+    Calls fn(item) for every item from `concurrency` threads.
+    `check(item, outcome)` says whether a call gave the expected verdict.
+    Returns a summary dict.
+    """
+    def timed(item):
+        started = time.perf_counter()
+        try:
+            outcome = fn(item)
+        except Exception as e:
+            logger.warning(f"Benchmark call failed: {e}")
+            return None, False
+        return time.perf_counter() - started, check(item, outcome) if check else None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        calls = list(pool.map(timed, items))
+    wall = time.perf_counter() - started
+
+    latencies = [latency for latency, _ in calls if latency is not None]
+    errors = len(calls) - len(latencies)
+    correct = sum(1 for latency, ok in calls if latency is not None and ok) if check else None
+    return summarize(latencies, wall, errors, correct)
+
+
+def expected_verdict(bundle, result: dict) -> bool:
+    return bool(result.get("verified")) == bundle.matched
+
+
+def bench_verify(bundles, cli_path: str, repeat: int = 3, concurrency: int = 2, profile_names=(profiles.BASELINE,)) -> dict:
+    bundles = [b for b in bundles if b.video_path]
+    if not bundles:
+        logger.warning("No synthetic clips (is opencv-python installed?), skipping the verify suite")
+        return {}
+    reference = profiles.BASELINE if profiles.BASELINE in profile_names else profile_names[0]
+    wrapper = MotionVerifierWrapper(cli_path, pool_size=concurrency)
+    try:
+        wrapper.verify(bundles[0].video_path, bundles[0].gyro_path)  # Warm-up
+        results = {}
+        outcomes = {}  # Profile -> group -> {bundle name: (score, verified)}
+        for name in profile_names:
+            profile = profiles.get_profile(name)
+            for group, members in by_group(bundles).items():
+                seen = outcomes.setdefault(name, {}).setdefault(group, {})
+
+                def call(b, profile=profile, seen=seen):
+                    result = wrapper.verify(b.video_path, b.gyro_path, profile=profile)
+                    seen[b.name] = (result.get("score") or 0.0, bool(result.get("verified")))
+                    return result
+
+                results[f"verify/{name}/{group}/c{concurrency}"] = run_concurrent(
+                    call, members * repeat, concurrency, expected_verdict,
+                )
+
+        for name in profile_names:
+            for group, seen in outcomes[name].items():
+                summary = results[f"verify/{name}/{group}/c{concurrency}"]
+                base = results[f"verify/{reference}/{group}/c{concurrency}"]
+                summary.update(agreement(seen, outcomes[reference][group]))
+                if summary["p50_ms"] and base["p50_ms"]:
+                    summary["speedup"] = base["p50_ms"] / summary["p50_ms"]
+        return results
+    finally:
+        wrapper.close()
+
+
+def score_flow_file(bundle) -> dict:
+    """What MotionVerifierWrapper.verify does for a bundle with a flow CSV."""
+    timestamps, flow_x = gyro_analysis.load_flow_csv(bundle.flow_path)
+    return gyro_analysis.score_flow(timestamps, flow_x, gyro_analysis.load_gyro(bundle.gyro_path))
+
+
+def bench_flow(bundles, repeat: int = 20, concurrency: int = 1) -> dict:
+    return {
+        f"flow/{group}/c{concurrency}": run_concurrent(score_flow_file, members * repeat, concurrency, expected_verdict)
+        for group, members in by_group(bundles).items()
+    }
+
+
+def bench_sign(bundles, work_dir: str, repeat: int = 3, concurrency: int = 2, cert=None) -> dict:
+    # Only verified bundles reach the signer
+    bundles = [b for b in bundles if b.video_path and b.matched]
+    if not bundles:
+        logger.warning("No synthetic clips (is opencv-python installed?), skipping the sign suite")
+        return {}
+    cert_path, key_path = cert or certs.make_test_certificate(os.path.join(work_dir, "certs"))
+    signer = C2PASignerService(cert_path, key_path, ta_url=None)  # No TSA: keeps the numbers offline and stable
+    out_dir = tempfile.mkdtemp(prefix="signed_", dir=work_dir)
+
+    def sign(bundle):
+        output = os.path.join(out_dir, f"{uuid.uuid4().hex}.mp4")
+        try:
+            signer.sign_video(bundle.video_path, output, {
+                "score": 0.93, "verified": True, "timestamp": time.time(),
+                "details": {"causality_score": 93.0, "is_handheld": True, "tremor_energy": 0.2},
+            })
+        finally:
+            if os.path.exists(output):
+                os.remove(output)
+
+    results = {}
+    for group, members in by_group(bundles).items():
+        results[f"sign/{group}/c{concurrency}"] = run_concurrent(sign, members * repeat, concurrency)
+    os.rmdir(out_dir)
+    return results
+
+
+class ApiClient:
+    """Minimal JSON-over-HTTP client for the server (stdlib only)."""
+
+    def __init__(self, url: str, api_key: str = None, timeout: float = 60.0):
+        self.url = url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, body: bytes = None, headers: dict = None):
+        headers = dict(headers or {})
+        if self.api_key:
+            headers["X-API-Key"] = self.api_key
+        req = urllib.request.Request(self.url + path, data=body, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                return json.loads(response.read() or b"null")
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"{method} {path}: HTTP {e.code} {e.read()[:200]!r}")
+
+    def register_benchmark_user(self) -> str:
+        """Creates a throwaway user and returns a fresh API key for it."""
+        email = f"bench-{uuid.uuid4().hex[:12]}@veriphysics.invalid"
+        password = uuid.uuid4().hex
+        self.request("POST", "/register", json.dumps({"email": email, "password": password}).encode(),
+                     {"Content-Type": "application/json"})
+        form = urllib.parse.urlencode({"username": email, "password": password}).encode()
+        token = self.request("POST", "/token", form, {"Content-Type": "application/x-www-form-urlencoded"})
+        key = self.request("POST", "/api-keys", headers={"Authorization": f"Bearer {token['access_token']}"})
+        self.api_key = key["api_key"]
+        return self.api_key
+
+    def submit(self, files: dict) -> dict:
+        """POST /verify with `files` as {field: (filename, content, content_type)}."""
+        boundary = uuid.uuid4().hex
+        parts = []
+        for field, (filename, content, content_type) in files.items():
+            parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+                f"Content-Type: {content_type}\r\n\r\n".encode() + content + b"\r\n"
+            )
+        parts.append(f"--{boundary}--\r\n".encode())
+        return self.request("POST", "/verify", b"".join(parts),
+                            {"Content-Type": f"multipart/form-data; boundary={boundary}"})
+
+
+def unique_gyro(content: bytes) -> bytes:
+    """
+    Tags the CSV header line with a random id, so the server's content dedup
+    sees a new bundle while the samples (and the verdict) stay the same.
+    """
+    header, _, rest = content.partition(b"\n")
+    return header + f" # bench {uuid.uuid4().hex}".encode() + b"\n" + rest
+
+
+def bench_e2e(
+    bundles,
+    url: str,
+    api_key: str = None,
+    requests: int = 20,
+    concurrency: int = 4,
+    timeout: float = 600.0,
+    poll_interval: float = 0.1,
+) -> dict:
+    bundles = [b for b in bundles if b.video_path and b.gyro_path.endswith(".csv")]
+    if not bundles:
+        logger.warning("No synthetic clips with CSV gyro logs, skipping the e2e suite")
+        return {}
+    client = ApiClient(url, api_key)
+    if not client.api_key:
+        client.register_benchmark_user()
+
+    contents = {}
+    for bundle in bundles:
+        with open(bundle.video_path, "rb") as f:
+            video = f.read()
+        with open(bundle.gyro_path, "rb") as f:
+            contents[bundle.name] = (video, f.read())
+
+    def submit_and_wait(bundle) -> dict:
+        video, gyro = contents[bundle.name]
+        job = client.submit({
+            "video": (os.path.basename(bundle.video_path), video, "video/mp4"),
+            "gyro": ("gyro.csv", unique_gyro(gyro), "text/csv"),
+        })
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = client.request("GET", f"/jobs/{job['id']}")
+            if status["status"] == "COMPLETED":
+                return status
+            if status["status"] == "ERROR":
+                raise RuntimeError(f"Job {job['id']} failed: {status.get('message')}")
+            time.sleep(poll_interval)
+        raise RuntimeError(f"Job {job['id']} not completed after {timeout:g}s")
+
+    results = {}
+    for group, members in by_group(bundles).items():
+        items = [members[i % len(members)] for i in range(requests)]
+        results[f"e2e/{group}/c{concurrency}"] = run_concurrent(submit_and_wait, items, concurrency, expected_verdict)
+    return results
@@ -0,0 +1,190 @@
+"""
+Synthetic bundles with known camera motion.
+
+A blurred noise texture is panned horizontally along a seeded yaw trajectory
+(a few slow sweeps plus 8-12 Hz hand tremor), so the optical flow of the clip
+follows the gyro Y axis the verifier correlates against. A matched bundle
+pairs the clip with a gyro log of the same trajectory; a mismatched one with
+the log of an independent trajectory. The ground-truth flow signal is written
+too, which lets the in-process flow path run without OpenCV.
+Generation is deterministic, so the same parameters always give the same files.
+"""
+import logging
+import os
+
+import numpy as np
+
+from app import gyro_format
+
+logger = logging.getLogger(__name__)
+
+RESOLUTIONS = {
+    "360p": (640, 360),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+}
+FPS = 30
+GYRO_RATE = 200  # Hz
+FOCAL_FRACTION = 0.8  # Focal length in pixels as a fraction of the width (~64 degree FOV)
+BOOT_NS = 1_000_000_000_000  # Gyro timestamps look like a device clock in nanoseconds
+GYRO_NOISE = 0.005  # rad/s
+
+
+class Bundle:
+    """Paths of one generated bundle; `video_path` is None when OpenCV is missing."""
+
+    def __init__(self, name, resolution, duration, matched, video_path, gyro_path, flow_path):
+        self.name = name
+        self.resolution = resolution
+        self.duration = duration
+        self.matched = matched
+        self.video_path = video_path
+        self.gyro_path = gyro_path
+        self.flow_path = flow_path
+
+    @property
+    def group(self) -> str:
+        """Results are aggregated per resolution and duration."""
+        return f"{self.resolution}/{self.duration:g}s"
+
+
+def yaw_rate(t: np.ndarray, seed: int) -> np.ndarray:
+    """Camera yaw rate in rad/s: three slow sweeps plus physiological tremor."""
+    rng = np.random.default_rng(seed)
+    rate = np.zeros_like(t)
+    for _ in range(3):
+        freq = rng.uniform(0.2, 1.2)
+        rate += rng.uniform(0.1, 0.3) * np.sin(2 * np.pi * freq * t + rng.uniform(0, 2 * np.pi))
+    tremor = rng.uniform(8.5, 11.5)
+    rate += 0.1 * np.sin(2 * np.pi * tremor * t + rng.uniform(0, 2 * np.pi))
+    return rate
+
+
+def yaw_angle(t: np.ndarray, seed: int, step: float = 1.0 / 1000) -> np.ndarray:
+    """Integrated yaw rate (radians from the start), sampled at `t`."""
+    fine = np.arange(0.0, t[-1] + 2 * step, step)
+    rate = yaw_rate(fine, seed)
+    angle = np.concatenate(([0.0], np.cumsum((rate[1:] + rate[:-1]) * step / 2)))
+    return np.interp(t, fine, angle)
+
+
+def gyro_log(duration: float, seed: int) -> np.ndarray:
+    """(N, 4) `timestamp,x,y,z` array (ns timestamps) for the trajectory of `seed`."""
+    t = np.arange(0.0, duration + 1.0 / GYRO_RATE, 1.0 / GYRO_RATE)
+    noise = np.random.default_rng(seed + 1).normal(0.0, GYRO_NOISE, size=(len(t), 3))
+    data = np.empty((len(t), 4))
+    data[:, 0] = BOOT_NS + np.round(t * 1e9)
+    data[:, 1:4] = noise
+    data[:, 2] += yaw_rate(t, seed)
+    return data
+
+
+def write_gyro(path: str, data: np.ndarray):
+    """Writes the log as CSV, or as VPGY when `path` ends in `.vpgy`."""
+    if path.endswith(gyro_format.EXTENSION):
+        with open(path, "wb") as f:
+            f.write(gyro_format.encode_gyro(data, nanoseconds=True, sample_rate=GYRO_RATE))
+        return
+    np.savetxt(path, data, delimiter=",", fmt=["%d", "%.6f", "%.6f", "%.6f"], header="timestamp,x,y,z", comments="")
+
+
+def pan_offsets(width: int, duration: float, seed: int) -> np.ndarray:
+    """Horizontal crop offset in pixels for every frame, starting at 0."""
+    t = np.arange(int(duration * FPS) + 1) / FPS
+    offsets = FOCAL_FRACTION * width * yaw_angle(t, seed)
+    return offsets - offsets.min()
+
+
+def write_flow(path: str, offsets: np.ndarray):
+    """Ground truth `timestamp,flow_x` CSV: scene content moves against the pan."""
+    t = np.arange(len(offsets) - 1) / FPS
+    flow = -np.diff(offsets)
+    np.savetxt(path, np.column_stack([t, flow]), delimiter=",", fmt="%.6f", header="timestamp,flow_x", comments="")
+
+
+def render_clip(path: str, width: int, height: int, offsets: np.ndarray, seed: int):
+    """
+    Renders the pan as an MP4 by cropping a texture wider than the frame.
+    Requires the optional OpenCV package.
+    """
+    import cv2  # Optional dependency
+
+    pad = int(np.ceil(offsets.max())) + 1
+    rng = np.random.default_rng(seed)
+    texture = rng.integers(0, 256, size=(height, width + pad), dtype=np.uint8)
+    texture = cv2.GaussianBlur(texture, (0, 0), 3.0)
+    texture = cv2.normalize(texture, None, 0, 255, cv2.NORM_MINMAX)
+
+    tmp = f"{path}.part"
+    writer = cv2.VideoWriter(tmp, cv2.VideoWriter_fourcc(*"mp4v"), FPS, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"OpenCV cannot write MP4 files ({path})")
+    try:
+        for offset in offsets:
+            x = int(round(offset))
+            writer.write(cv2.cvtColor(texture[:, x:x + width], cv2.COLOR_GRAY2BGR))
+    finally:
+        writer.release()
+    os.replace(tmp, path)
+
+
+def generate(
+    out_dir: str,
+    resolution: str,
+    duration: float,
+    matched: bool = True,
+    seed: int = 0,
+    gyro_ext: str = ".csv",
+    video: bool = True,
+) -> Bundle:
+    """
+    Generates (or reuses) one bundle in `out_dir`. The mismatched gyro log
+    comes from a trajectory with a different seed. Rendering the clip
+    requires OpenCV (ImportError otherwise).
+    """
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown resolution {resolution!r} (choose from {', '.join(RESOLUTIONS)})")
+    width, height = RESOLUTIONS[resolution]
+    name = f"{resolution}_{duration:g}s_{'match' if matched else 'mismatch'}_seed{seed}"
+    base = os.path.join(out_dir, name)
+    os.makedirs(out_dir, exist_ok=True)
+
+    offsets = pan_offsets(width, duration, seed)
+    gyro_path = base + gyro_ext
+    flow_path = base + "_flow.csv"
+    if not os.path.exists(gyro_path):
+        write_gyro(gyro_path, gyro_log(duration, seed if matched else seed + 1000))
+    if not os.path.exists(flow_path):
+        write_flow(flow_path, offsets)
+
+    video_path = None
+    if video:
+        # The clip only depends on the trajectory, so matched and mismatched bundles share it
+        video_path = os.path.join(out_dir, f"{resolution}_{duration:g}s_seed{seed}.mp4")
+        if not os.path.exists(video_path):
+            render_clip(video_path, width, height, offsets, seed)
+
+    return Bundle(name, resolution, duration, matched, video_path, gyro_path, flow_path)
+
+
+def have_opencv() -> bool:
+    try:
+        import cv2  # noqa: F401
+    except ImportError:
+        logger.warning("opencv-python not installed, generating gyro and flow data only")
+        return False
+    return True
+
+
+def generate_set(out_dir: str, resolutions, durations, seed: int = 0, gyro_ext: str = ".csv", video: bool = True):
+    """
+    A matched and a mismatched bundle for every resolution and duration; the
+    clips are skipped (video_path None) when OpenCV is not installed.
+    """
+    video = video and have_opencv()
+    return [
+        generate(out_dir, resolution, duration, matched, seed, gyro_ext, video)
+        for resolution in resolutions
+        for duration in durations
+        for matched in (True, False)
+    ]
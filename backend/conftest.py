@@ -0,0 +1,190 @@
+import json
+import math
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+import uuid
+
+import pytest
+
+# The app reads its configuration when imported; point everything it writes
+# at a throwaway directory before anything imports it
+TEST_ROOT = tempfile.mkdtemp(prefix="veriphysics-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{TEST_ROOT}/app.db",
+    "VERIPHYSICS_STORAGE_DIR": os.path.join(TEST_ROOT, "storage"),
+    "VERIPHYSICS_UPLOAD_SESSION_DIR": os.path.join(TEST_ROOT, "sessions"),
+    "VERIPHYSICS_FLOW_CACHE_DIR": os.path.join(TEST_ROOT, "flow_cache"),
+    "VERIPHYSICS_CLI_PATH": os.path.join(TEST_ROOT, "cli", "vp_cli"),
+    "VERIPHYSICS_CERT_PATH": os.path.join(TEST_ROOT, "missing.crt"),  # Jobs complete unsigned
+    "VERIPHYSICS_VERIFIER_WORKERS": "1",
+    "VERIPHYSICS_PREFLIGHT": "off",
+    "VERIPHYSICS_KEY_RATE_LIMIT": "0",
+})
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app import models  # noqa: E402
+
+# Speaks vp_cli's --serve protocol. Every request is appended to requests.log
+# beside the script as JSON, with a flow CSV's rows inlined. VERIFY scores
+# 0.91 for a video and 0.75 for a flow CSV; FLOW returns a 90-frame 0.7 Hz pan.
+# A file name containing "hang" or "crash" stalls or kills the worker, and
+# while a "wedged" file exists beside the script every request stalls.
+FAKE_CLI = r'''#!{python}
+import json, math, os, sys, time
+here = os.path.dirname(os.path.abspath(__file__))
+for line in sys.stdin:
+    fields = line.rstrip("\n").split("\t")
+    entry = {{"fields": fields, "pid": os.getpid()}}
+    if fields[0] == "VERIFY" and fields[1].endswith(".csv"):
+        entry["csv"] = open(fields[1]).read().splitlines()
+    with open(os.path.join(here, "requests.log"), "a") as f:
+        f.write(json.dumps(entry) + "\n")
+    name = os.path.basename(fields[1]) if len(fields) > 1 else ""
+    if os.path.exists(os.path.join(here, "wedged")) or "hang" in name:
+        time.sleep(3600)
+    if "crash" in name:
+        os._exit(3)
+    if fields[0] == "PING":
+        print("PONG", flush=True)
+    elif fields[0] == "QUIT":
+        break
+    elif fields[0] == "VERIFY":
+        score = 0.75 if fields[1].endswith(".csv") else 0.91
+        print("SUCCESS: Analysis complete.\nSCORE: %s\nIS_HANDHELD: true\nTREMOR_ENERGY: 0.2\nDURATION: 3s" % score)
+        print("VERDICT: REAL/CONSISTENT\nEXIT_CODE: 0\nEND", flush=True)
+    elif fields[0] == "FLOW":
+        print("FPS: 30\nFRAMES: 90")
+        for i in range(89):
+            t = (i + 1) / 30
+            print("FLOW: %r,%r,%r" % (t, math.sin(2 * math.pi * 0.7 * t), math.cos(t)))
+        print("EXIT_CODE: 0\nEND", flush=True)
+'''
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(TEST_ROOT, ignore_errors=True)
+
+
+def install_fake_cli(path: str) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(FAKE_CLI.format(python=sys.executable))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return path
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Sessions on a fresh SQLite database with every table created."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def cli(tmp_path):
+    """A fake vp_cli of its own; its requests are logged to requests.log beside it."""
+    return install_fake_cli(str(tmp_path / "vp_cli"))
+
+
+def cli_requests(cli: str) -> list:
+    """What the fake vp_cli at `cli` has been asked so far (see FAKE_CLI)."""
+    path = os.path.join(os.path.dirname(cli), "requests.log")
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.fixture
+def bundle(tmp_path):
+    """(video, gyro) paths: bytes the fake vp_cli does not decode and a 3 s gyro log."""
+    video, gyro = tmp_path / "clip.mp4", tmp_path / "gyro.csv"
+    video.write_bytes(b"not decoded by the fake")
+    gyro.write_bytes(gyro_csv())
+    return str(video), str(gyro)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The app, started once for the session, with an admin account registered first."""
+    from fastapi.testclient import TestClient
+
+    install_fake_cli(os.environ["VERIPHYSICS_CLI_PATH"])
+    from app.main import app
+
+    with TestClient(app) as client:
+        client.admin = login(client, "admin@example.com")
+        yield client
+
+
+def login(client, email: str) -> dict:
+    client.post("/register", json={"email": email, "password": "pw"})
+    token = client.post("/token", data={"username": email, "password": "pw"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def new_user(client) -> dict:
+    bearer = login(client, f"{uuid.uuid4().hex}@example.com")
+    key = client.post("/api-keys", headers=bearer).json()["api_key"]
+    return {"bearer": bearer, "key": key, "headers": {"x-api-key": key}}
+
+
+@pytest.fixture
+def user(client):
+    """A fresh account: its bearer headers, API key and API-key headers."""
+    return new_user(client)
+
+
+@pytest.fixture
+def other_user(client):
+    """A second fresh account, for isolation between tenants."""
+    return new_user(client)
+
+
+def gyro_csv(seconds: float = 3.0, rate: int = 200) -> bytes:
+    """A gyro log panning around Y at 0.7 Hz, matching the fake vp_cli's FLOW."""
+    rows = [(i / rate, math.sin(2 * math.pi * 0.7 * i / rate)) for i in range(int(seconds * rate))]
+    return ("timestamp,x,y,z\n" + "".join(f"{t!r},0.0,{y!r},0.0\n" for t, y in rows)).encode()
+
+
+@pytest.fixture
+def submit(client):
+    """Posts a bundle (unique video bytes unless given) and returns the job id."""
+    def submit(user, video: bytes = None, gyro: bytes = None, **options):
+        files = {
+            "video": ("clip.mp4", video or uuid.uuid4().bytes, "video/mp4"),
+            "gyro": ("gyro.csv", gyro or gyro_csv(), "text/csv"),
+        }
+        response = client.post("/verify", headers=user["headers"], files=files, **options)
+        assert response.status_code == 200, response.text
+        return response.json()["id"]
+    return submit
+
+
+@pytest.fixture
+def finished(client):
+    """Waits for a job to complete or fail and returns its status response."""
+    def finished(job_id: int, timeout: float = 10.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = client.get(f"/jobs/{job_id}").json()
+            if job["status"] in ("COMPLETED", "ERROR"):
+                return job
+            time.sleep(0.05)
+        raise AssertionError(f"Job {job_id} still {job['status']}")
+    return finished
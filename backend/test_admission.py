@@ -0,0 +1,202 @@
+import asyncio
+
+import pytest
+
+from app import admission, models
+from app.admission import AdmissionController, AdmissionError, AdmissionMiddleware, TokenBucket
+
+
+class Clock:
+    """Stands in for the time module; advanced by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission, "time", clock)
+    return clock
+
+
+def add_key(db, key: str, user_id: int = 1, **limits):
+    db.add(models.ApiKey(key=key, user_id=user_id, is_active=True, **limits))
+    db.commit()
+
+
+def controller(session_factory, depth=0, **options):
+    options.setdefault("default_rate_per_minute", 0)
+    return AdmissionController(session_factory, queue_depth=lambda db: depth, job_seconds=lambda: 20.0, **options)
+
+
+def refusal(action) -> AdmissionError:
+    with pytest.raises(AdmissionError) as error:
+        action()
+    return error.value
+
+
+def test_token_bucket_refills_up_to_its_burst(clock):
+    bucket = TokenBucket(rate=0.5, burst=2)
+    assert bucket.take() == bucket.take() == 0.0
+    assert bucket.take() == pytest.approx(2.0)
+    clock.now += 1.0  # Half a token
+    assert bucket.take() == pytest.approx(1.0)
+    clock.now += 1.0
+    assert bucket.take() == 0.0
+    clock.now += 3600
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, pytest.approx(2.0)]
+
+
+def test_rate_limit_per_key(session_factory, db, clock):
+    add_key(db, "a", rate_limit_per_minute=6, rate_limit_burst=2)
+    add_key(db, "b", rate_limit_per_minute=6, rate_limit_burst=2)
+    admit = controller(session_factory, default_max_uploads=0)
+    assert admit.admit("a") and admit.admit("a")
+    error = refusal(lambda: admit.admit("a"))
+    assert (error.reason, error.retry_after, error.status_code) == ("rate", 10, 429)
+    assert admit.admit("b")  # Buckets are per key
+    assert admit.admit("a", rated=False)  # Chunks of an upload already started are free
+    clock.now += 10
+    assert admit.admit("a")
+
+
+def test_defaults_and_unlimited(session_factory, db, clock):
+    add_key(db, "default")
+    add_key(db, "unlimited", rate_limit_per_minute=0)
+    admit = controller(session_factory, default_rate_per_minute=60, default_burst=1, default_max_uploads=0)
+    assert admit.effective_limits(db.query(models.ApiKey).filter_by(key="default").one()).to_dict() == {
+        "rate_limit_per_minute": 60, "rate_limit_burst": 1, "max_concurrent_jobs": 100, "max_concurrent_uploads": 0,
+    }
+    assert admit.admit("default")
+    assert refusal(lambda: admit.admit("default")).retry_after == 1
+    assert all(admit.admit("unlimited") for _ in range(20))
+    assert admit.admit("missing") is False
+
+
+def test_limit_changes_apply_after_invalidate(session_factory, db, clock):
+    add_key(db, "a", rate_limit_per_minute=1, rate_limit_burst=1)
+    admit = controller(session_factory)
+    assert admit.admit("a")
+    db.query(models.ApiKey).filter_by(key="a").update({"rate_limit_per_minute": 0})
+    db.commit()
+    assert refusal(lambda: admit.admit("a")).reason == "rate"  # Cached
+    admit.invalidate("a")
+    assert admit.admit("a")
+
+
+def test_per_key_concurrency(session_factory, db, clock):
+    add_key(db, "a", max_concurrent_uploads=2)
+    add_key(db, "b", max_concurrent_uploads=2)
+    admit = controller(session_factory)
+    assert admit.admit("a") and admit.admit("a")
+    assert refusal(lambda: admit.admit("a")).reason == "key_concurrency"
+    assert admit.admit("b")
+    admit.release("a", 3.0)
+    assert admit.admit("a")
+    assert admit.in_flight == 3
+
+
+def test_per_user_job_cap(session_factory, db, clock):
+    add_key(db, "a", user_id=1, max_concurrent_jobs=2)
+    add_key(db, "a2", user_id=1, max_concurrent_jobs=2)
+    for status in ("PENDING", "SIGNING", "COMPLETED", "ERROR"):
+        db.add(models.VerificationJob(user_id=1, status=status))
+    db.add(models.VerificationJob(user_id=2, status="PENDING"))
+    db.commit()
+    admit = controller(session_factory)
+    error = refusal(lambda: admit.admit("a2", creates_jobs=True))  # The cap is the user's, across keys
+    assert (error.reason, error.retry_after) == ("user_jobs", 20)
+    assert admit.admit("a", creates_jobs=False)  # Chunks of an upload do not create jobs
+    db.query(models.VerificationJob).filter_by(status="SIGNING").update({"status": "COMPLETED"})
+    db.commit()
+    assert admit.admit("a", creates_jobs=True)
+
+
+def test_global_caps(session_factory, db, clock):
+    add_key(db, "a", max_concurrent_uploads=0)
+    add_key(db, "b", max_concurrent_uploads=0)
+    admit = controller(session_factory, max_uploads=2, capacity=0)
+    assert admit.admit("a") and admit.admit("b")
+    assert refusal(lambda: admit.admit("b")).reason == "uploads"
+
+    full = controller(session_factory, depth=9, capacity=10, workers=2, max_uploads=0)
+    assert full.admit("a")
+    error = refusal(lambda: full.admit("b"))
+    assert (error.reason, error.retry_after) == ("capacity", 10)  # One job over, two workers at 20 s each
+    full.release("a", 1.0)
+    clock.now += 2  # The depth is cached for depth_ttl
+    assert full.admit("b")
+
+
+def call(middleware, method, path, headers=()):
+    """Runs one request through the middleware; returns (status, headers, body, received, reached)."""
+    scope = {"type": "http", "method": method, "path": path, "headers": [(k.encode(), v.encode()) for k, v in headers]}
+    received, reached, sent = [], [], []
+
+    async def receive():
+        received.append(True)
+        return {"type": "http.request", "body": b"payload", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    async def app(scope, receive, send):
+        reached.append(True)
+        await receive()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    asyncio.run(middleware(app)(scope, receive, send))
+    start = sent[0]
+    return start["status"], dict(start["headers"]), b"".join(m.get("body", b"") for m in sent[1:]), received, reached
+
+
+def test_middleware_rejects_before_reading_the_body(session_factory, db, clock):
+    add_key(db, "a", rate_limit_per_minute=60, rate_limit_burst=1)
+    admit, reasons = controller(session_factory), []
+
+    def middleware(app):
+        return AdmissionMiddleware(app, admit, on_reject=reasons.append)
+
+    status, _, _, received, reached = call(middleware, "POST", "/verify", [("x-api-key", "a")])
+    assert (status, received, reached) == (200, [True], [True])
+    assert admit.in_flight == 0  # Released when the response is done
+    status, headers, body, received, reached = call(middleware, "POST", "/verify", [("x-api-key", "a")])
+    assert status == 429 and headers[b"retry-after"] == b"1"
+    assert b"Rate limit" in body
+    assert received == [] and reached == []
+    assert reasons == ["rate"]
+
+
+def test_middleware_passes_other_requests_through(session_factory, db, clock):
+    add_key(db, "a", rate_limit_per_minute=60, rate_limit_burst=1)
+    admit = controller(session_factory)
+
+    def middleware(app):
+        return AdmissionMiddleware(app, admit)
+
+    assert call(middleware, "POST", "/verify", [("x-api-key", "a")])[0] == 200
+    assert call(middleware, "GET", "/jobs", [("x-api-key", "a")])[0] == 200  # Not admission-controlled
+    assert call(middleware, "POST", "/verify")[0] == 200  # No key: the endpoint rejects it
+    assert call(middleware, "POST", "/verify", [("x-api-key", "unknown")])[0] == 200
+    assert call(middleware, "PATCH", "/uploads/abc", [("x-api-key", "a")])[0] == 200  # Unrated chunk
+    assert call(middleware, "POST", "/verify", [("x-api-key", "a")])[0] == 429
+
+
+def test_rate_limit_on_verify(client, user, submit):
+    response = client.put(
+        f"/admin/api-keys/{user['key']}/limits", headers=client.admin,
+        json={"rate_limit_per_minute": 1, "rate_limit_burst": 1},
+    )
+    assert response.json()["effective"]["rate_limit_per_minute"] == 1
+    submit(user)
+    response = client.post("/verify", headers=user["headers"], files={"video": ("clip.mp4", b"v"), "gyro": ("gyro.csv", b"g")})
+    assert response.status_code == 429
+    assert 50 <= int(response.headers["retry-after"]) <= 60
@@ -0,0 +1,110 @@
+import datetime
+
+import pytest
+
+from app import analytics, models
+
+DAY = datetime.datetime(2026, 3, 14)
+
+
+def finish(db, at, verified=True, score=0.9, user_id=1, api_key_id=10, **fields):
+    job = models.VerificationJob(status="COMPLETED", user_id=user_id, api_key_id=api_key_id, **fields)
+    job.is_consistent = verified
+    job.score = score if verified is not None else None
+    analytics.store_metrics(job, {"is_handheld": True, "tremor_energy": 0.4, "duration": 5.0} if verified is not None else {})
+    job.finished_at = at
+    db.add(job)
+    analytics.record(db, job)
+    db.commit()
+    return job
+
+
+def day_query(db, **filters):
+    return analytics.query(db, "day", DAY, DAY + datetime.timedelta(days=2), **filters)
+
+
+def test_contribution():
+    job = models.VerificationJob(is_consistent=True, score=0.95, is_handheld=False, duration=3.0)
+    assert analytics.contribution(job) == {}  # Not finished yet
+    job.finished_at = DAY
+    assert analytics.contribution(job) == {
+        "jobs": 1, "verified": 1, "tremor_checked": 1, "handheld": 0,
+        "score_sum": 0.95, "score_bin_9": 1, "duration_sum": 3.0,
+    }
+    job.is_consistent = None
+    assert analytics.contribution(job) == {"jobs": 1, "errors": 1}
+
+
+def test_score_bins_are_clamped():
+    assert analytics.score_bin(0.0) == "score_bin_0"
+    assert analytics.score_bin(0.55) == "score_bin_5"
+    assert analytics.score_bin(1.0) == "score_bin_9"
+
+
+def test_query_sums_rollups(db):
+    finish(db, DAY + datetime.timedelta(hours=1), score=0.9)
+    finish(db, DAY + datetime.timedelta(hours=5), verified=False, score=0.2)
+    finish(db, DAY + datetime.timedelta(hours=6), verified=None)
+    result = day_query(db)
+    assert [bucket["start"] for bucket in result["buckets"]] == ["2026-03-14T00:00:00Z", "2026-03-15T00:00:00Z"]
+    first, empty = result["buckets"]
+    assert (first["jobs"], first["verified"], first["failed"], first["errors"]) == (3, 1, 1, 1)
+    assert first["pass_rate"] == 0.5
+    assert first["handheld_ratio"] == 1.0
+    assert first["mean_score"] == pytest.approx(0.55)
+    assert first["score_histogram"][9] == 1 and first["score_histogram"][2] == 1
+    assert empty["jobs"] == 0 and empty["pass_rate"] is None
+    assert result["totals"]["jobs"] == 3
+
+    hours = analytics.query(db, "hour", DAY, DAY + datetime.timedelta(hours=6))
+    assert [bucket["jobs"] for bucket in hours["buckets"]] == [0, 1, 0, 0, 0, 1]
+
+
+def test_query_filters_by_user_and_key(db):
+    finish(db, DAY, user_id=1, api_key_id=10)
+    finish(db, DAY, user_id=1, api_key_id=11)
+    finish(db, DAY, user_id=2, api_key_id=12)
+    assert day_query(db)["totals"]["jobs"] == 3
+    assert day_query(db, user_id=1)["totals"]["jobs"] == 2
+    assert day_query(db, user_id=1, api_key_id=11)["totals"]["jobs"] == 1
+
+
+def test_rescore_moves_a_job_between_bins(db):
+    job = finish(db, DAY, score=0.9)
+    analytics.record(db, job, sign=-1)
+    job.score, job.is_consistent = 0.3, False
+    analytics.record(db, job)
+    db.commit()
+    totals = day_query(db)["totals"]
+    assert (totals["jobs"], totals["verified"], totals["failed"]) == (1, 0, 1)
+    assert totals["score_histogram"][9] == 0 and totals["score_histogram"][3] == 1
+
+
+def test_rebuild_matches_incremental_rollups(db):
+    for hour, verified in ((1, True), (2, False), (30, None)):
+        finish(db, DAY + datetime.timedelta(hours=hour), verified=verified, score=0.8)
+    # Finished before the rollups existed: metrics only in details, no finished_at
+    legacy = models.VerificationJob(
+        status="COMPLETED", user_id=1, api_key_id=10, is_consistent=True, score=0.75,
+        details={"is_handheld": False, "duration": 2.0}, created_at=DAY + datetime.timedelta(hours=3),
+    )
+    db.add(legacy)
+    db.commit()
+    analytics.record(db, legacy)  # No-op: not finished
+    before = day_query(db)
+
+    assert analytics.rebuild_rollups(db, batch_size=2) == {"jobs": 4, "backfilled": 1, "rollups": 6}  # 4 hours, 2 days
+    after = day_query(db)
+    assert after["totals"]["jobs"] == before["totals"]["jobs"] + 1
+    assert after["totals"]["verified"] == before["totals"]["verified"] + 1
+    assert after["buckets"][1] == before["buckets"][1]
+    assert db.get(models.VerificationJob, legacy.id).duration == 2.0
+
+
+def test_invalid_ranges(db):
+    with pytest.raises(ValueError, match="Unknown period"):
+        analytics.query(db, "week")
+    with pytest.raises(ValueError, match="before end"):
+        analytics.query(db, "day", DAY, DAY)
+    with pytest.raises(ValueError, match="At most"):
+        analytics.query(db, "hour", DAY, DAY + datetime.timedelta(days=365))
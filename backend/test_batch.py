@@ -0,0 +1,195 @@
+import hashlib
+import io
+import json
+import os
+import tarfile
+import threading
+import time
+import uuid
+import zipfile
+
+import pytest
+
+from app.batch import ArchiveExtractor, BatchError, StreamPipe, pair_items
+from conftest import gyro_csv
+
+
+def tar_bytes(members: dict, mode: str = "w") -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def zip_bytes(members: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def extractor(tmp_path, max_file_bytes=1 << 20, max_total_bytes=1 << 20, max_members=100):
+    return ArchiveExtractor(str(tmp_path), max_file_bytes, max_total_bytes, max_members)
+
+
+def test_tar_members_are_stored_while_the_body_streams(tmp_path):
+    first, second = os.urandom(30000), os.urandom(100000)
+    data = tar_bytes({"a.mp4": first, "a.csv": second})
+    x, pipe = extractor(tmp_path), StreamPipe()
+    thread = threading.Thread(target=x.extract_tar, args=(pipe,))
+    thread.start()
+    pipe.feed(data[:60000])  # All of a.mp4, plus tarfile's read-ahead, but not a.csv
+    deadline = time.monotonic() + 5
+    while "a.mp4" not in x.files and time.monotonic() < deadline:
+        time.sleep(0.01)
+    midway = sorted(x.files)
+    pipe.feed(data[60000:])
+    pipe.finish()
+    thread.join(5)
+    assert midway == ["a.mp4"]
+    assert sorted(x.files) == ["a.csv", "a.mp4"]
+    path, size, sha256 = x.files["a.mp4"]
+    assert (size, sha256) == (len(first), hashlib.sha256(first).hexdigest())
+    assert open(path, "rb").read() == first
+
+
+@pytest.mark.parametrize("mode", ["w:gz", "w:bz2", "w:xz"])
+def test_compressed_tar(tmp_path, mode):
+    x = extractor(tmp_path)
+    x.extract_tar(io.BytesIO(tar_bytes({"clips/a.mp4": b"video", "clips/a.csv": b"gyro"}, mode)))
+    assert sorted(x.files) == ["clips/a.csv", "clips/a.mp4"]
+
+
+def test_zip(tmp_path):
+    x = extractor(tmp_path)
+    x.extract_zip(io.BytesIO(zip_bytes({"a.mp4": b"video", "dir/": b"", "a.csv": b"gyro"})))
+    assert sorted(x.files) == ["a.csv", "a.mp4"]
+    assert {size for _, size, _ in x.files.values()} == {5, 4}
+
+
+def test_invalid_archives(tmp_path):
+    with pytest.raises(BatchError, match="Invalid tar") as error:
+        extractor(tmp_path).extract_tar(io.BytesIO(b"not an archive" * 100))
+    assert error.value.status_code == 400
+    with pytest.raises(BatchError, match="Invalid zip"):
+        extractor(tmp_path).extract_zip(io.BytesIO(b"not an archive"))
+
+
+def test_path_traversal_stays_in_the_staging_directory(tmp_path):
+    dest = tmp_path / "staging"
+    dest.mkdir()
+    members = {"../escape.mp4": b"x", "a/../../up.csv": b"x", "./ok/../b.mp4": b"x", "/abs/c.mp4": b"x", "..\\win.mp4": b"x"}
+    x = extractor(dest)
+    x.extract_tar(io.BytesIO(tar_bytes(members)))
+    assert sorted(x.files) == ["abs/c.mp4"]
+    z = extractor(dest)
+    z.extract_zip(io.BytesIO(zip_bytes(members)))
+    assert sorted(z.files) == ["abs/c.mp4"]
+    assert sorted(os.listdir(tmp_path)) == ["staging"]
+    assert all(os.path.dirname(path) == str(dest) for path, _, _ in [*x.files.values(), *z.files.values()])
+
+
+def test_links_are_skipped(tmp_path):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as archive:
+        link = tarfile.TarInfo("a.mp4")
+        link.type, link.linkname = tarfile.SYMTYPE, "/etc/passwd"
+        archive.addfile(link)
+    x = extractor(tmp_path)
+    x.extract_tar(io.BytesIO(buffer.getvalue()))
+    assert x.files == {}
+
+
+@pytest.mark.parametrize("limits, message", [
+    ({"max_file_bytes": 1000}, "maximum file size"),
+    ({"max_total_bytes": 1500}, "maximum batch size"),
+    ({"max_members": 1}, "more than 1 files"),
+])
+def test_limits(tmp_path, limits, message):
+    data = tar_bytes({"a.mp4": b"v" * 800, "b.mp4": b"v" * 1200})
+    with pytest.raises(BatchError, match=message) as error:
+        extractor(tmp_path, **limits).extract_tar(io.BytesIO(data))
+    assert error.value.status_code == 413
+
+
+def test_zip_is_capped_while_spooling(tmp_path):
+    with pytest.raises(BatchError, match="maximum batch size") as error:
+        extractor(tmp_path, max_total_bytes=100).extract_zip(io.BytesIO(zip_bytes({"a.mp4": os.urandom(500)})))
+    assert error.value.status_code == 413
+    assert os.listdir(tmp_path) == []
+
+
+def staged(tmp_path, members: dict) -> dict:
+    x = extractor(tmp_path)
+    x.extract_tar(io.BytesIO(tar_bytes(members)))
+    return x.files
+
+
+def test_pairs_by_stem(tmp_path):
+    files = staged(tmp_path, {"a/1.mp4": b"v", "a/1.csv": b"g", "b/1.mov": b"v", "b/1.vpgy": b"g", "2.mp4": b"v", "1.csv": b"g"})
+    items = {item["video"]: item for item in pair_items(files)}
+    assert items["a/1.mp4"]["gyro"] == "a/1.csv"
+    assert items["b/1.mov"]["gyro"] == "b/1.vpgy"
+    assert items["2.mp4"]["error"] == "No gyro file for '2.mp4'"
+    assert [item["name"] for item in pair_items(files)] == ["2", "1", "1"]
+
+
+def test_manifest_overrides_stems(tmp_path):
+    manifest = {"items": [
+        {"id": "first", "video": "x.mp4", "gyro": "./logs/y.csv", "flow": "f.csv"},
+        {"video": "x.mp4", "gyro": "missing.csv"},
+        {"id": "partial", "video": "x.mp4"},
+    ]}
+    files = staged(tmp_path, {"manifest.json": json.dumps(manifest).encode(), "x.mp4": b"v", "x.csv": b"g", "logs/y.csv": b"g", "f.csv": b"f"})
+    first, missing, partial = pair_items(files)
+    assert (first["name"], first["gyro"], first["flow"], first["error"]) == ("first", "logs/y.csv", "f.csv", None)
+    assert (missing["name"], missing["error"]) == ("x.mp4", "Missing gyro file 'missing.csv'")
+    assert partial["error"] == "Item needs both 'video' and 'gyro'"
+
+
+@pytest.mark.parametrize("manifest, message", [
+    (b"{not json", "Invalid manifest"),
+    (b'{"items": {}}', "'items' list"),
+    (b'["x.mp4"]', "item 0 must be an object"),
+])
+def test_invalid_manifests(tmp_path, manifest, message):
+    with pytest.raises(BatchError, match=message):
+        pair_items(staged(tmp_path, {"manifest.json": manifest}))
+
+
+def test_batch_endpoint(client, user, finished):
+    members = {
+        "one.mp4": uuid.uuid4().bytes, "one.csv": gyro_csv(),
+        "two/clip.mp4": uuid.uuid4().bytes, "two/clip.csv": gyro_csv(),
+        "lonely.mp4": uuid.uuid4().bytes,
+    }
+    response = client.post(
+        "/verify/batch", headers={**user["headers"], "content-type": "application/x-tar"}, content=tar_bytes(members, "w:gz"),
+    )
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert (result["total"], result["invalid"]) == (3, 1)
+    items = {item["item"]: item for item in result["items"]}
+    assert items["lonely"]["status"] == "INVALID"
+    for name in ("one", "clip"):
+        assert finished(items[name]["job_id"])["status"] == "COMPLETED"
+    progress = client.get(f"/verify/batch/{result['batch_id']}", headers=user["headers"]).json()
+    assert progress["done"] and progress["completed"] == 3
+
+
+def test_batch_endpoint_limits(client, user, monkeypatch):
+    from app import main
+
+    headers = {**user["headers"], "content-type": "application/zip"}
+    archive = zip_bytes({"a.mp4": b"v", "a.csv": b"g"})
+    monkeypatch.setattr(main, "MAX_BATCH_FILES", 1)
+    response = client.post("/verify/batch", headers=headers, content=archive)
+    assert response.status_code == 413 and "more than 1 files" in response.json()["detail"]
+    monkeypatch.setattr(main, "MAX_BATCH_BYTES", 10)
+    response = client.post("/verify/batch", headers=headers, content=archive)
+    assert response.status_code == 413 and response.json()["detail"] == "Batch exceeds the maximum upload size"
+    assert client.post("/verify/batch", headers=headers, content=b"").status_code == 400
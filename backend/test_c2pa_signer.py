@@ -0,0 +1,134 @@
+import multiprocessing
+import os
+import threading
+import time
+import urllib.error
+
+import pytest
+from c2pa import C2paError
+
+from app.c2pa_signer import (
+    UPLOAD_INGREDIENT, C2PASignerService, SigningError, SigningTimeout, TSAProbe, build_manifest, is_tsa_error,
+)
+
+PRIMARY_TSA = "http://tsa.invalid"
+
+
+def fake_sign(cert_path, key_path, ta_url, input_path, output_path, verification_data):
+    """Stands in for c2pa in the signing process; the input's name picks the behaviour."""
+    scenario = os.path.basename(input_path)
+    primary = ta_url == PRIMARY_TSA
+    started = time.time()
+    if scenario == "tsa_error" and primary:
+        raise C2paError.Other("TimeStamp error: connection refused")
+    if scenario == "bad_key":
+        raise C2paError.Signature("certificate rejected")
+    if scenario == "stall" and primary:
+        time.sleep(60)
+    if scenario == "slow":
+        time.sleep(60)
+    if scenario == "crash":
+        os._exit(3)
+    if scenario == "busy":
+        time.sleep(0.5)
+    with open(output_path, "w") as f:
+        f.write(f"{'primary' if primary else 'fallback'} {started} {time.time()}")
+
+
+def make_service(tsa_answers=True, sign_timeout=10.0, max_concurrent=2):
+    """A signer service without certificates, signing with fake_sign."""
+    service = C2PASignerService.__new__(C2PASignerService)
+    service.cert_path = service.key_path = None
+    service.ta_url, service.fallback_ta_url = PRIMARY_TSA, None
+    service.tsa_probe = TSAProbe(PRIMARY_TSA)
+    service.tsa_probe._probe = lambda: tsa_answers
+    service.sign_timeout = sign_timeout
+    service._slots = threading.BoundedSemaphore(max_concurrent)
+    service.sign = fake_sign
+    return service
+
+
+def sign(service, tmp_path, scenario):
+    source = tmp_path / scenario
+    source.write_bytes(b"video")
+    output = tmp_path / "signed.mp4"
+    service.sign_video(str(source), str(output), {})
+    return output.read_text().split()[0]
+
+
+def leftovers(tmp_path):
+    return sorted(p.name for p in tmp_path.iterdir() if ".partial" in p.name)
+
+
+def test_tsa_errors_are_recognised():
+    assert is_tsa_error(urllib.error.URLError("refused"))
+    assert is_tsa_error(C2paError.Other("TimeStamp error: HTTP request failed"))
+    assert not is_tsa_error(C2paError.Signature("invalid key"))
+    assert not is_tsa_error(ValueError("bad manifest"))
+    assert not is_tsa_error(TimeoutError())  # Could be a slow rewrite; see sign_video
+
+
+def test_manifest_claims_only_to_have_opened_the_upload():
+    manifest = build_manifest({"score": 0.9})
+    actions, verification = manifest["assertions"]
+    assert actions["data"]["actions"] == [{"action": "c2pa.opened", "parameters": {"ingredientIds": [UPLOAD_INGREDIENT]}}]
+    assert "digitalSourceType" not in str(manifest)
+    assert verification == {"label": "stds.veriphysics.assertion", "data": {"score": 0.9}}
+
+
+def test_signs_with_the_primary_tsa(tmp_path):
+    assert sign(make_service(), tmp_path, "ok") == "primary"
+
+
+def test_tsa_failure_falls_back(tmp_path):
+    service = make_service()
+    assert sign(service, tmp_path, "tsa_error") == "fallback"
+    assert not service.tsa_probe.available()
+
+
+def test_signing_error_does_not_fall_back(tmp_path):
+    with pytest.raises(SigningError, match="certificate rejected") as error:
+        sign(make_service(), tmp_path, "bad_key")
+    assert not error.value.tsa
+    assert leftovers(tmp_path) == []
+
+
+def test_stalled_tsa_is_killed_and_falls_back(tmp_path):
+    started = time.monotonic()
+    assert sign(make_service(tsa_answers=False, sign_timeout=1.0), tmp_path, "stall") == "fallback"
+    assert time.monotonic() - started < 30
+    assert multiprocessing.active_children() == []
+    assert leftovers(tmp_path) == []
+
+
+def test_slow_rewrite_times_out_without_a_second_sign(tmp_path):
+    with pytest.raises(SigningTimeout):
+        sign(make_service(tsa_answers=True, sign_timeout=1.0), tmp_path, "slow")
+    assert multiprocessing.active_children() == []
+    assert not (tmp_path / "signed.mp4").exists()
+
+
+def test_crashed_signing_process(tmp_path):
+    with pytest.raises(SigningError, match="exited with code 3"):
+        sign(make_service(), tmp_path, "crash")
+
+
+def test_concurrent_calls_are_capped(tmp_path):
+    service = make_service(max_concurrent=1)
+    spans = []
+
+    def run(i):
+        directory = tmp_path / str(i)
+        directory.mkdir()
+        source = directory / "busy"
+        source.write_bytes(b"video")
+        service.sign_video(str(source), str(directory / "signed.mp4"), {})
+        spans.append(tuple(map(float, (directory / "signed.mp4").read_text().split()[1:])))
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    first, second = sorted(spans)
+    assert first[1] <= second[0]
@@ -0,0 +1,121 @@
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from app import database, models
+
+
+def test_engine_options_per_backend(monkeypatch):
+    monkeypatch.setattr(database, "SQLITE_BUSY_TIMEOUT_MS", 2500)
+    pooled = {"pool_size": database.DB_POOL_SIZE, "max_overflow": database.DB_MAX_OVERFLOW,
+              "pool_recycle": database.DB_POOL_RECYCLE, "pool_timeout": database.DB_POOL_TIMEOUT}
+
+    options = database.engine_options("sqlite:////srv/app.db")
+    assert options["connect_args"] == {"check_same_thread": False, "timeout": 2.5}
+    assert options["pool_pre_ping"] and pooled.items() <= options.items()
+
+    memory = database.engine_options("sqlite://")
+    assert "pool_size" not in memory and memory["connect_args"]["check_same_thread"] is False
+    assert "pool_size" not in database.engine_options("sqlite+aiosqlite:///:memory:")
+
+    postgres = database.engine_options("postgresql://vp:secret@db/vp")
+    assert "connect_args" not in postgres and pooled.items() <= postgres.items()
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("sqlite:///./veriphysics.db", "sqlite+aiosqlite:///./veriphysics.db"),
+    ("postgresql://vp:s3cret@db:5432/vp", "postgresql+asyncpg://vp:s3cret@db:5432/vp"),
+    ("postgresql+psycopg2://vp@db/vp", "postgresql+asyncpg://vp@db/vp"),
+    ("mysql+pymysql://vp:pw@db/vp", "mysql+aiomysql://vp:pw@db/vp"),
+    ("oracle://vp@db/vp", None),
+])
+def test_async_url(url, expected):
+    assert database.async_url(url) == expected
+
+
+def pragmas(conn) -> tuple:
+    return tuple(conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in ("journal_mode", "busy_timeout", "synchronous"))
+
+
+def test_sqlite_pragmas(tmp_path):
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    engine = create_engine(url, **database.engine_options(url))
+    event.listen(engine, "connect", database._set_sqlite_pragmas)
+    with engine.connect() as conn:
+        assert pragmas(conn) == ("wal", database.SQLITE_BUSY_TIMEOUT_MS, 1)  # 1 = NORMAL
+    engine.dispose()
+    with database.engine.connect() as conn:  # The app's own engine
+        assert pragmas(conn)[:2] == ("wal", database.SQLITE_BUSY_TIMEOUT_MS)
+
+
+def test_busy_writer_waits_for_the_lock(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "SQLITE_BUSY_TIMEOUT_MS", 300)
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    engine = create_engine(url, **database.engine_options(url))
+    event.listen(engine, "connect", database._set_sqlite_pragmas)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+    holder, waiter = engine.raw_connection(), engine.raw_connection()
+    try:
+        holder.cursor().execute("BEGIN IMMEDIATE")
+        waiter.cursor().execute("SELECT count(*) FROM t").fetchall()  # WAL: readers are not blocked
+        started = time.monotonic()
+        with pytest.raises(Exception, match="locked"):
+            waiter.cursor().execute("INSERT INTO t VALUES (1)")
+        assert time.monotonic() - started >= 0.25
+    finally:
+        holder.close()
+        waiter.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def stored_job(client):
+    """A job in the app's database (the client fixture has created the schema)."""
+    db = database.SessionLocal()
+    job = models.VerificationJob(user_id=1, status="COMPLETED", score=0.9, details={"verdict": "ok"})
+    db.add(job)
+    db.commit()
+    job_id = job.id
+    db.close()
+    return job_id
+
+
+def test_load_job_with_an_async_session(stored_job, monkeypatch):
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    from app import main
+
+    assert database.AsyncSessionLocal is not None
+    assert event.contains(database.async_engine.sync_engine, "connect", database._set_sqlite_pragmas)
+    url = database.async_url(database.SQL_ALCHEMY_DATABASE_URL)
+
+    async def load():
+        # An engine of this event loop's own: pooled aiosqlite connections are tied to their loop
+        engine = create_async_engine(url, **database.engine_options(url))
+        event.listen(engine.sync_engine, "connect", database._set_sqlite_pragmas)
+        monkeypatch.setattr(database, "AsyncSessionLocal", sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+        try:
+            async with engine.connect() as conn:
+                journal_mode = (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar()
+            return journal_mode, await main.load_job(stored_job), await main.load_job(10 ** 9)
+        finally:
+            await engine.dispose()
+
+    journal_mode, job, missing = asyncio.run(load())
+    assert journal_mode == "wal"
+    assert (job.id, job.status, job.score, job.details) == (stored_job, "COMPLETED", 0.9, {"verdict": "ok"})
+    assert missing is None
+
+
+def test_load_job_without_an_async_engine(stored_job, monkeypatch):
+    from app import main
+
+    monkeypatch.setattr(database, "AsyncSessionLocal", None)
+    job = asyncio.run(main.load_job(stored_job))
+    assert (job.id, job.status) == (stored_job, "COMPLETED")
+    assert job.details == {"verdict": "ok"}  # Loaded before the session closed
@@ -0,0 +1,46 @@
+from app import dedup, models, profiles
+
+VIDEO, GYRO, FLOW = "a" * 64, "b" * 64, "c" * 64
+
+
+def add_job(db, user_id=1, content_hash="h", status="COMPLETED", **fields):
+    job = models.VerificationJob(user_id=user_id, content_hash=content_hash, status=status, **fields)
+    db.add(job)
+    db.commit()
+    return job.id
+
+
+def test_bundle_hash_is_stable():
+    assert dedup.bundle_hash(VIDEO, GYRO) == dedup.bundle_hash(VIDEO, GYRO)
+    assert dedup.bundle_hash(VIDEO, GYRO) != dedup.bundle_hash(GYRO, VIDEO)
+    assert dedup.bundle_hash(VIDEO, GYRO) != dedup.bundle_hash(VIDEO, GYRO, FLOW)
+
+
+def test_bundle_hash_profiles():
+    # Jobs stored before profiles existed hashed without one, i.e. as the baseline
+    assert dedup.bundle_hash(VIDEO, GYRO, profile=profiles.BASELINE) == dedup.bundle_hash(VIDEO, GYRO)
+    assert dedup.bundle_hash(VIDEO, GYRO, profile="fast") != dedup.bundle_hash(VIDEO, GYRO)
+    assert dedup.bundle_hash(VIDEO, GYRO, profile="fast") != dedup.bundle_hash(VIDEO, GYRO, profile="balanced")
+    # A precomputed flow is not analysed, so the profile cannot change the result
+    assert dedup.bundle_hash(VIDEO, GYRO, FLOW, "fast") == dedup.bundle_hash(VIDEO, GYRO, FLOW)
+
+
+def test_find_duplicate_prefers_latest_reusable_job(db):
+    add_job(db, status="COMPLETED")
+    latest = add_job(db, status="PENDING")
+    add_job(db, status="ERROR")
+    assert dedup.find_duplicate(db, 1, "h").id == latest
+
+
+def test_find_duplicate_skips_errors_and_other_users(db):
+    add_job(db, status="ERROR")
+    add_job(db, user_id=2)
+    assert dedup.find_duplicate(db, 1, "h") is None
+    assert dedup.find_duplicate(db, 1, "other") is None
+
+
+def test_find_by_idempotency_key(db):
+    job_id = add_job(db, idempotency_key="retry-1")
+    assert dedup.find_by_idempotency_key(db, 1, "retry-1").id == job_id
+    assert dedup.find_by_idempotency_key(db, 2, "retry-1") is None
+    assert dedup.find_by_idempotency_key(db, 1, "retry-2") is None
@@ -0,0 +1,52 @@
+import asyncio
+
+from app import events
+
+
+class Request:
+    def __init__(self, connected):
+        self.connected = connected
+
+    async def is_disconnected(self):
+        return not self.connected
+
+
+def collect(broker, job_id, snapshot, last_event_id, connected=True):
+    """The stream's chunks after the retry line; fails if it does not end within 5 s."""
+    async def run():
+        sub = broker.subscribe(job_id=job_id, event_type="job")
+        stream = events.stream_events(
+            broker, sub, Request(connected), initial=[snapshot], last_event_id=last_event_id,
+            heartbeat=0.05, final_statuses=("COMPLETED", "ERROR"),
+        )
+        return [chunk async for chunk in stream]
+    return asyncio.run(asyncio.wait_for(run(), 5))[1:]
+
+
+def job(status):
+    return {"id": 1, "user_id": 1, "status": status}
+
+
+def history(*statuses):
+    broker = events.EventBroker()
+    for status in statuses:
+        broker.publish(job(status))
+    return broker, [e["id"] for e in broker._history]
+
+
+def test_resume_after_the_final_event_ends_the_stream():
+    broker, ids = history("PROCESSING", "COMPLETED")
+    chunks = collect(broker, 1, job("COMPLETED"), ids[-1])
+    assert chunks == ['event: job\ndata: {"id": 1, "status": "COMPLETED"}\n\n']
+
+
+def test_resume_replays_up_to_the_final_event():
+    broker, ids = history("PROCESSING", "COMPLETED")
+    chunks = collect(broker, 1, job("COMPLETED"), ids[0])
+    assert len(chunks) == 1 and chunks[0].startswith(f"id: {ids[1]}\nevent: job\n")
+
+
+def test_resume_of_a_running_job_skips_the_snapshot():
+    broker, ids = history("PROCESSING")
+    assert collect(broker, 1, job("PROCESSING"), ids[-1], connected=False) == []  # Ends on the disconnect check
+
@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+
+from app.flow_cache import FlowCache, FlowSeries
+
+
+def series(n=100, with_y=True):
+    t = np.arange(n) / 30
+    return FlowSeries(t, np.sin(t), np.cos(t) if with_y else None)
+
+
+def test_miss_then_hit(tmp_path):
+    cache = FlowCache(str(tmp_path))
+    assert cache.get_flow("video", "a" * 64) is None
+    cache.put_flow("video", "a" * 64, series())
+    hit = cache.get_flow("video", "a" * 64)
+    np.testing.assert_array_equal(hit.to_array(), series().to_array())
+    assert cache.get_flow("client", "a" * 64) is None  # Kinds do not share entries
+    assert cache.get_flow("video", None) is None
+
+
+def test_flow_without_y_round_trips(tmp_path):
+    cache = FlowCache(str(tmp_path))
+    cache.put_flow("client", "b" * 64, series(with_y=False))
+    assert cache.get_flow("client", "b" * 64).flow_y is None
+
+
+def test_gyro_round_trips(tmp_path):
+    cache = FlowCache(str(tmp_path))
+    gyro = np.column_stack([np.arange(50) / 100, np.ones(50), np.zeros(50), np.arange(50.0)])
+    cache.put_gyro("c" * 64, gyro)
+    with open(cache.gyro_path("c" * 64), "rb") as f:
+        assert f.read(4) == b"VPGY"
+    assert cache.gyro_path("d" * 64) is None
+
+
+def test_unreadable_entry_is_dropped(tmp_path):
+    cache = FlowCache(str(tmp_path))
+    cache.put_flow("video", "a" * 64, series())
+    with open(cache.path("video", "a" * 64), "wb") as f:
+        f.write(b"garbage")
+    assert cache.get_flow("video", "a" * 64) is None
+    assert not os.path.exists(cache.path("video", "a" * 64))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    entry = FlowCache(str(tmp_path / "probe"))
+    entry.put_flow("video", "0" * 64, series())
+    size = os.path.getsize(entry.path("video", "0" * 64))
+
+    cache = FlowCache(str(tmp_path / "cache"), max_bytes=int(size * 3.5))
+    for i, key in enumerate("abc"):
+        cache.put_flow("video", key * 64, series())
+        os.utime(cache.path("video", key * 64), (1000 + i, 1000 + i))
+    assert cache.get_flow("video", "a" * 64) is not None  # Now the most recently used
+    cache.put_flow("video", "d" * 64, series())  # Over the limit: evicts down to 90%
+    assert [key for key in "abcd" if os.path.exists(cache.path("video", key * 64))] == ["a", "c", "d"]
+    assert cache.size == 3 * size
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = FlowCache(str(tmp_path), max_bytes=0)
+    cache.put_flow("video", "a" * 64, series())
+    assert cache.get_flow("video", "a" * 64) is None
@@ -0,0 +1,154 @@
+import numpy as np
+import pytest
+
+from app import gyro_analysis
+
+# Literal transcription of cpp_core/MotionVerifier.cpp (resampleGyro, normalizeVector,
+# calculatePearsonCorrelation, analyzeTremor), loops and float32 DFT included
+
+
+def cpp_resample(targets, gyro, column):
+    out, g = [], 0
+    for t in targets:
+        while g + 1 < len(gyro) and gyro[g + 1, 0] < t:
+            g += 1
+        if g + 1 >= len(gyro):
+            out.append(gyro[-1, column])
+            continue
+        dt = gyro[g + 1, 0] - gyro[g, 0]
+        alpha = (t - gyro[g, 0]) / dt if dt > 1e-9 else 0.0
+        out.append(gyro[g, column] * (1.0 - alpha) + gyro[g + 1, column] * alpha)
+    return out
+
+
+def cpp_normalize(v):
+    mean = sum(v) / len(v)
+    stdev = np.sqrt(sum(x * x for x in v) / len(v) - mean * mean)
+    return v if stdev < 1e-6 else [(x - mean) / stdev for x in v]
+
+
+def cpp_pearson(x, y):
+    n = len(x)
+    sum_x, sum_y = sum(x), sum(y)
+    sum_xy, sum_sq_x, sum_sq_y = sum(a * b for a, b in zip(x, y)), sum(a * a for a in x), sum(b * b for b in y)
+    denominator = np.sqrt((n * sum_sq_x - sum_x * sum_x) * (n * sum_sq_y - sum_y * sum_y))
+    return 0.0 if abs(denominator) < 1e-9 else (n * sum_xy - sum_x * sum_y) / denominator
+
+
+def cpp_optimal_dft_size(n):
+    return min(
+        2 ** a * 3 ** b * 5 ** c
+        for a in range(40) for b in range(26) for c in range(18)
+        if 2 ** a * 3 ** b * 5 ** c >= n
+    )
+
+
+def cpp_tremor(gyro):
+    duration = gyro[-1, 0] - gyro[0, 0]
+    if duration < 0.5 or int(duration * 50) < 32:
+        return False, 0.0
+    magnitude = np.sqrt((gyro[:, 1:] ** 2).sum(axis=1))
+    signal = cpp_resample([gyro[0, 0] + i / 50 for i in range(int(duration * 50))], np.column_stack([gyro[:, 0], magnitude]), 1)
+    mean = sum(signal) / len(signal)
+    padded = np.zeros(cpp_optimal_dft_size(len(signal)), dtype=np.float32)
+    padded[:len(signal)] = [v - mean for v in signal]
+    spectrum = np.fft.fft(padded)  # complex64, like cv::dft on CV_32F
+    magnitudes = np.abs(spectrum).astype(np.float32)
+    total = tremor = 0.0
+    for i in range(1, len(padded) // 2):
+        power = float(magnitudes[i] * magnitudes[i])
+        total += power
+        if 8.0 <= i * (50 / len(padded)) <= 12.0:
+            tremor += power
+    if total < 1e-6:
+        return False, 0.0
+    return bool(tremor / total > 0.10 and total > 0.1), tremor / total
+
+
+def cpp_verify(frames, flow_x, gyro):
+    resampled = cpp_resample(frames, gyro, 2)
+    flow_x = list(flow_x)
+    if len(flow_x) > 2:
+        flow_x, resampled = flow_x[2:], resampled[2:]
+    score = abs(cpp_pearson(cpp_normalize(flow_x), cpp_normalize(resampled)))
+    return score, cpp_tremor(gyro)
+
+
+def gyro_log(seconds=5.0, rate=200, tremor=0.0, seed=0):
+    """Pan around gyro Y at 0.7 Hz on a 2 rad/s bias, plus `tremor` rad/s at 10 Hz."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate)) / rate + rng.uniform(0, 0.2 / rate, int(seconds * rate))
+    t.sort()
+    y = 2.0 + np.sin(2 * np.pi * 0.7 * t) + tremor * np.sin(2 * np.pi * 10.0 * t)
+    return np.column_stack([t - t[0], 0.01 * rng.standard_normal(len(t)), y, 0.01 * rng.standard_normal(len(t))])
+
+
+def flow_with_score(gyro, score, fps=30, seed=0):
+    """Frame timestamps and a flow signal whose correlation with gyro Y is exactly `score`."""
+    rng = np.random.default_rng(seed)
+    frames = 0.02 + np.arange(int(gyro[-1, 0] * fps)) / fps
+    g = np.asarray(cpp_resample(frames, gyro, 2))[2:]
+    g = (g - g.mean()) / np.linalg.norm(g - g.mean())
+    noise = rng.standard_normal(len(g))
+    noise -= noise.mean() + np.dot(noise - noise.mean(), g) * g
+    noise /= np.linalg.norm(noise)
+    flow_x = np.empty(len(frames))
+    flow_x[:2] = rng.standard_normal(2)
+    flow_x[2:] = -5.0 * (score * g + np.sqrt(1 - score ** 2) * noise)
+    return frames, flow_x
+
+
+def tremor_log_with_ratio(ratio):
+    """A gyro log whose tremor-band energy ratio is `ratio` (found by bisection on the amplitude)."""
+    low, high = 0.0, 1.0
+    for _ in range(60):
+        mid = (low + high) / 2
+        if gyro_analysis.analyze_tremor(gyro_log(tremor=mid))[1] < ratio:
+            low = mid
+        else:
+            high = mid
+    return gyro_log(tremor=(low + high) / 2)
+
+
+@pytest.mark.parametrize("score", [0.05, 0.5, 0.698, 0.6995, 0.7005, 0.702, 0.95])
+def test_score_matches_the_cli(score):
+    gyro = gyro_log(tremor=0.3)
+    frames, flow_x = flow_with_score(gyro, score)
+    expected_score, _ = cpp_verify(frames, flow_x, gyro)
+    result = gyro_analysis.score_flow(frames, flow_x, gyro)
+    assert expected_score == pytest.approx(score, abs=1e-9)
+    assert result["score"] == pytest.approx(expected_score, abs=1e-12)
+    assert result["verified"] == (expected_score > gyro_analysis.CONSISTENCY_THRESHOLD)
+    assert result["details"]["duration"] == pytest.approx(frames[-1] - frames[0])
+
+
+@pytest.mark.parametrize("ratio", [0.02, 0.098, 0.0995, 0.1005, 0.102, 0.4])
+def test_tremor_matches_the_cli(ratio):
+    gyro = tremor_log_with_ratio(ratio)
+    is_handheld, tremor_energy = gyro_analysis.analyze_tremor(gyro)
+    expected_handheld, expected_energy = cpp_tremor(gyro)
+    assert tremor_energy == pytest.approx(ratio, abs=1e-9)
+    # float32 DFT in the CLI vs float64 here
+    assert tremor_energy == pytest.approx(expected_energy, rel=1e-5)
+    assert is_handheld == expected_handheld == (ratio > 0.10)
+
+
+@pytest.mark.parametrize("seconds, rate", [(0.4, 200), (0.66, 50), (3.0, 30), (12.0, 400)])
+def test_tremor_durations_match_the_cli(seconds, rate):
+    gyro = gyro_log(seconds=seconds, rate=rate, tremor=0.5)
+    is_handheld, tremor_energy = gyro_analysis.analyze_tremor(gyro)
+    expected_handheld, expected_energy = cpp_tremor(gyro)
+    assert is_handheld == expected_handheld
+    assert tremor_energy == pytest.approx(expected_energy, rel=1e-5, abs=1e-12)
+
+
+def test_frames_outside_the_gyro_log_match_the_cli():
+    gyro = gyro_log(seconds=3.0)[100:]  # Starts 0.5 s in: early frames extrapolate
+    frames, flow_x = flow_with_score(gyro_log(seconds=4.0), 0.8)
+    expected_score, _ = cpp_verify(frames, flow_x, gyro)
+    assert gyro_analysis.score_flow(frames, flow_x, gyro)["score"] == pytest.approx(expected_score, abs=1e-12)
+
+
+def test_optimal_dft_size_matches_opencv():
+    for n in (1, 7, 31, 32, 97, 121, 250, 600, 1021):
+        assert gyro_analysis.optimal_dft_size(n) == cpp_optimal_dft_size(n)
@@ -0,0 +1,107 @@
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from app import gyro_analysis, gyro_format
+
+
+def sample_log(n=200, t0=0.0, rate=100.0):
+    t = t0 + np.arange(n) / rate
+    return np.column_stack([t, np.sin(t), np.cos(t), 0.5 * t])
+
+
+def csv_bytes(data):
+    lines = ["timestamp,x,y,z"] + [",".join(repr(float(v)) for v in row) for row in data]
+    return ("\n".join(lines) + "\n").encode()
+
+
+@pytest.mark.parametrize("float32", [True, False])
+@pytest.mark.parametrize("compress", [True, False])
+def test_round_trip(float32, compress):
+    data = sample_log()
+    raw, rates, nanoseconds = gyro_format.decode_gyro_binary(gyro_format.encode_gyro(data, float32, compress))
+    assert not nanoseconds
+    np.testing.assert_array_equal(raw, data[:, 0])
+    np.testing.assert_allclose(rates, data[:, 1:], rtol=1e-6 if float32 else 0)
+
+
+def test_binary_loads_like_csv():
+    data = sample_log(t0=1.7e18, rate=1e-7)  # 100 Hz on a nanosecond clock
+    binary = gyro_analysis.load_gyro(gyro_format.encode_gyro(data, float32=False, nanoseconds=True))
+    text = gyro_analysis.load_gyro(csv_bytes(data))
+    np.testing.assert_allclose(binary, text)
+    assert binary[0, 0] == 0.0
+    assert binary[-1, 0] == pytest.approx(1.99)
+
+
+def test_load_gyro_reads_files_of_either_format(tmp_path):
+    data = sample_log()
+    (tmp_path / "g.vpgy").write_bytes(gyro_format.encode_gyro(data, float32=False))
+    (tmp_path / "g.csv").write_bytes(csv_bytes(data))
+    np.testing.assert_allclose(gyro_analysis.load_gyro(str(tmp_path / "g.vpgy")), gyro_analysis.load_gyro(str(tmp_path / "g.csv")))
+
+
+def test_degrees_flag_converts_to_radians():
+    data = sample_log(n=4)
+    buffer = bytearray(gyro_format.encode_gyro(data, float32=False))
+    buffer[5] |= gyro_format.FLAG_DEGREES
+    _, rates, _ = gyro_format.decode_gyro_binary(bytes(buffer))
+    np.testing.assert_allclose(rates, np.radians(data[:, 1:]))
+
+
+def test_zero_count_reads_the_whole_payload():
+    data = sample_log(n=10)
+    buffer = bytearray(gyro_format.encode_gyro(data))
+    struct.pack_into("<I", buffer, 12, 0)
+    raw, _, _ = gyro_format.decode_gyro_binary(bytes(buffer))
+    assert len(raw) == 10
+
+
+def header(magic=gyro_format.MAGIC, version=gyro_format.VERSION, flags=0, value_size=4, count=0):
+    return gyro_format.HEADER.pack(magic, version, flags, value_size, 0.0, count)
+
+
+@pytest.mark.parametrize("buffer, message", [
+    (b"VPGY", "Truncated header"),
+    (header(magic=b"NOPE"), "Not a VPGY"),
+    (header(version=2), "version"),
+    (header(value_size=2), "value size"),
+    (header(count=5) + b"\0" * 20, "declares 5 records"),
+    (header(flags=gyro_format.FLAG_ZLIB) + b"not zlib", "Corrupt compressed payload"),
+])
+def test_malformed_buffers(buffer, message):
+    with pytest.raises(gyro_format.GyroFormatError, match=message):
+        gyro_format.decode_gyro_binary(buffer)
+
+
+def test_compressed_payload_is_capped_by_the_declared_count():
+    data = sample_log(n=10)
+    exact = gyro_format.encode_gyro(data, compress=True)
+    assert len(gyro_format.decode_gyro_binary(exact)[0]) == 10
+    record = gyro_format.record_dtype(4).itemsize
+    bomb = header(flags=gyro_format.FLAG_ZLIB, count=10) + zlib.compress(b"\0" * (11 * record))
+    with pytest.raises(gyro_format.GyroFormatError, match=f"inflates past {10 * record} bytes"):
+        gyro_format.decode_gyro_binary(bomb)
+
+
+def test_compressed_payload_without_a_count_is_capped(monkeypatch):
+    monkeypatch.setattr(gyro_format, "MAX_INFLATED_BYTES", 1024)
+    payload = zlib.compress(b"\0" * 1024)
+    assert len(gyro_format.decode_gyro_binary(header(flags=gyro_format.FLAG_ZLIB) + payload)[0]) == 1024 // gyro_format.record_dtype(4).itemsize
+    with pytest.raises(gyro_format.GyroFormatError, match="inflates past 1024"):
+        gyro_format.decode_gyro_binary(header(flags=gyro_format.FLAG_ZLIB) + zlib.compress(b"\0" * 1025))
+    with pytest.raises(gyro_format.GyroFormatError, match="more than 1024"):
+        gyro_format.decode_gyro_binary(header(flags=gyro_format.FLAG_ZLIB, count=100) + payload)
+
+
+def test_truncated_compressed_payload():
+    payload = gyro_format.encode_gyro(sample_log(n=10), compress=True)
+    with pytest.raises(gyro_format.GyroFormatError, match="truncated"):
+        gyro_format.decode_gyro_binary(payload[:-6])
+
+
+def test_malformed_binary_loads_as_empty():
+    assert gyro_analysis.load_gyro(header(count=5)).shape == (0, 4)
+    assert gyro_analysis.load_gyro(header(flags=gyro_format.FLAG_ZLIB) + zlib.compress(b"")).shape == (0, 4)
@@ -0,0 +1,203 @@
+import datetime
+
+import pytest
+
+from app import models, stats
+from app.job_queue import Deferred, JobQueue, LeaseLost, release_lease
+
+
+def add_job(db, **fields):
+    fields.setdefault("status", "PENDING")
+    job = models.VerificationJob(user_id=1, **fields)
+    db.add(job)
+    stats.record_job_created(db)
+    db.commit()
+    return job.id
+
+
+def complete(job, db):
+    stats.record_transition(db, job.status, job.is_consistent, "COMPLETED", True)
+    job.status = "COMPLETED"
+    job.is_consistent = True
+    release_lease(db, job)
+    db.commit()
+
+
+def fail(job, db):
+    raise RuntimeError("boom")
+
+
+def make_queue(session_factory, handler, **options):
+    options.setdefault("max_attempts", 3)
+    options.setdefault("backoff_base", 0.0)
+    return JobQueue(session_factory, handler, workers=1, **options)
+
+
+def expire_lease(session_factory, job_id):
+    db = session_factory()
+    job = db.get(models.VerificationJob, job_id)
+    job.lease_expires_at = datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+    db.commit()
+    db.close()
+
+
+def load(session_factory, job_id):
+    db = session_factory()
+    job = db.get(models.VerificationJob, job_id)
+    db.expunge(job)
+    db.close()
+    return job
+
+
+def counters(session_factory):
+    db = session_factory()
+    try:
+        return dict(db.query(models.StatCounter.name, models.StatCounter.value).all())
+    finally:
+        db.close()
+
+
+def test_success_releases_lease(session_factory, db):
+    job_id = add_job(db)
+    queue = make_queue(session_factory, complete)
+    assert queue._run_one()
+    job = load(session_factory, job_id)
+    assert (job.status, job.attempts, job.lease_token, job.lease_expires_at) == ("COMPLETED", 1, None, None)
+    assert counters(session_factory)[stats.status_counter("COMPLETED")] == 1
+    assert not queue._run_one()
+
+
+def test_failures_retry_then_give_up(session_factory, db):
+    job_id = add_job(db)
+    given_up = []
+    queue = make_queue(session_factory, fail, on_give_up=lambda job, db: given_up.append(job.id))
+    for attempt in range(1, 4):
+        assert queue._run_one()
+        job = load(session_factory, job_id)
+        assert job.attempts == attempt
+        assert job.lease_token is None
+    assert job.status == "ERROR"
+    assert given_up == [job_id]
+    assert not queue._run_one()
+    stat = counters(session_factory)
+    assert stat[stats.status_counter("ERROR")] == 1
+    assert stat[stats.status_counter("PENDING")] == 0
+    assert stat[stats.status_counter("PROCESSING")] == 0
+
+
+def test_deferred_job_keeps_its_attempts(session_factory, db):
+    job_id = add_job(db)
+
+    def defer(job, db):
+        raise Deferred("Signer unavailable", retry_after=0)
+
+    queue = make_queue(session_factory, defer, max_attempts=1)
+    for _ in range(3):
+        assert queue._run_one()
+    job = load(session_factory, job_id)
+    assert (job.status, job.attempts, job.lease_token) == ("PENDING", 0, None)
+    assert "Signer unavailable" in job.message
+
+
+def test_expired_lease_is_retried_while_attempts_remain(session_factory, db):
+    job_id = add_job(db)
+    queue = make_queue(session_factory, complete, max_attempts=2)
+    first = queue._lease(db)
+    token = first.lease_token
+    expire_lease(session_factory, job_id)
+    second = queue._lease(session_factory())
+    assert second.id == job_id
+    assert second.attempts == 2
+    assert second.lease_token != token
+
+
+def test_exhausted_expired_lease_gives_up(session_factory, db):
+    job_id = add_job(db)
+    given_up = []
+    queue = make_queue(session_factory, complete, max_attempts=1, on_give_up=lambda job, db: given_up.append(job.id))
+    queue._lease(db)
+    expire_lease(session_factory, job_id)
+    # The worker died: the job is failed, not leased for a second run
+    assert not queue._run_one()
+    job = load(session_factory, job_id)
+    assert job.status == "ERROR"
+    assert "lease expired" in job.message
+    assert given_up == [job_id]
+    stat = counters(session_factory)
+    assert stat[stats.status_counter("ERROR")] == 1
+    assert stat[stats.status_counter("PROCESSING")] == 0
+
+
+def record_in_details(job, message):
+    job.details = dict(job.details, signing_error=message)
+
+
+def test_record_error_keeps_the_message(session_factory, db):
+    job_id = add_job(db, status="SIGNING", message="REAL/CONSISTENT", details={})
+    queue = make_queue(
+        session_factory, fail, max_attempts=2, record_error=record_in_details,
+        ready_status="SIGNING", running_status="SIGNING", failed_status="COMPLETED",
+    )
+    assert queue._run_one()
+    job = load(session_factory, job_id)
+    assert (job.status, job.message) == ("SIGNING", "REAL/CONSISTENT")
+    assert job.details["signing_error"].startswith("Attempt 1 failed")
+    assert queue._run_one()
+    job = load(session_factory, job_id)
+    assert (job.status, job.message, job.details["signing_error"]) == ("COMPLETED", "REAL/CONSISTENT", "boom")
+
+
+def test_record_error_on_an_expired_lease(session_factory, db):
+    job_id = add_job(db, message="REAL/CONSISTENT", details={})
+    queue = make_queue(session_factory, complete, max_attempts=1, record_error=record_in_details)
+    queue._lease(db)
+    expire_lease(session_factory, job_id)
+    assert not queue._run_one()
+    job = load(session_factory, job_id)
+    assert (job.status, job.message) == ("ERROR", "REAL/CONSISTENT")
+    assert "lease expired" in job.details["signing_error"]
+
+
+def test_stale_run_cannot_commit(session_factory):
+    first_db, second_db = session_factory(), session_factory()
+    job_id = add_job(first_db)
+    queue = make_queue(session_factory, complete)
+    stale = queue._lease(first_db)
+    expire_lease(session_factory, job_id)
+    current = queue._lease(second_db)
+    assert current.id == stale.id
+
+    stale.status = "COMPLETED"
+    with pytest.raises(LeaseLost):
+        release_lease(first_db, stale)
+    assert load(session_factory, job_id).status == "PROCESSING"
+
+    complete(current, second_db)
+    assert load(session_factory, job_id).status == "COMPLETED"
+    assert counters(session_factory)[stats.status_counter("COMPLETED")] == 1
+    first_db.close()
+    second_db.close()
+
+
+def test_stale_failure_does_not_reschedule(session_factory):
+    first_db, second_db = session_factory(), session_factory()
+    job_id = add_job(first_db)
+    queue = make_queue(session_factory, complete)
+    stale = queue._lease(first_db)
+    token = stale.lease_token
+    expire_lease(session_factory, job_id)
+    queue._lease(second_db)
+    queue._handle_failure(first_db, job_id, token, RuntimeError("late"))
+    job = load(session_factory, job_id)
+    assert job.status == "PROCESSING"
+    assert job.lease_token is not None
+    first_db.close()
+    second_db.close()
+
+
+def test_priority_order(session_factory, db):
+    low = add_job(db, priority=0)
+    high = add_job(db, priority=5)
+    queue = make_queue(session_factory, complete)
+    assert queue._lease(db).id == high
+    assert queue._lease(db).id == low
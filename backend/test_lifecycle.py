@@ -0,0 +1,61 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app import lifecycle, models
+from app.job_queue import JobQueue
+
+# verification_jobs, users and api_keys as the first release created them
+BASELINE_SCHEMA = [
+    """CREATE TABLE verification_jobs (
+        id INTEGER PRIMARY KEY, created_at DATETIME DEFAULT CURRENT_TIMESTAMP, status VARCHAR,
+        user_id INTEGER, video_filename VARCHAR, gyro_filename VARCHAR, score FLOAT,
+        is_consistent BOOLEAN, message VARCHAR, signed_url VARCHAR)""",
+    """CREATE TABLE users (
+        id INTEGER PRIMARY KEY, email VARCHAR UNIQUE, hashed_password VARCHAR,
+        is_active BOOLEAN, is_admin BOOLEAN)""",
+    """CREATE TABLE api_keys (
+        id INTEGER PRIMARY KEY, key VARCHAR UNIQUE, user_id INTEGER, is_active BOOLEAN,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP)""",
+    "INSERT INTO users (id, email, hashed_password, is_active, is_admin) VALUES (1, 'old@example.com', 'x', 1, 1)",
+    "INSERT INTO api_keys (id, key, user_id, is_active) VALUES (1, 'legacy-key', 1, 1)",
+    """INSERT INTO verification_jobs (id, status, user_id, video_filename, gyro_filename)
+        VALUES (1, 'PENDING', 1, 'clip.mp4', 'gyro.csv')""",
+]
+
+
+def baseline_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}", connect_args={"check_same_thread": False})
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.execute(text(statement))
+    return engine
+
+
+def test_upgrade_backfills_defaults(tmp_path):
+    engine = baseline_engine(tmp_path)
+    changes = lifecycle.init_schema(engine, models.Base.metadata)
+    assert {"verification_jobs.attempts", "verification_jobs.priority", "api_keys.priority"} <= set(changes["added"])
+    columns = {column["name"] for column in inspect(engine).get_columns("verification_jobs")}
+    assert {"video_path", "gyro_path", "lease_token", "next_attempt_at"} <= columns
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT attempts, priority FROM verification_jobs")).one() == (0, 0)
+        assert conn.execute(text("SELECT priority FROM api_keys")).one() == (None,)  # No default: the user's
+    assert lifecycle.init_schema(engine, models.Base.metadata) == {"created": [], "added": []}
+    engine.dispose()
+
+
+def test_legacy_pending_job_fails_instead_of_retrying(tmp_path):
+    from app.main import process_verification, verification_given_up
+
+    engine = baseline_engine(tmp_path)
+    lifecycle.init_schema(engine, models.Base.metadata)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    queue = JobQueue(session_factory, process_verification, workers=1, on_give_up=verification_given_up)
+    assert queue._run_one()
+    assert not queue._run_one()
+    db = session_factory()
+    job = db.get(models.VerificationJob, 1)
+    assert (job.status, job.attempts, job.lease_token) == ("ERROR", 1, None)
+    assert "resubmit" in job.message
+    db.close()
+    engine.dispose()
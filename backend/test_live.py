@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+from app import gyro_analysis
+from app.live import LiveAnalysis, LiveError
+
+
+def recording(seconds=6.0, gyro_rate=200, fps=30, consistent=True, seed=0):
+    """Raw gyro (seconds clock starting at 1000) and per-frame flow of one clip."""
+    rng = np.random.default_rng(seed)
+    raw = 1000.0 + np.arange(int(seconds * gyro_rate)) / gyro_rate
+    t = raw - raw[0]
+    rates = np.column_stack([
+        0.1 * np.cos(t),
+        np.sin(2 * np.pi * 0.7 * t) + 0.05 * np.sin(2 * np.pi * 10 * t) + 0.02 * rng.standard_normal(len(t)),
+        0.1 * rng.standard_normal(len(t)),
+    ])
+    frames = 0.01 + np.arange(int(seconds * fps)) / fps
+    if consistent:
+        flow_x = -3.0 * np.interp(frames, t, rates[:, 1]) + 0.1 * rng.standard_normal(len(frames))
+    else:
+        flow_x = rng.standard_normal(len(frames))
+    return raw, rates, frames, flow_x
+
+
+def reference(raw, rates, frames, flow_x):
+    gyro = np.column_stack([raw - raw[0], rates])
+    return gyro_analysis.score_flow(frames, flow_x, gyro)
+
+
+def chunks(n, sizes):
+    start = 0
+    for size in sizes:
+        if start >= n:
+            return
+        yield slice(start, start + size)
+        start += size
+    if start < n:
+        yield slice(start, n)
+
+
+def push(analysis, raw, rates, frames, flow_x, order):
+    gyro = list(chunks(len(raw), [150, 7, 300, 1, 90] * 10))
+    flow = list(chunks(len(frames), [4, 1, 20, 9] * 20))
+    if order == "gyro_first":
+        steps = [("g", s) for s in gyro] + [("f", s) for s in flow]
+    elif order == "flow_first":
+        steps = [("f", s) for s in flow] + [("g", s) for s in gyro]
+    else:
+        steps = [step for pair in zip([("g", s) for s in gyro], [("f", s) for s in flow]) for step in pair]
+        steps += [("g", s) for s in gyro[len(flow):]] + [("f", s) for s in flow[len(gyro):]]
+    for kind, part in steps:
+        if kind == "g":
+            analysis.add_gyro(raw[part], rates[part], False)
+        else:
+            analysis.add_flow(frames[part], flow_x[part])
+
+
+@pytest.mark.parametrize("order", ["gyro_first", "flow_first", "interleaved"])
+@pytest.mark.parametrize("consistent", [True, False])
+def test_finish_matches_score_flow(order, consistent):
+    clip = recording(consistent=consistent)
+    analysis = LiveAnalysis(window=2.0)
+    push(analysis, *clip, order)
+    result, expected = analysis.finish(), reference(*clip)
+    assert result["verified"] == expected["verified"] == consistent
+    assert result["message"] == expected["message"]
+    assert result["score"] == pytest.approx(expected["score"], rel=1e-9)
+    assert result["details"] == pytest.approx(expected["details"], rel=1e-9)
+
+
+def test_short_recording_matches_score_flow():
+    raw, rates, frames, flow_x = recording(seconds=1.0)
+    analysis = LiveAnalysis()
+    analysis.add_gyro(raw, rates, False)
+    analysis.add_flow(frames[:2], flow_x[:2])
+    expected = reference(raw, rates, frames[:2], flow_x[:2])
+    assert analysis.finish()["score"] == pytest.approx(expected["score"], rel=1e-9)
+
+
+def test_snapshot_reports_the_recent_window():
+    raw, rates, frames, flow_x = recording(seconds=8.0)
+    flow_x = flow_x.copy()
+    late = frames > 6.0
+    flow_x[~late] = np.random.default_rng(1).standard_normal((~late).sum())  # Only the last 2 s agree
+    analysis = LiveAnalysis(window=2.0)
+    analysis.add_gyro(raw, rates, False)
+    analysis.add_flow(frames, flow_x)
+    snapshot = analysis.snapshot()
+    assert snapshot["frames"] == len(frames)
+    assert snapshot["window_verified"] and not snapshot["verified"]
+    assert snapshot["window_score"] > snapshot["score"]
+
+
+def test_gyro_is_trimmed_as_frames_are_matched():
+    raw, rates, frames, flow_x = recording(seconds=6.0)
+    analysis = LiveAnalysis()
+    push(analysis, raw, rates, frames, flow_x, "interleaved")
+    assert len(analysis._gyro_t) < len(raw) // 10
+
+
+def test_out_of_order_pushes_are_rejected():
+    raw, rates, frames, flow_x = recording(seconds=1.0)
+    analysis = LiveAnalysis()
+    analysis.add_gyro(raw[100:], rates[100:], False)
+    with pytest.raises(LiveError) as error:
+        analysis.add_gyro(raw[:100], rates[:100], False)
+    assert error.value.status_code == 409
+    analysis.add_flow(frames[5:], flow_x[5:])
+    with pytest.raises(LiveError):
+        analysis.add_flow(frames[:5], flow_x[:5])
+    with pytest.raises(LiveError) as error:
+        analysis.add_gyro(raw[:0], rates[:0], False)
+    assert error.value.status_code == 400
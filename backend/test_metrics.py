@@ -0,0 +1,25 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app import metrics
+
+
+def timed_selects():
+    for sample in metrics.DB_SECONDS.collect()[0].samples:
+        if sample.name.endswith("_count") and sample.labels.get("operation") == "SELECT":
+            return sample.value
+    return 0
+
+
+def test_failed_statements_leave_nothing_on_the_connection():
+    engine = metrics.instrument_engine(create_engine("sqlite://"))
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing_table"))
+        before = timed_selects()
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+        assert timed_selects() == before + 1
+        assert not any(key.startswith("veriphysics") for key in conn.info)
+    engine.dispose()
@@ -0,0 +1,96 @@
+import datetime
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from fastapi import HTTPException, Response
+from starlette.requests import Request
+
+from app import models
+from app.pagination import decode_cursor, encode_cursor, paginate_jobs
+
+T0 = datetime.datetime(2024, 5, 1, 12, 0, 0)
+
+
+def request(query: str = "") -> Request:
+    return Request({
+        "type": "http", "method": "GET", "scheme": "http", "server": ("testserver", 80),
+        "path": "/admin/jobs", "query_string": query.encode(), "headers": [],
+    })
+
+
+@pytest.fixture
+def jobs(db):
+    """Twelve jobs, three per timestamp, so pages split ties on created_at."""
+    statuses = ["COMPLETED", "ERROR", "PENDING"]
+    for i in range(12):
+        db.add(models.VerificationJob(user_id=1, status=statuses[i % 3], created_at=T0 + datetime.timedelta(minutes=i // 3)))
+    db.commit()
+    return db.query(models.VerificationJob).order_by(models.VerificationJob.created_at.desc(), models.VerificationJob.id.desc()).all()
+
+
+def pages(db, limit, **filters):
+    """Follows X-Next-Cursor to the end; returns the ids per page."""
+    result, cursor = [], None
+    while True:
+        response = Response()
+        page = paginate_jobs(db.query(models.VerificationJob), request(), response, cursor=cursor, limit=limit, **filters)
+        result.append([job.id for job in page])
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return result
+
+
+def test_cursor_round_trips(jobs):
+    assert decode_cursor(encode_cursor(jobs[4])) == (jobs[4].created_at, jobs[4].id)
+    with pytest.raises(HTTPException) as error:
+        decode_cursor("not-a-cursor")
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4, 5, 12])
+def test_pages_split_ties_without_gaps_or_repeats(db, jobs, limit):
+    result = pages(db, limit)
+    assert [job_id for page in result for job_id in page] == [job.id for job in jobs]
+    assert all(len(page) == limit for page in result[:-1])
+
+
+def test_last_full_page_has_no_cursor(db, jobs):
+    assert pages(db, 12) == [[job.id for job in jobs]]
+
+
+def test_status_and_date_filters(db, jobs):
+    statuses = [job_id for page in pages(db, 2, status="completed, error") for job_id in page]
+    assert statuses == [job.id for job in jobs if job.status in ("COMPLETED", "ERROR")]
+    window = [job_id for page in pages(db, 2, created_after=T0 + datetime.timedelta(minutes=1), created_before=T0 + datetime.timedelta(minutes=3)) for job_id in page]
+    assert window == [job.id for job in jobs if T0 + datetime.timedelta(minutes=1) <= job.created_at < T0 + datetime.timedelta(minutes=3)]
+    assert len(window) == 6
+
+
+def test_limit_is_clamped(db, jobs):
+    response = Response()
+    assert len(paginate_jobs(db.query(models.VerificationJob), request(), response, limit=0)) == 1
+    assert "X-Next-Cursor" in response.headers
+
+
+def test_link_header_keeps_the_filters(db, jobs):
+    response = Response()
+    paginate_jobs(db.query(models.VerificationJob), request("status=PENDING&limit=9"), response, limit=2, status="PENDING")
+    cursor = response.headers["X-Next-Cursor"]
+    url, rel = response.headers["Link"].split("; ")
+    assert rel == 'rel="next"'
+    next_url = urlsplit(url.strip("<>"))
+    assert next_url.path == "/admin/jobs"
+    assert parse_qs(next_url.query) == {"status": ["PENDING"], "limit": ["2"], "cursor": [cursor]}
+
+
+def test_admin_jobs_headers(client, user, submit):
+    for _ in range(3):
+        submit(user)
+    first = client.get("/admin/jobs", headers=client.admin, params={"limit": 2})
+    assert first.status_code == 200 and len(first.json()) == 2
+    assert first.headers["link"].endswith('; rel="next"')
+    second = client.get(first.headers["link"][1:].split(">")[0], headers=client.admin)
+    assert second.status_code == 200
+    assert not {job["id"] for job in first.json()} & {job["id"] for job in second.json()}
+    assert client.get("/admin/jobs", headers=client.admin, params={"cursor": "%%%"}).status_code == 400
+    assert client.get("/admin/jobs", headers=user["bearer"]).status_code == 403
@@ -0,0 +1,192 @@
+import struct
+
+import pytest
+
+from app.preflight import PreflightError, check_bundle, read_video_info
+from conftest import gyro_csv
+
+
+def box(kind: bytes, *children: bytes) -> bytes:
+    payload = b"".join(children)
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def large_box(kind: bytes, *children: bytes) -> bytes:
+    """The 64-bit `largesize` header form."""
+    payload = b"".join(children)
+    return struct.pack(">I4sQ", 1, kind, 16 + len(payload)) + payload
+
+
+def full_box(kind: bytes, version: int, body: bytes) -> bytes:
+    return box(kind, struct.pack(">B3x", version), body)
+
+
+def mvhd(timescale: int, duration: int, version: int = 0) -> bytes:
+    if version == 1:
+        return full_box(b"mvhd", 1, struct.pack(">QQIQ", 0, 0, timescale, duration) + bytes(80))
+    return full_box(b"mvhd", 0, struct.pack(">IIII", 0, 0, timescale, duration) + bytes(80))
+
+
+def mdhd(timescale: int, duration: int, version: int = 0) -> bytes:
+    if version == 1:
+        return full_box(b"mdhd", 1, struct.pack(">QQIQ", 0, 0, timescale, duration) + bytes(4))
+    return full_box(b"mdhd", 0, struct.pack(">IIII", 0, 0, timescale, duration) + bytes(4))
+
+
+def tkhd(width: int, height: int, version: int = 0) -> bytes:
+    head = bytes(32) if version == 1 else bytes(20)
+    return full_box(b"tkhd", version, head + bytes(52) + struct.pack(">II", width << 16, height << 16))
+
+
+def hdlr(handler: bytes) -> bytes:
+    return full_box(b"hdlr", 0, bytes(4) + handler + bytes(12) + b"\0")
+
+
+def stts(*entries) -> bytes:
+    return full_box(b"stts", 0, struct.pack(">I", len(entries)) + b"".join(struct.pack(">II", *e) for e in entries))
+
+
+def co64(*offsets) -> bytes:
+    return full_box(b"co64", 0, struct.pack(">I", len(offsets)) + b"".join(struct.pack(">Q", o) for o in offsets))
+
+
+def trak(handler: bytes, timescale=30000, duration=90000, frames=90, width=1920, height=1080, version=0) -> bytes:
+    runs = [(frames - frames // 2, 1000), (frames // 2, 1000)] if frames else []
+    sample_table = box(b"stbl", stts(*runs), co64(1 << 33, (1 << 33) + 4096))
+    return box(
+        b"trak",
+        tkhd(width, height, version),
+        box(b"mdia", mdhd(timescale, duration, version), hdlr(handler), box(b"minf", sample_table)),
+    )
+
+
+FTYP = box(b"ftyp", b"isom", bytes(4), b"isomavc1")
+
+
+def write(tmp_path, data: bytes, name: str = "clip.mp4") -> str:
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_video_track(tmp_path):
+    path = write(tmp_path, FTYP + box(b"moov", mvhd(1000, 3000), trak(b"vide")) + box(b"mdat", bytes(64)))
+    assert read_video_info(path) == {
+        "duration": 3.0, "frames": 90, "fps": 30.0, "width": 1920, "height": 1080, "fragmented": False,
+    }
+
+
+def test_largesize_boxes_and_version_1_headers(tmp_path):
+    moov = large_box(b"moov", mvhd(600, 1800, version=1), trak(b"vide", 600, 1800, 60, 1280, 720, version=1))
+    path = write(tmp_path, FTYP + large_box(b"mdat", bytes(100)) + moov)
+    info = read_video_info(path)
+    assert (info["duration"], info["frames"], info["fps"], info["width"], info["height"]) == (3.0, 60, 20.0, 1280, 720)
+
+
+def test_first_trak_is_not_video(tmp_path):
+    audio = box(b"trak", box(b"mdia", mdhd(48000, 144000), hdlr(b"soun")))
+    path = write(tmp_path, FTYP + box(b"moov", mvhd(1000, 3000), audio, trak(b"vide", frames=45, width=640, height=480)))
+    info = read_video_info(path)
+    assert (info["frames"], info["width"], info["height"]) == (45, 640, 480)
+
+
+def test_only_non_video_tracks_fall_back_to_the_movie_header(tmp_path):
+    audio = box(b"trak", box(b"mdia", mdhd(48000, 96000), hdlr(b"soun")))
+    info = read_video_info(write(tmp_path, FTYP + box(b"moov", mvhd(1000, 5000), audio)))
+    assert (info["duration"], info["frames"], info["fps"], info["width"]) == (5.0, None, None, None)
+
+
+def test_truncated_boxes(tmp_path):
+    whole = FTYP + box(b"moov", mvhd(1000, 3000), trak(b"vide")) + box(b"mdat", bytes(64))
+    # The upload stopped inside mdat: the moov before it is intact
+    assert read_video_info(write(tmp_path, whole[:-10]))["frames"] == 90
+    # ... inside moov: nothing usable
+    assert read_video_info(write(tmp_path, whole[:len(FTYP) + 40])) is None
+    # A box claiming more than its parent holds is dropped, the rest is kept
+    broken = box(b"stbl", struct.pack(">I4s", 4096, b"stts") + bytes(16))
+    track = box(b"trak", tkhd(320, 240), box(b"mdia", mdhd(30, 90), hdlr(b"vide"), box(b"minf", broken)))
+    info = read_video_info(write(tmp_path, FTYP + box(b"moov", track)))
+    assert (info["duration"], info["frames"], info["width"]) == (3.0, None, 320)
+    # Header sizes below the header itself
+    assert read_video_info(write(tmp_path, FTYP + struct.pack(">I4s", 4, b"moov"))) is None
+
+
+def test_fragmented_and_other_containers(tmp_path):
+    fragmented = FTYP + box(b"moov", mvhd(1000, 0), box(b"mvex"), trak(b"vide", duration=0, frames=0)) + box(b"moof")
+    info = read_video_info(write(tmp_path, fragmented))
+    assert info["fragmented"] and info["frames"] is None and info["duration"] is None
+    assert read_video_info(write(tmp_path, b"\x1aE\xdf\xa3" + bytes(60), "clip.mkv")) is None
+    assert read_video_info(write(tmp_path, b"", "empty.mp4")) is None
+
+
+def bundle(tmp_path, gyro_seconds: float, frames: int = 90, gyro_rate: int = 200):
+    video = write(tmp_path, FTYP + box(b"moov", mvhd(1000, frames * 1000 // 30), trak(b"vide", 30, frames, frames)))
+    gyro = write(tmp_path, gyro_csv(gyro_seconds, gyro_rate), "gyro.csv")
+    return video, gyro
+
+
+def codes(issues) -> list:
+    return [issue["code"] for issue in issues]
+
+
+def test_full_coverage_passes(tmp_path):
+    report = check_bundle(*bundle(tmp_path, 3.0))
+    assert report["errors"] == [] and report["warnings"] == []
+    assert report["coverage"] == pytest.approx(2.995 / 3.0)
+
+
+def test_partial_coverage_warns(tmp_path):
+    report = check_bundle(*bundle(tmp_path, 2.0))
+    assert codes(report["warnings"]) == ["gyro_coverage"] and report["errors"] == []
+
+
+def test_short_gyro_log_is_rejected(tmp_path):
+    with pytest.raises(PreflightError, match="covers 0.99s of a 3.00s recording") as error:
+        check_bundle(*bundle(tmp_path, 1.0))
+    assert error.value.status_code == 422
+    assert codes(error.value.report["errors"]) == ["gyro_coverage"]
+
+
+def test_flag_mode_reports_without_raising(tmp_path):
+    report = check_bundle(*bundle(tmp_path, 1.0, frames=3, gyro_rate=20), strict=False)
+    assert codes(report["errors"]) == ["video_too_few_frames", "gyro_too_few_samples"]
+    assert codes(report["warnings"]) == ["gyro_low_rate"]
+
+
+def test_flow_span_replaces_the_video_duration(tmp_path):
+    video, gyro = bundle(tmp_path, 1.0)
+    flow = write(tmp_path, ("timestamp,flow_x\n" + "".join(f"{i / 30},0.1\n" for i in range(30))).encode(), "flow.csv")
+    report = check_bundle(video, gyro, flow)
+    assert report["flow"]["samples"] == 30 and report["errors"] == []
+
+
+@pytest.mark.filterwarnings("ignore:loadtxt")
+def test_unreadable_video_and_gyro(tmp_path):
+    video = write(tmp_path, b"not a container", "clip.avi")
+    gyro = write(tmp_path, b"timestamp,x,y,z\n", "gyro.csv")
+    report = check_bundle(video, gyro, strict=False)
+    assert codes(report["warnings"]) == ["video_unparsed"]
+    assert codes(report["errors"]) == ["gyro_empty"]
+
+
+@pytest.mark.parametrize("mode, status", [("reject", 422), ("flag", 200), ("off", 200)])
+def test_preflight_mode_on_verify(client, user, tmp_path, monkeypatch, mode, status):
+    from app import main, models
+
+    monkeypatch.setattr(main, "PREFLIGHT_MODE", mode)
+    video, gyro = bundle(tmp_path, 1.0)
+    files = {"video": ("clip.mp4", open(video, "rb").read() + bytes(16) + tmp_path.name.encode()), "gyro": ("gyro.csv", open(gyro, "rb").read())}
+    response = client.post("/verify", headers=user["headers"], files=files)
+    assert response.status_code == status, response.text
+    if status == 422:
+        assert codes(response.json()["detail"]["errors"]) == ["gyro_coverage"]
+        return
+    db = main.database.SessionLocal()
+    try:
+        details = db.get(models.VerificationJob, response.json()["id"]).details or {}
+    finally:
+        db.close()
+    if mode == "flag":
+        assert codes(details["preflight"]["errors"]) == ["gyro_coverage"]
+    else:
+        assert "preflight" not in details
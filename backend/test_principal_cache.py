@@ -0,0 +1,82 @@
+import hashlib
+
+import pytest
+
+from app.principal_cache import LocalBackend, Principal, PrincipalCache, RedisBackend
+
+SECRET = "vp_live_0123456789abcdef"
+
+
+def test_api_keys_are_stored_under_their_hash():
+    backend = LocalBackend()
+    cache = PrincipalCache(backend)
+    cache.set_api_key(SECRET, 7)
+    assert list(backend._data) == ["key:" + hashlib.sha256(SECRET.encode()).hexdigest()]
+    assert cache.get_api_key(SECRET) == 7
+    cache.invalidate_api_key(SECRET)
+    assert cache.get_api_key(SECRET) is None
+
+
+def test_local_backend_expires_and_evicts():
+    backend = LocalBackend(max_entries=2)
+    cache = PrincipalCache(backend, ttl=0.0)
+    cache.set_user(Principal(1, "a@b.c"))
+    assert cache.get_user("a@b.c") is None  # Expired on arrival
+    for key in "abc":
+        backend.set(key, key, 60)
+    assert (backend.get("a"), backend.get("c")) == (None, "c")
+
+
+class FakeRedis:
+    def __init__(self, error=None):
+        self.data = {}
+        self.error = error
+
+    def _check(self):
+        if self.error:
+            raise self.error
+
+    def get(self, key):
+        self._check()
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self._check()
+        self.data[key] = value
+
+    def delete(self, key):
+        self._check()
+        self.data.pop(key, None)
+
+    def scan_iter(self, pattern):
+        self._check()
+        return [key for key in list(self.data) if key.startswith(pattern.rstrip("*"))]
+
+
+def redis_cache(error=None):
+    redis = pytest.importorskip("redis")
+    backend = RedisBackend.__new__(RedisBackend)
+    backend.client, backend.prefix, backend._error = FakeRedis(error), "vp:principal:", redis.RedisError
+    return PrincipalCache(backend), backend.client
+
+
+def test_redis_backend_hashes_api_keys():
+    cache, client = redis_cache()
+    cache.set_api_key(SECRET, 7)
+    assert list(client.data) == ["vp:principal:key:" + hashlib.sha256(SECRET.encode()).hexdigest()]
+    assert cache.get_api_key(SECRET) == 7
+    cache.set_user(Principal(1, "a@b.c", is_admin=True))
+    assert cache.get_user("a@b.c").is_admin
+    cache.clear()
+    assert client.data == {}
+
+
+def test_redis_errors_fall_through_to_the_database():
+    redis = pytest.importorskip("redis")
+    cache, _ = redis_cache(redis.ConnectionError("Connection refused"))
+    assert cache.get_api_key(SECRET) is None
+    assert cache.get_user("a@b.c") is None
+    cache.set_api_key(SECRET, 7)
+    cache.set_user(Principal(1, "a@b.c"))
+    cache.invalidate_api_key(SECRET)
+    cache.clear()
@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+from app import models, profiles
+from app.flow_cache import FlowCache
+from app.profiles import AnalysisProfile, get_profile
+from app.verifier import MotionVerifierWrapper
+from conftest import cli_requests
+
+VIDEO_SHA = "a" * 64
+GYRO_SHA = "b" * 64
+
+
+def test_spec_is_what_vp_cli_parses():
+    assert get_profile("fast").spec() == (
+        "max_width=480,stride=2,pyr_scale=0.5,levels=2,winsize=11,iterations=2,poly_n=5,poly_sigma=1.2,roi_margin=0.1"
+    )
+    assert get_profile("balanced").spec().startswith("max_width=960,stride=1,")
+    assert AnalysisProfile("tiny", poly_sigma=1e-7, roi_margin=0.25).spec().endswith(",poly_sigma=1e-07,roi_margin=0.25")
+
+
+def test_profiles_round_trip_and_validate():
+    fast = get_profile("fast")
+    assert AnalysisProfile.from_dict(fast.to_dict()).to_dict() == fast.to_dict()
+    assert get_profile(profiles.BASELINE).is_baseline and not fast.is_baseline
+    for bad in ({"stride": 0}, {"pyr_scale": 1.0}, {"poly_n": 6}, {"roi_margin": 0.5}, {"max_width": -1}):
+        with pytest.raises(ValueError, match="Invalid analysis profile"):
+            AnalysisProfile("bad", **bad)
+    with pytest.raises(ValueError, match="choose from fast, balanced, accurate"):
+        get_profile("turbo")
+
+
+def test_flow_keys_isolate_profiles():
+    keys = {name: profile.flow_key(VIDEO_SHA) for name, profile in profiles.PROFILES.items()}
+    assert keys["accurate"] == VIDEO_SHA  # Entries cached before profiles existed stay valid
+    assert len(set(keys.values())) == 3
+    assert AnalysisProfile("renamed", max_width=960).flow_key(VIDEO_SHA) == keys["balanced"]
+    assert AnalysisProfile("balanced", max_width=1280).flow_key(VIDEO_SHA) != keys["balanced"]  # Retuned
+    assert get_profile("fast").flow_key(None) is None
+
+
+def fields(cli, command):
+    return [r["fields"] for r in cli_requests(cli) if r["fields"][0] == command]
+
+
+def test_vp_cli_receives_the_spec(cli, bundle):
+    verifier = MotionVerifierWrapper(cli, pool_size=1)
+    try:
+        fast = verifier.verify(*bundle, profile=get_profile("fast"))
+        baseline = verifier.verify(*bundle)
+    finally:
+        verifier.close()
+    assert fields(cli, "VERIFY") == [["VERIFY", *bundle, get_profile("fast").spec()], ["VERIFY", *bundle]]
+    assert fast["details"]["profile"]["name"] == "fast"
+    assert baseline["details"]["profile"] == get_profile("accurate").to_dict()
+
+
+def test_cached_flow_is_per_profile(cli, bundle, tmp_path):
+    verifier = MotionVerifierWrapper(cli, pool_size=1, flow_cache=FlowCache(str(tmp_path / "cache")))
+    runs = [("fast", "miss"), ("balanced", "miss"), ("fast", "hit"), ("accurate", "miss"), ("balanced", "hit")]
+    try:
+        for name, outcome in runs:
+            result = verifier.verify(*bundle, video_sha256=VIDEO_SHA, gyro_sha256=GYRO_SHA, profile=get_profile(name))
+            assert (result["details"]["flow_cache"], result["details"]["profile"]["name"]) == (outcome, name)
+    finally:
+        verifier.close()
+    video = bundle[0]
+    assert fields(cli, "FLOW") == [
+        ["FLOW", video, get_profile("fast").spec()], ["FLOW", video, get_profile("balanced").spec()], ["FLOW", video],
+    ]
+
+
+def job_profile(job_id: int) -> tuple:
+    """(analysis_profile column, profile recorded in details) of a job."""
+    from app import main
+
+    db = main.database.SessionLocal()
+    try:
+        job = db.get(models.VerificationJob, job_id)
+        return job.analysis_profile, (job.details or {}).get("profile", {}).get("name")
+    finally:
+        db.close()
+
+
+def test_profile_per_key_and_per_request(client, user, submit, finished):
+    from app import main
+
+    default = submit(user)
+    response = client.put(f"/api-keys/{user['key']}/profile", headers=user["bearer"], json={"analysis_profile": "fast"})
+    assert response.json() == {"key": user["key"], "analysis_profile": "fast"}
+    by_key = submit(user)
+    by_request = submit(user, data={"profile": "balanced"})
+    for job_id in (default, by_key, by_request):
+        finished(job_id)
+    assert job_profile(default) == (main.ANALYSIS_PROFILE, main.ANALYSIS_PROFILE)
+    assert job_profile(by_key) == ("fast", "fast")
+    assert job_profile(by_request) == ("balanced", "balanced")
+
+    specs = [r["fields"][2:] for r in cli_requests(os.environ["VERIPHYSICS_CLI_PATH"]) if r["fields"][0] == "FLOW"]
+    assert [get_profile("fast").spec()] in specs and [get_profile("balanced").spec()] in specs
+
+    response = client.post(
+        "/verify", headers=user["headers"], data={"profile": "turbo"},
+        files={"video": ("clip.mp4", b"v"), "gyro": ("gyro.csv", b"g")},
+    )
+    assert response.status_code == 422
+    assert client.put(f"/api-keys/{user['key']}/profile", headers=user["bearer"], json={"analysis_profile": "turbo"}).status_code == 422
+    client.put(f"/api-keys/{user['key']}/profile", headers=user["bearer"], json={"analysis_profile": None})
+    assert job_profile(submit(user))[0] == main.ANALYSIS_PROFILE
+
+
+def test_profile_of_another_users_key(client, user, other_user):
+    response = client.put(f"/api-keys/{user['key']}/profile", headers=other_user["bearer"], json={"analysis_profile": "fast"})
+    assert response.status_code == 404
@@ -0,0 +1,66 @@
+import pytest
+
+from app import database, models
+
+
+@pytest.fixture
+def job(client, user, submit, finished):
+    job_id = submit(user)
+    assert finished(job_id)["score"] == 0.75  # vp_cli's verdict on the flow it extracted
+    return job_id
+
+
+def rescore(client, user, job_id, **params):
+    return client.post(f"/jobs/{job_id}/rescore", headers=user["headers"], params=params)
+
+
+def stored_details(job_id):
+    db = database.SessionLocal()
+    try:
+        return db.get(models.VerificationJob, job_id).details
+    finally:
+        db.close()
+
+
+def test_verification_misses_then_hits_the_flow_cache(user, other_user, submit, finished):
+    video = b"the same clip, from two users"
+    first = submit(user, video=video)
+    finished(first)
+    second = submit(other_user, video=video)
+    finished(second)
+    assert [stored_details(job_id)["flow_cache"] for job_id in (first, second)] == ["miss", "hit"]
+
+
+def test_owner_rescore_replaces_the_verdict(client, user, job):
+    response = rescore(client, user, job)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["stored"] is True
+    assert body["previous"] == {"score": 0.75, "verified": True}
+    assert body["score"] == pytest.approx(1.0, abs=1e-3)  # The cached flow against the cached gyro log
+    assert client.get(f"/jobs/{job}").json()["score"] == body["score"]
+    assert stored_details(job)["rescored"]["previous_score"] == 0.75
+
+
+def test_tenant_scoring_is_only_a_what_if(client, user, job):
+    response = rescore(client, user, job, threshold=0.5, gyro_axis="z")
+    body = response.json()
+    assert (body["stored"], body["scoring"]["threshold"], body["scoring"]["gyro_axis"]) == (False, 0.5, "z")
+    assert body["what_if"] == {"score": 0.0, "verified": False, "message": "FAKE/INCONSISTENT"}
+    assert (body["score"], body["verified"]) == (0.75, True)  # The stored verdict is untouched
+    assert "rescored" not in stored_details(job)
+
+    response = client.post(
+        f"/jobs/{job}/rescore", headers=user["headers"],
+        files={"gyro": ("fixed.csv", b"timestamp,x,y,z\n0,0,0,0\n0.01,0,1,0\n", "text/csv")},
+    )
+    assert response.json()["stored"] is False
+
+
+def test_rescore_of_another_users_job_is_not_found(client, other_user, job):
+    assert rescore(client, other_user, job).status_code == 404
+
+
+def test_invalid_scoring_is_rejected(client, user, job):
+    assert rescore(client, user, job, gyro_axis="w").status_code == 422
+    assert rescore(client, user, 10 ** 9).status_code == 404
@@ -0,0 +1,80 @@
+import asyncio
+import datetime
+import hashlib
+
+from starlette.requests import Request
+
+from app import models, resumable
+
+
+def add_session(db, tmp_path, length=64):
+    data_path = tmp_path / "upload.mp4"
+    data_path.write_bytes(b"")
+    session = models.UploadSession(id="u1", user_id=1, length=length, offset=0, filename="a.mp4", data_path=str(data_path))
+    db.add(session)
+    db.commit()
+    return session
+
+
+def patch_request(data: bytes, chunk: int = 8) -> Request:
+    chunks = [data[i:i + chunk] for i in range(0, len(data), chunk)]
+
+    async def receive():
+        if chunks:
+            body = chunks.pop(0)
+            return {"type": "http.request", "body": body, "more_body": bool(chunks)}
+        return {"type": "http.disconnect"}
+
+    return Request({"type": "http", "method": "PATCH", "headers": []}, receive)
+
+
+def load(session_factory):
+    db = session_factory()
+    session = db.get(models.UploadSession, "u1")
+    db.expunge(session)
+    db.close()
+    return session
+
+
+def test_one_writer_at_a_time(session_factory, db, tmp_path):
+    add_session(db, tmp_path)
+    token = resumable.claim_writer(db, "u1", 0)
+    assert token
+    assert resumable.claim_writer(session_factory(), "u1", 0) is None
+    assert resumable.release_writer(db, "u1", token, 16, datetime.datetime.utcnow())
+    session = load(session_factory)
+    assert (session.offset, session.writer_token) == (16, None)
+    # The next PATCH has to start at the committed offset
+    assert resumable.claim_writer(db, "u1", 0) is None
+    assert resumable.claim_writer(db, "u1", 16)
+
+
+def test_expired_writer_is_taken_over(session_factory, db, tmp_path):
+    add_session(db, tmp_path)
+    stale = resumable.claim_writer(db, "u1", 0)
+    db.query(models.UploadSession).update(
+        {models.UploadSession.writer_expires_at: datetime.datetime.utcnow() - datetime.timedelta(seconds=1)}
+    )
+    db.commit()
+    current = resumable.claim_writer(session_factory(), "u1", 0)
+    assert current and current != stale
+    assert not resumable.release_writer(db, "u1", stale, 32, datetime.datetime.utcnow())
+    assert load(session_factory).offset == 0
+
+
+def test_append_hashes_what_it_writes(session_factory, db, tmp_path):
+    session = add_session(db, tmp_path)
+    token = resumable.claim_writer(db, "u1", 0)
+    data = bytes(range(40))
+    offset, hasher = asyncio.run(resumable.append_chunk(patch_request(data), session, db, token))
+    assert offset == len(data)
+    assert (tmp_path / "upload.mp4").read_bytes() == data
+    assert hasher.hexdigest() == hashlib.sha256(data).hexdigest()
+
+    resumable.release_writer(db, "u1", token, offset, None)
+    resumable.hashers.put("u1", offset, hasher)
+    db.refresh(session)
+    assert resumable.session_sha256(session) == hashlib.sha256(data).hexdigest()
+    # Kept on the session, so a finalize retry after the file moved still knows it
+    (tmp_path / "upload.mp4").unlink()
+    assert resumable.session_sha256(session) == hashlib.sha256(data).hexdigest()
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import time
+
+import pytest
+
+from app import models
+from app.storage import LocalStorage, StorageGC, blob_key, blob_sha256, file_url
+
+
+def put(storage, tmp_path, kind: str, data: bytes, ext: str = ".mp4", age: float = 0.0) -> str:
+    src = tmp_path / f"src-{hashlib.sha256(data).hexdigest()}"
+    src.write_bytes(data)
+    key = storage.put_file(str(src), blob_key(kind, hashlib.sha256(data).hexdigest(), ext))
+    if age:
+        then = time.time() - age
+        os.utime(storage.path(key), (then, then))
+    return key
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalStorage(str(tmp_path / "blobs"))
+
+
+def add_job(db, status: str, **paths) -> models.VerificationJob:
+    job = models.VerificationJob(user_id=1, status=status, **paths)
+    db.add(job)
+    db.commit()
+    return job
+
+
+def test_blobs_are_content_addressed(storage, tmp_path):
+    key = put(storage, tmp_path, "uploads", b"video", ".MP4")
+    sha256 = hashlib.sha256(b"video").hexdigest()
+    assert key == f"uploads/{sha256}.mp4" and blob_sha256(key) == sha256
+    assert storage.path(key) == os.path.join(storage.root, "uploads", sha256[:2], f"{sha256}.mp4")
+    assert put(storage, tmp_path, "uploads", b"video") == key  # The duplicate is dropped, the blob kept
+    assert not (tmp_path / f"src-{sha256}").exists()
+    assert list(storage.list("uploads")) == [(key, 5, os.stat(storage.path(key)).st_mtime)]
+    assert file_url("signed/abc.mp4") == "/files/abc.mp4"
+
+
+def test_release_keeps_blobs_another_active_job_references(storage, session_factory, db, tmp_path):
+    gc = StorageGC(storage, session_factory)
+    shared = put(storage, tmp_path, "uploads", b"shared", age=60)
+    own = put(storage, tmp_path, "uploads", b"own", ".csv", age=60)
+    add_job(db, "PENDING", video_path=shared, gyro_path="uploads/other.csv")
+    done = add_job(db, "COMPLETED", video_path=shared, gyro_path=own)
+    gc.release(db, [done.video_path, done.gyro_path, None], stored_before=time.time())
+    assert storage.exists(shared) and not storage.exists(own)
+
+
+def test_release_leaves_blobs_touched_by_a_new_upload(storage, session_factory, db, tmp_path):
+    gc = StorageGC(storage, session_factory)
+    key = put(storage, tmp_path, "uploads", b"video", age=60)
+    stored_before = time.time() - 30  # The finished job was created before the blob was touched again
+    put(storage, tmp_path, "uploads", b"video")
+    gc.release(db, [key], stored_before=stored_before)
+    assert storage.exists(key)
+
+
+def test_collect_uploads_after_the_grace_period(storage, session_factory, db, tmp_path):
+    gc = StorageGC(storage, session_factory, grace=3600)
+    active = put(storage, tmp_path, "uploads", b"active", age=7200)
+    orphan = put(storage, tmp_path, "uploads", b"orphan", age=7200)
+    fresh = put(storage, tmp_path, "uploads", b"fresh")
+    add_job(db, "SIGNING", video_path=active, gyro_path=None)
+    result = gc.collect()
+    assert result["uploads"] == {"removed": 1, "bytes": len(b"orphan")}
+    assert storage.exists(active) and storage.exists(fresh) and not storage.exists(orphan)
+
+
+def test_signed_outputs_expire_by_age_then_by_total_size(storage, session_factory, db, tmp_path):
+    gc = StorageGC(storage, session_factory, signed_max_age=86400, signed_max_bytes=250)
+    old = put(storage, tmp_path, "signed", b"o" * 100, age=2 * 86400)
+    older = put(storage, tmp_path, "signed", b"x" * 100, age=3600)
+    newer = put(storage, tmp_path, "signed", b"y" * 100, age=60)
+    newest = put(storage, tmp_path, "signed", b"z" * 100)
+    jobs = [add_job(db, "COMPLETED", signed_url=file_url(key)) for key in (old, older, newer, newest)]
+    assert gc.collect()["signed"] == {"removed": 2, "bytes": 200}
+    assert [storage.exists(key) for key in (old, older, newer, newest)] == [False, False, True, True]
+    db.expire_all()
+    assert [job.signed_url for job in jobs] == [None, None, file_url(newer), file_url(newest)]
+
+
+def test_signed_retention_can_be_disabled(storage, session_factory, tmp_path):
+    gc = StorageGC(storage, session_factory, signed_max_age=0, signed_max_bytes=0)
+    key = put(storage, tmp_path, "signed", b"kept", age=365 * 86400)
+    assert gc.collect()["signed"] == {"removed": 0, "bytes": 0}
+    assert storage.exists(key)
+
+
+def test_staging_and_collectors(storage, session_factory, tmp_path):
+    staging = tmp_path / "staging"
+    (staging / "abandoned").mkdir(parents=True)
+    (staging / "partial.mp4").write_bytes(b"part")
+    (staging / "current.mp4").write_bytes(b"live")
+    then = time.time() - 7200
+    for name in ("abandoned", "partial.mp4"):
+        os.utime(staging / name, (then, then))
+    gc = StorageGC(storage, session_factory, staging_dir=str(staging), grace=3600)
+    gc.add_collector("extra", lambda db: {"removed": 0})
+    result = gc.collect()
+    assert result["staging"]["removed"] == 2 and result["extra"] == {"removed": 0}
+    assert os.listdir(staging) == ["current.mp4"]
+
+
+@pytest.fixture
+def signed_file(client, tmp_path):
+    from app import main
+
+    data = os.urandom(1000)
+    key = put(main.storage, tmp_path, "signed", data)
+    return file_url(key), data
+
+
+def test_files_are_served_with_a_strong_etag(client, signed_file):
+    url, data = signed_file
+    response = client.get(url)
+    assert response.status_code == 200 and response.content == data
+    etag = response.headers["etag"]
+    assert etag == f'"{hashlib.sha256(data).hexdigest()}"'
+    assert "immutable" in response.headers["cache-control"]
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        cached = client.get(url, headers={"If-None-Match": if_none_match})
+        assert cached.status_code == 304 and cached.content == b"" and cached.headers["etag"] == etag
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_files_support_ranges(client, signed_file):
+    url, data = signed_file
+    response = client.get(url, headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206 and response.content == data[100:200]
+    assert response.headers["content-range"] == f"bytes 100-199/{len(data)}"
+    assert client.get(url, headers={"Range": "bytes=-10"}).content == data[-10:]
+
+
+def test_unknown_or_malformed_files_are_404(client):
+    assert client.get(f"/files/{'0' * 64}.mp4").status_code == 404
+    assert client.get("/files/..%2Fapp.db").status_code == 404
+    assert client.get("/files/not-a-hash.mp4").status_code == 404
@@ -0,0 +1,105 @@
+import asyncio
+import hashlib
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app import uploads
+
+BOUNDARY = "vpboundary"
+PARTS = {
+    "video": uploads.FilePart(uploads.VIDEO_CONTENT_TYPES, uploads.VIDEO_EXTENSIONS, 1024, "video.mp4"),
+    "gyro": uploads.FilePart(uploads.GYRO_CONTENT_TYPES, uploads.GYRO_EXTENSIONS, 1024, "gyro.csv"),
+}
+
+
+def part(name, data, filename=None, content_type=None):
+    disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+    head = f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n"
+    if content_type:
+        head += f"Content-Type: {content_type}\r\n"
+    return head.encode() + b"\r\n" + data + b"\r\n"
+
+
+def body(*parts):
+    return b"".join(parts) + f"--{BOUNDARY}--\r\n".encode()
+
+
+class Stream:
+    """ASGI receive() that hands the body out in small chunks and counts what was read."""
+
+    def __init__(self, data: bytes, chunk: int = 16):
+        self.chunks = [data[i:i + chunk] for i in range(0, len(data), chunk)]
+        self.read = 0
+
+    async def __call__(self):
+        if self.read < len(self.chunks):
+            self.read += 1
+            return {"type": "http.request", "body": self.chunks[self.read - 1], "more_body": self.read < len(self.chunks)}
+        return {"type": "http.disconnect"}
+
+
+def receive(data: bytes, tmp_path, max_request_bytes: int = 1 << 20, stream=None, **options):
+    stream = stream or Stream(data)
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    request = Request({"type": "http", "method": "POST", "headers": headers}, stream)
+    receiver = uploads.MultipartReceiver(
+        PARTS, lambda field, filename: str(tmp_path / f"{field}_{filename}"), max_request_bytes, **options
+    )
+    return asyncio.run(receiver.receive(request)), receiver
+
+
+def test_files_and_fields(tmp_path):
+    video = b"\x00\x01video bytes" * 10
+    data = body(
+        part("profile", b"fast"),
+        part("video", video, "clip.mp4", "video/mp4"),
+        part("gyro", b"t,x,y,z\n0,1,2,3\n", "g.csv", "text/csv"),
+    )
+    (received, fields), _ = receive(data, tmp_path)
+    assert fields == {"profile": "fast"}
+    assert received["video"].filename == "clip.mp4"
+    assert received["video"].size == len(video)
+    assert received["video"].sha256 == hashlib.sha256(video).hexdigest()
+    assert open(received["video"].path, "rb").read() == video
+
+
+def test_wrong_type_rejected_before_file_data(tmp_path):
+    data = body(part("video", b"x" * 4096, "clip.exe", "application/x-msdownload"))
+    stream = Stream(data)
+    with pytest.raises(HTTPException) as e:
+        receive(data, tmp_path, stream=stream)
+    assert e.value.status_code == 415
+    assert stream.read < len(stream.chunks)
+    assert not list(tmp_path.iterdir())
+
+
+def test_file_limit_applies_mid_stream(tmp_path):
+    data = body(part("video", b"x" * 100_000, "clip.mp4", "video/mp4"), part("gyro", b"0,1,2,3\n", "g.csv", "text/csv"))
+    stream = Stream(data, chunk=64 * 1024)
+    with pytest.raises(HTTPException) as e:
+        receive(data, tmp_path, stream=stream)
+    assert e.value.status_code == 413
+    assert not list(tmp_path.iterdir())
+
+
+def test_request_limit(tmp_path):
+    data = body(part("video", b"x" * 900, "clip.mp4", "video/mp4"), part("gyro", b"x" * 900, "g.csv", "text/csv"))
+    with pytest.raises(HTTPException) as e:
+        receive(data, tmp_path, max_request_bytes=1200)
+    assert e.value.status_code == 413
+
+
+def test_missing_file_and_field_validation(tmp_path):
+    with pytest.raises(HTTPException) as e:
+        receive(body(part("video", b"x", "clip.mp4", "video/mp4")), tmp_path)
+    assert e.value.status_code == 422
+    assert not list(tmp_path.iterdir())
+
+    def reject(name, value):
+        raise HTTPException(422, f"bad {name}")
+
+    with pytest.raises(HTTPException) as e:
+        receive(body(part("profile", b"nope"), part("video", b"x", "clip.mp4", "video/mp4")), tmp_path, on_field=reject)
+    assert e.value.detail == "bad profile"
@@ -0,0 +1,172 @@
+import math
+import os
+import threading
+import time
+
+import pytest
+
+from app import gyro_analysis
+from app.flow_cache import FlowCache
+from app.verifier import MotionVerifierWrapper, VerifierError, VerifierPool
+from conftest import cli_requests
+
+
+def test_verify_without_a_flow_cache_uses_the_cli(cli, bundle):
+    verifier = MotionVerifierWrapper(cli, pool_size=1)
+    try:
+        result = verifier.verify(*bundle)
+    finally:
+        verifier.close()
+    assert result["score"] == 0.91 and result["verified"]
+    assert ["VERIFY", *bundle] in [r["fields"] for r in cli_requests(cli)]
+
+
+def test_flow_cache_keeps_the_cli_verdict(cli, bundle, tmp_path):
+    cache = FlowCache(str(tmp_path / "cache"))
+    verifier = MotionVerifierWrapper(cli, pool_size=1, flow_cache=cache)
+    try:
+        miss = verifier.verify(*bundle, video_sha256="a" * 64, gyro_sha256="b" * 64)
+        hit = verifier.verify(*bundle, video_sha256="a" * 64, gyro_sha256="b" * 64)
+    finally:
+        verifier.close()
+    assert (miss["details"]["flow_cache"], hit["details"]["flow_cache"]) == ("miss", "hit")
+    assert miss["score"] == hit["score"] == 0.75  # The CLI's score for the flow CSV, not the NumPy port's
+    verifies = [r for r in cli_requests(cli) if r["fields"][0] == "VERIFY"]
+    assert [r["fields"][0] for r in cli_requests(cli) if r["fields"][0] in ("FLOW", "VERIFY")] == ["FLOW", "VERIFY", "VERIFY"]
+    assert all(r["fields"][2] == bundle[1] and len(r["fields"]) == 3 for r in verifies)
+    header, first = verifies[0]["csv"][:2]
+    assert header == "timestamp,flow_x"
+    assert [float(v) for v in first.split(",")] == [1 / 30, math.sin(2 * math.pi * 0.7 * (1 / 30))]  # Full precision
+    assert len(verifies[1]["csv"]) == 90
+    assert not any(os.path.exists(r["fields"][1]) for r in verifies)
+    assert cache.gyro_path("b" * 64) is not None
+
+
+def test_axis_mapping_is_scored_in_process(cli, bundle, tmp_path):
+    scoring = gyro_analysis.ScoringParams(flow_axis="y", gyro_axis="y")
+    verifier = MotionVerifierWrapper(cli, pool_size=1, flow_cache=FlowCache(str(tmp_path / "cache")), scoring=scoring)
+    try:
+        result = verifier.verify(*bundle, video_sha256="a" * 64, gyro_sha256="b" * 64)
+    finally:
+        verifier.close()
+    assert result["details"]["scoring"] == scoring.to_dict()
+    assert "VERIFY" not in [r["fields"][0] for r in cli_requests(cli)]
+
+
+@pytest.fixture
+def pool(cli):
+    pools = []
+
+    def make(**options):
+        pools.append(VerifierPool(cli, **options))
+        return pools[-1]
+    yield make
+    for p in pools:
+        p.close()
+
+
+def pids(pool):
+    return sorted(worker.process.pid for worker in pool._workers if worker.process)
+
+
+def test_pool_runs_requests_on_persistent_workers(pool, cli):
+    p = pool(size=2)
+    started = pids(p)
+    for _ in range(4):
+        assert "VERDICT: REAL/CONSISTENT" in p.run(["VERIFY", "clip.mp4", "gyro.csv"])
+    assert pids(p) == started
+    assert sum(worker.jobs_served for worker in p._workers) == 4
+    assert {r["pid"] for r in cli_requests(cli)} <= set(started)
+
+
+def test_dead_worker_is_restarted_before_use(pool):
+    p = pool(size=1)
+    worker = p._workers[0]
+    old = worker.process.pid
+    worker.process.kill()
+    worker.process.wait()
+    assert p.alive_workers == 0
+    assert p.run(["VERIFY", "clip.mp4", "gyro.csv"])
+    assert worker.process.pid != old and p.alive_workers == 1
+
+
+def test_crash_mid_job_replaces_the_worker(pool):
+    p = pool(size=1)
+    old = pids(p)
+    with pytest.raises(VerifierError, match="exited"):
+        p.run(["VERIFY", "crash.mp4", "gyro.csv"])
+    assert pids(p) != old and p.alive_workers == 1
+    assert p.run(["VERIFY", "clip.mp4", "gyro.csv"])
+    assert p.in_flight == 0
+
+
+def test_timed_out_worker_is_replaced(pool):
+    p = pool(size=1, job_timeout=0.3)
+    old = pids(p)
+    started = time.monotonic()
+    with pytest.raises(VerifierError, match="timed out"):
+        p.run(["VERIFY", "hang.mp4", "gyro.csv"])
+    assert time.monotonic() - started < 5  # The timeout, plus QUIT's grace period before the kill
+    assert pids(p) != old
+    assert p.run(["VERIFY", "clip.mp4", "gyro.csv"])
+
+
+def test_in_flight_accounting_and_acquire_timeout(pool):
+    p = pool(size=2, acquire_timeout=0.2)
+    errors = []
+
+    def hang():
+        try:
+            p.run(["VERIFY", "hang.mp4", "gyro.csv"], timeout=1.0)
+        except VerifierError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=hang) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 2
+    while p.in_flight < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert p.in_flight == 2
+    with pytest.raises(VerifierError, match="No verifier worker available"):
+        p.run(["VERIFY", "clip.mp4", "gyro.csv"])
+    assert not p.ping(timeout=0.1)  # No idle worker to ping
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 2 and p.in_flight == 0
+    assert p.run(["VERIFY", "clip.mp4", "gyro.csv"])
+
+
+def test_health_loop_replaces_dead_workers(pool, cli):
+    p = pool(size=2, health_interval=0.05)
+    victim = p._workers[0]
+    victim.process.kill()
+    deadline = time.monotonic() + 5
+    while p.alive_workers < 2 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert p.alive_workers == 2
+    deadline = time.monotonic() + 5
+    while not any(r["fields"] == ["PING"] for r in cli_requests(cli)) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert any(r["fields"] == ["PING"] for r in cli_requests(cli))  # The live worker was pinged
+
+
+def test_wedged_worker_fails_ping_and_is_replaced(pool, cli):
+    p = pool(size=1)
+    old = pids(p)
+    wedged = os.path.join(os.path.dirname(cli), "wedged")
+    open(wedged, "w").close()
+    assert not p.ping(timeout=0.3)
+    os.remove(wedged)
+    assert pids(p) != old
+    assert p.ping(timeout=2.0)
+
+
+def test_closed_pool(pool):
+    p = pool(size=1)
+    with pytest.raises(ValueError, match="Invalid character"):
+        p.run(["VERIFY", "clip\t.mp4", "gyro.csv"])
+    p.close()
+    assert p.alive_workers == 0
+    with pytest.raises(VerifierError, match="closed"):
+        p.run(["VERIFY", "clip.mp4", "gyro.csv"])
@@ -5,21 +5,198 @@
 #include <numeric>
 #include <algorithm>
 #include <iostream>
+#include <chrono>
+#include <cstdint>
+#include <cstring>
+#include <iterator>
+#include <stdexcept>
+#ifdef VP_HAVE_ZLIB
+#include <zlib.h>
+#endif
+
+namespace {
+
+// Binary gyro log, see backend/app/gyro_format.py for the layout
+const char kGyroMagic[4] = {'V', 'P', 'G', 'Y'};
+const size_t kGyroHeaderSize = 16;
+const uint8_t kGyroVersion = 1;
+const uint8_t kGyroFlagZlib = 1;
+const uint8_t kGyroFlagNanoseconds = 2;
+const uint8_t kGyroFlagDegrees = 4;
+// Largest compressed payload we inflate, as MAX_INFLATED_BYTES in gyro_format.py
+const size_t kGyroMaxInflatedBytes = 64 * 1024 * 1024;
+
+// Fields are little-endian, like every platform we build for
+template <typename T>
+T readLittleEndian(const unsigned char* p) {
+    T value;
+    std::memcpy(&value, p, sizeof(T));
+    return value;
+}
+
+#ifdef VP_HAVE_ZLIB
+// Fails on a corrupt stream or one that inflates past `limit` bytes
+bool inflateBuffer(const std::vector<char>& in, std::vector<char>& out, size_t limit) {
+    z_stream zs;
+    std::memset(&zs, 0, sizeof(zs));
+    if (inflateInit(&zs) != Z_OK) return false;
+    zs.next_in = reinterpret_cast<Bytef*>(const_cast<char*>(in.data()));
+    zs.avail_in = static_cast<uInt>(in.size());
+
+    char buffer[64 * 1024];
+    int ret;
+    do {
+        zs.next_out = reinterpret_cast<Bytef*>(buffer);
+        zs.avail_out = sizeof(buffer);
+        ret = inflate(&zs, Z_NO_FLUSH);
+        if (ret != Z_OK && ret != Z_STREAM_END) {
+            inflateEnd(&zs);
+            return false;
+        }
+        size_t produced = sizeof(buffer) - zs.avail_out;
+        if (produced > limit - out.size()) {
+            inflateEnd(&zs);
+            return false;
+        }
+        out.insert(out.end(), buffer, buffer + produced);
+    } while (ret != Z_STREAM_END);
+    inflateEnd(&zs);
+    return true;
+}
+#endif
+
+} // namespace
+
+bool parseAnalysisProfile(const std::string& spec, AnalysisProfile& profile, std::string& error) {
+    std::stringstream ss(spec);
+    std::string item;
+    while (std::getline(ss, item, ',')) {
+        if (item.empty()) continue;
+        size_t eq = item.find('=');
+        if (eq == std::string::npos) {
+            error = "Malformed profile parameter '" + item + "'";
+            return false;
+        }
+        std::string key = item.substr(0, eq);
+        double value;
+        try {
+            size_t used = 0;
+            value = std::stod(item.substr(eq + 1), &used);
+            if (used != item.size() - eq - 1) throw std::invalid_argument(key);
+        } catch (const std::exception&) {
+            error = "Invalid value for profile parameter '" + key + "'";
+            return false;
+        }
+        if (key == "max_width") profile.maxWidth = static_cast<int>(value);
+        else if (key == "stride") profile.stride = static_cast<int>(value);
+        else if (key == "pyr_scale") profile.pyrScale = value;
+        else if (key == "levels") profile.levels = static_cast<int>(value);
+        else if (key == "winsize") profile.winsize = static_cast<int>(value);
+        else if (key == "iterations") profile.iterations = static_cast<int>(value);
+        else if (key == "poly_n") profile.polyN = static_cast<int>(value);
+        else if (key == "poly_sigma") profile.polySigma = value;
+        else if (key == "roi_margin") profile.roiMargin = value;
+        else {
+            error = "Unknown profile parameter '" + key + "'";
+            return false;
+        }
+    }
+    if (profile.maxWidth < 0 || profile.stride < 1 || profile.levels < 1 || profile.winsize < 3 ||
+        profile.iterations < 1 || profile.pyrScale <= 0.0 || profile.pyrScale >= 1.0 ||
+        (profile.polyN != 5 && profile.polyN != 7) || profile.polySigma <= 0.0 ||
+        profile.roiMargin < 0.0 || profile.roiMargin >= 0.5) {
+        error = "Profile parameter out of range";
+        return false;
+    }
+    return true;
+}
 
 MotionVerifier::MotionVerifier() {}
 MotionVerifier::~MotionVerifier() {}
 
+std::vector<GyroSample> MotionVerifier::loadGyroBinary(std::ifstream& file) {
+    std::vector<GyroSample> data;
+    unsigned char header[kGyroHeaderSize];
+    if (!file.read(reinterpret_cast<char*>(header), kGyroHeaderSize)) {
+        std::cerr << "Truncated binary gyro header" << std::endl;
+        return data;
+    }
+    uint8_t version = header[4];
+    uint8_t flags = header[5];
+    uint8_t valueSize = header[6];
+    uint32_t count = readLittleEndian<uint32_t>(header + 12);
+    if (version != kGyroVersion || (valueSize != 4 && valueSize != 8)) {
+        std::cerr << "Unsupported binary gyro log (version " << int(version)
+                  << ", value size " << int(valueSize) << ")" << std::endl;
+        return data;
+    }
+
+    // One read of the whole payload; records are decoded in place
+    std::vector<char> payload((std::istreambuf_iterator<char>(file)), std::istreambuf_iterator<char>());
+    if (flags & kGyroFlagZlib) {
+#ifdef VP_HAVE_ZLIB
+        size_t limit = count ? count * (sizeof(double) + 3 * valueSize) : kGyroMaxInflatedBytes;
+        std::vector<char> inflated;
+        if (limit > kGyroMaxInflatedBytes || !inflateBuffer(payload, inflated, limit)) {
+            std::cerr << "Corrupt or oversized compressed gyro payload" << std::endl;
+            return data;
+        }
+        payload.swap(inflated);
+#else
+        std::cerr << "Compressed gyro logs need a build with zlib" << std::endl;
+        return data;
+#endif
+    }
+
+    size_t recordSize = sizeof(double) + 3 * valueSize;
+    size_t available = payload.size() / recordSize;
+    if (count == 0) {
+        count = static_cast<uint32_t>(available);
+    } else if (count > available) {
+        std::cerr << "Binary gyro log declares " << count << " records, payload holds " << available << std::endl;
+        return data;
+    }
+
+    double timeScale = (flags & kGyroFlagNanoseconds) ? 1e-9 : 1.0;
+    double rateScale = (flags & kGyroFlagDegrees) ? M_PI / 180.0 : 1.0;
+    const unsigned char* p = reinterpret_cast<const unsigned char*>(payload.data());
+    double t0 = count > 0 ? readLittleEndian<double>(p) : 0.0;
+    data.reserve(count);
+    for (uint32_t i = 0; i < count; ++i, p += recordSize) {
+        GyroSample sample;
+        sample.timestamp = (readLittleEndian<double>(p) - t0) * timeScale;
+        const unsigned char* values = p + sizeof(double);
+        for (int axis = 0; axis < 3; ++axis) {
+            double v = valueSize == 4
+                ? readLittleEndian<float>(values + axis * 4)
+                : readLittleEndian<double>(values + axis * 8);
+            (axis == 0 ? sample.x : axis == 1 ? sample.y : sample.z) = v * rateScale;
+        }
+        data.push_back(sample);
+    }
+    return data;
+}
+
 std::vector<GyroSample> MotionVerifier::loadGyroData(const std::string& path) {
     std::vector<GyroSample> data;
-    std::ifstream file(path);
+    std::ifstream file(path, std::ios::binary);
     std::string line;
     
     // Check if file opened
     if (!file.is_open()) {
-        std::cerr << "Failed to open gyro CSV: " << path << std::endl;
+        std::cerr << "Failed to open gyro log: " << path << std::endl;
         return data; 
     }
 
+    // Binary VPGY log, otherwise CSV
+    char magic[sizeof(kGyroMagic)] = {0};
+    file.read(magic, sizeof(magic));
+    file.clear();
+    file.seekg(0);
+    if (std::memcmp(magic, kGyroMagic, sizeof(kGyroMagic)) == 0) {
+        return loadGyroBinary(file);
+    }
+
     // Skip header
     std::getline(file, line);
     
@@ -107,7 +284,17 @@ std::pair<std::vector<double>, std::vector<double>> MotionVerifier::loadFlowCSV(
     return {timestamps, flowX};
 }
 
-std::pair<std::vector<double>, std::vector<double>> MotionVerifier::calculateOpticalFlow(const std::string& videoPath) {
+std::pair<std::vector<double>, std::vector<double>> MotionVerifier::extractFlow(
+    const std::string& videoPath, double& fps, int& frames, std::vector<double>* flowY,
+    const AnalysisProfile& profile) {
+    fps = 0.0;
+    frames = 0;
+    return calculateOpticalFlow(videoPath, profile, &fps, &frames, flowY);
+}
+
+std::pair<std::vector<double>, std::vector<double>> MotionVerifier::calculateOpticalFlow(
+    const std::string& videoPath, const AnalysisProfile& profile, double* fpsOut, int* framesOut,
+    std::vector<double>* flowYOut) {
     std::vector<double> timestamps;
     std::vector<double> flowX;
     
@@ -119,42 +306,71 @@ std::pair<std::vector<double>, std::vector<double>> MotionVerifier::calculateOpt
     
     double fps = cap.get(cv::CAP_PROP_FPS);
     if (fps <= 0) fps = 30.0;
+    if (fpsOut) *fpsOut = fps;
     
     cv::Mat prevGray, frame, gray;
     cap >> frame;
     if (frame.empty()) return {timestamps, flowX};
+    int decoded = 1;
+    if (framesOut) *framesOut = decoded;
+
+    // Downscaling happens after the grey conversion, on a third of the data
+    double scale = 1.0;
+    if (profile.maxWidth > 0 && frame.cols > profile.maxWidth) {
+        scale = static_cast<double>(profile.maxWidth) / frame.cols;
+    }
+    auto toGray = [scale](const cv::Mat& in, cv::Mat& out) {
+        cv::cvtColor(in, out, cv::COLOR_BGR2GRAY);
+        if (scale < 1.0) cv::resize(out, out, cv::Size(), scale, scale, cv::INTER_AREA);
+    };
+    toGray(frame, prevGray);
     
-    cv::cvtColor(frame, prevGray, cv::COLOR_BGR2GRAY);
-    
-    int frameCount = 0;
+    int frameIndex = 0; // Index of prevGray in the video
     
     while (true) {
+        // Skipped frames are only grabbed, not decoded into a Mat
+        bool ended = false;
+        for (int s = 1; s < profile.stride; ++s) {
+            if (!cap.grab()) {
+                ended = true;
+                break;
+            }
+            decoded++;
+        }
+        if (ended) break;
         cap >> frame;
         if (frame.empty()) break;
+        decoded++;
         
-        cv::cvtColor(frame, gray, cv::COLOR_BGR2GRAY);
+        toGray(frame, gray);
         
         cv::Mat flow;
         // Basic Farneback
-        cv::calcOpticalFlowFarneback(prevGray, gray, flow, 0.5, 3, 15, 3, 5, 1.2, 0);
+        cv::calcOpticalFlowFarneback(prevGray, gray, flow, profile.pyrScale, profile.levels, profile.winsize,
+                                     profile.iterations, profile.polyN, profile.polySigma, 0);
         
         // Calculate mean flow
-        // Crop margins 10%
+        // Crop margins (10% by default)
         int h = flow.rows;
         int w = flow.cols;
-        int mX = w * 0.1;
-        int mY = h * 0.1;
+        int mX = w * profile.roiMargin;
+        int mY = h * profile.roiMargin;
         
         cv::Rect roi(mX, mY, w - 2*mX, h - 2*mY);
         cv::Scalar meanFlow = cv::mean(flow(roi));
         
-        // meanFlow[0] is X, [1] is Y
-        flowX.push_back(meanFlow[0]);
-        timestamps.push_back((double)frameCount / fps);
+        // meanFlow[0] is X, [1] is Y; back to full-resolution pixels per frame,
+        // stamped at the middle of the frames the pair spans
+        double norm = scale * profile.stride;
+        flowX.push_back(meanFlow[0] / norm);
+        if (flowYOut) flowYOut->push_back(meanFlow[1] / norm);
+        timestamps.push_back((frameIndex + (profile.stride - 1) / 2.0) / fps);
         
-        frameCount++;
+        frameIndex += profile.stride;
+        if (framesOut) *framesOut = decoded;
         prevGray = gray.clone(); // Important clone
     }
+    if (framesOut) *framesOut = decoded;
     
     return {timestamps, flowX};
 }
@@ -318,11 +534,18 @@ std::pair<bool, double> MotionVerifier::analyzeTremor(const std::vector<GyroSamp
     return {isHandheld, ratio};
 }
 
-VerificationResult MotionVerifier::verify(const std::string& videoPath, const std::string& gyroCSVPath) {
+static double elapsedMs(std::chrono::steady_clock::time_point since) {
+    return std::chrono::duration<double, std::milli>(std::chrono::steady_clock::now() - since).count();
+}
+
+VerificationResult MotionVerifier::verify(const std::string& videoPath, const std::string& gyroCSVPath,
+                                          const AnalysisProfile& profile) {
     VerificationResult result;
     result.success = false;
     result.score = 0.0;
     
+    auto stageStart = std::chrono::steady_clock::now();
+
     std::cout << "DEBUG: Checking path: '" << videoPath << "'" << std::endl;
     std::pair<std::vector<double>, std::vector<double>> opticalFlow;
     if (videoPath.length() >= 4 && videoPath.substr(videoPath.length() - 4) == ".csv") {
@@ -330,8 +553,9 @@ VerificationResult MotionVerifier::verify(const std::string& videoPath, const st
          opticalFlow = loadFlowCSV(videoPath);
     } else {
          std::cout << "DEBUG: Treating as video input." << std::endl;
-         opticalFlow = calculateOpticalFlow(videoPath);
+         opticalFlow = calculateOpticalFlow(videoPath, profile);
     }
+    result.timingsMs.push_back({"flow", elapsedMs(stageStart)});
     
     auto& timestamps = opticalFlow.first;
     auto& visualFlowX = opticalFlow.second;
@@ -341,12 +565,16 @@ VerificationResult MotionVerifier::verify(const std::string& videoPath, const st
         return result;
     }
     
+    stageStart = std::chrono::steady_clock::now();
     auto gyroData = loadGyroData(gyroCSVPath);
+    result.timingsMs.push_back({"gyro_load", elapsedMs(stageStart)});
     if (gyroData.empty()) {
         result.message = "Could not load gyro data.";
         return result;
     }
     
+    stageStart = std::chrono::steady_clock::now();
+    
     // Sync Gyro Y (Yaw) to Visual Flow X (Pan)
     // Note: Assuming Gyro Y correlates to Flow X
     auto gyroYResampled = resampleGyro(timestamps, gyroData, 1);
@@ -366,11 +594,14 @@ VerificationResult MotionVerifier::verify(const std::string& videoPath, const st
     
     result.score = std::abs(corr); // We care about magnitude
     result.causalityScore = std::max(0.0, std::min(100.0, result.score * 100.0));
+    result.timingsMs.push_back({"correlation", elapsedMs(stageStart)});
     
     // Analyze Tremor
+    stageStart = std::chrono::steady_clock::now();
     auto tremorResult = analyzeTremor(gyroData);
     result.isHandheld = tremorResult.first;
     result.tremorEnergy = tremorResult.second;
+    result.timingsMs.push_back({"tremor", elapsedMs(stageStart)});
     
     result.success = true;
     result.duration_analyzed = timestamps.back() - timestamps.front();
@@ -3,6 +3,7 @@
 
 #include <vector>
 #include <string>
+#include <fstream>
 #include <opencv2/opencv.hpp>
 
 struct GyroSample {
@@ -18,8 +19,29 @@ struct VerificationResult {
     double duration_analyzed;
     bool success;
     std::string message;
+    std::vector<std::pair<std::string, double>> timingsMs; // Per-stage wall time (stage name, ms)
 };
 
+// How optical flow is computed: working resolution, frames skipped between
+// flow pairs, Farneback pyramid parameters and the margin cropped from each
+// side. The defaults are the "accurate" profile (full resolution, every frame).
+struct AnalysisProfile {
+    int maxWidth = 0;       // Frames wider than this are downscaled first; 0 = never
+    int stride = 1;         // Flow between frames i and i + stride
+    double pyrScale = 0.5;
+    int levels = 3;
+    int winsize = 15;
+    int iterations = 3;
+    int polyN = 5;
+    double polySigma = 1.2;
+    double roiMargin = 0.1; // Fraction of width/height ignored on each side
+};
+
+// Parses a `key=value,...` spec (max_width, stride, pyr_scale, levels, winsize,
+// iterations, poly_n, poly_sigma, roi_margin) over the defaults in `profile`.
+// Returns false and sets `error` on unknown keys or out-of-range values.
+bool parseAnalysisProfile(const std::string& spec, AnalysisProfile& profile, std::string& error);
+
 class MotionVerifier {
 public:
     MotionVerifier();
@@ -28,16 +50,33 @@ public:
     /**
      * Verify consistency between a video file and a gyroscope CSV.
      * @param videoPath Path to mp4 video
-     * @param gyroCSVPath Path to CSV (timestamp, x, y, z)
+     * @param gyroCSVPath Path to CSV (timestamp, x, y, z) or binary VPGY gyro log
+     * @param profile How the optical flow of the video is computed
+     */
+    VerificationResult verify(const std::string& videoPath, const std::string& gyroCSVPath,
+                              const AnalysisProfile& profile = AnalysisProfile());
+
+    /**
+     * Per-frame optical flow of one video segment, as computed by verify().
+     * Timestamps are seconds from the segment's first frame; `fps` and the
+     * number of decoded `frames` let callers place consecutive segments.
+     * The mean vertical flow per frame goes to `flowY` when given.
      */
-    VerificationResult verify(const std::string& videoPath, const std::string& gyroCSVPath);
+    std::pair<std::vector<double>, std::vector<double>> extractFlow(
+        const std::string& videoPath, double& fps, int& frames, std::vector<double>* flowY = nullptr,
+        const AnalysisProfile& profile = AnalysisProfile());
 
 private:
+    // Gyro log as `timestamp,x,y,z` CSV or binary VPGY (detected by its magic)
     std::vector<GyroSample> loadGyroData(const std::string& path);
+    std::vector<GyroSample> loadGyroBinary(std::ifstream& file);
     
     // Calculates dense optical flow and returns a signal of average flow (X, Y) per frame
-    // Returns pair of vectors: <Time, FlowX> (focusing on X for now)
-    std::pair<std::vector<double>, std::vector<double>> calculateOpticalFlow(const std::string& videoPath);
+    // Returns pair of vectors: <Time, FlowX> (focusing on X for now). Flow is in
+    // full-resolution pixels per frame whatever the profile's scale and stride.
+    std::pair<std::vector<double>, std::vector<double>> calculateOpticalFlow(
+        const std::string& videoPath, const AnalysisProfile& profile, double* fpsOut = nullptr,
+        int* framesOut = nullptr, std::vector<double>* flowYOut = nullptr);
     
     // Resamples gyro data to match video timestamps
     std::vector<double> resampleGyro(
@@ -1,37 +1,144 @@
 #include <iostream>
+#include <sstream>
+#include <string>
+#include <algorithm>
+#include <cctype>
+#include <iomanip>
 #include "MotionVerifier.h"
 
-int main(int argc, char** argv) {
-    if (argc < 3) {
-        std::cout << "Usage: ./vp_cli <video_path> <gyro_csv_path>" << std::endl;
-        return 1;
+// Stage timings as TIMING_<STAGE>_MS lines (printed on failure too)
+static void printTimings(const VerificationResult& result) {
+    for (const auto& timing : result.timingsMs) {
+        std::string stage = timing.first;
+        std::transform(stage.begin(), stage.end(), stage.begin(), [](unsigned char c) { return std::toupper(c); });
+        std::cout << "TIMING_" << stage << "_MS: " << timing.second << std::endl;
     }
-    
-    std::string videoPath = argv[1];
-    std::string gyroPath = argv[2];
-    
-    MotionVerifier verifier;
-    VerificationResult result = verifier.verify(videoPath, gyroPath);
-    
+}
+
+// Structured output (YAML-like) for easy parsing
+static int printResult(const VerificationResult& result, std::ostream& err) {
+    printTimings(result);
     if (result.success) {
-        // Structured output (YAML-like) for easy parsing
         std::cout << "SUCCESS: " << result.message << std::endl;
         std::cout << "SCORE: " << result.score << std::endl;
         std::cout << "CAUSALITY_SCORE: " << result.causalityScore << std::endl;
         std::cout << "IS_HANDHELD: " << (result.isHandheld ? "true" : "false") << std::endl;
         std::cout << "TREMOR_ENERGY: " << result.tremorEnergy << std::endl;
         std::cout << "DURATION: " << result.duration_analyzed << "s" << std::endl;
-        
+
         // Simple threshold
         if (result.score > 0.7) {
             std::cout << "VERDICT: REAL/CONSISTENT" << std::endl;
         } else {
             std::cout << "VERDICT: FAKE/INCONSISTENT" << std::endl;
         }
-    } else {
-        std::cerr << "FAILURE: " << result.message << std::endl;
-        return 1;
+        return 0;
+    }
+    err << "FAILURE: " << result.message << std::endl;
+    return 1;
+}
+
+// Long-lived worker mode used by the backend pool.
+// Reads one tab-separated request per line from stdin:
+//   PING                                 -> PONG
+//   VERIFY\t<video>\t<gyro>[\t<profile>] -> result lines, EXIT_CODE: <n>, END
+//   FLOW\t<video>[\t<profile>]           -> FPS: <fps>, FRAMES: <n>, FLOW: <t>,<flow_x>,<flow_y>
+//                                           per frame pair, EXIT_CODE: <n>, END (live sessions,
+//                                           and clips whose flow the backend caches)
+//   QUIT                                 -> exits
+// <profile> is an analysis profile spec (`max_width=960,stride=2,...`, see
+// parseAnalysisProfile); omitted parameters keep the accurate defaults.
+// OpenCV/FFmpeg are initialised once for the lifetime of the process.
+// Optional trailing profile field; prints the failure block and returns false if invalid
+static bool readProfile(std::stringstream& ss, AnalysisProfile& profile) {
+    std::string spec, error;
+    std::getline(ss, spec, '\t');
+    if (parseAnalysisProfile(spec, profile, error)) return true;
+    std::cout << "FAILURE: " << error << std::endl;
+    std::cout << "EXIT_CODE: 2" << std::endl;
+    std::cout << "END" << std::endl;
+    return false;
+}
+
+static int serve() {
+    MotionVerifier verifier;
+    std::string line;
+
+    while (std::getline(std::cin, line)) {
+        if (!line.empty() && line.back() == '\r') line.pop_back();
+
+        std::stringstream ss(line);
+        std::string command;
+        std::getline(ss, command, '\t');
+
+        if (command == "PING") {
+            std::cout << "PONG" << std::endl;
+        } else if (command == "QUIT") {
+            break;
+        } else if (command == "VERIFY") {
+            std::string videoPath, gyroPath;
+            std::getline(ss, videoPath, '\t');
+            std::getline(ss, gyroPath, '\t');
+            AnalysisProfile profile;
+            if (!readProfile(ss, profile)) continue;
+
+            VerificationResult result = verifier.verify(videoPath, gyroPath, profile);
+            int code = printResult(result, std::cout);
+            std::cout << "EXIT_CODE: " << code << std::endl;
+            std::cout << "END" << std::endl;
+        } else if (command == "FLOW") {
+            std::string videoPath;
+            std::getline(ss, videoPath, '\t');
+            AnalysisProfile profile;
+            if (!readProfile(ss, profile)) continue;
+
+            double fps = 0.0;
+            int frames = 0;
+            std::vector<double> flowY;
+            auto flow = verifier.extractFlow(videoPath, fps, frames, &flowY, profile);
+            std::cout << "FPS: " << std::setprecision(17) << fps << "\n";
+            std::cout << "FRAMES: " << frames << "\n";
+            for (size_t i = 0; i < flow.first.size(); ++i) {
+                std::cout << "FLOW: " << flow.first[i] << "," << flow.second[i] << "," << flowY[i] << "\n";
+            }
+            std::cout << std::setprecision(6);
+            if (frames == 0) {
+                std::cout << "FAILURE: Could not decode video segment." << std::endl;
+            }
+            std::cout << "EXIT_CODE: " << (frames > 0 ? 0 : 1) << std::endl;
+            std::cout << "END" << std::endl;
+        } else {
+            std::cout << "FAILURE: Unknown command '" << command << "'" << std::endl;
+            std::cout << "EXIT_CODE: 2" << std::endl;
+            std::cout << "END" << std::endl;
+        }
     }
-    
     return 0;
 }
+
+int main(int argc, char** argv) {
+    if (argc >= 2 && std::string(argv[1]) == "--serve") {
+        return serve();
+    }
+
+    if (argc < 3) {
+        std::cout << "Usage: ./vp_cli <video_path> <gyro_csv_or_vpgy_path> [profile_spec]" << std::endl;
+        std::cout << "       ./vp_cli --serve" << std::endl;
+        return 1;
+    }
+
+    std::string videoPath = argv[1];
+    std::string gyroPath = argv[2];
+
+    AnalysisProfile profile;
+    std::string error;
+    if (argc >= 4 && !parseAnalysisProfile(argv[3], profile, error)) {
+        std::cerr << "FAILURE: " << error << std::endl;
+        return 1;
+    }
+
+    MotionVerifier verifier;
+    VerificationResult result = verifier.verify(videoPath, gyroPath, profile);
+
+    return printResult(result, std::cerr);
+}